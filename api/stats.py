@@ -0,0 +1,40 @@
+
+import os
+import json
+from stats_api import StatsService
+from supabase_database import SupabaseManager
+from dotenv import load_dotenv
+
+# تحميل متغيرات البيئة
+load_dotenv()
+
+# الذاكرة المؤقتة تبقى بين الطلبات ما دامت نسخة الدالة دافئة
+service = StatsService(
+    SupabaseManager(),
+    ttl=float(os.getenv('STATS_CACHE_TTL', '30')),
+    stale=float(os.getenv('STATS_CACHE_STALE', '300'))
+)
+
+async def handler(request):
+    """معالج واجهة الإحصائيات لـ Vercel (/api/stats/leaderboard و /profile و /activity)"""
+    try:
+        if request.method == 'GET':
+            status, headers, body = await service.handle(
+                request.path, dict(request.query), dict(request.headers)
+            )
+            return {
+                'statusCode': status,
+                'headers': headers,
+                'body': body.decode('utf-8')
+            }
+        else:
+            return {
+                'statusCode': 405,
+                'body': json.dumps({'error': 'Method not allowed'})
+            }
+    except Exception as e:
+        print(f"خطأ في واجهة الإحصائيات: {e}")
+        return {
+            'statusCode': 500,
+            'body': json.dumps({'error': str(e)})
+        }
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Activity - عدادات نشاط كل جروب حسب ساعة الأسبوع (7 × 24 خانة) لأمر /activity
+
+كل رسالة (قبل فترة الانتظار وتقييم السبام) تزيد خانة في مصفوفة أعداد ثابتة الحجم (array) في الذاكرة، والفروق تُكتب دورياً في
+group_activity بإضافة تراكمية (ON CONFLICT ... messages + excluded.messages). الخريطة الحرارية
+تُرسم من المصفوفات مباشرة، وأول طلب لجروب فقط يقرأ صفوفه (168 صفاً كحد أقصى) من الجدول.
+"""
+
+import asyncio
+import logging
+import time
+from array import array
+from datetime import datetime
+from typing import Optional, Dict
+
+from utils import format_number
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_WEEK = 7 * 24
+
+# ترتيب datetime.weekday(): الاثنين = 0
+DAY_NAMES = ('الاثنين', 'الثلاثاء', 'الأربعاء', 'الخميس', 'الجمعة', 'السبت', 'الأحد')
+
+# من الأقل للأكثر نشاطاً (الخانة الفارغة نقطة)
+SHADES = '·░▒▓█'
+
+
+def hour_of_week(when: Optional[datetime] = None) -> int:
+    when = when or datetime.now()
+    return when.weekday() * 24 + when.hour
+
+
+def _counters() -> array:
+    return array('Q', bytes(8 * HOURS_PER_WEEK))
+
+
+class GroupActivity:
+    """مجموع الرسائل الممنوحة لكل (جروب، ساعة أسبوع) مع فروق لم تُكتب بعد"""
+
+    def __init__(self, db):
+        self.db = db
+        self.flushes = 0
+        # المجموع الكامل، للجروبات التي طُلبت خريطتها فقط
+        self._totals: Dict[int, array] = {}
+        # ما أضيف منذ آخر كتابة
+        self._pending: Dict[int, array] = {}
+        # التحميل والكتابة لا يتداخلان (وإلا تُحسب الفروق مرتين أو لا تُحسب)
+        self._lock = asyncio.Lock()
+
+    def record(self, group_id: int, when: Optional[datetime] = None, messages: int = 1):
+        """زيادة خانة الساعة الحالية (بدون أي استعلام)"""
+        slot = hour_of_week(when)
+        pending = self._pending.get(group_id)
+        if pending is None:
+            pending = self._pending[group_id] = _counters()
+        pending[slot] += messages
+        totals = self._totals.get(group_id)
+        if totals is not None:
+            totals[slot] += messages
+
+    async def counters(self, group_id: int) -> array:
+        """المجموع الكامل للجروب (قراءة الجدول مرة واحدة عند أول طلب)"""
+        totals = self._totals.get(group_id)
+        if totals is not None:
+            return totals
+        async with self._lock:
+            if group_id not in self._totals:
+                totals = _counters()
+                for row in await self.db.get_group_activity(group_id):
+                    totals[row['hour_of_week']] = row['messages']
+                pending = self._pending.get(group_id)
+                if pending is not None:
+                    for slot, value in enumerate(pending):
+                        totals[slot] += value
+                self._totals[group_id] = totals
+        return self._totals[group_id]
+
+    async def flush(self) -> int:
+        """كتابة الفروق في group_activity، وعند الفشل تعود للانتظار حتى المحاولة التالية"""
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            rows = [
+                {'group_id': group_id, 'hour_of_week': slot, 'messages': value}
+                for group_id, counters in pending.items()
+                for slot, value in enumerate(counters) if value
+            ]
+            if not rows:
+                return 0
+            try:
+                await self.db.add_group_activity(rows)
+            except Exception:
+                for group_id, counters in pending.items():
+                    current = self._pending.get(group_id)
+                    if current is None:
+                        self._pending[group_id] = counters
+                    else:
+                        for slot, value in enumerate(counters):
+                            current[slot] += value
+                raise
+            self.flushes += 1
+            return len(rows)
+
+    async def job_callback(self, context):
+        """كتابة دورية عبر JobQueue"""
+        started = time.perf_counter()
+        try:
+            written = await self.flush()
+        except Exception as e:
+            logger.error("خطأ في كتابة نشاط الجروبات: %s", e)
+            return
+        if written:
+            logger.debug("🗓️ كتابة %d خانة نشاط خلال %.0fms", written, (time.perf_counter() - started) * 1000)
+
+    async def stop(self):
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {'groups': len(self._totals), 'pending_groups': len(self._pending), 'flushes': self.flushes}
+
+
+def render_heatmap(counters: array) -> str:
+    """خريطة حرارية نصية: سطر لكل يوم وخانة لكل ساعة، مع أنشط يوم وساعة"""
+    peak = max(counters)
+    if not peak:
+        return "📭 لا يوجد نشاط مسجل لهذا الجروب بعد!"
+    lines = ["🗓️ نشاط الجروب حسب الساعة:", "", "         " + "0     6     12    18   23"]
+    for day, name in enumerate(DAY_NAMES):
+        row = counters[day * 24:(day + 1) * 24]
+        shades = ''.join(SHADES[0] if not value else SHADES[1 + min(3, (value * 4 - 1) // peak)]
+                         for value in row)
+        lines.append(f"{name:<8} {shades}")
+    busiest_day = max(range(7), key=lambda day: sum(counters[day * 24:(day + 1) * 24]))
+    busiest_hour = max(range(24), key=lambda hour: sum(counters[day * 24 + hour] for day in range(7)))
+    lines += [
+        "",
+        f"📈 أنشط يوم: {DAY_NAMES[busiest_day]}",
+        f"⏰ أنشط ساعة: {busiest_hour:02d}:00",
+        f"💬 مجموع الرسائل: {format_number(sum(counters))}",
+    ]
+    return "\n".join(lines)
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Admin Tools - أدوات الأوامر الإدارية الجماعية
+"""
+
+import re
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, List, Set, Tuple
+
+from telegram import Message, MessageEntity
+
+
+class ReplyTracker:
+    """تتبع المستخدمين الذين ردوا على رسالة (ذاكرة محدودة)"""
+
+    def __init__(self, max_messages: int = 10_000, max_repliers: int = 5_000):
+        self.max_messages = max_messages
+        self.max_repliers = max_repliers
+        self._replies: 'OrderedDict[Tuple[int, int], Set[int]]' = OrderedDict()
+
+    def record(self, chat_id: int, replied_message_id: int, user_id: int):
+        """تسجيل رد مستخدم على رسالة"""
+        key = (chat_id, replied_message_id)
+        repliers = self._replies.get(key)
+        if repliers is None:
+            repliers = set()
+            self._replies[key] = repliers
+            if len(self._replies) > self.max_messages:
+                self._replies.popitem(last=False)
+        else:
+            self._replies.move_to_end(key)
+
+        if len(repliers) < self.max_repliers:
+            repliers.add(user_id)
+
+    def get_repliers(self, chat_id: int, message_id: int) -> Set[int]:
+        """المستخدمون الذين ردوا على الرسالة"""
+        return set(self._replies.get((chat_id, message_id), ()))
+
+
+@dataclass
+class AdminTargets:
+    user_ids: Set[int] = field(default_factory=set)
+    usernames: List[str] = field(default_factory=list)
+    reason: Optional[str] = None
+
+
+def is_integer(text: str) -> bool:
+    """عدد صحيح بإشارة سالبة اختيارية (int() لا يفشل عليه)"""
+    return re.fullmatch(r'-?\d+', text) is not None
+
+
+def parse_admin_targets(message: Message, args: List[str], reply_tracker: ReplyTracker) -> AdminTargets:
+    """استخراج المستخدمين المستهدفين من نص الأمر أو من الرسالة المردود عليها"""
+    targets = AdminTargets()
+    reason_words = []
+
+    for arg in args:
+        if arg.startswith('@') and len(arg) > 1:
+            targets.usernames.append(arg[1:])
+        elif is_integer(arg):
+            targets.user_ids.add(int(arg))
+        else:
+            reason_words.append(arg)
+
+    # المستخدمون المذكورون بدون اسم مستخدم
+    for entity in message.parse_entities([MessageEntity.TEXT_MENTION]):
+        if entity.user:
+            targets.user_ids.add(entity.user.id)
+
+    # الرد على رسالة: صاحب الرسالة وكل من رد عليها
+    if not targets.user_ids and not targets.usernames and message.reply_to_message:
+        replied = message.reply_to_message
+        if replied.from_user and not replied.from_user.is_bot and replied.from_user.id != message.from_user.id:
+            targets.user_ids.add(replied.from_user.id)
+        targets.user_ids |= reply_tracker.get_repliers(message.chat_id, replied.message_id)
+        targets.user_ids.discard(message.from_user.id)
+
+    targets.reason = " ".join(reason_words) or None
+    return targets
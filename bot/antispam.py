@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Anti-Spam - تقييم الرسائل قبل منح XP (معدل المستخدم، الرسائل المكررة، موجات الرسائل في الجروب)
+"""
+
+import re
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Optional, List, Tuple
+
+_FINGERPRINT_MASK = (1 << 64) - 1
+_NOISE = re.compile(r"[\W\d_]+", re.UNICODE)
+_REPEATS = re.compile(r"(.)\1{2,}")
+
+
+def normalize_text(text: str) -> str:
+    """توحيد النص قبل المقارنة: حذف التشكيل والرموز والأرقام وتكرار الحروف"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = _NOISE.sub('', text)
+    return _REPEATS.sub(r"\1\1", text)
+
+
+def simhash(text: str, shingle: int = 3) -> int:
+    """بصمة SimHash من مقاطع الحروف (النصوص المتشابهة تختلف في بتات قليلة)"""
+    # كل مقطع كسلسلة بتات، ثم عدّ الآحاد لكل عمود (أسرع من حلقة على البتات)
+    values = [format(hash(text[i:i + shingle]) & _FINGERPRINT_MASK, '064b')
+              for i in range(max(1, len(text) - shingle + 1))]
+    half = len(values) / 2
+    fingerprint = 0
+    for column in zip(*values):
+        fingerprint = fingerprint << 1 | (column.count('1') > half)
+    return fingerprint
+
+
+class SlidingCounter:
+    """عداد نافذة منزلقة تقريبي بنافذتين ثابتتين (ذاكرة ثابتة)"""
+
+    __slots__ = ('window', 'start', 'current', 'previous')
+
+    def __init__(self, window: float, now: float):
+        self.window = window
+        self.start = now
+        self.current = 0
+        self.previous = 0
+
+    def _roll(self, now: float):
+        elapsed = now - self.start
+        if elapsed >= self.window:
+            self.previous = self.current if elapsed < 2 * self.window else 0
+            self.current = 0
+            self.start = now - (elapsed % self.window)
+
+    def add(self, now: float, amount: int = 1) -> float:
+        self._roll(now)
+        self.current += amount
+        return self.value(now)
+
+    def value(self, now: float) -> float:
+        self._roll(now)
+        weight = 1 - (now - self.start) / self.window
+        return self.current + self.previous * max(weight, 0.0)
+
+
+@dataclass
+class _GroupState:
+    fingerprints: deque
+    recent: SlidingCounter
+    baseline: float = 0.0
+    baseline_at: float = 0.0
+
+
+@dataclass
+class SpamVerdict:
+    """نتيجة تقييم رسالة: score بين 0 و 1 يُضرب في XP والعملات"""
+    score: float = 1.0
+    reasons: List[str] = field(default_factory=list)
+
+    def scale(self, amount: int) -> int:
+        return int(amount * self.score)
+
+
+class SpamScorer:
+    """تقييم متدفق للرسائل بذاكرة محدودة (LRU للمستخدمين والجروبات)"""
+
+    def __init__(self, user_window: float = 60.0, user_soft_limit: int = 8,
+                 duplicate_history: int = 64, duplicate_distance: int = 10, min_duplicate_length: int = 8,
+                 burst_window: float = 10.0, burst_factor: float = 4.0, burst_floor: int = 30,
+                 max_users: int = 50_000, max_groups: int = 5_000,
+                 duplicate_penalty: float = 0.1, burst_penalty: float = 0.5, enabled: bool = True):
+        self.enabled = enabled
+        self.user_window = user_window
+        self.user_soft_limit = user_soft_limit
+        self.duplicate_history = duplicate_history
+        self.duplicate_distance = duplicate_distance
+        self.min_duplicate_length = min_duplicate_length
+        self.max_fingerprint_length = 256
+        self.burst_window = burst_window
+        self.burst_factor = burst_factor
+        self.burst_floor = burst_floor
+        self.max_users = max_users
+        self.max_groups = max_groups
+        self.duplicate_penalty = duplicate_penalty
+        self.burst_penalty = burst_penalty
+        self._users: "OrderedDict[Tuple[int, int], SlidingCounter]" = OrderedDict()
+        self._groups: "OrderedDict[int, _GroupState]" = OrderedDict()
+
+    def _user_counter(self, group_id: int, user_id: int, now: float) -> SlidingCounter:
+        key = (group_id, user_id)
+        counter = self._users.get(key)
+        if counter is None:
+            counter = self._users[key] = SlidingCounter(self.user_window, now)
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(key)
+        return counter
+
+    def _group_state(self, group_id: int, now: float) -> _GroupState:
+        state = self._groups.get(group_id)
+        if state is None:
+            state = self._groups[group_id] = _GroupState(
+                deque(maxlen=self.duplicate_history), SlidingCounter(self.burst_window, now), baseline_at=now
+            )
+            if len(self._groups) > self.max_groups:
+                self._groups.popitem(last=False)
+        else:
+            self._groups.move_to_end(group_id)
+        return state
+
+    def _is_duplicate(self, state: _GroupState, text: Optional[str]) -> bool:
+        normalized = normalize_text(text or '')
+        if len(normalized) < self.min_duplicate_length:
+            return False
+        fingerprint = simhash(normalized[:self.max_fingerprint_length])
+        duplicate = any(bin(fingerprint ^ previous).count('1') <= self.duplicate_distance
+                        for previous in state.fingerprints)
+        state.fingerprints.append(fingerprint)
+        return duplicate
+
+    def _is_burst(self, state: _GroupState, now: float) -> bool:
+        """موجة: معدل الجروب الحالي أعلى بكثير من متوسطه المتحرك"""
+        current = state.recent.add(now)
+        # متوسط أسي لعدد الرسائل في النافذة (يتكيف خلال دقائق)
+        elapsed = now - state.baseline_at
+        state.baseline_at = now
+        alpha = min(1.0, elapsed / (self.burst_window * 30))
+        state.baseline += alpha * (current - state.baseline)
+        return current >= max(self.burst_floor, self.burst_factor * state.baseline)
+
+    def score(self, group_id: int, user_id: int, text: Optional[str], now: Optional[float] = None) -> SpamVerdict:
+        """تقييم رسالة وتحديث العدادات (يُستدعى لكل رسالة حتى أثناء فترة الانتظار)"""
+        verdict = SpamVerdict()
+        if not self.enabled:
+            return verdict
+        now = time.monotonic() if now is None else now
+
+        rate = self._user_counter(group_id, user_id, now).add(now)
+        if rate > self.user_soft_limit:
+            verdict.score *= self.user_soft_limit / rate
+            verdict.reasons.append('rate')
+
+        state = self._group_state(group_id, now)
+        if self._is_duplicate(state, text):
+            verdict.score *= self.duplicate_penalty
+            verdict.reasons.append('duplicate')
+        if self._is_burst(state, now):
+            verdict.score *= self.burst_penalty
+            verdict.reasons.append('burst')
+
+        return verdict
+
+    def stats(self) -> dict:
+        return {'tracked_users': len(self._users), 'tracked_groups': len(self._groups)}
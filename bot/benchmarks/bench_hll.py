@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HLL Benchmark - دقة وذاكرة مخططات HyperLogLog مقابل العد الدقيق على بيانات مصطنعة
+
+لكل عدد أعضاء: رسائل بتوزيع غير منتظم (قلة تكتب كثيراً) ومقارنة العدد التقديري بـ set دقيقة،
+ثم نافذة 30 يوماً من مخططات يومية مدموجة مقابل اتحاد المجموعات اليومية.
+
+الاستخدام (من مجلد bot):
+    python -m benchmarks.bench_hll --cardinalities 100,1000,10000,100000 --precision 12
+"""
+
+import argparse
+import random
+import sys
+import time
+from typing import Optional, List, Set
+
+from hll import HyperLogLog, DEFAULT_PRECISION
+
+
+def _set_bytes(members: Set[int]) -> int:
+    """حجم set في الذاكرة مع كائنات الأعداد"""
+    return sys.getsizeof(members) + sum(sys.getsizeof(member) for member in members)
+
+
+def _stream(rng: random.Random, members: List[int], messages: int) -> List[int]:
+    # أوزان 1/rank: أغلب الرسائل من أعضاء قليلين كما في الجروبات الحقيقية
+    weights = [1 / (rank + 1) for rank in range(len(members))]
+    return rng.choices(members, weights=weights, k=messages)
+
+
+def _error(estimate: int, exact: int) -> float:
+    return (estimate - exact) / exact * 100 if exact else 0.0
+
+
+def bench_cardinality(rng: random.Random, cardinality: int, precision: int, messages_per_member: int,
+                      trials: int):
+    """متوسط وأقصى خطأ على عدة مجموعات أعضاء مختلفة (الزمن والذاكرة من آخرها)"""
+    errors = []
+    for _ in range(trials):
+        members = rng.sample(range(10**8, 10**10), cardinality)
+        # كل عضو يكتب مرة على الأقل، والباقي بتوزيع غير منتظم
+        stream = members + _stream(rng, members, cardinality * (messages_per_member - 1))
+        rng.shuffle(stream)
+
+        exact: Set[int] = set()
+        started = time.perf_counter()
+        for user_id in stream:
+            exact.add(user_id)
+        exact_seconds = time.perf_counter() - started
+
+        sketch = HyperLogLog(precision)
+        started = time.perf_counter()
+        for user_id in stream:
+            sketch.add(user_id)
+        sketch_seconds = time.perf_counter() - started
+        errors.append(_error(sketch.count(), len(exact)))
+
+    mean_error = sum(abs(error) for error in errors) / len(errors)
+    max_error = max(errors, key=abs)
+    stored = len(sketch.to_bytes())
+    print(f"{cardinality:>9} {len(stream):>10} {mean_error:>8.2f}% {max_error:>+8.2f}% "
+          f"{_set_bytes(exact) / 1024:>10.1f} {len(sketch.registers) / 1024:>8.1f} {stored:>8} "
+          f"{exact_seconds / len(stream) * 1e9:>7.0f} {sketch_seconds / len(stream) * 1e9:>7.0f}")
+
+
+def bench_window(rng: random.Random, population: int, daily: int, days: int, precision: int):
+    """أعضاء يعودون أياماً متعددة: مجموع الأيام يكرر العضو، والدمج لا يكرره"""
+    members = rng.sample(range(10**8, 10**10), population)
+    weights = [1 / (rank + 1) ** 0.5 for rank in range(population)]
+    union: Set[int] = set()
+    merged = HyperLogLog(precision)
+    daily_sum = 0
+    stored = 0
+    merge_seconds = 0.0
+    for _ in range(days):
+        today = set(rng.choices(members, weights=weights, k=daily))
+        sketch = HyperLogLog(precision)
+        for user_id in today:
+            sketch.add(user_id)
+        blob = sketch.to_bytes()
+        stored += len(blob)
+        union |= today
+        daily_sum += len(today)
+        started = time.perf_counter()
+        merged.merge(HyperLogLog.from_bytes(blob))
+        merge_seconds += time.perf_counter() - started
+    estimate = merged.count()
+    print(f"\nنافذة {days} يوماً ({population} عضو محتمل، {daily} رسالة يومياً):")
+    print(f"  دقيق (اتحاد)      {len(union)}")
+    print(f"  مجموع الأيام      {daily_sum} ({_error(daily_sum, len(union)):+.1f}%)")
+    print(f"  دمج المخططات      {estimate} ({_error(estimate, len(union)):+.2f}%)")
+    print(f"  المخططات المحفوظة {stored / 1024:.1f} KB، دمج {days} مخطط في {merge_seconds * 1000:.1f}ms")
+    print(f"  المجموعة الدقيقة  {_set_bytes(union) / 1024:.1f} KB")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="دقة وذاكرة HyperLogLog مقابل العد الدقيق")
+    parser.add_argument('--cardinalities', default='100,1000,10000,100000')
+    parser.add_argument('--precision', type=int, default=DEFAULT_PRECISION)
+    parser.add_argument('--messages-per-member', type=int, default=5)
+    parser.add_argument('--trials', type=int, default=5)
+    parser.add_argument('--window-days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    print(f"الدقة {args.precision} ({1 << args.precision} خانة، الخطأ المعياري المتوقع "
+          f"{104 / (1 << args.precision) ** 0.5:.2f}%)\n")
+    print(f"{'أعضاء':>9} {'رسائل':>10} {'متوسط خطأ':>9} {'أقصى':>9} {'set KB':>10} {'HLL KB':>8} "
+          f"{'محفوظ B':>8} {'set ns':>7} {'HLL ns':>7}")
+    for cardinality in (int(value) for value in args.cardinalities.split(',')):
+        bench_cardinality(rng, cardinality, args.precision, args.messages_per_member, args.trials)
+
+    bench_window(rng, population=50_000, daily=20_000, days=args.window_days, precision=args.precision)
+
+
+if __name__ == '__main__':
+    main()
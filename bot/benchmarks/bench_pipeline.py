@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pipeline Benchmark - قياس أداء مسار الرسائل والأوامر بتحديثات تيليجرام اصطناعية
+
+الاستخدام (من مجلد bot):
+    python -m benchmarks.bench_pipeline --backend memory --messages 20000
+    python -m benchmarks.bench_pipeline --backend sqlite        # ملف SQLITE_PATH (أو :memory:)
+    python -m benchmarks.bench_pipeline --backend postgres      # يستخدم متغيرات DB_* (المخطط مُطبق مسبقاً)
+    python -m benchmarks.bench_pipeline --backend postgrest     # خادم PostgREST محلي مبسط
+    python -m benchmarks.bench_pipeline --compare benchmarks/results/<old>.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import time
+from bisect import bisect_left
+from dataclasses import replace
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Optional, List, Dict, Any
+
+from metrics import REGISTRY
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# الأوامر التي تُرسل أثناء القياس (لا تحتاج صلاحيات مشرف)
+BENCH_COMMANDS = ('xp_command', 'level_command', 'progress_command', 'profile_command', 'daily_command')
+
+
+class ZipfSampler:
+    """اختيار عناصر بتوزيع Zipf (قلة من المستخدمين يرسلون أغلب الرسائل)"""
+
+    def __init__(self, n: int, exponent: float, rng: random.Random):
+        weights = [1.0 / (rank ** exponent) for rank in range(1, n + 1)]
+        self.cumulative = list(itertools.accumulate(weights))
+        self.total = self.cumulative[-1]
+        self.rng = rng
+
+    def sample(self) -> int:
+        return bisect_left(self.cumulative, self.rng.random() * self.total)
+
+
+class _Message:
+    __slots__ = ('message_id', 'chat_id', 'text', 'caption', 'from_user', 'reply_to_message', 'replies')
+
+    def __init__(self, message_id, chat_id, text, from_user):
+        self.message_id = message_id
+        self.chat_id = chat_id
+        self.text = text
+        self.caption = None
+        self.from_user = from_user
+        self.reply_to_message = None
+        self.replies = 0
+
+    async def reply_text(self, text, **kwargs):
+        self.replies += 1
+
+    def parse_entities(self, types=None):
+        return {}
+
+
+def make_update(update_id: int, group_id: int, user_id: int, text: str) -> SimpleNamespace:
+    """إنشاء تحديث اصطناعي بالحقول التي تستخدمها المعالجات"""
+    user = SimpleNamespace(id=user_id, username=f"user{user_id}", first_name=f"User {user_id}",
+                           last_name=None, language_code='ar', is_bot=False)
+    chat = SimpleNamespace(id=group_id, type='supergroup', title=f"Group {group_id}")
+    message = _Message(update_id, group_id, text, user)
+    return SimpleNamespace(update_id=update_id, effective_user=user, effective_chat=chat,
+                           effective_message=message, message=message)
+
+
+async def _make_backend(name: str):
+    """إنشاء الواجهة الخلفية المطلوبة ودالة الإغلاق"""
+    if name == 'memory':
+        from benchmarks.fakes import InMemoryDatabase
+        return InMemoryDatabase(), None
+
+    if name in ('postgres', 'sqlite'):
+        from storage import create_storage, open_storage, close_storage
+        db = create_storage(name)
+        await open_storage(db)
+
+        async def close():
+            await close_storage(db)
+        return db, close
+
+    if name == 'postgrest':
+        from benchmarks.postgrest_stub import PostgrestStub
+        stub = PostgrestStub()
+        stub.start()
+        os.environ['SUPABASE_URL'] = stub.url
+        os.environ['SUPABASE_ANON_KEY'] = 'bench.stub.key'
+        from supabase_database import SupabaseManager
+
+        async def close():
+            stub.stop()
+        return SupabaseManager(), close
+
+    raise ValueError(f"واجهة غير معروفة: {name}")
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(q * len(sorted_values)))
+    return sorted_values[index]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    from main import TelegramBot
+
+    db, close = await _make_backend(args.backend)
+    bot = TelegramBot('123456:BENCHMARK', db=db)
+    bot.group_settings.defaults = replace(bot.group_settings.defaults, xp_cooldown=args.cooldown)
+    bot.spam_scorer.enabled = args.antispam
+
+    rng = random.Random(args.seed)
+    sampler = ZipfSampler(args.users, args.zipf, rng)
+    group_ids = [-1000000000 - g for g in range(args.groups)]
+    # معرفات جديدة في كل تشغيل: القيد الفريد message_logs(group_id, message_id) يتجاهل رسائل التشغيل السابق
+    update_ids = itertools.count(int(time.time() * 1000))
+
+    latencies: Dict[str, List[float]] = {}
+    REGISTRY.operations.clear()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 4)
+
+    async def producer():
+        interval = 1.0 / args.rate if args.rate else 0.0
+        next_at = time.perf_counter()
+        for _ in range(args.messages):
+            group_id = group_ids[rng.randrange(args.groups)]
+            user_id = 10_000 + sampler.sample()
+            if rng.random() < args.command_ratio:
+                handler_name = rng.choice(BENCH_COMMANDS)
+                text = '/' + handler_name.replace('_command', '')
+            else:
+                handler_name = 'handle_message'
+                text = 'x' * rng.randint(1, 200)
+            update = make_update(next(update_ids), group_id, user_id, text)
+            await queue.put((handler_name, update))
+            if rng.random() < args.duplicates:
+                # إعادة تسليم نفس التحديث (إعادة محاولة webhook)
+                await queue.put((handler_name, update))
+            if interval:
+                next_at += interval
+                delay = next_at - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        for _ in range(args.concurrency):
+            await queue.put(None)
+
+    async def worker():
+        context = SimpleNamespace(args=[], bot=None)
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            handler_name, update = item
+            started = time.perf_counter()
+            await getattr(bot, handler_name)(update, context)
+            latencies.setdefault(handler_name, []).append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(producer(), *(worker() for _ in range(args.concurrency)))
+    duration = time.perf_counter() - started
+
+    if close:
+        await close()
+
+    db_calls = sum(stats.calls for name, stats in REGISTRY.operations.items() if name.startswith('db.'))
+    all_latencies = sorted(itertools.chain.from_iterable(latencies.values()))
+    per_handler = {}
+    for handler_name, values in sorted(latencies.items()):
+        values.sort()
+        per_handler[handler_name] = {
+            'count': len(values),
+            'p50_ms': _percentile(values, 0.50) * 1000,
+            'p99_ms': _percentile(values, 0.99) * 1000,
+        }
+    db_ops = {
+        name: {'calls': stats.calls, 'errors': stats.errors, 'total_ms': stats.histogram.total * 1000}
+        for name, stats in sorted(REGISTRY.operations.items()) if name.startswith('db.')
+    }
+
+    return {
+        'commit': _git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'backend': args.backend,
+        'params': {
+            'messages': args.messages, 'groups': args.groups, 'users': args.users, 'zipf': args.zipf,
+            'rate': args.rate, 'concurrency': args.concurrency, 'command_ratio': args.command_ratio,
+            'cooldown': args.cooldown, 'duplicates': args.duplicates, 'seed': args.seed,
+        },
+        'results': {
+            'duration_s': duration,
+            'throughput_per_s': len(all_latencies) / duration if duration else 0.0,
+            'p50_ms': _percentile(all_latencies, 0.50) * 1000,
+            'p99_ms': _percentile(all_latencies, 0.99) * 1000,
+            'db_calls_per_message': db_calls / len(all_latencies) if all_latencies else 0.0,
+            'per_handler': per_handler,
+            'db_ops': db_ops,
+        }
+    }
+
+
+def compare(current: Dict[str, Any], baseline_path: str):
+    """طباعة الفرق مع نتيجة سابقة"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nمقارنة مع {baseline['commit']} ({baseline['backend']}):")
+    for key in ('throughput_per_s', 'p50_ms', 'p99_ms', 'db_calls_per_message'):
+        old, new = baseline['results'][key], current['results'][key]
+        change = ((new - old) / old * 100) if old else 0.0
+        print(f"  {key:22} {old:12.3f} → {new:12.3f}  ({change:+.1f}%)")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="قياس أداء مسار الرسائل")
+    parser.add_argument('--backend', choices=['memory', 'sqlite', 'postgres', 'postgrest'], default='memory')
+    parser.add_argument('--messages', type=int, default=20_000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--users', type=int, default=5_000)
+    parser.add_argument('--zipf', type=float, default=1.1, help="أس توزيع Zipf لنشاط المستخدمين")
+    parser.add_argument('--rate', type=float, default=0.0, help="رسائل في الثانية (0 = بلا حد)")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--command-ratio', type=float, default=0.05)
+    parser.add_argument('--cooldown', type=int, default=0, help="فترة انتظار XP بالثواني أثناء القياس")
+    parser.add_argument('--duplicates', type=float, default=0.0, help="نسبة التحديثات المعاد تسليمها")
+    parser.add_argument('--antispam', action='store_true', help="تفعيل تقييم السبام (يقلل الكتابات للمستخدمين النشطين)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="مسار ملف النتائج (افتراضياً benchmarks/results)")
+    parser.add_argument('--compare', help="ملف نتائج سابق للمقارنة")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(run_benchmark(args))
+    summary = result['results']
+    print(f"backend={result['backend']} messages={args.messages} "
+          f"throughput={summary['throughput_per_s']:.0f}/s p50={summary['p50_ms']:.3f}ms "
+          f"p99={summary['p99_ms']:.3f}ms db_calls/msg={summary['db_calls_per_message']:.2f}")
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{result['commit']}-{args.backend}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"النتائج محفوظة في {output}")
+
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
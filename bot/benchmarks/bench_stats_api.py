@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stats API Benchmark - زمن ردود واجهة الإحصائيات من الذاكرة المؤقتة مقابل قاعدة البيانات
+
+قاعدة البيانات في الذاكرة مع تأخير مصطنع لكل استدعاء (يحاكي رحلة Supabase عبر الشبكة).
+
+الاستخدام (من مجلد bot):
+    python -m benchmarks.bench_stats_api --members 5000 --requests 2000 --latency-ms 20
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Optional, List, Dict, Any
+
+from benchmarks.fakes import InMemoryDatabase
+from stats_api import StatsService
+
+GROUP_ID = -1001
+
+
+class SlowDatabase:
+    """تأخير ثابت قبل كل استدعاء لقاعدة البيانات مع عدّ الاستدعاءات"""
+
+    def __init__(self, db, latency: float):
+        self._db = db
+        self.latency = latency
+        self.calls = 0
+
+    def __getattr__(self, name):
+        method = getattr(self._db, name)
+
+        async def call(*args, **kwargs):
+            self.calls += 1
+            await asyncio.sleep(self.latency)
+            return await method(*args, **kwargs)
+        return call
+
+
+async def seed(db: InMemoryDatabase, members: int, days: int, rng: random.Random):
+    for user_id in range(1, members + 1):
+        await db.add_user_if_not_exists(SimpleNamespace(
+            id=user_id, username=f"user{user_id}", first_name=f"User {user_id}", last_name=None,
+            language_code='ar', is_bot=False
+        ))
+        await db.add_user_to_group_if_not_exists(user_id, GROUP_ID)
+        db.user_groups[(user_id, GROUP_ID)]['xp'] = rng.randint(0, 50_000)
+    now = datetime.now()
+    for _ in range(members * 4):
+        db.message_logs.append({
+            'user_id': rng.randint(1, members), 'group_id': GROUP_ID, 'message_id': 0,
+            'xp_gained': 10, 'coins_gained': 2, 'message_type': 'text',
+            'created_at': now - timedelta(days=rng.randrange(days), seconds=rng.randrange(86400)),
+        })
+    await db.refresh_group_daily_stats((now - timedelta(days=days)).date())
+
+
+def make_queries(members: int, pages: int, rng: random.Random) -> List[Dict[str, str]]:
+    queries = [{'path': '/api/stats/leaderboard', 'group_id': str(GROUP_ID), 'limit': '20'},
+               {'path': '/api/stats/activity', 'group_id': str(GROUP_ID), 'days': '30'}]
+    queries += [{'path': '/api/stats/profile', 'group_id': str(GROUP_ID), 'user_id': str(rng.randint(1, members))}
+                for _ in range(pages)]
+    return queries
+
+
+async def _measure(label: str, service: StatsService, queries: List[Dict[str, str]], requests: int,
+                   headers_for=None, clear: bool = False) -> Dict[str, Any]:
+    latencies = []
+    statuses: Dict[int, int] = {}
+    for index in range(requests):
+        query = dict(queries[index % len(queries)])
+        path = query.pop('path')
+        if clear:
+            service.cache.clear()
+        headers = headers_for(path, query) if headers_for else None
+        started = time.perf_counter()
+        status, _, _ = await service.handle(path, query, headers)
+        latencies.append(time.perf_counter() - started)
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies.sort()
+    result = {
+        'p50_us': latencies[len(latencies) // 2] * 1e6,
+        'p99_us': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6,
+        'statuses': statuses,
+    }
+    print(f"{label:24} p50={result['p50_us']:10.1f}µs p99={result['p99_us']:10.1f}µs {statuses}")
+    return result
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    memory = InMemoryDatabase()
+    await seed(memory, args.members, 30, rng)
+    db = SlowDatabase(memory, args.latency_ms / 1000)
+    service = StatsService(db, ttl=3600, stale=3600)
+    queries = make_queries(args.members, args.profiles, rng)
+
+    await _measure("بدون ذاكرة (miss)", service, queries, args.requests // 10 or 1, clear=True)
+
+    # تعبئة الذاكرة وحفظ ETag لكل طلب
+    etags: Dict[tuple, str] = {}
+    for query in queries:
+        query = dict(query)
+        path = query.pop('path')
+        _, headers, _ = await service.handle(path, query)
+        etags[(path, tuple(sorted(query.items())))] = headers['ETag']
+
+    calls_before = db.calls
+    await _measure("من الذاكرة (hit)", service, queries, args.requests)
+    print(f"استدعاءات قاعدة البيانات أثناء hit: {db.calls - calls_before}")
+    await _measure("طلب شرطي (304)", service, queries, args.requests,
+                   headers_for=lambda path, query: {'If-None-Match': etags[(path, tuple(sorted(query.items())))]})
+
+    # نسخة منتهية الصلاحية: الرد فوري والتحديث في الخلفية
+    service.cache.ttl = 0
+    await _measure("قديمة مع تحديث (stale)", service, queries, args.requests)
+    await asyncio.sleep(args.latency_ms / 1000 * 3)
+    print(f"الذاكرة: {service.cache.stats()}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="قياس زمن واجهة الإحصائيات مع وبدون الذاكرة المؤقتة")
+    parser.add_argument('--members', type=int, default=5000)
+    parser.add_argument('--profiles', type=int, default=200, help="عدد الأعضاء المختلفين في طلبات الملف")
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--latency-ms', type=float, default=20.0, help="تأخير كل استدعاء لقاعدة البيانات")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XP Rules Benchmark - تكلفة تقييم قواعد XP لرسالة واحدة
+
+يقارن الجدول المترجم مع تفسير قواعد JSON مباشرة في كل رسالة.
+
+الاستخدام (من مجلد bot):
+    python -m benchmarks.bench_xp_rules --evaluations 200000 --channels 20
+"""
+
+import argparse
+import random
+import time
+from types import SimpleNamespace
+from typing import Optional, List, Dict, Any
+
+from xp_rules import MESSAGE_TYPES, XpRuleBook, compile_rules, _parse_hours
+
+
+def make_spec(channels: int, buckets: int) -> Dict[str, Any]:
+    return {
+        'message_types': {name: 1.0 + index / 10 for index, name in enumerate(MESSAGE_TYPES)},
+        'length_buckets': [[step * 20, 0.5 + step / 10] for step in range(buckets)],
+        'channels': {str(1000 + channel): 1.5 for channel in range(channels)},
+        'hours': {'0-6': 0.5, '18-23': 1.2},
+    }
+
+
+def interpret(spec: Dict[str, Any], message_type: str, length: int, thread_id: Optional[int], hour: int) -> float:
+    """التقييم بدون ترجمة مسبقة (للمقارنة)"""
+    value = spec['message_types'].get(message_type, 1.0)
+    for minimum, bucket_value in reversed(spec['length_buckets']):
+        if length >= minimum:
+            value *= bucket_value
+            break
+    value *= spec['channels'].get(str(thread_id), 1.0)
+    return value * _parse_hours(spec['hours'])[hour]
+
+
+def make_messages(count: int, channels: int, rng: random.Random) -> List[SimpleNamespace]:
+    messages = []
+    for _ in range(count):
+        message_type = rng.choice(MESSAGE_TYPES)
+        topic = rng.random() < 0.5
+        messages.append(SimpleNamespace(
+            text='x' * rng.randint(1, 400) if message_type == 'text' else None,
+            caption=None,
+            **({message_type: True} if message_type not in ('text', 'other') else {}),
+            is_topic_message=topic,
+            message_thread_id=1000 + rng.randrange(channels) if topic and channels else None,
+        ))
+    return messages
+
+
+def _time(label: str, func, inputs, evaluations: int):
+    started = time.perf_counter()
+    for index in range(evaluations):
+        func(*inputs[index % len(inputs)])
+    elapsed = time.perf_counter() - started
+    print(f"{label:28} {elapsed / evaluations * 1e9:10.0f} ns/تقييم")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="قياس تكلفة تقييم قواعد XP")
+    parser.add_argument('--evaluations', type=int, default=200_000)
+    parser.add_argument('--channels', type=int, default=20)
+    parser.add_argument('--buckets', type=int, default=6)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    spec = make_spec(args.channels, args.buckets)
+    started = time.perf_counter()
+    compiled = compile_rules(spec)
+    print(f"ترجمة القواعد: {(time.perf_counter() - started) * 1000:.2f}ms، حجم الجدول {len(compiled.table)} خانة")
+
+    messages = make_messages(1024, args.channels, rng)
+    raw = [(rng.choice(MESSAGE_TYPES), rng.randint(0, 400), rng.choice([None, 1000, 1001]), rng.randrange(24))
+           for _ in range(1024)]
+
+    _time("الجدول المترجم", compiled.multiplier, raw, args.evaluations)
+    _time("تفسير JSON مباشرة", lambda *row: interpret(spec, *row), raw, args.evaluations)
+
+    book = XpRuleBook(path='/nonexistent')
+    book.load({'default': spec})
+    _time("رسالة كاملة (مع كشف النوع)", book.multiplier,
+          [(-100, message, hour % 24) for hour, message in enumerate(messages)], args.evaluations)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fakes - قاعدة بيانات في الذاكرة بنفس واجهة DatabaseManager/SupabaseManager لاختبارات الأداء
+"""
+
+import os
+import re
+from datetime import datetime, date
+from typing import Optional, List, Dict, Any
+
+from dataclasses import replace
+
+from models import User, UserGroup, Level, ShopItem, Badge, DailyQuest, Clan, GroupSettings, ProfileBundle, Season
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'database', 'schema.sql')
+
+_LEVEL_ROW = re.compile(r"\((\d+), '([^']*)', '([^']*)', (\d+), '([^']*)', (\d+)\)")
+_BADGE_ROW = re.compile(r"\('([^']*)', '([^']*)', '([^']*)', '([^']*)', '([^']*)', (\d+), '([^']*)'\)")
+_SHOP_ROW = re.compile(r"\('([^']*)', '([^']*)', (\d+), '([^']*)', '([^']*)', ([\d.]+), ([\d.]+)\)")
+
+
+def _schema_section(sql: str, table: str) -> str:
+    start = sql.index(f"INSERT INTO {table} ")
+    end = sql.index(";", start)
+    return sql[start:end]
+
+
+def load_seed_data(schema_path: str = SCHEMA_PATH) -> Dict[str, List[Dict[str, Any]]]:
+    """قراءة بيانات المستويات والشارات والمتجر من schema.sql"""
+    with open(schema_path, 'r', encoding='utf-8') as f:
+        sql = f.read()
+
+    levels = [
+        {'id': int(m[0]), 'level_number': int(m[0]), 'level_name': m[1], 'level_emoji': m[2],
+         'required_xp': int(m[3]), 'category': m[4], 'tier': int(m[5])}
+        for m in _LEVEL_ROW.findall(_schema_section(sql, 'levels'))
+    ]
+    badges = [
+        {'id': i, 'name': m[0], 'description': m[1], 'emoji': m[2], 'category': m[3],
+         'requirement_type': m[4], 'requirement_value': int(m[5]), 'rarity': m[6], 'is_active': True}
+        for i, m in enumerate(_BADGE_ROW.findall(_schema_section(sql, 'badges')), start=1)
+    ]
+    shop_items = [
+        {'id': i, 'name': m[0], 'description': m[1], 'price': int(m[2]), 'item_type': m[3],
+         'effect_type': m[4], 'effect_value': float(m[5]), 'duration_hours': float(m[6]), 'is_active': True}
+        for i, m in enumerate(_SHOP_ROW.findall(_schema_section(sql, 'shop_items')), start=1)
+    ]
+    return {'levels': levels, 'badges': badges, 'shop_items': shop_items}
+
+
+class InMemoryDatabase:
+    """تطبيق كامل لواجهة مدير قاعدة البيانات في الذاكرة"""
+
+    def __init__(self, seed: Optional[Dict[str, List[Dict[str, Any]]]] = None):
+        seed = seed or load_seed_data()
+        self.levels = {row['id']: dict(row) for row in seed['levels']}
+        self.badges = {row['id']: dict(row) for row in seed['badges']}
+        self.shop_items = {row['id']: dict(row) for row in seed['shop_items']}
+        self.users: Dict[int, Dict] = {}
+        self.groups: Dict[int, Dict] = {}
+        self.group_settings: Dict[int, GroupSettings] = {}
+        self.user_groups: Dict[tuple, Dict] = {}
+        self.user_badges: Dict[tuple, Dict] = {}
+        self.daily_quests: Dict[tuple, Dict] = {}
+        self.clans: Dict[int, Dict] = {}
+        self.message_logs: List[Dict] = []
+        self._logged_messages: set = set()
+        self.group_daily_stats: Dict[tuple, Dict] = {}
+        self.group_activity: Dict[tuple, int] = {}
+        self.activity_sketches: Dict[tuple, bytes] = {}
+        self.seasons: Dict[tuple, Dict] = {}
+        self.season_standings: Dict[tuple, List[Dict]] = {}
+        self.inventory: List[Dict] = []
+        self.admin_actions: List[Dict] = []
+        self.event_outbox: List[Dict] = []
+        self._ids = {}
+
+    def _next_id(self, table: str) -> int:
+        self._ids[table] = self._ids.get(table, 0) + 1
+        return self._ids[table]
+
+    def _level_for_xp(self, xp: int) -> Dict:
+        return max((l for l in self.levels.values() if l['required_xp'] <= xp), key=lambda l: l['required_xp'])
+
+    def _current_season(self, group_id: int) -> int:
+        settings = self.group_settings.get(group_id)
+        return settings.season_id if settings else 1
+
+    # المستخدمين
+    async def add_user_if_not_exists(self, user):
+        row = self.users.setdefault(user.id, {'id': user.id, 'created_at': datetime.now()})
+        row.update(username=user.username, first_name=user.first_name, last_name=user.last_name,
+                   language_code=user.language_code, is_bot=user.is_bot, updated_at=datetime.now())
+        return True
+
+    async def get_user_by_id(self, user_id: int) -> Optional[User]:
+        row = self.users.get(user_id)
+        return User.from_dict(dict(row)) if row else None
+
+    async def get_user_ids_by_usernames(self, usernames: List[str]) -> Dict[str, int]:
+        wanted = {name.lower() for name in usernames}
+        return {row['username'].lower(): row['id'] for row in self.users.values()
+                if row.get('username') and row['username'].lower() in wanted}
+
+    # الجروبات
+    async def add_group_if_not_exists(self, group_id: int, name: str):
+        self.groups.setdefault(group_id, {'id': group_id})['name'] = name
+        return True
+
+    async def get_group_settings(self, group_id: int) -> Optional[GroupSettings]:
+        return self.group_settings.get(group_id)
+
+    async def get_group_settings_since(self, since: Optional[datetime] = None) -> List[GroupSettings]:
+        return [settings for settings in self.group_settings.values()
+                if since is None or settings.updated_at >= since]
+
+    async def save_group_settings(self, settings: GroupSettings) -> Optional[GroupSettings]:
+        previous = self.group_settings.get(settings.group_id)
+        saved = self.group_settings[settings.group_id] = replace(settings, updated_at=datetime.now())
+        if saved.season_days > 0:
+            season = self._season(saved.group_id, saved.season_id)
+            if season['started_at'] is None:
+                season['started_at'] = previous.updated_at if previous and previous.season_days > 0 else saved.updated_at
+        return saved
+
+    async def add_user_to_group_if_not_exists(self, user_id: int, group_id: int):
+        key = (user_id, group_id)
+        if key not in self.user_groups:
+            self.user_groups[key] = {
+                'id': self._next_id('user_groups'), 'user_id': user_id, 'group_id': group_id,
+                'xp': 0, 'level_id': 1, 'coins': 0, 'total_messages': 0, 'last_message_at': None,
+                'last_xp_gain': None, 'clan_id': None, 'is_active': True, 'season_id': 1, 'season_xp': 0,
+                'prev_season_id': None, 'prev_season_xp': 0, 'joined_at': datetime.now(), 'updated_at': datetime.now()
+            }
+        return True
+
+    async def get_user_group(self, user_id: int, group_id: int) -> Optional[UserGroup]:
+        row = self.user_groups.get((user_id, group_id))
+        return UserGroup.from_dict(dict(row)) if row else None
+
+    async def get_profile_bundle(self, user_id: int, group_id: int) -> Optional[ProfileBundle]:
+        row = self.user_groups.get((user_id, group_id))
+        if not row:
+            return None
+        level = self.levels[row['level_id']]
+        next_level = next((l for l in self.levels.values() if l['level_number'] == level['level_number'] + 1), None)
+        clan = self.clans.get(row['clan_id'])
+        return ProfileBundle.from_dict({
+            'user_group': row, 'level': level, 'user': self.users.get(user_id), 'next_level': next_level,
+            'badge_count': await self.get_user_badges_count(user_id, group_id),
+            'clan': clan, 'clan_leader': self.users.get(clan['leader_user_id']) if clan else None,
+        })
+
+    async def update_user_stats(self, user_id: int, group_id: int, xp_gained: int, coins_gained: int,
+                                season_id: int = 1):
+        row = self.user_groups.get((user_id, group_id))
+        if row:
+            now = datetime.now()
+            if row['season_id'] < season_id:
+                row.update(prev_season_id=row['season_id'], prev_season_xp=row['season_xp'],
+                           season_id=season_id, season_xp=0)
+            row['season_xp'] += xp_gained
+            row['xp'] += xp_gained
+            row['coins'] += coins_gained
+            row['total_messages'] += 1
+            row['last_message_at'] = row['last_xp_gain'] = row['updated_at'] = now
+
+    async def update_user_level(self, user_id: int, group_id: int, new_level_id: int):
+        row = self.user_groups.get((user_id, group_id))
+        if row:
+            row['level_id'] = new_level_id
+
+    async def bulk_adjust_users(self, admin_user_id, group_id, user_ids, xp_deltas, coin_deltas,
+                                action_type, reason=None) -> List[Dict]:
+        updated = []
+        for user_id, xp_delta, coin_delta in zip(user_ids, xp_deltas, coin_deltas):
+            row = self.user_groups.get((user_id, group_id))
+            if not row:
+                continue
+            row['xp'] = max(row['xp'] + xp_delta, 0)
+            row['coins'] = max(row['coins'] + coin_delta, 0)
+            if row['season_id'] == self._current_season(group_id):
+                row['season_xp'] = max(row['season_xp'] + xp_delta, 0)
+            row['level_id'] = self._level_for_xp(row['xp'])['id']
+            self.admin_actions.append({'admin_user_id': admin_user_id, 'target_user_id': user_id,
+                                       'group_id': group_id, 'action_type': action_type,
+                                       'amount': abs(xp_delta or coin_delta), 'reason': reason})
+            updated.append({k: row[k] for k in ('user_id', 'xp', 'coins', 'level_id')})
+        return updated
+
+    async def bulk_reset_users(self, admin_user_id, group_id, user_ids, reason=None) -> List[Dict]:
+        count = len(user_ids)
+        updated = []
+        for row in await self.bulk_adjust_users(admin_user_id, group_id, user_ids,
+                                                [0] * count, [0] * count, 'reset_user', reason):
+            target = self.user_groups[(row['user_id'], group_id)]
+            target.update(xp=0, coins=0, season_xp=0, prev_season_xp=0, level_id=self._level_for_xp(0)['id'])
+            updated.append({k: target[k] for k in ('user_id', 'xp', 'coins', 'level_id')})
+        return updated
+
+    # المستويات
+    async def get_level_by_id(self, level_id: int) -> Optional[Level]:
+        row = self.levels.get(level_id)
+        return Level.from_dict(dict(row)) if row else None
+
+    async def get_level_by_number(self, level_number: int) -> Optional[Level]:
+        for row in self.levels.values():
+            if row['level_number'] == level_number:
+                return Level.from_dict(dict(row))
+        return None
+
+    async def get_level_by_xp(self, xp: int) -> Optional[Level]:
+        return Level.from_dict(dict(self._level_for_xp(xp)))
+
+    async def get_all_levels(self) -> List[Level]:
+        return [Level.from_dict(dict(row)) for row in sorted(self.levels.values(), key=lambda l: l['required_xp'])]
+
+    async def count_user_groups(self) -> int:
+        return len(self.user_groups)
+
+    async def fetch_user_groups_chunk(self, after_id: int, limit: int) -> List[Dict]:
+        rows = sorted((r for r in self.user_groups.values() if r['id'] > after_id), key=lambda r: r['id'])
+        return [{'id': r['id'], 'xp': r['xp'], 'level_id': r['level_id']} for r in rows[:limit]]
+
+    async def bulk_update_level_ids(self, ids: List[int], level_ids: List[int]):
+        by_id = {row['id']: row for row in self.user_groups.values()}
+        for row_id, level_id in zip(ids, level_ids):
+            if row_id in by_id:
+                by_id[row_id]['level_id'] = level_id
+
+    async def get_group_leaderboard(self, group_id: int, limit: int = 10) -> List[Dict]:
+        rows = sorted((r for (u, g), r in self.user_groups.items() if g == group_id and r['is_active']),
+                      key=lambda r: r['xp'], reverse=True)[:limit]
+        return [{'user_id': r['user_id'], 'xp': r['xp'], 'level_id': r['level_id'],
+                 'username': self.users.get(r['user_id'], {}).get('username'),
+                 'first_name': self.users.get(r['user_id'], {}).get('first_name')} for r in rows]
+
+    async def get_leaderboard_page(self, group_id: int, limit: int, after_xp: Optional[int] = None,
+                                   after_user_id: Optional[int] = None) -> List[Dict]:
+        rows = sorted((r for (u, g), r in self.user_groups.items() if g == group_id and r['is_active']
+                       and (after_xp is None or (r['xp'], r['user_id']) < (after_xp, after_user_id))),
+                      key=lambda r: (r['xp'], r['user_id']), reverse=True)[:limit]
+        return [{'user_id': r['user_id'], 'xp': r['xp'], 'level_id': r['level_id'], 'updated_at': r['updated_at'],
+                 'username': self.users.get(r['user_id'], {}).get('username'),
+                 'first_name': self.users.get(r['user_id'], {}).get('first_name')} for r in rows]
+
+    # الإحصائيات اليومية
+    async def refresh_group_daily_stats(self, since: date) -> int:
+        totals: Dict[tuple, Dict] = {}
+        for log in self.message_logs:
+            if log['created_at'].date() < since:
+                continue
+            row = totals.setdefault((log['group_id'], log['created_at'].date()), {
+                'messages': 0, 'users': set(), 'xp_gained': 0, 'coins_gained': 0
+            })
+            row['messages'] += 1
+            row['users'].add(log['user_id'])
+            row['xp_gained'] += log['xp_gained']
+            row['coins_gained'] += log['coins_gained']
+        changed = 0
+        for (group_id, stat_date), row in totals.items():
+            values = {'stat_date': stat_date, 'messages': row['messages'], 'active_users': len(row['users']),
+                      'xp_gained': row['xp_gained'], 'coins_gained': row['coins_gained']}
+            current = self.group_daily_stats.get((group_id, stat_date))
+            if current is None or any(current[k] != v for k, v in values.items()):
+                self.group_daily_stats[(group_id, stat_date)] = {**values, 'updated_at': datetime.now()}
+                changed += 1
+        return changed
+
+    async def get_group_daily_stats(self, group_id: int, since: date) -> List[Dict]:
+        return [dict(row) for (g, stat_date), row in sorted(self.group_daily_stats.items())
+                if g == group_id and stat_date >= since]
+
+    # نشاط الجروب حسب ساعة الأسبوع
+    async def add_group_activity(self, rows: List[Dict]):
+        for row in rows:
+            key = (row['group_id'], row['hour_of_week'])
+            self.group_activity[key] = self.group_activity.get(key, 0) + row['messages']
+
+    async def get_group_activity(self, group_id: int) -> List[Dict]:
+        return [{'hour_of_week': hour, 'messages': messages}
+                for (g, hour), messages in sorted(self.group_activity.items()) if g == group_id]
+
+    # مخططات الأعضاء النشطين (HyperLogLog)
+    async def save_activity_sketches(self, rows: List[Dict]):
+        for row in rows:
+            self.activity_sketches[(row['group_id'], row['sketch_date'])] = bytes(row['sketch'])
+
+    async def get_activity_sketches(self, group_ids: List[int], since: date, until: date) -> List[Dict]:
+        return [{'group_id': g, 'sketch_date': day, 'sketch': sketch}
+                for (g, day), sketch in self.activity_sketches.items() if g in group_ids and since <= day <= until]
+
+    # المواسم
+    async def start_season(self, group_id: int, season_id: int, started_by: Optional[int] = None) -> Optional[GroupSettings]:
+        if any(g == group_id and s['ended_at'] and not s['archived_at'] for (g, _), s in self.seasons.items()):
+            return None
+        current = self.group_settings.get(group_id) or GroupSettings(group_id=group_id)
+        if current.season_id != season_id - 1:
+            return None
+        now = datetime.now()
+        saved = self.group_settings[group_id] = replace(current, season_id=season_id, updated_by=started_by,
+                                                        updated_at=now)
+        self._season(group_id, season_id - 1)['ended_at'] = now
+        self._season(group_id, season_id).update(started_at=now, started_by=started_by)
+        return saved
+
+    def _season(self, group_id: int, season_id: int) -> Dict:
+        return self.seasons.setdefault((group_id, season_id), {
+            'group_id': group_id, 'season_id': season_id, 'started_at': None, 'ended_at': None,
+            'archived_at': None, 'started_by': None, 'members': 0
+        })
+
+    async def archive_season(self, group_id: int, season_id: int) -> int:
+        final = [(r['season_xp'] if r['season_id'] == season_id else r['prev_season_xp'], r['user_id'])
+                 for (u, g), r in self.user_groups.items() if g == group_id and r['is_active']
+                 and season_id in (r['season_id'], r['prev_season_id'])]
+        final = sorted((entry for entry in final if entry[0] > 0), reverse=True)
+        self.season_standings.setdefault((group_id, season_id), [
+            {'user_id': user_id, 'xp': xp, 'season_rank': rank} for rank, (xp, user_id) in enumerate(final, start=1)
+        ])
+        self._season(group_id, season_id).update(archived_at=datetime.now(), members=len(final))
+        return len(final)
+
+    async def get_season(self, group_id: int, season_id: int) -> Optional[Season]:
+        row = self.seasons.get((group_id, season_id))
+        return Season.from_dict(dict(row)) if row else None
+
+    async def get_due_seasons(self, now: datetime) -> List[Dict]:
+        due = []
+        for settings in self.group_settings.values():
+            season = self.seasons.get((settings.group_id, settings.season_id)) or {}
+            started_at = season.get('started_at') or settings.updated_at
+            if settings.season_days > 0 and (now - started_at).total_seconds() >= settings.season_days * 86400:
+                due.append({'group_id': settings.group_id, 'season_id': settings.season_id})
+        return due
+
+    async def get_unarchived_seasons(self, ended_before: datetime) -> List[Season]:
+        rows = sorted((s for s in self.seasons.values() if s['ended_at'] and not s['archived_at']
+                       and s['ended_at'] <= ended_before), key=lambda s: s['ended_at'])
+        return [Season.from_dict(dict(row)) for row in rows]
+
+    async def get_season_leaderboard(self, group_id: int, season_id: int, limit: int = 10) -> List[Dict]:
+        rows = sorted((r for (u, g), r in self.user_groups.items() if g == group_id and r['is_active']
+                       and r['season_id'] == season_id and r['season_xp'] > 0),
+                      key=lambda r: (r['season_xp'], r['user_id']), reverse=True)[:limit]
+        return [{'user_id': r['user_id'], 'xp': r['season_xp'], 'level_id': r['level_id'],
+                 'username': self.users.get(r['user_id'], {}).get('username'),
+                 'first_name': self.users.get(r['user_id'], {}).get('first_name')} for r in rows]
+
+    async def get_season_standings(self, group_id: int, season_id: int, limit: int = 10) -> List[Dict]:
+        return [{**row, 'username': self.users.get(row['user_id'], {}).get('username'),
+                 'first_name': self.users.get(row['user_id'], {}).get('first_name')}
+                for row in self.season_standings.get((group_id, season_id), [])[:limit]]
+
+    # المتجر
+    async def get_shop_items(self, limit: int = 50) -> List[ShopItem]:
+        rows = sorted((r for r in self.shop_items.values() if r['is_active']), key=lambda r: r['price'])
+        return [ShopItem.from_dict(dict(row)) for row in rows[:limit]]
+
+    async def get_shop_item_by_id(self, item_id: int) -> Optional[ShopItem]:
+        row = self.shop_items.get(item_id)
+        return ShopItem.from_dict(dict(row)) if row and row['is_active'] else None
+
+    # الشارات
+    async def get_all_badges(self) -> List[Badge]:
+        return [Badge.from_dict(dict(row)) for row in self.badges.values() if row['is_active']]
+
+    async def get_user_badges(self, user_id: int, group_id: int) -> List[Badge]:
+        return [Badge.from_dict(dict(self.badges[badge_id]))
+                for (u, g, badge_id) in self.user_badges if u == user_id and g == group_id]
+
+    async def get_user_badges_count(self, user_id: int, group_id: int) -> int:
+        return sum(1 for (u, g, _) in self.user_badges if u == user_id and g == group_id)
+
+    async def award_badge(self, user_id: int, group_id: int, badge_id: int):
+        self.user_badges.setdefault((user_id, group_id, badge_id), {'earned_at': datetime.now()})
+
+    # المهام اليومية
+    async def get_daily_quests(self, user_id: int, group_id: int, quest_date: date) -> List[DailyQuest]:
+        return [DailyQuest.from_dict(dict(row)) for key, row in self.daily_quests.items()
+                if key[0] == user_id and key[1] == group_id and key[3] == quest_date]
+
+    async def create_daily_quest(self, user_id, group_id, quest_type, target_value, reward_xp,
+                                 reward_coins, quest_date):
+        key = (user_id, group_id, quest_type, quest_date)
+        self.daily_quests.setdefault(key, {
+            'id': self._next_id('daily_quests'), 'user_id': user_id, 'group_id': group_id,
+            'quest_type': quest_type, 'target_value': target_value, 'current_progress': 0,
+            'reward_xp': reward_xp, 'reward_coins': reward_coins, 'is_completed': False,
+            'quest_date': quest_date, 'completed_at': None, 'created_at': datetime.now()
+        })
+
+    async def update_daily_quest_progress(self, user_id, group_id, quest_type, progress, quest_date):
+        row = self.daily_quests.get((user_id, group_id, quest_type, quest_date))
+        if row:
+            row['current_progress'] += progress
+            if row['current_progress'] >= row['target_value']:
+                row['is_completed'] = True
+                row['completed_at'] = datetime.now()
+
+    async def sweep_daily_quests(self, cutoff: date, batch_size: int, archive: bool = False) -> Dict[str, int]:
+        expired = [key for key in self.daily_quests if key[3] < cutoff][:batch_size]
+        completed = sum(1 for key in expired if self.daily_quests[key]['is_completed'])
+        for key in expired:
+            del self.daily_quests[key]
+        return {'deleted': len(expired), 'completed': completed}
+
+    async def fetch_group_ids_chunk(self, after_id: Optional[int], limit: int) -> List[int]:
+        group_ids = sorted(group_id for group_id, row in self.groups.items()
+                           if row.get('is_active', True) and (after_id is None or group_id > after_id))
+        return group_ids[:limit]
+
+    async def generate_daily_quests(self, group_ids: List[int], quest_date: date, active_since: datetime,
+                                    quests: List[Dict]) -> int:
+        by_level: Dict[int, List[Dict]] = {}
+        for quest in quests:
+            by_level.setdefault(quest['level_id'], []).append(quest)
+        wanted = set(group_ids)
+        created = 0
+        for (user_id, group_id), row in self.user_groups.items():
+            if (group_id not in wanted or not row['is_active'] or row['last_message_at'] is None
+                    or row['last_message_at'] < active_since):
+                continue
+            for quest in by_level.get(row['level_id'], []):
+                key = (user_id, group_id, quest['quest_type'], quest_date)
+                if key not in self.daily_quests:
+                    await self.create_daily_quest(user_id, group_id, quest['quest_type'], quest['target_value'],
+                                                  quest['reward_xp'], quest['reward_coins'], quest_date)
+                    created += 1
+        return created
+
+    # الكلانات
+    async def get_clan_by_id(self, clan_id: int) -> Optional[Clan]:
+        row = self.clans.get(clan_id)
+        return Clan.from_dict(dict(row)) if row else None
+
+    async def get_clan_by_name(self, name: str, group_id: int) -> Optional[Clan]:
+        for row in self.clans.values():
+            if row['name'] == name and row['group_id'] == group_id:
+                return Clan.from_dict(dict(row))
+        return None
+
+    # تسجيل الرسائل
+    async def log_message(self, user_id, group_id, message_id, xp_gained, coins_gained, message_type='text') -> bool:
+        key = (group_id, message_id)
+        if key in self._logged_messages:
+            return False
+        self._logged_messages.add(key)
+        self.message_logs.append({
+            'user_id': user_id, 'group_id': group_id, 'message_id': message_id, 'xp_gained': xp_gained,
+            'coins_gained': coins_gained, 'message_type': message_type, 'created_at': datetime.now()
+        })
+        return True
+
+    # صندوق الأحداث (outbox)
+    async def append_outbox_events(self, events: List[Dict]):
+        for event in events:
+            self.event_outbox.append({'id': self._next_id('event_outbox'), **event})
+
+    async def claim_outbox_events(self, limit: int) -> List[Dict]:
+        claimed, self.event_outbox = self.event_outbox[:limit], self.event_outbox[limit:]
+        return claimed
+
+    # المخزون
+    async def add_to_inventory(self, user_id, group_id, item_id, quantity=1, expires_at=None):
+        self.inventory.append({
+            'id': self._next_id('user_inventory'), 'user_id': user_id, 'group_id': group_id,
+            'item_id': item_id, 'quantity': quantity, 'purchased_at': datetime.now(),
+            'expires_at': expires_at, 'is_active': True
+        })
+
+    async def get_user_inventory(self, user_id: int, group_id: int) -> List[Dict]:
+        now = datetime.now()
+        result = []
+        for row in self.inventory:
+            if row['user_id'] == user_id and row['group_id'] == group_id and row['is_active'] \
+                    and (row['expires_at'] is None or row['expires_at'] > now):
+                item = self.shop_items[row['item_id']]
+                result.append({**row, **{k: item[k] for k in ('name', 'description', 'item_type',
+                                                                'effect_type', 'effect_value')}})
+        return result
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PostgREST Stub - خادم محلي يحاكي واجهة PostgREST لتشغيل SupabaseManager في اختبارات الأداء
+"""
+
+import asyncio
+import json
+import threading
+from datetime import datetime, date
+from typing import Optional, List, Dict, Any, Callable
+
+from aiohttp import web
+
+from benchmarks.fakes import load_seed_data
+
+# الأعمدة الفريدة لكل جدول (لمنع التكرار كما في قاعدة البيانات الحقيقية)
+UNIQUE_KEYS = {
+    'users': ('id',),
+    'groups': ('id',),
+    'user_groups': ('user_id', 'group_id'),
+    'user_badges': ('user_id', 'group_id', 'badge_id'),
+    'daily_quests': ('user_id', 'group_id', 'quest_type', 'quest_date'),
+    'group_settings': ('group_id',),
+    'group_daily_stats': ('group_id', 'stat_date'),
+    'group_activity': ('group_id', 'hour_of_week'),
+    'activity_sketches': ('group_id', 'sketch_date'),
+    'message_logs': ('group_id', 'message_id'),
+    'seasons': ('group_id', 'season_id'),
+    'season_standings': ('group_id', 'season_id', 'user_id'),
+}
+
+# جداول مفتاحها طبيعي (بدون عمود id)
+NATURAL_KEY_TABLES = {'group_settings', 'group_daily_stats', 'group_activity', 'activity_sketches', 'seasons',
+                      'season_standings'}
+
+# أعمدة الربط للجداول المضمنة في select
+EMBED_KEYS = {
+    'badges': 'badge_id',
+    'shop_items': 'item_id',
+    'levels': 'level_id',
+    'clans': 'clan_id',
+    'users': 'user_id',
+}
+
+DEFAULTS = {
+    'groups': {'is_active': True},
+    'user_groups': {'xp': 0, 'level_id': 1, 'coins': 0, 'total_messages': 0, 'last_message_at': None,
+                    'last_xp_gain': None, 'clan_id': None, 'is_active': True, 'season_id': 1, 'season_xp': 0,
+                    'prev_season_id': None, 'prev_season_xp': 0},
+    'group_settings': {'season_days': 0, 'season_id': 1},
+    'daily_quests': {'current_progress': 0, 'is_completed': False, 'completed_at': None},
+    'user_inventory': {'quantity': 1, 'expires_at': None, 'is_active': True},
+}
+
+TIMESTAMP_COLUMNS = {'users': 'created_at', 'groups': 'created_at', 'user_groups': 'joined_at',
+                     'user_badges': 'earned_at', 'message_logs': 'created_at',
+                     'user_inventory': 'purchased_at', 'daily_quests': 'created_at',
+                     'group_settings': 'updated_at', 'activity_sketches': 'updated_at'}
+
+
+def _split_top_level(text: str) -> List[str]:
+    parts, depth, current = [], 0, ''
+    for char in text:
+        if char == ',' and depth == 0:
+            parts.append(current.strip())
+            current = ''
+            continue
+        depth += char == '('
+        depth -= char == ')'
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+
+def _coerce(raw: str, sample: Any) -> Any:
+    if raw == 'null':
+        return None
+    if isinstance(sample, bool):
+        return raw.lower() == 'true'
+    if isinstance(sample, int):
+        return int(raw)
+    if isinstance(sample, float):
+        return float(raw)
+    return raw
+
+
+def _compare(value: Any, op: str, raw: str) -> bool:
+    if op == 'is':
+        return value is None if raw == 'null' else value == (raw.lower() == 'true')
+    if op == 'in':
+        options = [item.strip('"') for item in raw.strip('()').split(',')]
+        return value is not None and str(value) in options
+    if value is None:
+        return False
+    target = _coerce(raw, value)
+    if op == 'eq':
+        return value == target
+    if op == 'neq':
+        return value != target
+    if op == 'gt':
+        return value > target
+    if op == 'gte':
+        return value >= target
+    if op == 'lt':
+        return value < target
+    if op == 'lte':
+        return value <= target
+    raise ValueError(f"unsupported operator {op}")
+
+
+class PostgrestStub:
+    """خادم PostgREST مبسط يعمل في خيط منفصل"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 54321):
+        self.host = host
+        self.port = port
+        seed = load_seed_data()
+        self.tables: Dict[str, List[Dict[str, Any]]] = {
+            'levels': seed['levels'], 'badges': seed['badges'], 'shop_items': seed['shop_items'],
+            'users': [], 'groups': [], 'group_settings': [], 'user_groups': [], 'user_badges': [], 'daily_quests': [],
+            'clans': [], 'message_logs': [], 'user_inventory': [], 'admin_actions': [], 'event_outbox': [],
+            'group_daily_stats': [], 'group_activity': [], 'activity_sketches': [], 'seasons': [],
+            'season_standings': [],
+        }
+        self.rpc: Dict[str, Callable[[Dict], Any]] = {'get_profile_bundle': self._profile_bundle,
+                                                      'add_group_activity': self._add_group_activity,
+                                                      'start_season': self._start_season,
+                                                      'archive_season': self._archive_season,
+                                                      'get_due_seasons': self._due_seasons,
+                                                      'generate_daily_quests': self._generate_daily_quests,
+                                                      'get_user_ids_by_usernames': self._user_ids_by_usernames}
+        self.requests = 0
+        self._ids: Dict[str, int] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _next_id(self, table: str) -> int:
+        rows = self.tables[table]
+        current = self._ids.get(table, max((row.get('id', 0) for row in rows), default=0))
+        self._ids[table] = current + 1
+        return current + 1
+
+    def _profile_bundle(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """مثل دالة get_profile_bundle في functions.sql"""
+        user_group = next((r for r in self.tables['user_groups']
+                           if r['user_id'] == params['p_user_id'] and r['group_id'] == params['p_group_id']), None)
+        if user_group is None:
+            return None
+        level = next(r for r in self.tables['levels'] if r['id'] == user_group['level_id'])
+        next_level = next((r for r in self.tables['levels'] if r['level_number'] == level['level_number'] + 1), None)
+        clan = next((r for r in self.tables['clans'] if r['id'] == user_group['clan_id']), None)
+        users = {r['id']: r for r in self.tables['users']}
+        badge_count = sum(1 for r in self.tables['user_badges']
+                          if r['user_id'] == user_group['user_id'] and r['group_id'] == user_group['group_id'])
+        return {'user_group': user_group, 'level': level, 'user': users.get(user_group['user_id']),
+                'next_level': next_level, 'badge_count': badge_count, 'clan': clan,
+                'clan_leader': users.get(clan['leader_user_id']) if clan else None}
+
+    def _add_group_activity(self, params: Dict[str, Any]) -> None:
+        """مثل دالة add_group_activity في functions.sql (إضافة وليس استبدال)"""
+        rows = {(r['group_id'], r['hour_of_week']): r for r in self.tables['group_activity']}
+        for row in params['p_rows']:
+            current = rows.get((row['group_id'], row['hour_of_week']))
+            if current is None:
+                current = rows[(row['group_id'], row['hour_of_week'])] = {**row, 'messages': 0}
+                self.tables['group_activity'].append(current)
+            current['messages'] += row['messages']
+            current['updated_at'] = datetime.now().isoformat()
+
+    def _season(self, group_id: int, season_id: int) -> Dict[str, Any]:
+        row = next((r for r in self.tables['seasons'] if r['group_id'] == group_id and r['season_id'] == season_id),
+                   None)
+        if row is None:
+            row = {'group_id': group_id, 'season_id': season_id, 'started_at': None, 'ended_at': None,
+                   'archived_at': None, 'started_by': None, 'members': 0}
+            self.tables['seasons'].append(row)
+        return row
+
+    def _start_season(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """مثل دالة start_season في functions.sql"""
+        group_id, season_id = params['p_group_id'], params['p_season_id']
+        if any(r['group_id'] == group_id and r['ended_at'] and not r['archived_at'] for r in self.tables['seasons']):
+            return []
+        settings = next((r for r in self.tables['group_settings'] if r['group_id'] == group_id), None)
+        if (settings['season_id'] if settings else 1) != season_id - 1:
+            return []
+        if settings is None:
+            settings = {**DEFAULTS['group_settings'], 'group_id': group_id}
+            self.tables['group_settings'].append(settings)
+        now = datetime.now().isoformat()
+        settings.update(season_id=season_id, updated_by=params['p_started_by'], updated_at=now)
+        self._season(group_id, season_id - 1)['ended_at'] = now
+        self._season(group_id, season_id).update(started_at=now, started_by=params['p_started_by'])
+        return [settings]
+
+    def _archive_season(self, params: Dict[str, Any]) -> int:
+        """مثل دالة archive_season في functions.sql"""
+        group_id, season_id = params['p_group_id'], params['p_season_id']
+        final = sorted(((r['season_xp'] if r['season_id'] == season_id else r['prev_season_xp'], r['user_id'])
+                        for r in self.tables['user_groups'] if r['group_id'] == group_id and r['is_active']
+                        and season_id in (r['season_id'], r['prev_season_id'])), reverse=True)
+        final = [entry for entry in final if entry[0] > 0]
+        archived = {r['user_id'] for r in self.tables['season_standings']
+                    if r['group_id'] == group_id and r['season_id'] == season_id}
+        self.tables['season_standings'].extend(
+            {'group_id': group_id, 'season_id': season_id, 'user_id': user_id, 'xp': xp, 'season_rank': rank}
+            for rank, (xp, user_id) in enumerate(final, start=1) if user_id not in archived
+        )
+        self._season(group_id, season_id).update(archived_at=datetime.now().isoformat(), members=len(final))
+        return len(final)
+
+    def _due_seasons(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """مثل دالة get_due_seasons في functions.sql"""
+        now = datetime.fromisoformat(params['p_now'])
+        due = []
+        for settings in self.tables['group_settings']:
+            if not settings.get('season_days'):
+                continue
+            season = next((r for r in self.tables['seasons'] if r['group_id'] == settings['group_id']
+                           and r['season_id'] == settings['season_id']), {})
+            started_at = datetime.fromisoformat(season.get('started_at') or settings['updated_at'])
+            if (now - started_at).total_seconds() >= settings['season_days'] * 86400:
+                due.append({'group_id': settings['group_id'], 'season_id': settings['season_id']})
+        return due
+
+    def _user_ids_by_usernames(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """مثل دالة get_user_ids_by_usernames في functions.sql"""
+        wanted = set(params['p_usernames'])
+        return [{'id': row['id'], 'username': row['username']} for row in self.tables['users']
+                if row.get('username') and row['username'].lower() in wanted]
+
+    def _generate_daily_quests(self, params: Dict[str, Any]) -> int:
+        """مثل دالة generate_daily_quests في functions.sql"""
+        by_level: Dict[int, List[Dict[str, Any]]] = {}
+        for level_id, quest_type, target, reward_xp, reward_coins in zip(
+                params['p_level_ids'], params['p_quest_types'], params['p_targets'],
+                params['p_reward_xp'], params['p_reward_coins']):
+            by_level.setdefault(level_id, []).append({'quest_type': quest_type, 'target_value': target,
+                                                      'reward_xp': reward_xp, 'reward_coins': reward_coins})
+        group_ids, quest_date = set(params['p_group_ids']), params['p_quest_date']
+        existing = {(r['user_id'], r['group_id'], r['quest_type'])
+                    for r in self.tables['daily_quests'] if r['quest_date'] == quest_date}
+        created = 0
+        for member in self.tables['user_groups']:
+            if (member['group_id'] not in group_ids or not member['is_active'] or not member.get('last_message_at')
+                    or member['last_message_at'] < params['p_active_since']):
+                continue
+            for quest in by_level.get(member['level_id'], []):
+                if (member['user_id'], member['group_id'], quest['quest_type']) in existing:
+                    continue
+                self.tables['daily_quests'].append({
+                    'id': self._next_id('daily_quests'), 'user_id': member['user_id'], 'group_id': member['group_id'],
+                    **quest, **DEFAULTS['daily_quests'], 'quest_date': quest_date,
+                    'created_at': datetime.now().isoformat()
+                })
+                created += 1
+        return created
+
+    def _filtered(self, table: str, query) -> List[Dict[str, Any]]:
+        rows = self.tables[table]
+        for column, expression in query.items():
+            if column in ('select', 'order', 'limit', 'offset', 'on_conflict', 'columns'):
+                continue
+            op, _, raw = expression.partition('.')
+            rows = [row for row in rows if _compare(row.get(column), op, raw)]
+        return rows
+
+    def _project(self, row: Dict[str, Any], select: str) -> Dict[str, Any]:
+        result = {}
+        for field in _split_top_level(select or '*'):
+            if '(' in field:
+                name, _, inner = field.partition('(')
+                inner = inner.rstrip(')')
+                key = EMBED_KEYS.get(name)
+                target = next((r for r in self.tables.get(name, []) if r.get('id') == row.get(key)), None)
+                result[name] = self._project(target, inner) if target else None
+            elif field == '*':
+                result.update(row)
+            else:
+                result[field] = row.get(field)
+        return result
+
+    @staticmethod
+    def _json(data: Any, status: int = 200, headers: Optional[Dict[str, str]] = None) -> web.Response:
+        def default(value):
+            if isinstance(value, (datetime, date)):
+                return value.isoformat()
+            raise TypeError(type(value))
+        return web.Response(text=json.dumps(data, default=default), status=status,
+                            content_type='application/json', headers=headers)
+
+    async def _handle_table(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        table = request.match_info['table']
+        if table == 'rpc':
+            return await self._handle_rpc(request)
+        if table not in self.tables:
+            return self._json({'message': f'relation {table} does not exist'}, 404)
+
+        query = request.query
+        prefer = request.headers.get('Prefer', '')
+
+        if request.method == 'GET':
+            rows = self._filtered(table, query)
+            total = len(rows)
+            if 'order' in query:
+                for term in reversed(query['order'].split(',')):
+                    column, _, direction = term.partition('.')
+                    rows = sorted(rows, key=lambda r: (r.get(column) is None, r.get(column)),
+                                  reverse=direction.startswith('desc'))
+            offset = int(query.get('offset', 0))
+            if 'limit' in query:
+                rows = rows[offset:offset + int(query['limit'])]
+            data = [self._project(row, query.get('select', '*')) for row in rows]
+            headers = {'Content-Range': f"0-{max(len(data) - 1, 0)}/{total}"} if 'count=' in prefer else None
+            return self._json(data, headers=headers)
+
+        if request.method == 'POST':
+            payload = await request.json()
+            records = payload if isinstance(payload, list) else [payload]
+            inserted = []
+            unique = UNIQUE_KEYS.get(table)
+            for record in records:
+                if unique and all(k in record for k in unique):
+                    existing = next((r for r in self.tables[table]
+                                     if all(r.get(k) == record[k] for k in unique)), None)
+                    if existing is not None:
+                        if 'ignore-duplicates' in prefer:
+                            continue
+                        if 'merge-duplicates' in prefer:
+                            existing.update(record)
+                            if TIMESTAMP_COLUMNS.get(table) == 'updated_at':
+                                existing['updated_at'] = datetime.now().isoformat()
+                            inserted.append(existing)
+                            continue
+                        return self._json({'code': '23505', 'message': 'duplicate key value'}, 409)
+                row = dict(DEFAULTS.get(table, {}))
+                row.update(record)
+                if table not in NATURAL_KEY_TABLES:
+                    row.setdefault('id', self._next_id(table))
+                if table in TIMESTAMP_COLUMNS:
+                    row.setdefault(TIMESTAMP_COLUMNS[table], datetime.now().isoformat())
+                self.tables[table].append(row)
+                inserted.append(row)
+            return self._json(inserted, 201)
+
+        if request.method == 'PATCH':
+            changes = await request.json()
+            rows = self._filtered(table, query)
+            for row in rows:
+                row.update(changes)
+            return self._json(rows)
+
+        if request.method == 'DELETE':
+            rows = self._filtered(table, query)
+            ids = {id(row) for row in rows}
+            self.tables[table] = [row for row in self.tables[table] if id(row) not in ids]
+            return self._json(rows)
+
+        return self._json({'message': 'method not allowed'}, 405)
+
+    async def _handle_rpc(self, request: web.Request) -> web.Response:
+        name = request.match_info.get('name') or request.path.rsplit('/', 1)[-1]
+        handler = self.rpc.get(name)
+        if handler is None:
+            return self._json({'message': f'function {name} does not exist'}, 404)
+        return self._json(handler(await request.json()))
+
+    def _build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route('*', '/rest/v1/rpc/{name}', self._handle_rpc)
+        app.router.add_route('*', '/rest/v1/{table}', self._handle_table)
+        return app
+
+    def start(self):
+        """تشغيل الخادم في خيط منفصل (عميل Supabase متزامن ويحجب الحلقة الرئيسية)"""
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            runner = web.AppRunner(self._build_app(), access_log=None)
+            self._loop.run_until_complete(runner.setup())
+            self._loop.run_until_complete(web.TCPSite(runner, self.host, self.port).start())
+            self._ready.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(runner.cleanup())
+
+        self._thread = threading.Thread(target=run, name='postgrest-stub', daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
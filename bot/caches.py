@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Caches - الذاكرة الدافئة لمسار الرسائل والأوامر (تُحفظ وتُستعاد عبر lifecycle.py)
+
+- CooldownTracker: آخر منح لكل عضو، ففترة الانتظار تُفحص بدون قراءة user_groups
+- SeenEntities: المستخدمون والجروبات والعضويات المسجلة، فلا تتكرر كتابات ensure_user_exists
+- LevelCache: جدول المستويات كاملاً (ترقية المستوى والمتصدرون بدون استعلام)
+- LeaderboardCache: أعلى الأعضاء لكل جروب لمدة قصيرة
+
+لكل منها snapshot() تعيد قيماً قابلة لـ JSON و restore() تتجاهل ما انتهت صلاحيته.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import Optional, List, Dict, Any, Tuple, Hashable, Callable, Awaitable
+
+from models import Level
+from recompute_levels import LevelTable
+
+logger = logging.getLogger(__name__)
+
+
+class _BoundedDict:
+    """dict بترتيب آخر استخدام يحذف الأقدم عند تجاوز الحد"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.data: 'OrderedDict[Hashable, Any]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, key: Hashable) -> Any:
+        value = self.data.get(key)
+        if value is not None:
+            self.data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.max_entries:
+            self.data.popitem(last=False)
+
+    def discard(self, key: Hashable):
+        self.data.pop(key, None)
+
+
+class CooldownTracker:
+    """وقت آخر منح (epoch) لكل (مستخدم، جروب) في هذه العملية"""
+
+    def __init__(self, max_entries: int = 200_000, max_cooldown: float = 3600.0):
+        self.max_cooldown = max_cooldown
+        self._last = _BoundedDict(max_entries)
+
+    def last_award(self, user_id: int, group_id: int) -> Optional[float]:
+        return self._last.get((user_id, group_id))
+
+    def record(self, user_id: int, group_id: int, at: Optional[float] = None):
+        self._last.set((user_id, group_id), time.time() if at is None else at)
+
+    def snapshot(self) -> Dict[str, Any]:
+        # الأقدم من أطول فترة انتظار ممكنة لا يفيد بعد الاستعادة
+        cutoff = time.time() - self.max_cooldown
+        return {'entries': [[user_id, group_id, at] for (user_id, group_id), at in self._last.data.items()
+                            if at >= cutoff]}
+
+    def restore(self, data: Dict[str, Any]):
+        cutoff = time.time() - self.max_cooldown
+        for user_id, group_id, at in data.get('entries', []):
+            if at >= cutoff:
+                self.record(user_id, group_id, at)
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._last)}
+
+
+def _user_fingerprint(user) -> Tuple:
+    return (user.username, user.first_name, user.last_name, user.language_code, bool(user.is_bot))
+
+
+class SeenEntities:
+    """ما سجله ensure_user_exists بكتابة مؤكدة: بيانات المستخدم (لكشف تغير الاسم) والجروبات والعضويات
+
+    العضويات لا تُحفظ في ملف الحالة: صف محذوف أثناء التوقف (استيراد --replace) يعني أن العضو
+    لن يكسب شيئاً، فتُعاد كتابتها مرة واحدة لكل عضو بعد التشغيل.
+    """
+
+    def __init__(self, max_entries: int = 200_000):
+        self._users = _BoundedDict(max_entries)
+        self._groups = _BoundedDict(max_entries)
+        self._members = _BoundedDict(max_entries)
+
+    def user_known(self, user) -> bool:
+        return self._users.get(user.id) == _user_fingerprint(user)
+
+    def mark_user(self, user):
+        self._users.set(user.id, _user_fingerprint(user))
+
+    def forget_user(self, user_id: int):
+        self._users.discard(user_id)
+
+    def group_known(self, group_id: int) -> bool:
+        return self._groups.get(group_id) is not None
+
+    def mark_group(self, group_id: int):
+        self._groups.set(group_id, True)
+
+    def forget_group(self, group_id: int):
+        self._groups.discard(group_id)
+
+    def member_known(self, user_id: int, group_id: int) -> bool:
+        return self._members.get((user_id, group_id)) is not None
+
+    def mark_member(self, user_id: int, group_id: int):
+        self._members.set((user_id, group_id), True)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'users': [[user_id, *fingerprint] for user_id, fingerprint in self._users.data.items()],
+            'groups': list(self._groups.data),
+        }
+
+    def restore(self, data: Dict[str, Any]):
+        for user_id, *fingerprint in data.get('users', []):
+            self._users.set(user_id, tuple(fingerprint))
+        for group_id in data.get('groups', []):
+            self._groups.set(group_id, True)
+
+    def stats(self) -> Dict[str, int]:
+        return {'users': len(self._users), 'groups': len(self._groups), 'members': len(self._members)}
+
+
+class LevelCache:
+    """جدول المستويات في الذاكرة، يُعاد تحميله كل ttl ثانية"""
+
+    def __init__(self, db, ttl: float = 3600.0):
+        self.db = db
+        self.ttl = ttl
+        self._table: Optional[LevelTable] = None
+        self._loaded_at = 0.0
+
+    def _set(self, levels: List[Level], loaded_at: float):
+        self._table = LevelTable(levels)
+        self._loaded_at = loaded_at
+
+    async def table(self) -> LevelTable:
+        if self._table is None or time.time() - self._loaded_at >= self.ttl:
+            try:
+                self._set(await self.db.get_all_levels(), time.time())
+            except Exception as e:
+                # الجدول المستعاد أفضل من لا شيء أثناء تعطل القاعدة، ويُعاد التحميل في الطلب التالي
+                if self._table is None:
+                    raise
+                logger.warning("تعذر تحميل جدول المستويات، استخدام النسخة السابقة: %s", e)
+        return self._table
+
+    async def by_id(self, level_id: int) -> Optional[Level]:
+        return (await self.table()).by_id.get(level_id)
+
+    async def all(self) -> Dict[int, Level]:
+        return (await self.table()).by_id
+
+    def snapshot(self) -> Dict[str, Any]:
+        if self._table is None:
+            return {}
+        return {'loaded_at': self._loaded_at, 'levels': [asdict(level) for level in self._table.levels]}
+
+    def restore(self, data: Dict[str, Any]):
+        # منتهي الصلاحية فوراً: التشغيل يعيد التحميل من القاعدة (قد تكون عتبات required_xp تغيرت)،
+        # والنسخة المحفوظة تُستخدم فقط إن تعذر ذلك
+        if data.get('levels'):
+            self._set([Level.from_dict(row) for row in data['levels']], 0.0)
+
+
+class LeaderboardCache:
+    """أعلى الأعضاء لكل (جروب، حد) لمدة ttl ثانية"""
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10_000):
+        self.ttl = ttl
+        self._boards = _BoundedDict(max_entries)
+
+    async def get(self, group_id: int, limit: int,
+                  fetch: Callable[[int, int], Awaitable[List[Dict]]]) -> List[Dict]:
+        entry = self._boards.get((group_id, limit))
+        if entry is not None and time.time() - entry[0] < self.ttl:
+            return entry[1]
+        rows = await fetch(group_id, limit)
+        self._boards.set((group_id, limit), (time.time(), rows))
+        return rows
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'boards': [[group_id, limit, stored_at, rows]
+                           for (group_id, limit), (stored_at, rows) in self._boards.data.items()]}
+
+    def restore(self, data: Dict[str, Any]):
+        now = time.time()
+        for group_id, limit, stored_at, rows in data.get('boards', []):
+            if now - stored_at < self.ttl:
+                self._boards.set((group_id, limit), (stored_at, rows))
@@ -6,15 +6,75 @@ Database Manager - إدارة قاعدة البيانات
 """
 
 import asyncio
+import contextvars
+import itertools
+import json
+import logging
+import os
+import time
 import asyncpg
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable
 from datetime import datetime, date
-from models import User, UserGroup, Level, ShopItem, Badge, DailyQuest, Clan
+from models import (
+    User, UserGroup, Level, ShopItem, Badge, DailyQuest, Clan, GroupSettings, GROUP_SETTING_FIELDS, ProfileBundle,
+    Season
+)
+
+logger = logging.getLogger(__name__)
+
+# آخر كتابة في سياق التحديث الحالي (القراءات بعدها تذهب للقاعدة الرئيسية)
+_last_write_at: contextvars.ContextVar[float] = contextvars.ContextVar('db_last_write_at', default=0.0)
+
+# تأخر النسخة بالثواني (صفر إن كانت متزامنة أو كانت قاعدة رئيسية)
+REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END AS lag
+"""
+
+def load_config_from_env() -> Dict[str, Any]:
+    """قراءة إعدادات PostgreSQL من متغيرات البيئة"""
+    return {
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': int(os.getenv('DB_PORT', '5432')),
+        'database': os.getenv('DB_NAME', 'telegram_bot'),
+        'user': os.getenv('DB_USER', 'postgres'),
+        'password': os.getenv('DB_PASSWORD', '')
+    }
+
+def load_replica_dsns_from_env() -> List[str]:
+    """قراءة عناوين النسخ المقروءة من DB_REPLICA_URLS (مفصولة بفواصل)"""
+    return [dsn.strip() for dsn in os.getenv('DB_REPLICA_URLS', '').split(',') if dsn.strip()]
+
+class ReplicaPool:
+    """نسخة قراءة مع حالتها الصحية وآخر تأخر مقاس"""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.pool = None
+        self.healthy = False
+        self.lag = 0.0
+        self.checked_at = 0.0
+
+    @property
+    def name(self) -> str:
+        return self.dsn.rsplit('@', 1)[-1]
 
 class DatabaseManager:
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], replica_dsns: Optional[List[str]] = None,
+                 max_replica_lag: float = 5.0, health_check_interval: float = 10.0):
         self.config = config
         self.pool = None
+        self.replicas = [ReplicaPool(dsn) for dsn in (replica_dsns or [])]
+        self.max_replica_lag = max_replica_lag
+        self.health_check_interval = health_check_interval
+        self._replica_cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self._health_task: Optional[asyncio.Task] = None
+        self._listen_connection = None
+        self._listeners: Dict[str, Callable[[Optional[str]], Any]] = {}
+        self._relisten_task: Optional[asyncio.Task] = None
     
     async def connect(self):
         """الاتصال بقاعدة البيانات"""
@@ -32,17 +92,144 @@ class DatabaseManager:
         except Exception as e:
             print(f"❌ خطأ في الاتصال بقاعدة البيانات: {e}")
             raise
+        
+        if self.replicas:
+            await asyncio.gather(*(self._check_replica(replica) for replica in self.replicas))
+            self._health_task = asyncio.create_task(self._health_loop())
     
     async def disconnect(self):
         """قطع الاتصال بقاعدة البيانات"""
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        self._listeners.clear()
+        if self._relisten_task:
+            self._relisten_task.cancel()
+            self._relisten_task = None
+        if self._listen_connection:
+            await self._listen_connection.close()
+            self._listen_connection = None
+        for replica in self.replicas:
+            if replica.pool:
+                await replica.pool.close()
+                replica.pool = None
         if self.pool:
             await self.pool.close()
     
+    # نسخ القراءة
+    async def _check_replica(self, replica: ReplicaPool):
+        """فحص صحة النسخة وقياس تأخرها (مع إنشاء الاتصال عند الحاجة)"""
+        try:
+            if replica.pool is None:
+                replica.pool = await asyncpg.create_pool(replica.dsn, min_size=1, max_size=10)
+            async with replica.pool.acquire() as connection:
+                replica.lag = float(await connection.fetchval(REPLICA_LAG_QUERY))
+            was_healthy, replica.healthy = replica.healthy, True
+            if not was_healthy:
+                logger.info("✅ نسخة القراءة %s متاحة (تأخر %.1f ث)", replica.name, replica.lag)
+        except Exception as e:
+            if replica.healthy:
+                logger.warning("⚠️ نسخة القراءة %s غير متاحة: %s", replica.name, e)
+            replica.healthy = False
+        replica.checked_at = time.monotonic()
+    
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_check_interval)
+            await asyncio.gather(*(self._check_replica(replica) for replica in self.replicas))
+    
+    def _pick_replica(self) -> Optional[ReplicaPool]:
+        """نسخة سليمة بتأخر مقبول بالتناوب، أو None للقراءة من الرئيسية"""
+        if not self.replicas:
+            return None
+        # قراءة ما كُتب في نفس التحديث من الرئيسية
+        if time.monotonic() - _last_write_at.get() < self.max_replica_lag:
+            return None
+        for _ in range(len(self.replicas)):
+            replica = next(self._replica_cycle)
+            if replica.healthy and replica.pool and replica.lag <= self.max_replica_lag:
+                return replica
+        return None
+    
+    async def _read(self, method: str, query: str, *args):
+        replica = self._pick_replica()
+        if replica is not None:
+            try:
+                async with replica.pool.acquire() as connection:
+                    return await getattr(connection, method)(query, *args)
+            except (OSError, asyncpg.PostgresConnectionError, asyncpg.InterfaceError) as e:
+                logger.warning("⚠️ فشل القراءة من %s، التحويل للرئيسية: %s", replica.name, e)
+                replica.healthy = False
+        
+        if not self.pool:
+            await self.connect()
+        async with self.pool.acquire() as connection:
+            return await getattr(connection, method)(query, *args)
+    
+    # الإشعارات (LISTEN/NOTIFY)
+    async def listen(self, channel: str, callback: Callable[[Optional[str]], Any]):
+        """الاستماع لقناة NOTIFY على اتصال مخصص خارج الـ pool
+        
+        يُستدعى callback بمحتوى الإشعار، وبـ None بعد إعادة الاتصال (قد تكون إشعارات فاتت).
+        """
+        if self._listen_connection is None:
+            await self._open_listen_connection()
+        self._listeners[channel] = callback
+        await self._listen_connection.add_listener(channel, self._dispatch_notification)
+    
+    async def _open_listen_connection(self):
+        self._listen_connection = await asyncpg.connect(
+            host=self.config['host'], port=self.config['port'], database=self.config['database'],
+            user=self.config['user'], password=self.config['password']
+        )
+        self._listen_connection.add_termination_listener(self._on_listen_terminated)
+    
+    def _dispatch_notification(self, connection, pid: int, channel: str, payload: str):
+        callback = self._listeners.get(channel)
+        if callback:
+            callback(payload)
+    
+    def _on_listen_terminated(self, connection):
+        self._listen_connection = None
+        if self._listeners and self._relisten_task is None:
+            logger.warning("⚠️ انقطع اتصال الإشعارات، جاري إعادة الاتصال")
+            self._relisten_task = asyncio.create_task(self._relisten())
+    
+    async def _relisten(self):
+        """إعادة الاتصال بمهلة متزايدة ثم إعادة الاشتراك وإبلاغ المستمعين بإعادة المزامنة"""
+        delay = 1.0
+        try:
+            while self._listeners:
+                try:
+                    await self._open_listen_connection()
+                    for channel, callback in self._listeners.items():
+                        await self._listen_connection.add_listener(channel, self._dispatch_notification)
+                        callback(None)
+                    logger.info("✅ تمت إعادة الاشتراك في الإشعارات")
+                    return
+                except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as e:
+                    logger.warning("⚠️ فشل إعادة اتصال الإشعارات: %s", e)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 60.0)
+        finally:
+            self._relisten_task = None
+    
+    async def _read_one(self, query: str, *args):
+        """جلب صف واحد من نسخة قراءة إن أمكن"""
+        return await self._read('fetchrow', query, *args)
+    
+    async def _read_all(self, query: str, *args):
+        """جلب جميع الصفوف من نسخة قراءة إن أمكن"""
+        return await self._read('fetch', query, *args)
+    
+    # execute_query و fetch_one و fetch_all تعمل دائماً على الرئيسية وتُعد كتابة
+    # (قد تحتوي UPDATE/DELETE ... RETURNING)، والقراءات البحتة تستخدم _read_one و _read_all
     async def execute_query(self, query: str, *args):
         """تنفيذ استعلام"""
         if not self.pool:
             await self.connect()
         
+        _last_write_at.set(time.monotonic())
         async with self.pool.acquire() as connection:
             return await connection.execute(query, *args)
     
@@ -51,6 +238,7 @@ class DatabaseManager:
         if not self.pool:
             await self.connect()
         
+        _last_write_at.set(time.monotonic())
         async with self.pool.acquire() as connection:
             return await connection.fetchrow(query, *args)
     
@@ -59,11 +247,12 @@ class DatabaseManager:
         if not self.pool:
             await self.connect()
         
+        _last_write_at.set(time.monotonic())
         async with self.pool.acquire() as connection:
             return await connection.fetch(query, *args)
     
     # المستخدمين
-    async def add_user_if_not_exists(self, user):
+    async def add_user_if_not_exists(self, user) -> bool:
         """إضافة مستخدم جديد إذا لم يكن موجوداً"""
         query = """
         INSERT INTO users (id, username, first_name, last_name, language_code, is_bot)
@@ -78,15 +267,16 @@ class DatabaseManager:
             query, user.id, user.username, user.first_name, 
             user.last_name, user.language_code, user.is_bot
         )
+        return True
     
     async def get_user_by_id(self, user_id: int) -> Optional[User]:
         """الحصول على مستخدم بالمعرف"""
         query = "SELECT * FROM users WHERE id = $1"
-        row = await self.fetch_one(query, user_id)
+        row = await self._read_one(query, user_id)
         return User.from_dict(dict(row)) if row else None
     
     # الجروبات
-    async def add_group_if_not_exists(self, group_id: int, name: str):
+    async def add_group_if_not_exists(self, group_id: int, name: str) -> bool:
         """إضافة جروب جديد إذا لم يكن موجوداً"""
         query = """
         INSERT INTO groups (id, name)
@@ -96,9 +286,53 @@ class DatabaseManager:
             updated_at = CURRENT_TIMESTAMP
         """
         await self.execute_query(query, group_id, name)
+        return True
+    
+    # إعدادات الجروبات (من الرئيسية: الإشعار قد يسبق وصول التغيير للنسخ)
+    async def get_group_settings(self, group_id: int) -> Optional[GroupSettings]:
+        """إعدادات جروب واحد (None = القيم الافتراضية)"""
+        row = await self.fetch_one("SELECT * FROM group_settings WHERE group_id = $1", group_id)
+        return GroupSettings.from_dict(dict(row)) if row else None
+    
+    async def get_group_settings_since(self, since: Optional[datetime] = None) -> List[GroupSettings]:
+        """الإعدادات المعدلة منذ وقت معين (أو كلها)"""
+        if since is None:
+            rows = await self.fetch_all("SELECT * FROM group_settings")
+        else:
+            rows = await self.fetch_all("SELECT * FROM group_settings WHERE updated_at >= $1", since)
+        return [GroupSettings.from_dict(dict(row)) for row in rows]
+    
+    async def save_group_settings(self, settings: GroupSettings) -> Optional[GroupSettings]:
+        """حفظ إعدادات جروب (إدراج أو تحديث)
+
+        تفعيل season_days يسجل بداية الموسم الحالي في seasons إن لم تكن مسجلة، فتعديل إعداد آخر
+        لا يؤخر الموسم (إعدادات مفعلة قبل ذلك تبدأ من آخر تعديل لها كما كانت تُحسب).
+        """
+        columns = ", ".join(GROUP_SETTING_FIELDS)
+        placeholders = ", ".join(f"${index}" for index in range(2, len(GROUP_SETTING_FIELDS) + 3))
+        updates = ", ".join(f"{name} = EXCLUDED.{name}" for name in (*GROUP_SETTING_FIELDS, 'updated_by'))
+        query = f"""
+        WITH previous AS (
+            SELECT updated_at FROM group_settings WHERE group_id = $1 AND season_days > 0
+        ), saved AS (
+            INSERT INTO group_settings (group_id, {columns}, updated_by)
+            VALUES ($1, {placeholders})
+            ON CONFLICT (group_id) DO UPDATE SET {updates}
+            RETURNING *
+        ), started AS (
+            INSERT INTO seasons (group_id, season_id, started_at)
+            SELECT group_id, season_id, COALESCE((SELECT updated_at FROM previous), CURRENT_TIMESTAMP)
+            FROM saved WHERE season_days > 0
+            ON CONFLICT (group_id, season_id) DO NOTHING
+        )
+        SELECT * FROM saved
+        """
+        values = [getattr(settings, name) for name in GROUP_SETTING_FIELDS]
+        row = await self.fetch_one(query, settings.group_id, *values, settings.updated_by)
+        return GroupSettings.from_dict(dict(row)) if row else None
     
     # ربط المستخدمين بالجروبات
-    async def add_user_to_group_if_not_exists(self, user_id: int, group_id: int):
+    async def add_user_to_group_if_not_exists(self, user_id: int, group_id: int) -> bool:
         """ربط المستخدم بالجروب إذا لم يكن مربوطاً"""
         query = """
         INSERT INTO user_groups (user_id, group_id)
@@ -106,26 +340,57 @@ class DatabaseManager:
         ON CONFLICT (user_id, group_id) DO NOTHING
         """
         await self.execute_query(query, user_id, group_id)
+        return True
     
     async def get_user_group(self, user_id: int, group_id: int) -> Optional[UserGroup]:
         """الحصول على بيانات المستخدم في الجروب"""
         query = "SELECT * FROM user_groups WHERE user_id = $1 AND group_id = $2"
-        row = await self.fetch_one(query, user_id, group_id)
+        row = await self._read_one(query, user_id, group_id)
         return UserGroup.from_dict(dict(row)) if row else None
     
-    async def update_user_stats(self, user_id: int, group_id: int, xp_gained: int, coins_gained: int):
-        """تحديث إحصائيات المستخدم"""
+    async def get_profile_bundle(self, user_id: int, group_id: int) -> Optional[ProfileBundle]:
+        """المستخدم والعضوية والمستوى والتالي وعدد الشارات والكلان مع قائده في رحلة واحدة"""
+        query = """
+        SELECT to_jsonb(ug) AS user_group, to_jsonb(l) AS level, to_jsonb(u) AS "user",
+               to_jsonb(nl) AS next_level,
+               (SELECT COUNT(*) FROM user_badges ub
+                WHERE ub.user_id = ug.user_id AND ub.group_id = ug.group_id) AS badge_count,
+               to_jsonb(c) AS clan, to_jsonb(cl) AS clan_leader
+        FROM user_groups ug
+        JOIN levels l ON l.id = ug.level_id
+        LEFT JOIN users u ON u.id = ug.user_id
+        LEFT JOIN levels nl ON nl.level_number = l.level_number + 1
+        LEFT JOIN clans c ON c.id = ug.clan_id
+        LEFT JOIN users cl ON cl.id = c.leader_user_id
+        WHERE ug.user_id = $1 AND ug.group_id = $2
+        """
+        # من الرئيسية دائماً: النتيجة تُخزن كبطاقة، ونسخة قراءة متأخرة قد تعيد بيانات ما قبل آخر منح
+        row = await self.fetch_one(query, user_id, group_id)
+        if not row:
+            return None
+        data = dict(row)
+        for key in ('user_group', 'level', 'user', 'next_level', 'clan', 'clan_leader'):
+            data[key] = json.loads(data[key]) if data[key] else None
+        return ProfileBundle.from_dict(data)
+    
+    async def update_user_stats(self, user_id: int, group_id: int, xp_gained: int, coins_gained: int,
+                                season_id: int = 1):
+        """تحديث إحصائيات المستخدم (أول منح في موسم جديد ينقل XP الموسم السابق إلى prev_season_xp)"""
         query = """
         UPDATE user_groups 
         SET xp = xp + $3, 
             coins = coins + $4, 
             total_messages = total_messages + 1,
+            season_xp = CASE WHEN season_id >= $5 THEN season_xp + $3 ELSE $3 END,
+            prev_season_id = CASE WHEN season_id < $5 THEN season_id ELSE prev_season_id END,
+            prev_season_xp = CASE WHEN season_id < $5 THEN season_xp ELSE prev_season_xp END,
+            season_id = GREATEST(season_id, $5),
             last_message_at = CURRENT_TIMESTAMP,
             last_xp_gain = CURRENT_TIMESTAMP,
             updated_at = CURRENT_TIMESTAMP
         WHERE user_id = $1 AND group_id = $2
         """
-        await self.execute_query(query, user_id, group_id, xp_gained, coins_gained)
+        await self.execute_query(query, user_id, group_id, xp_gained, coins_gained, season_id)
     
     async def update_user_level(self, user_id: int, group_id: int, new_level_id: int):
         """تحديث مستوى المستخدم"""
@@ -140,13 +405,13 @@ class DatabaseManager:
     async def get_level_by_id(self, level_id: int) -> Optional[Level]:
         """الحصول على مستوى بالمعرف"""
         query = "SELECT * FROM levels WHERE id = $1"
-        row = await self.fetch_one(query, level_id)
+        row = await self._read_one(query, level_id)
         return Level.from_dict(dict(row)) if row else None
     
     async def get_level_by_number(self, level_number: int) -> Optional[Level]:
         """الحصول على مستوى بالرقم"""
         query = "SELECT * FROM levels WHERE level_number = $1"
-        row = await self.fetch_one(query, level_number)
+        row = await self._read_one(query, level_number)
         return Level.from_dict(dict(row)) if row else None
     
     async def get_level_by_xp(self, xp: int) -> Optional[Level]:
@@ -157,27 +422,290 @@ class DatabaseManager:
         ORDER BY required_xp DESC 
         LIMIT 1
         """
-        row = await self.fetch_one(query, xp)
+        row = await self._read_one(query, xp)
         return Level.from_dict(dict(row)) if row else None
     
+    async def get_all_levels(self) -> List[Level]:
+        """الحصول على جميع المستويات مرتبة حسب XP المطلوب"""
+        query = "SELECT * FROM levels ORDER BY required_xp ASC"
+        rows = await self._read_all(query)
+        return [Level.from_dict(dict(row)) for row in rows]
+    
+    async def count_user_groups(self) -> int:
+        """عدد تقريبي لصفوف user_groups"""
+        query = "SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE relname = 'user_groups'"
+        row = await self.fetch_one(query)
+        return row[0] if row else 0
+    
+    async def fetch_user_groups_chunk(self, after_id: int, limit: int) -> List[Dict]:
+        """جلب دفعة من user_groups بترقيم المفتاح (id, xp, level_id)"""
+        query = """
+        SELECT id, xp, level_id FROM user_groups
+        WHERE id > $1
+        ORDER BY id
+        LIMIT $2
+        """
+        rows = await self.fetch_all(query, after_id, limit)
+        return [dict(row) for row in rows]
+    
+    async def bulk_update_level_ids(self, ids: List[int], level_ids: List[int]):
+        """تحديث مستويات عدة صفوف في استعلام واحد"""
+        query = """
+        UPDATE user_groups ug
+        SET level_id = t.level_id, updated_at = CURRENT_TIMESTAMP
+        FROM unnest($1::bigint[], $2::int[]) AS t(id, level_id)
+        WHERE ug.id = t.id AND ug.level_id IS DISTINCT FROM t.level_id
+        """
+        await self.execute_query(query, ids, level_ids)
+    
+    async def get_group_leaderboard(self, group_id: int, limit: int = 10) -> List[Dict]:
+        """أعلى الأعضاء XP في الجروب"""
+        query = """
+        SELECT ug.user_id, ug.xp, ug.level_id, u.username, u.first_name
+        FROM user_groups ug
+        JOIN users u ON u.id = ug.user_id
+        WHERE ug.group_id = $1 AND ug.is_active = TRUE
+        ORDER BY ug.xp DESC
+        LIMIT $2
+        """
+        rows = await self._read_all(query, group_id, limit)
+        return [dict(row) for row in rows]
+    
+    async def get_leaderboard_page(self, group_id: int, limit: int, after_xp: Optional[int] = None,
+                                   after_user_id: Optional[int] = None) -> List[Dict]:
+        """صفحة من المتصدرين بعد (xp, user_id) معين (ترقيم بالمفتاح بدون OFFSET)"""
+        select = """
+        SELECT ug.user_id, ug.xp, ug.level_id, ug.updated_at, u.username, u.first_name
+        FROM user_groups ug
+        JOIN users u ON u.id = ug.user_id
+        WHERE ug.group_id = $1 AND ug.is_active = TRUE
+        """
+        order = "ORDER BY ug.xp DESC, ug.user_id DESC LIMIT $2"
+        if after_xp is None:
+            rows = await self._read_all(select + order, group_id, limit)
+        else:
+            rows = await self._read_all(
+                select + "AND (ug.xp, ug.user_id) < ($3, $4)\n" + order, group_id, limit, after_xp, after_user_id
+            )
+        return [dict(row) for row in rows]
+    
+    # الإحصائيات اليومية
+    async def refresh_group_daily_stats(self, since: date) -> int:
+        """إعادة تجميع message_logs منذ تاريخ معين في group_daily_stats (الصفوف المتغيرة فقط)"""
+        query = """
+        WITH upserted AS (
+            INSERT INTO group_daily_stats (group_id, stat_date, messages, active_users, xp_gained, coins_gained)
+            SELECT group_id, created_at::date, COUNT(*), COUNT(DISTINCT user_id),
+                   COALESCE(SUM(xp_gained), 0), COALESCE(SUM(coins_gained), 0)
+            FROM message_logs
+            WHERE created_at >= $1
+            GROUP BY group_id, created_at::date
+            ON CONFLICT (group_id, stat_date) DO UPDATE SET
+                messages = EXCLUDED.messages,
+                active_users = EXCLUDED.active_users,
+                xp_gained = EXCLUDED.xp_gained,
+                coins_gained = EXCLUDED.coins_gained,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE (group_daily_stats.messages, group_daily_stats.active_users,
+                   group_daily_stats.xp_gained, group_daily_stats.coins_gained)
+                IS DISTINCT FROM (EXCLUDED.messages, EXCLUDED.active_users, EXCLUDED.xp_gained, EXCLUDED.coins_gained)
+            RETURNING 1
+        )
+        SELECT COUNT(*) FROM upserted
+        """
+        row = await self.fetch_one(query, datetime.combine(since, datetime.min.time()))
+        return row[0]
+    
+    async def get_group_daily_stats(self, group_id: int, since: date) -> List[Dict]:
+        """نشاط الجروب اليومي المجمع مرتباً بالتاريخ"""
+        query = """
+        SELECT stat_date, messages, active_users, xp_gained, coins_gained, updated_at
+        FROM group_daily_stats
+        WHERE group_id = $1 AND stat_date >= $2
+        ORDER BY stat_date
+        """
+        rows = await self._read_all(query, group_id, since)
+        return [dict(row) for row in rows]
+    
+    # نشاط الجروب حسب ساعة الأسبوع
+    async def add_group_activity(self, rows: List[Dict]):
+        """إضافة فروق العدادات إلى group_activity في استعلام واحد"""
+        if not rows:
+            return
+        query = """
+        INSERT INTO group_activity (group_id, hour_of_week, messages)
+        SELECT g, h, m FROM unnest($1::bigint[], $2::smallint[], $3::bigint[]) AS a(g, h, m)
+        ON CONFLICT (group_id, hour_of_week) DO UPDATE SET
+            messages = group_activity.messages + EXCLUDED.messages,
+            updated_at = CURRENT_TIMESTAMP
+        """
+        await self.execute_query(
+            query,
+            [row['group_id'] for row in rows],
+            [row['hour_of_week'] for row in rows],
+            [row['messages'] for row in rows]
+        )
+    
+    async def get_group_activity(self, group_id: int) -> List[Dict]:
+        """عدادات الجروب المكتوبة (صف لكل ساعة أسبوع فيها نشاط)"""
+        query = "SELECT hour_of_week, messages FROM group_activity WHERE group_id = $1 ORDER BY hour_of_week"
+        rows = await self._read_all(query, group_id)
+        return [dict(row) for row in rows]
+    
+    # مخططات الأعضاء النشطين (HyperLogLog)
+    async def save_activity_sketches(self, rows: List[Dict]):
+        """حفظ مخططات (جروب، يوم) في استعلام واحد (المخطط في الذاكرة دُمج مع المحفوظ قبل الكتابة)"""
+        if not rows:
+            return
+        query = """
+        INSERT INTO activity_sketches (group_id, sketch_date, sketch)
+        SELECT g, d, s FROM unnest($1::bigint[], $2::date[], $3::bytea[]) AS a(g, d, s)
+        ON CONFLICT (group_id, sketch_date) DO UPDATE SET
+            sketch = EXCLUDED.sketch,
+            updated_at = CURRENT_TIMESTAMP
+        """
+        await self.execute_query(
+            query,
+            [row['group_id'] for row in rows],
+            [row['sketch_date'] for row in rows],
+            [row['sketch'] for row in rows]
+        )
+    
+    async def get_activity_sketches(self, group_ids: List[int], since: date, until: date) -> List[Dict]:
+        """مخططات الجروبات في نطاق أيام"""
+        query = """
+        SELECT group_id, sketch_date, sketch FROM activity_sketches
+        WHERE group_id = ANY($1::bigint[]) AND sketch_date BETWEEN $2 AND $3
+        """
+        rows = await self._read_all(query, group_ids, since, until)
+        return [dict(row) for row in rows]
+    
+    # المواسم
+    async def start_season(self, group_id: int, season_id: int, started_by: Optional[int] = None) -> Optional[GroupSettings]:
+        """بدء الموسم season_id إن كان الحالي season_id - 1 ولا يوجد موسم منتهٍ لم يُؤرشف (None = لم يبدأ)"""
+        query = """
+        WITH bumped AS (
+            INSERT INTO group_settings (group_id, season_id, updated_by)
+            SELECT $1, $2, $3::bigint
+            WHERE NOT EXISTS (SELECT 1 FROM seasons
+                              WHERE group_id = $1 AND ended_at IS NOT NULL AND archived_at IS NULL)
+              AND ($2 = 2 OR EXISTS (SELECT 1 FROM group_settings WHERE group_id = $1))
+            ON CONFLICT (group_id) DO UPDATE SET
+                season_id = EXCLUDED.season_id,
+                updated_by = EXCLUDED.updated_by,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE group_settings.season_id = EXCLUDED.season_id - 1
+            RETURNING *
+        ), ended AS (
+            INSERT INTO seasons (group_id, season_id, ended_at)
+            SELECT group_id, season_id - 1, CURRENT_TIMESTAMP FROM bumped
+            ON CONFLICT (group_id, season_id) DO UPDATE SET ended_at = EXCLUDED.ended_at
+        ), started AS (
+            INSERT INTO seasons (group_id, season_id, started_at, started_by)
+            SELECT group_id, season_id, CURRENT_TIMESTAMP, $3::bigint FROM bumped
+            ON CONFLICT (group_id, season_id) DO NOTHING
+        )
+        SELECT * FROM bumped
+        """
+        row = await self.fetch_one(query, group_id, season_id, started_by)
+        return GroupSettings.from_dict(dict(row)) if row else None
+    
+    async def archive_season(self, group_id: int, season_id: int) -> int:
+        """نسخ الترتيب النهائي لموسم منتهٍ من user_groups إلى season_standings في استعلام واحد"""
+        query = """
+        WITH final AS (
+            SELECT user_id, CASE WHEN season_id = $2 THEN season_xp ELSE prev_season_xp END AS xp
+            FROM user_groups
+            WHERE group_id = $1 AND is_active = TRUE AND (season_id = $2 OR prev_season_id = $2)
+        ), copied AS (
+            INSERT INTO season_standings (group_id, season_id, user_id, xp, season_rank)
+            SELECT $1, $2, user_id, xp, ROW_NUMBER() OVER (ORDER BY xp DESC, user_id DESC)
+            FROM final WHERE xp > 0
+            ON CONFLICT (group_id, season_id, user_id) DO NOTHING
+        ), marked AS (
+            INSERT INTO seasons (group_id, season_id, archived_at, members)
+            SELECT $1, $2, CURRENT_TIMESTAMP, COUNT(*) FROM final WHERE xp > 0
+            ON CONFLICT (group_id, season_id) DO UPDATE SET
+                archived_at = EXCLUDED.archived_at,
+                members = EXCLUDED.members
+            RETURNING members
+        )
+        SELECT members FROM marked
+        """
+        row = await self.fetch_one(query, group_id, season_id)
+        return row[0] if row else 0
+    
+    async def get_season(self, group_id: int, season_id: int) -> Optional[Season]:
+        """بيانات موسم واحد (None للموسم الأول قبل تفعيل season_days)"""
+        row = await self._read_one("SELECT * FROM seasons WHERE group_id = $1 AND season_id = $2", group_id, season_id)
+        return Season.from_dict(dict(row)) if row else None
+    
+    async def get_due_seasons(self, now: datetime) -> List[Dict]:
+        """الجروبات التي انتهت مدة موسمها الحالي (من بدايته في seasons، أو آخر تعديل إن فُعل قبل تسجيلها)"""
+        query = """
+        SELECT gs.group_id, gs.season_id
+        FROM group_settings gs
+        LEFT JOIN seasons s ON s.group_id = gs.group_id AND s.season_id = gs.season_id
+        WHERE gs.season_days > 0
+          AND COALESCE(s.started_at, gs.updated_at) + gs.season_days * INTERVAL '1 day' <= $1
+        """
+        rows = await self.fetch_all(query, now)
+        return [dict(row) for row in rows]
+    
+    async def get_unarchived_seasons(self, ended_before: datetime) -> List[Season]:
+        """المواسم المنتهية قبل وقت معين ولم يُؤرشف ترتيبها بعد"""
+        query = """
+        SELECT * FROM seasons
+        WHERE archived_at IS NULL AND ended_at IS NOT NULL AND ended_at <= $1
+        ORDER BY ended_at
+        """
+        rows = await self.fetch_all(query, ended_before)
+        return [Season.from_dict(dict(row)) for row in rows]
+    
+    async def get_season_leaderboard(self, group_id: int, season_id: int, limit: int = 10) -> List[Dict]:
+        """أعلى الأعضاء XP في الموسم الجاري"""
+        query = """
+        SELECT ug.user_id, ug.season_xp AS xp, ug.level_id, u.username, u.first_name
+        FROM user_groups ug
+        JOIN users u ON u.id = ug.user_id
+        WHERE ug.group_id = $1 AND ug.season_id = $2 AND ug.is_active = TRUE AND ug.season_xp > 0
+        ORDER BY ug.season_xp DESC, ug.user_id DESC
+        LIMIT $3
+        """
+        rows = await self._read_all(query, group_id, season_id, limit)
+        return [dict(row) for row in rows]
+    
+    async def get_season_standings(self, group_id: int, season_id: int, limit: int = 10) -> List[Dict]:
+        """الترتيب النهائي المؤرشف لموسم منتهٍ"""
+        query = """
+        SELECT ss.user_id, ss.xp, ss.season_rank, u.username, u.first_name
+        FROM season_standings ss
+        LEFT JOIN users u ON u.id = ss.user_id
+        WHERE ss.group_id = $1 AND ss.season_id = $2
+        ORDER BY ss.season_rank
+        LIMIT $3
+        """
+        rows = await self._read_all(query, group_id, season_id, limit)
+        return [dict(row) for row in rows]
+    
     # المتجر
     async def get_shop_items(self, limit: int = 50) -> List[ShopItem]:
         """الحصول على عناصر المتجر"""
         query = "SELECT * FROM shop_items WHERE is_active = TRUE ORDER BY price ASC LIMIT $1"
-        rows = await self.fetch_all(query, limit)
+        rows = await self._read_all(query, limit)
         return [ShopItem.from_dict(dict(row)) for row in rows]
     
     async def get_shop_item_by_id(self, item_id: int) -> Optional[ShopItem]:
         """الحصول على عنصر من المتجر"""
         query = "SELECT * FROM shop_items WHERE id = $1 AND is_active = TRUE"
-        row = await self.fetch_one(query, item_id)
+        row = await self._read_one(query, item_id)
         return ShopItem.from_dict(dict(row)) if row else None
     
     # الشارات
     async def get_all_badges(self) -> List[Badge]:
         """الحصول على جميع الشارات"""
         query = "SELECT * FROM badges WHERE is_active = TRUE"
-        rows = await self.fetch_all(query)
+        rows = await self._read_all(query)
         return [Badge.from_dict(dict(row)) for row in rows]
     
     async def get_user_badges(self, user_id: int, group_id: int) -> List[Badge]:
@@ -188,13 +716,13 @@ class DatabaseManager:
         WHERE ub.user_id = $1 AND ub.group_id = $2
         ORDER BY ub.earned_at DESC
         """
-        rows = await self.fetch_all(query, user_id, group_id)
+        rows = await self._read_all(query, user_id, group_id)
         return [Badge.from_dict(dict(row)) for row in rows]
     
     async def get_user_badges_count(self, user_id: int, group_id: int) -> int:
         """الحصول على عدد شارات المستخدم"""
         query = "SELECT COUNT(*) FROM user_badges WHERE user_id = $1 AND group_id = $2"
-        row = await self.fetch_one(query, user_id, group_id)
+        row = await self._read_one(query, user_id, group_id)
         return row[0] if row else 0
     
     async def award_badge(self, user_id: int, group_id: int, badge_id: int):
@@ -214,7 +742,7 @@ class DatabaseManager:
         WHERE user_id = $1 AND group_id = $2 AND quest_date = $3
         ORDER BY id
         """
-        rows = await self.fetch_all(query, user_id, group_id, quest_date)
+        rows = await self._read_all(query, user_id, group_id, quest_date)
         return [DailyQuest.from_dict(dict(row)) for row in rows]
     
     async def create_daily_quest(self, user_id: int, group_id: int, quest_type: str, 
@@ -238,28 +766,141 @@ class DatabaseManager:
         """
         await self.execute_query(query, user_id, group_id, quest_type, progress, quest_date)
     
+    async def sweep_daily_quests(self, cutoff: date, batch_size: int, archive: bool = False) -> Dict[str, int]:
+        """نقل دفعة من المهام القديمة إلى السجل المجمع وحذفها"""
+        query = """
+        WITH batch AS (
+            DELETE FROM daily_quests
+            WHERE id IN (
+                SELECT id FROM daily_quests
+                WHERE quest_date < $1
+                ORDER BY id
+                LIMIT $2
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *
+        ), archived AS (
+            INSERT INTO daily_quests_archive (id, user_id, group_id, quest_type, target_value, current_progress,
+                                              reward_xp, reward_coins, is_completed, quest_date, completed_at, created_at)
+            SELECT id, user_id, group_id, quest_type, target_value, current_progress,
+                   reward_xp, reward_coins, is_completed, quest_date, completed_at, created_at
+            FROM batch WHERE $3
+        ), rollup AS (
+            INSERT INTO user_quest_history (user_id, group_id, quests_completed, quests_expired,
+                                            total_reward_xp, total_reward_coins, last_quest_date)
+            SELECT user_id, group_id,
+                   COUNT(*) FILTER (WHERE is_completed),
+                   COUNT(*) FILTER (WHERE NOT is_completed),
+                   COALESCE(SUM(reward_xp) FILTER (WHERE is_completed), 0),
+                   COALESCE(SUM(reward_coins) FILTER (WHERE is_completed), 0),
+                   MAX(quest_date)
+            FROM batch
+            GROUP BY user_id, group_id
+            ON CONFLICT (user_id, group_id) DO UPDATE SET
+                quests_completed = user_quest_history.quests_completed + EXCLUDED.quests_completed,
+                quests_expired = user_quest_history.quests_expired + EXCLUDED.quests_expired,
+                total_reward_xp = user_quest_history.total_reward_xp + EXCLUDED.total_reward_xp,
+                total_reward_coins = user_quest_history.total_reward_coins + EXCLUDED.total_reward_coins,
+                last_quest_date = GREATEST(user_quest_history.last_quest_date, EXCLUDED.last_quest_date),
+                updated_at = CURRENT_TIMESTAMP
+        )
+        SELECT COUNT(*) AS deleted, COUNT(*) FILTER (WHERE is_completed) AS completed FROM batch
+        """
+        row = await self.fetch_one(query, cutoff, batch_size, archive)
+        return {'deleted': row['deleted'], 'completed': row['completed']}
+    
+    async def fetch_group_ids_chunk(self, after_id: Optional[int], limit: int) -> List[int]:
+        """جلب دفعة من معرفات الجروبات النشطة بترقيم المفتاح (المعرفات سالبة، فالبداية None)"""
+        query = """
+        SELECT id FROM groups
+        WHERE is_active AND ($1::bigint IS NULL OR id > $1)
+        ORDER BY id
+        LIMIT $2
+        """
+        rows = await self._read_all(query, after_id, limit)
+        return [row['id'] for row in rows]
+    
+    async def generate_daily_quests(self, group_ids: List[int], quest_date: date, active_since: datetime,
+                                    quests: List[Dict]) -> int:
+        """إنشاء مهام quest_date لأعضاء الجروبات النشطين حسب مستوى كل عضو في استعلام واحد"""
+        query = """
+        WITH created AS (
+            INSERT INTO daily_quests (user_id, group_id, quest_type, target_value, reward_xp, reward_coins, quest_date)
+            SELECT ug.user_id, ug.group_id, q.quest_type, q.target_value, q.reward_xp, q.reward_coins, $2
+            FROM user_groups ug
+            JOIN unnest($4::int[], $5::text[], $6::int[], $7::int[], $8::int[])
+                AS q(level_id, quest_type, target_value, reward_xp, reward_coins) ON q.level_id = ug.level_id
+            WHERE ug.group_id = ANY($1::bigint[]) AND ug.is_active AND ug.last_message_at >= $3
+            ON CONFLICT (user_id, group_id, quest_type, quest_date) DO NOTHING
+            RETURNING 1
+        )
+        SELECT COUNT(*) AS created FROM created
+        """
+        row = await self.fetch_one(
+            query, group_ids, quest_date, active_since,
+            [quest['level_id'] for quest in quests], [quest['quest_type'] for quest in quests],
+            [quest['target_value'] for quest in quests], [quest['reward_xp'] for quest in quests],
+            [quest['reward_coins'] for quest in quests]
+        )
+        return row['created']
+    
     # الكلانات
     async def get_clan_by_id(self, clan_id: int) -> Optional[Clan]:
         """الحصول على كلان بالمعرف"""
         query = "SELECT * FROM clans WHERE id = $1"
-        row = await self.fetch_one(query, clan_id)
+        row = await self._read_one(query, clan_id)
         return Clan.from_dict(dict(row)) if row else None
     
     async def get_clan_by_name(self, name: str, group_id: int) -> Optional[Clan]:
         """الحصول على كلان بالاسم"""
         query = "SELECT * FROM clans WHERE name = $1 AND group_id = $2"
-        row = await self.fetch_one(query, name, group_id)
+        row = await self._read_one(query, name, group_id)
         return Clan.from_dict(dict(row)) if row else None
     
     # تسجيل الرسائل
     async def log_message(self, user_id: int, group_id: int, message_id: int, 
-                         xp_gained: int, coins_gained: int, message_type: str = 'text'):
-        """تسجيل رسالة"""
+                         xp_gained: int, coins_gained: int, message_type: str = 'text') -> bool:
+        """تسجيل رسالة (False إن كانت مسجلة من قبل: تحديث مكرر)"""
         query = """
         INSERT INTO message_logs (user_id, group_id, message_id, xp_gained, coins_gained, message_type)
         VALUES ($1, $2, $3, $4, $5, $6)
+        ON CONFLICT (group_id, message_id) DO NOTHING
+        RETURNING id
         """
-        await self.execute_query(query, user_id, group_id, message_id, xp_gained, coins_gained, message_type)
+        row = await self.fetch_one(query, user_id, group_id, message_id, xp_gained, coins_gained, message_type)
+        return row is not None
+    
+    # صندوق الأحداث (outbox)
+    async def append_outbox_events(self, events: List[Dict]):
+        """إدراج دفعة أحداث في استعلام واحد"""
+        if not events:
+            return
+        query = """
+        INSERT INTO event_outbox (event_type, group_id, user_id, payload, created_at)
+        SELECT t, g, u, p::jsonb, c
+        FROM unnest($1::text[], $2::bigint[], $3::bigint[], $4::text[], $5::timestamp[]) AS e(t, g, u, p, c)
+        """
+        await self.execute_query(
+            query,
+            [event['event_type'] for event in events],
+            [event['group_id'] for event in events],
+            [event['user_id'] for event in events],
+            [json.dumps(event['payload'], ensure_ascii=False, default=str) for event in events],
+            [event['created_at'] for event in events]
+        )
+    
+    async def claim_outbox_events(self, limit: int) -> List[Dict]:
+        """سحب أقدم الأحداث وحذفها (SKIP LOCKED يسمح بعدة مستهلكين متوازيين)"""
+        query = """
+        DELETE FROM event_outbox
+        WHERE id IN (SELECT id FROM event_outbox ORDER BY id LIMIT $1 FOR UPDATE SKIP LOCKED)
+        RETURNING id, event_type, group_id, user_id, payload, created_at
+        """
+        rows = await self.fetch_all(query, limit)
+        events = [dict(row) for row in rows]
+        for event in events:
+            event['payload'] = json.loads(event['payload'])
+        return sorted(events, key=lambda event: event['id'])
     
     # المخزون
     async def add_to_inventory(self, user_id: int, group_id: int, item_id: int, 
@@ -281,5 +922,75 @@ class DatabaseManager:
         AND (ui.expires_at IS NULL OR ui.expires_at > CURRENT_TIMESTAMP)
         ORDER BY ui.purchased_at DESC
         """
-        rows = await self.fetch_all(query, user_id, group_id)
+        rows = await self._read_all(query, user_id, group_id)
+        return [dict(row) for row in rows]
+    
+    # الإجراءات الإدارية
+    async def get_user_ids_by_usernames(self, usernames: List[str]) -> Dict[str, int]:
+        """الحصول على معرفات المستخدمين بأسماء المستخدمين"""
+        if not usernames:
+            return {}
+        query = "SELECT id, username FROM users WHERE lower(username) = ANY($1::text[])"
+        rows = await self._read_all(query, [name.lower() for name in usernames])
+        return {row['username'].lower(): row['id'] for row in rows}
+    
+    async def bulk_adjust_users(self, admin_user_id: int, group_id: int, user_ids: List[int],
+                                xp_deltas: List[int], coin_deltas: List[int],
+                                action_type: str, reason: Optional[str] = None) -> List[Dict]:
+        """تعديل XP والعملات لعدة مستخدمين في استعلام واحد مع تسجيل الإجراءات"""
+        # تحديث واحد لكل الصفوف + إعادة حساب المستوى + سجل التدقيق في نفس العبارة
+        # (XP الموسم يتغير فقط لمن بدأ الموسم الحالي؛ غيره يبدأ من الصفر مع أول رسالة فيه)
+        query = """
+        WITH updated AS (
+            UPDATE user_groups ug
+            SET xp = GREATEST(ug.xp + t.xp_delta, 0),
+                coins = GREATEST(ug.coins + t.coins_delta, 0),
+                season_xp = CASE
+                    WHEN ug.season_id = COALESCE((SELECT gs.season_id FROM group_settings gs WHERE gs.group_id = $2), 1)
+                    THEN GREATEST(ug.season_xp + t.xp_delta, 0)
+                    ELSE ug.season_xp
+                END,
+                level_id = COALESCE((
+                    SELECT l.id FROM levels l
+                    WHERE l.required_xp <= GREATEST(ug.xp + t.xp_delta, 0)
+                    ORDER BY l.required_xp DESC
+                    LIMIT 1
+                ), ug.level_id),
+                updated_at = CURRENT_TIMESTAMP
+            FROM unnest($3::bigint[], $4::bigint[], $5::bigint[]) AS t(user_id, xp_delta, coins_delta)
+            WHERE ug.group_id = $2 AND ug.user_id = t.user_id
+            RETURNING ug.user_id, ug.xp, ug.coins, ug.level_id,
+                      CASE WHEN t.xp_delta <> 0 THEN t.xp_delta ELSE t.coins_delta END AS amount
+        ), audit AS (
+            INSERT INTO admin_actions (admin_user_id, target_user_id, group_id, action_type, amount, reason)
+            SELECT $1, u.user_id, $2, $6, abs(u.amount), $7 FROM updated u
+        )
+        SELECT user_id, xp, coins, level_id FROM updated
+        """
+        rows = await self.fetch_all(
+            query, admin_user_id, group_id, user_ids, xp_deltas, coin_deltas, action_type, reason
+        )
+        return [dict(row) for row in rows]
+    
+    async def bulk_reset_users(self, admin_user_id: int, group_id: int, user_ids: List[int],
+                               reason: Optional[str] = None) -> List[Dict]:
+        """إعادة تعيين عدة مستخدمين في استعلام واحد مع تسجيل الإجراءات (ومن ترتيب المواسم غير المؤرشفة)"""
+        query = """
+        WITH updated AS (
+            UPDATE user_groups ug
+            SET xp = 0,
+                coins = 0,
+                season_xp = 0,
+                prev_season_xp = 0,
+                level_id = (SELECT id FROM levels ORDER BY required_xp ASC LIMIT 1),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE ug.group_id = $2 AND ug.user_id = ANY($3::bigint[])
+            RETURNING ug.user_id, ug.xp, ug.coins, ug.level_id
+        ), audit AS (
+            INSERT INTO admin_actions (admin_user_id, target_user_id, group_id, action_type, amount, reason)
+            SELECT $1, u.user_id, $2, 'reset_user', 0, $4 FROM updated u
+        )
+        SELECT user_id, xp, coins, level_id FROM updated
+        """
+        rows = await self.fetch_all(query, admin_user_id, group_id, user_ids, reason)
         return [dict(row) for row in rows]
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dedup - تجاهل التحديثات المكررة (إعادة إرسال webhook أو إعادة تشغيل الاستطلاع)
+
+الطبقة الأولى مجموعة محدودة في الذاكرة لآخر update_id: التكرار يكلف فحصاً واحداً بدون أي كتابة.
+الطبقة الثانية القيد الفريد message_logs(group_id, message_id): بعد إعادة التشغيل تُفقد الذاكرة،
+فيُسجل مسار المنح الرسالة أولاً (ON CONFLICT DO NOTHING) ولا يمنح XP إن كانت مسجلة من قبل.
+"""
+
+from collections import deque
+from typing import Dict, Hashable, Optional
+
+from metrics import REGISTRY
+
+
+class RecentUpdates:
+    """آخر max_entries مفتاح (update_id) بترتيب الوصول، يُحذف الأقدم عند الامتلاء"""
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.duplicates = 0
+        self._order: deque = deque()
+        self._seen: set = set()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._seen
+
+    def add(self, key: Optional[Hashable]) -> bool:
+        """تسجيل المفتاح، و False إن كان مسجلاً من قبل (تحديث مكرر)"""
+        if key is None:
+            return True
+        if key in self._seen:
+            self.duplicates += 1
+            REGISTRY.count_error('dedup.update')
+            return False
+        self._seen.add(key)
+        self._order.append(key)
+        if len(self._order) > self.max_entries:
+            self._seen.discard(self._order.popleft())
+        return True
+
+    def snapshot(self) -> Dict[str, list]:
+        return {'keys': list(self._order)}
+
+    def restore(self, data: Dict[str, list]):
+        for key in data.get('keys', []):
+            if key not in self._seen:
+                self.add(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._seen), 'duplicates': self.duplicates}
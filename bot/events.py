@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Events - نشر أحداث XP والمستويات والشارات للمستهلكين (لوحة التحكم، التحليلات)
+
+مسار المنح ينشر الحدث بدون انتظار، وكل مستهلك (sink) له طابور محدود ومهمة تكتب على دفعات:
+- EVENTS_FILE: ملف NDJSON يُضاف إليه فقط
+- EVENTS_OUTBOX=1: جدول event_outbox يسحبه المستهلكون (python events.py drain)
+- EVENTS_PORT: خادم Server-Sent Events على /events (مع ?group_id= للتصفية)
+
+الاستخدام (سحب الـ outbox إلى stdout):
+    python events.py drain [--backend postgres] [--batch-size 500] [--follow]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Set
+
+from dotenv import load_dotenv
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('xp_awarded', 'level_up', 'badge_earned', 'purchase', 'clan_change')
+
+# سلوك الطابور الممتلئ: حذف أقدم حدث أو رفض الجديد
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest')
+
+
+@dataclass
+class Event:
+    """حدث واحد بمعرف تسلسلي متزايد عبر إعادة التشغيل"""
+    id: int
+    type: str
+    group_id: Optional[int]
+    user_id: Optional[int]
+    data: Dict[str, Any] = field(default_factory=dict)
+    created_at: datetime = field(default_factory=datetime.now)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id, 'type': self.type, 'group_id': self.group_id, 'user_id': self.user_id,
+            'data': self.data, 'created_at': self.created_at.isoformat()
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, default=str)
+
+
+class EventSink:
+    """مستهلك أحداث: write يستقبل دفعة ويُستدعى من مهمة واحدة فقط"""
+
+    name = 'sink'
+
+    async def start(self):
+        pass
+
+    async def write(self, events: List[Event]):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+
+class FileSink(EventSink):
+    """ملف NDJSON يُضاف إليه فقط (الكتابة في خيط منفصل)"""
+
+    name = 'file'
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    async def start(self):
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _append(self, lines: str):
+        self._file.write(lines)
+        self._file.flush()
+
+    async def write(self, events: List[Event]):
+        await asyncio.to_thread(self._append, ''.join(event.to_json() + '\n' for event in events))
+
+    async def stop(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class OutboxSink(EventSink):
+    """جدول event_outbox: إدراج الدفعة في استعلام واحد، ويسحبها المستهلكون لاحقاً"""
+
+    name = 'outbox'
+
+    def __init__(self, db):
+        self.db = db
+
+    async def write(self, events: List[Event]):
+        await self.db.append_outbox_events([
+            {'event_type': event.type, 'group_id': event.group_id, 'user_id': event.user_id,
+             'payload': event.data, 'created_at': event.created_at}
+            for event in events
+        ])
+
+
+class _SSEClient:
+    __slots__ = ('queue', 'group_id', 'overflowed')
+
+    def __init__(self, group_id: Optional[int], max_pending: int):
+        self.queue: asyncio.Queue = asyncio.Queue(max_pending)
+        self.group_id = group_id
+        self.overflowed = False
+
+
+class SSESink(EventSink):
+    """خادم Server-Sent Events: لكل عميل طابور محدود، والعميل البطيء يُفصل ليعيد الاتصال"""
+
+    name = 'sse'
+
+    def __init__(self, host: str = '0.0.0.0', port: int = 8090, max_pending: int = 1000,
+                 replay: int = 1000, heartbeat: float = 15.0):
+        self.host = host
+        self.port = port
+        self.max_pending = max_pending
+        self.heartbeat = heartbeat
+        self.recent: deque = deque(maxlen=replay)
+        self.clients: Set[_SSEClient] = set()
+        self._runner = None
+
+    async def start(self):
+        from aiohttp import web
+
+        app = web.Application()
+        app.router.add_get('/events', self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("📡 خادم الأحداث يعمل على المنفذ %s", self.port)
+
+    @staticmethod
+    def _format(event: Event) -> bytes:
+        return f"id: {event.id}\nevent: {event.type}\ndata: {event.to_json()}\n\n".encode()
+
+    async def _handle(self, request):
+        from aiohttp import web
+
+        try:
+            group_id = request.query.get('group_id')
+            group_id = int(group_id) if group_id else None
+            last_id = int(request.headers.get('Last-Event-ID') or 0)
+        except ValueError:
+            return web.Response(status=400, text="group_id و Last-Event-ID يجب أن يكونا أعداداً صحيحة")
+        client = _SSEClient(group_id, self.max_pending)
+        response = web.StreamResponse(headers={
+            'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache',
+            'Access-Control-Allow-Origin': '*'
+        })
+        await response.prepare(request)
+
+        # إعادة إرسال ما فات العميل منذ آخر حدث استلمه (إن كان ما زال في الذاكرة)
+        for event in list(self.recent):
+            if event.id > last_id and client.group_id in (None, event.group_id):
+                await response.write(self._format(event))
+
+        self.clients.add(client)
+        try:
+            while not client.overflowed:
+                try:
+                    event = await asyncio.wait_for(client.queue.get(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    await response.write(b": ping\n\n")
+                    continue
+                await response.write(self._format(event))
+        except ConnectionResetError:
+            pass
+        finally:
+            self.clients.discard(client)
+        return response
+
+    async def write(self, events: List[Event]):
+        self.recent.extend(events)
+        for client in list(self.clients):
+            for event in events:
+                if client.group_id not in (None, event.group_id):
+                    continue
+                try:
+                    client.queue.put_nowait(event)
+                except asyncio.QueueFull:
+                    # العميل متأخر: يُفصل ويعيد الاتصال مع Last-Event-ID
+                    client.overflowed = True
+                    REGISTRY.count_error('events.sse.slow_client')
+                    break
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+class _SinkWorker:
+    """طابور محدود ومهمة كتابة على دفعات لمستهلك واحد"""
+
+    def __init__(self, sink: EventSink, max_pending: int, batch_size: int, overflow: str):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"سياسة غير معروفة: {overflow}")
+        self.sink = sink
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.queue: deque = deque()
+        self.max_pending = max_pending
+        self.dropped = 0
+        self.written = 0
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        # الدفعة التي أُخرجت من الطابور ولم تُكتب بعد
+        self._in_flight: List[Event] = []
+
+    def offer(self, event: Event):
+        if len(self.queue) >= self.max_pending:
+            self.dropped += 1
+            REGISTRY.count_error(f"events.{self.sink.name}")
+            if self.overflow == 'drop_newest':
+                return
+            self.queue.popleft()
+        self.queue.append(event)
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self.queue:
+                batch = [self.queue.popleft() for _ in range(min(self.batch_size, len(self.queue)))]
+                self._in_flight = batch
+                await self._write(batch, attempts=1 if self._stopping else 3)
+                self._in_flight = []
+            if self._stopping:
+                return
+
+    async def _write(self, batch: List[Event], attempts: int = 3):
+        for attempt in range(1, attempts + 1):
+            started = time.perf_counter()
+            try:
+                await self.sink.write(batch)
+                REGISTRY.observe(f"events.{self.sink.name}", time.perf_counter() - started)
+                self.written += len(batch)
+                return
+            except Exception as e:
+                REGISTRY.observe(f"events.{self.sink.name}", time.perf_counter() - started, error=True)
+                logger.error("خطأ في كتابة الأحداث إلى %s (محاولة %d): %s", self.sink.name, attempt, e)
+                await asyncio.sleep(attempt)
+        self.dropped += len(batch)
+
+    async def start(self):
+        await self.sink.start()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """إكمال الدفعة الجارية وكتابة ما تبقى في الطابور قبل الإغلاق (ما لم يُكتب خلال المهلة يُحسب محذوفاً)"""
+        if self._task:
+            self._stopping = True
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(self._task, drain_timeout)
+            except asyncio.TimeoutError:
+                self.dropped += len(self._in_flight) + len(self.queue)
+                self._in_flight = []
+                self.queue.clear()
+            self._task = None
+        await self.sink.stop()
+
+
+class EventBus:
+    """نشر الأحداث لكل المستهلكين بدون انتظار (publish لا يحجب مسار الرسائل)"""
+
+    def __init__(self):
+        self.workers: List[_SinkWorker] = []
+        # المعرفات تبدأ من وقت التشغيل بالميكروثانية: تبقى متزايدة بعد إعادة التشغيل فلا يتخطى
+        # Last-Event-ID أحداثاً جديدة ولا يكررها
+        self._ids = itertools.count(time.time_ns() // 1000)
+        self.published = 0
+
+    def add_sink(self, sink: EventSink, max_pending: int = 10_000, batch_size: int = 500,
+                 overflow: str = 'drop_oldest'):
+        self.workers.append(_SinkWorker(sink, max_pending, batch_size, overflow))
+
+    def publish(self, event_type: str, group_id: Optional[int], user_id: Optional[int], **data) -> Optional[Event]:
+        if event_type not in EVENT_TYPES:
+            raise ValueError(f"نوع حدث غير معروف: {event_type}")
+        if not self.workers:
+            return None
+        event = Event(next(self._ids), event_type, group_id, user_id, data)
+        self.published += 1
+        for worker in self.workers:
+            worker.offer(event)
+        return event
+
+    async def start(self):
+        for worker in self.workers:
+            await worker.start()
+
+    async def stop(self):
+        for worker in self.workers:
+            await worker.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'published': self.published,
+            'sinks': {
+                worker.sink.name: {'pending': len(worker.queue), 'written': worker.written, 'dropped': worker.dropped}
+                for worker in self.workers
+            }
+        }
+
+
+def build_event_bus(db) -> EventBus:
+    """إنشاء الناقل مع المستهلكين المفعلين في متغيرات البيئة"""
+    bus = EventBus()
+    if os.getenv('EVENTS_FILE'):
+        bus.add_sink(FileSink(os.getenv('EVENTS_FILE')))
+    if os.getenv('EVENTS_OUTBOX', '').lower() in ('1', 'true', 'yes'):
+        bus.add_sink(OutboxSink(db))
+    if os.getenv('EVENTS_PORT'):
+        # العملاء المتأخرون يُفصلون بدلاً من إبطاء الطابور
+        bus.add_sink(SSESink(port=int(os.getenv('EVENTS_PORT'))), batch_size=100)
+    return bus
+
+
+async def _drain(args):
+    from storage import create_storage, open_storage, close_storage
+
+    db = create_storage(args.backend)
+    await open_storage(db)
+    try:
+        while True:
+            rows = await db.claim_outbox_events(args.batch_size)
+            for row in rows:
+                sys.stdout.write(json.dumps(row, ensure_ascii=False, default=str) + '\n')
+            sys.stdout.flush()
+            if len(rows) < args.batch_size:
+                if not args.follow:
+                    break
+                await asyncio.sleep(args.interval)
+    finally:
+        await close_storage(db)
+
+
+def main(argv: Optional[List[str]] = None):
+    from storage import available_backends
+
+    parser = argparse.ArgumentParser(description="سحب أحداث event_outbox على دفعات")
+    commands = parser.add_subparsers(dest='command', required=True)
+    drain = commands.add_parser('drain', help="طباعة الأحداث (NDJSON) وحذفها من الجدول")
+    drain.add_argument('--backend', choices=available_backends(), default=None)
+    drain.add_argument('--batch-size', type=int, default=500)
+    drain.add_argument('--follow', action='store_true', help="الاستمرار في انتظار أحداث جديدة")
+    drain.add_argument('--interval', type=float, default=1.0)
+    args = parser.parse_args(argv)
+    asyncio.run(_drain(args))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main()
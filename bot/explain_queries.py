@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Explain Queries - فهرس أشكال الاستعلامات التي يرسلها DatabaseManager وفحص خطط تنفيذها
+
+الاستخدام:
+    python explain_queries.py catalog [--check]        # توليد database/query_catalog.sql
+    python explain_queries.py explain [--check]        # EXPLAIN على PostgreSQL محلي (متغيرات DB_*)
+
+في وضع --check يفشل الأمر (رمز خروج 1) إن لجأ استعلام ساخن إلى Seq Scan على جدول كبير.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from typing import Optional, List, Dict, Any, Tuple
+
+from dotenv import load_dotenv
+
+from database import DatabaseManager, load_config_from_env
+from models import GroupSettings
+
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), '..', 'database', 'query_catalog.sql')
+
+# جداول صغيرة ثابتة: القراءة المتسلسلة لها أرخص من أي فهرس
+SMALL_TABLES = {'levels', 'badges'}
+
+_TODAY = date(2024, 1, 1)
+_USER = SimpleNamespace(id=1, username='user', first_name='User', last_name=None, language_code='ar', is_bot=False)
+
+
+@dataclass
+class QueryShape:
+    """استدعاء نموذجي لدالة في مدير قاعدة البيانات"""
+    method: str
+    args: Tuple
+    hot: bool = True
+
+
+# كل دالة في DatabaseManager مع معاملات نموذجية (hot = يُنفذ في مسار الرسائل أو الأوامر)
+QUERY_CATALOG = [
+    QueryShape('add_user_if_not_exists', (_USER,)),
+    QueryShape('get_user_by_id', (1,)),
+    QueryShape('get_user_ids_by_usernames', (['user'],)),
+    QueryShape('add_group_if_not_exists', (-100, 'group')),
+    QueryShape('get_group_settings', (-100,)),
+    QueryShape('save_group_settings', (GroupSettings(group_id=-100, updated_by=1),)),
+    QueryShape('add_user_to_group_if_not_exists', (1, -100)),
+    QueryShape('get_user_group', (1, -100)),
+    QueryShape('get_profile_bundle', (1, -100)),
+    QueryShape('update_user_stats', (1, -100, 10, 5, 2)),
+    QueryShape('update_user_level', (1, -100, 2)),
+    QueryShape('get_group_leaderboard', (-100, 10)),
+    QueryShape('get_leaderboard_page', (-100, 21, 500, 7)),
+    QueryShape('get_group_daily_stats', (-100, _TODAY)),
+    QueryShape('get_group_activity', (-100,)),
+    QueryShape('get_activity_sketches', ([-100], _TODAY - timedelta(days=29), _TODAY)),
+    QueryShape('get_season', (-100, 2)),
+    QueryShape('get_season_leaderboard', (-100, 2, 10)),
+    QueryShape('get_season_standings', (-100, 1, 10)),
+    QueryShape('start_season', (-100, 2, 1)),
+    QueryShape('get_level_by_id', (1,)),
+    QueryShape('get_level_by_number', (2,)),
+    QueryShape('get_level_by_xp', (500,)),
+    QueryShape('get_all_levels', ()),
+    QueryShape('get_shop_items', (50,)),
+    QueryShape('get_shop_item_by_id', (1,)),
+    QueryShape('get_all_badges', ()),
+    QueryShape('get_user_badges', (1, -100)),
+    QueryShape('get_user_badges_count', (1, -100)),
+    QueryShape('award_badge', (1, -100, 1)),
+    QueryShape('get_daily_quests', (1, -100, _TODAY)),
+    QueryShape('create_daily_quest', (1, -100, 'messages', 10, 50, 10, _TODAY)),
+    QueryShape('update_daily_quest_progress', (1, -100, 'messages', 1, _TODAY)),
+    QueryShape('get_clan_by_id', (1,)),
+    QueryShape('get_clan_by_name', ('clan', -100)),
+    QueryShape('log_message', (1, -100, 1, 10, 5)),
+    QueryShape('append_outbox_events', ([{'event_type': 'level_up', 'group_id': -100, 'user_id': 1,
+                                          'payload': {}, 'created_at': datetime(2024, 1, 1)}],)),
+    QueryShape('add_to_inventory', (1, -100, 1, 1, datetime(2024, 1, 1) + timedelta(hours=1))),
+    QueryShape('get_user_inventory', (1, -100)),
+    QueryShape('bulk_adjust_users', (2, -100, [1], [10], [0], 'add_xp', None)),
+    QueryShape('bulk_reset_users', (2, -100, [1], None)),
+    # مهام الصيانة
+    QueryShape('get_group_settings_since', (datetime(2024, 1, 1),), hot=False),
+    QueryShape('claim_outbox_events', (500,), hot=False),
+    QueryShape('refresh_group_daily_stats', (_TODAY,), hot=False),
+    QueryShape('add_group_activity', ([{'group_id': -100, 'hour_of_week': 0, 'messages': 1}],), hot=False),
+    QueryShape('save_activity_sketches', ([{'group_id': -100, 'sketch_date': _TODAY, 'sketch': b'\x02\x0c'}],),
+               hot=False),
+    QueryShape('archive_season', (-100, 1), hot=False),
+    QueryShape('get_due_seasons', (datetime(2024, 1, 1),), hot=False),
+    QueryShape('get_unarchived_seasons', (datetime(2024, 1, 1),), hot=False),
+    QueryShape('count_user_groups', (), hot=False),
+    QueryShape('fetch_user_groups_chunk', (0, 1000), hot=False),
+    QueryShape('bulk_update_level_ids', ([1], [2]), hot=False),
+    QueryShape('sweep_daily_quests', (_TODAY, 1000, False), hot=False),
+    QueryShape('fetch_group_ids_chunk', (None, 500), hot=False),
+    QueryShape('generate_daily_quests', ([-100], _TODAY, datetime(2024, 1, 1),
+                                         [{'level_id': 1, 'quest_type': 'messages', 'target_value': 22,
+                                           'reward_xp': 110, 'reward_coins': 55}]), hot=False),
+]
+
+
+class _RecordingManager(DatabaseManager):
+    """DatabaseManager بدون اتصال يسجل الاستعلامات بدلاً من تنفيذها"""
+
+    def __init__(self):
+        super().__init__({})
+        self.recorded: List[Tuple[str, Tuple]] = []
+
+    async def execute_query(self, query: str, *args):
+        self.recorded.append((query, args))
+        return "OK"
+
+    async def fetch_one(self, query: str, *args):
+        self.recorded.append((query, args))
+        return None
+
+    async def fetch_all(self, query: str, *args):
+        self.recorded.append((query, args))
+        return []
+
+    _read_one = fetch_one
+    _read_all = fetch_all
+
+
+def _dedent(query: str) -> str:
+    return "\n".join(line.strip() for line in query.strip().splitlines() if line.strip())
+
+
+async def record_queries() -> List[Dict[str, Any]]:
+    """تشغيل كل دالة في الفهرس وتسجيل العبارات التي ترسلها"""
+    manager = _RecordingManager()
+    shapes = []
+    for shape in QUERY_CATALOG:
+        manager.recorded.clear()
+        try:
+            await getattr(manager, shape.method)(*shape.args)
+        except (TypeError, KeyError):
+            pass  # معالجة النتيجة الفارغة لا تهم، العبارة سُجلت قبلها
+        for index, (query, args) in enumerate(manager.recorded):
+            name = shape.method if len(manager.recorded) == 1 else f"{shape.method}#{index + 1}"
+            shapes.append({'name': name, 'sql': _dedent(query), 'args': args, 'hot': shape.hot})
+    return shapes
+
+
+def render_catalog(shapes: List[Dict[str, Any]]) -> str:
+    out = [
+        "-- فهرس أشكال الاستعلامات التي يرسلها DatabaseManager",
+        "-- مُولد بواسطة: python bot/explain_queries.py catalog (لا تعدله يدوياً)",
+    ]
+    for shape in shapes:
+        out.append(f"\n-- name: {shape['name']}{' (hot)' if shape['hot'] else ''}")
+        out.append(f"{shape['sql']};")
+    return "\n".join(out) + "\n"
+
+
+def _plan_nodes(plan: Dict[str, Any]):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _plan_nodes(child)
+
+
+def seq_scans(plan: Dict[str, Any]) -> List[str]:
+    """الجداول الكبيرة التي تُقرأ بالكامل في الخطة"""
+    return sorted({
+        node['Relation Name'] for node in _plan_nodes(plan)
+        if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name') not in SMALL_TABLES
+    })
+
+
+def _index_names(plan: Dict[str, Any]) -> List[str]:
+    return sorted({node['Index Name'] for node in _plan_nodes(plan) if 'Index Name' in node})
+
+
+async def explain_all(config: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """EXPLAIN لكل استعلام مع تعطيل Seq Scan: إن ظهر رغم ذلك فلا يوجد فهرس مناسب"""
+    import asyncpg
+
+    shapes = await record_queries()
+    # config: معاملات asyncpg.connect (host/port/database/user/password أو dsn)
+    connection = await asyncpg.connect(**config)
+    try:
+        for shape in shapes:
+            transaction = connection.transaction()
+            await transaction.start()
+            try:
+                await connection.execute("SET LOCAL enable_seqscan = off")
+                raw = await connection.fetchval(f"EXPLAIN (FORMAT JSON) {shape['sql']}", *shape['args'])
+                plan = json.loads(raw)[0]['Plan']
+                shape['seq_scans'] = seq_scans(plan)
+                shape['indexes'] = _index_names(plan)
+                shape['cost'] = plan.get('Total Cost')
+            except Exception as e:
+                shape['error'] = str(e)
+            finally:
+                await transaction.rollback()
+    finally:
+        await connection.close()
+    return shapes
+
+
+def _report(shapes: List[Dict[str, Any]]) -> int:
+    failures = 0
+    for shape in shapes:
+        if 'error' in shape:
+            status, detail = "❌", shape['error']
+            failures += 1
+        elif shape['seq_scans'] and shape['hot']:
+            status, detail = "❌", f"Seq Scan: {', '.join(shape['seq_scans'])}"
+            failures += 1
+        elif shape['seq_scans']:
+            status, detail = "⚠️", f"Seq Scan: {', '.join(shape['seq_scans'])}"
+        else:
+            status, detail = "✅", ', '.join(shape['indexes']) or '-'
+        print(f"{status} {shape['name']:34} cost={shape.get('cost') or 0:>10.2f}  {detail}")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="فهرس الاستعلامات وفحص خطط التنفيذ")
+    commands = parser.add_subparsers(dest='command', required=True)
+    catalog = commands.add_parser('catalog', help="توليد database/query_catalog.sql")
+    catalog.add_argument('--output', default=CATALOG_PATH)
+    catalog.add_argument('--check', action='store_true', help="فشل إن كان الفهرس قديماً")
+    explain = commands.add_parser('explain', help="EXPLAIN على PostgreSQL (المخطط مُطبق مسبقاً)")
+    explain.add_argument('--check', action='store_true', help="فشل إن لجأ استعلام ساخن إلى Seq Scan")
+    args = parser.parse_args(argv)
+
+    if args.command == 'catalog':
+        rendered = render_catalog(asyncio.run(record_queries()))
+        if args.check:
+            current = open(args.output, 'r', encoding='utf-8').read() if os.path.exists(args.output) else ''
+            if current != rendered:
+                print(f"❌ {args.output} غير متزامن مع DatabaseManager، شغّل: python explain_queries.py catalog")
+                return 1
+            print(f"✅ {args.output} متزامن")
+            return 0
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(rendered)
+        print(f"تم توليد {args.output}")
+        return 0
+
+    failures = _report(asyncio.run(explain_all(load_config_from_env())))
+    if failures:
+        print(f"\n{failures} استعلام ساخن بدون فهرس مناسب")
+    return 1 if failures and args.check else 0
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Group Settings - نسخة في الذاكرة من إعدادات كل الجروبات مع إشعارات التغيير
+
+القراءة في مسار الرسائل بحث في dict بدون أي I/O. النسخة تُستبدل كاملة عند كل تغيير
+(copy-on-write)، والتحديث يصل عبر LISTEN/NOTIFY مع asyncpg أو بالاستطلاع مع Supabase و SQLite.
+"""
+
+import asyncio
+import logging
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Callable, Any, Iterable
+
+from models import GroupSettings, GROUP_SETTING_FIELDS
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'group_settings'
+
+# حدود القيم المسموح بها لكل إعداد
+SETTING_LIMITS = {
+    'xp_cooldown': (0, 3600),
+    'min_xp': (0, 1000),
+    'max_xp': (0, 1000),
+    'min_coins': (0, 1000),
+    'max_coins': (0, 1000),
+    'season_days': (0, 365),
+}
+
+# هامش إعادة القراءة في الاستطلاع (معاملات التزمت بـ updated_at أقدم من آخر ما قُرئ)
+POLL_OVERLAP = timedelta(seconds=5)
+
+
+def validate_settings(settings: GroupSettings):
+    """ValueError إن كانت القيم خارج الحدود أو الحد الأدنى أكبر من الأعلى"""
+    for name in GROUP_SETTING_FIELDS:
+        low, high = SETTING_LIMITS[name]
+        value = getattr(settings, name)
+        if not isinstance(value, int) or not low <= value <= high:
+            raise ValueError(f"{name} يجب أن يكون بين {low} و {high}")
+    if settings.min_xp > settings.max_xp:
+        raise ValueError("min_xp يجب ألا يتجاوز max_xp")
+    if settings.min_coins > settings.max_coins:
+        raise ValueError("min_coins يجب ألا يتجاوز max_coins")
+
+
+class GroupSettingsStore:
+    """إعدادات كل الجروبات في الذاكرة، تُحدث من قاعدة البيانات وتبلغ المشتركين بالتغييرات"""
+
+    def __init__(self, db, defaults: Optional[GroupSettings] = None,
+                 poll_interval: float = 30.0, resync_interval: float = 300.0):
+        self.db = db
+        self.defaults = defaults or GroupSettings(group_id=0)
+        self.poll_interval = poll_interval
+        self.resync_interval = resync_interval
+        self.listening = False
+        self._snapshot: Dict[int, GroupSettings] = {}
+        self._subscribers: List[Callable[[int, GroupSettings], Any]] = []
+        self._cursor: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: set = set()
+
+    def get(self, group_id: int) -> GroupSettings:
+        """إعدادات الجروب (أو الافتراضية) بدون I/O"""
+        return self._snapshot.get(group_id) or self.defaults
+
+    def subscribe(self, callback: Callable[[int, GroupSettings], Any]):
+        """تسجيل دالة تُستدعى بعد كل تغيير (group_id، الإعدادات الجديدة)"""
+        self._subscribers.append(callback)
+
+    def _publish(self, snapshot: Dict[int, GroupSettings], changed: Iterable[int]):
+        self._snapshot = snapshot
+        for group_id in changed:
+            settings = snapshot.get(group_id) or self.defaults
+            for callback in self._subscribers:
+                try:
+                    callback(group_id, settings)
+                except Exception as e:
+                    logger.error("خطأ في مشترك إعدادات الجروب: %s", e)
+
+    def _apply(self, rows: List[GroupSettings]):
+        """دمج صفوف جديدة في نسخة جديدة ثم استبدالها"""
+        snapshot = dict(self._snapshot)
+        changed = []
+        for settings in rows:
+            if snapshot.get(settings.group_id) != settings:
+                snapshot[settings.group_id] = settings
+                changed.append(settings.group_id)
+            if settings.updated_at and (self._cursor is None or settings.updated_at > self._cursor):
+                self._cursor = settings.updated_at
+        if changed:
+            self._publish(snapshot, changed)
+
+    def _remove(self, group_id: int):
+        if group_id in self._snapshot:
+            snapshot = dict(self._snapshot)
+            del snapshot[group_id]
+            self._publish(snapshot, [group_id])
+
+    async def reload(self):
+        """قراءة كل الإعدادات (عند البدء وبعد انقطاع الإشعارات)"""
+        rows = await self.db.get_group_settings_since(None)
+        snapshot = {settings.group_id: settings for settings in rows}
+        changed = [group_id for group_id in snapshot.keys() | self._snapshot.keys()
+                   if snapshot.get(group_id) != self._snapshot.get(group_id)]
+        self._cursor = max((s.updated_at for s in rows if s.updated_at), default=self._cursor)
+        self._publish(snapshot, changed)
+
+    async def refresh(self):
+        """قراءة ما تغير منذ آخر استطلاع"""
+        since = self._cursor - POLL_OVERLAP if self._cursor else None
+        self._apply(await self.db.get_group_settings_since(since))
+
+    async def refresh_group(self, group_id: int):
+        settings = await self.db.get_group_settings(group_id)
+        if settings is None:
+            self._remove(group_id)
+        else:
+            self._apply([settings])
+
+    def _on_notify(self, payload: Optional[str]):
+        """إشعار NOTIFY: معرف الجروب المتغير، أو None لإعادة المزامنة الكاملة"""
+        coroutine = self.reload() if payload is None else self.refresh_group(int(payload))
+        task = asyncio.create_task(coroutine)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def start(self):
+        await self.reload()
+        listen = getattr(self.db, 'listen', None)
+        if listen is not None:
+            try:
+                await listen(CHANNEL, self._on_notify)
+                self.listening = True
+            except Exception as e:
+                logger.warning("تعذر الاستماع لإشعارات الإعدادات، التحويل للاستطلاع: %s", e)
+        self._task = asyncio.create_task(self._poll_loop())
+        logger.info("✅ تم تحميل إعدادات %d جروب (%s)",
+                    len(self._snapshot), 'LISTEN/NOTIFY' if self.listening else 'استطلاع')
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def _poll_loop(self):
+        """الاستطلاع الدوري (ومزامنة احتياطية أبطأ عند توفر الإشعارات)"""
+        while True:
+            await asyncio.sleep(self.resync_interval if self.listening else self.poll_interval)
+            try:
+                await (self.reload() if self.listening else self.refresh())
+            except Exception as e:
+                logger.error("خطأ في تحديث إعدادات الجروبات: %s", e)
+
+    async def update(self, group_id: int, updated_by: Optional[int] = None, **changes) -> GroupSettings:
+        """تعديل إعدادات جروب وحفظها (ValueError عند قيم غير صالحة)"""
+        unknown = set(changes) - set(GROUP_SETTING_FIELDS)
+        if unknown:
+            raise ValueError(f"إعدادات غير معروفة: {', '.join(sorted(unknown))}")
+        settings = replace(self.get(group_id), group_id=group_id, updated_by=updated_by, **changes)
+        validate_settings(settings)
+        saved = await self.db.save_group_settings(settings)
+        if saved is None:
+            raise RuntimeError("تعذر حفظ إعدادات الجروب")
+        self._apply([saved])
+        return saved
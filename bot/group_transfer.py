@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Group Transfer - تصدير واستيراد بيانات جروب كامل بذاكرة ثابتة (PostgreSQL)
+
+الاستخدام:
+    python group_transfer.py export --group -1001234567890 --output group.ndjson
+    python group_transfer.py export --group -1001234567890 --output group.jsonl.gz --format compact
+    python group_transfer.py import --input group.jsonl.gz [--target-group -100987654321] [--replace]
+
+الملف سطري: رأس بمراجع المستويات والشارات وعناصر المتجر، ثم لكل جدول سطر أعمدة يليه صفوفه،
+ثم سطر ختامي بعدد الصفوف. صيغة ndjson تكتب الصفوف ككائنات، وصيغة compact تكتبها كمصفوفات
+مضغوطة بـ gzip. التصدير يقرأ عبر مؤشر في الخادم داخل لقطة واحدة (REPEATABLE READ)،
+والاستيراد يكتب بـ COPY داخل معاملة واحدة ويعيد ترقيم المعرفات.
+"""
+
+import argparse
+import asyncio
+import gzip
+import io
+import json
+import logging
+import sys
+import time
+from datetime import datetime, date
+from decimal import Decimal
+from typing import Optional, List, Dict, Any, Callable, IO, Iterator, Tuple
+
+from dotenv import load_dotenv
+
+from database import load_config_from_env
+from migrate import coerce_value
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+FORMATS = ('ndjson', 'compact')
+
+# الجداول بترتيب الاستيراد (المفاتيح الأجنبية أولاً) واستعلام تصدير كل منها
+EXPORT_QUERIES = {
+    'groups': "SELECT * FROM groups WHERE id = $1",
+    'group_settings': "SELECT * FROM group_settings WHERE group_id = $1",
+    'users': """
+        SELECT u.* FROM users u
+        WHERE u.id IN (SELECT user_id FROM user_groups WHERE group_id = $1
+                       UNION SELECT leader_user_id FROM clans WHERE group_id = $1)
+        ORDER BY u.id
+    """,
+    'clans': "SELECT * FROM clans WHERE group_id = $1 ORDER BY id",
+    'user_groups': "SELECT * FROM user_groups WHERE group_id = $1 ORDER BY id",
+    'user_badges': "SELECT * FROM user_badges WHERE group_id = $1 ORDER BY id",
+    'user_inventory': "SELECT * FROM user_inventory WHERE group_id = $1 ORDER BY id",
+    'daily_quests': "SELECT * FROM daily_quests WHERE group_id = $1 ORDER BY id",
+    'user_quest_history': "SELECT * FROM user_quest_history WHERE group_id = $1 ORDER BY user_id",
+    'seasons': "SELECT * FROM seasons WHERE group_id = $1 ORDER BY season_id",
+    'season_standings': "SELECT * FROM season_standings WHERE group_id = $1 ORDER BY season_id, season_rank",
+    'clan_activities': """
+        SELECT ca.* FROM clan_activities ca
+        JOIN clans c ON c.id = ca.clan_id
+        WHERE c.group_id = $1
+        ORDER BY ca.id
+    """,
+    'message_logs': "SELECT * FROM message_logs WHERE group_id = $1 ORDER BY id",
+}
+
+# جداول معرفاتها تسلسلية: لا تُنسخ المعرفات بل تُولد من جديد
+SERIAL_TABLES = {'clans', 'user_groups', 'user_badges', 'user_inventory', 'daily_quests',
+                 'clan_activities', 'message_logs'}
+
+# جداول مشتركة بين الجروبات: إدراج ما لم يوجد فقط
+SHARED_TABLES = {'users': 'id', 'groups': 'id', 'group_settings': 'group_id'}
+
+# مراجع ثابتة تُطابق بمفتاح طبيعي بين القاعدتين
+REFERENCE_QUERIES = {
+    'levels': "SELECT id, level_number AS key FROM levels",
+    'badges': "SELECT id, name AS key FROM badges",
+    'shop_items': "SELECT id, name AS key FROM shop_items",
+}
+REFERENCE_COLUMNS = {'level_id': 'levels', 'badge_id': 'badges', 'item_id': 'shop_items'}
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"نوع غير مدعوم: {type(value)}")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(',', ':'))
+
+
+def open_export(path: str, mode: str, fmt: Optional[str] = None) -> IO[str]:
+    """فتح ملف التصدير نصياً (gzip لصيغة compact، ويُكتشف تلقائياً عند القراءة)"""
+    if mode == 'r':
+        with open(path, 'rb') as f:
+            compressed = f.read(2) == b'\x1f\x8b'
+    else:
+        compressed = fmt == 'compact'
+    if compressed:
+        return io.TextIOWrapper(gzip.open(path, mode + 'b'), encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class _Progress:
+    def __init__(self, action: str, every: int, callback: Optional[Callable[[Dict], None]]):
+        self.action = action
+        self.every = every
+        self.callback = callback
+        self.started = time.monotonic()
+
+    def report(self, table: str, rows: int, total: Optional[int] = None, done: bool = False):
+        if not done and rows % self.every:
+            return
+        elapsed = time.monotonic() - self.started
+        report = {'table': table, 'rows': rows, 'total': total, 'done': done, 'elapsed': elapsed}
+        if self.callback:
+            self.callback(report)
+        else:
+            logger.info("%s %s: %s/%s صف (%.0f ث)", self.action, table, rows, total or '?', elapsed)
+
+
+async def export_group(connection, group_id: int, out: IO[str], fmt: str = 'ndjson',
+                       include_logs: bool = False, prefetch: int = 5_000, progress_every: int = 50_000,
+                       progress: Optional[Callable[[Dict], None]] = None) -> Dict[str, int]:
+    """تصدير جروب إلى تدفق نصي مفتوح (اتصال asyncpg واحد، ذاكرة ثابتة)"""
+    if fmt not in FORMATS:
+        raise ValueError(f"صيغة غير معروفة: {fmt}")
+    tracker = _Progress("تصدير", progress_every, progress)
+    counts: Dict[str, int] = {}
+
+    async with connection.transaction(isolation='repeatable_read', readonly=True):
+        refs = {}
+        for name, query in REFERENCE_QUERIES.items():
+            refs[name] = {str(row['id']): row['key'] for row in await connection.fetch(query)}
+        out.write(_dumps({'format': 'group-export', 'version': FORMAT_VERSION, 'encoding': fmt,
+                          'group_id': group_id, 'exported_at': datetime.now(), 'refs': refs}) + "\n")
+
+        for table, query in EXPORT_QUERIES.items():
+            if table == 'message_logs' and not include_logs:
+                continue
+            statement = await connection.prepare(query)
+            columns = [attribute.name for attribute in statement.get_attributes()]
+            total = None
+            if table in ('user_groups', 'message_logs'):
+                total = await connection.fetchval(f"SELECT COUNT(*) FROM {table} WHERE group_id = $1", group_id)
+            out.write(_dumps({'table': table, 'columns': columns}) + "\n")
+
+            rows = 0
+            async for record in statement.cursor(group_id, prefetch=prefetch):
+                values = list(record.values())
+                out.write(_dumps(dict(zip(columns, values)) if fmt == 'ndjson' else values) + "\n")
+                rows += 1
+                tracker.report(table, rows, total)
+            counts[table] = rows
+            tracker.report(table, rows, total, done=True)
+
+    out.write(_dumps({'end': True, 'counts': counts}) + "\n")
+    return counts
+
+
+def _read_sections(lines: Iterator[str]) -> Iterator[Tuple[str, Any]]:
+    """قراءة الملف سطراً سطراً: ('header'|'table'|'row'|'end', قيمة)"""
+    header = json.loads(next(lines))
+    if header.get('format') != 'group-export' or header.get('version') != FORMAT_VERSION:
+        raise ValueError("ملف تصدير غير مدعوم")
+    yield 'header', header
+    for line in lines:
+        item = json.loads(line)
+        if isinstance(item, list):
+            yield 'row', item
+        elif 'table' in item:
+            yield 'table', item
+        elif item.get('end'):
+            yield 'end', item
+        else:
+            yield 'row', item
+
+
+async def _column_types(connection, table: str) -> Dict[str, str]:
+    rows = await connection.fetch(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = $1", table
+    )
+    return {row['column_name']: row['data_type'] for row in rows}
+
+
+class _TableLoader:
+    """تحويل صفوف جدول واحد وكتابتها بـ COPY على دفعات"""
+
+    def __init__(self, connection, table: str, columns: List[str], types: Dict[str, str],
+                 remap: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]], batch_size: int):
+        self.connection = connection
+        self.table = table
+        self.source_columns = columns
+        skip = {'id'} if table in SERIAL_TABLES else set()
+        self.columns = [column for column in columns if column in types and column not in skip]
+        self.types = [types[column] for column in self.columns]
+        self.remap = remap
+        self.batch_size = batch_size
+        self.batch: List[tuple] = []
+        self.rows = 0
+
+    async def add(self, raw: Any):
+        row = dict(zip(self.source_columns, raw)) if isinstance(raw, list) else raw
+        row = self.remap(row)
+        if row is None:
+            return
+        self.batch.append(tuple(coerce_value(row.get(column), data_type)
+                                for column, data_type in zip(self.columns, self.types)))
+        self.rows += 1
+        if len(self.batch) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self.batch:
+            return
+        key = SHARED_TABLES.get(self.table)
+        if key:
+            # جداول مشتركة: جدول مؤقت ثم إدراج ما لم يوجد
+            await self.connection.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS import_{self.table} (LIKE {self.table} INCLUDING DEFAULTS)"
+            )
+            await self.connection.execute(f"TRUNCATE import_{self.table}")
+            await self.connection.copy_records_to_table(f"import_{self.table}", records=self.batch,
+                                                        columns=self.columns)
+            columns = ', '.join(self.columns)
+            await self.connection.execute(
+                f"INSERT INTO {self.table} ({columns}) SELECT {columns} FROM import_{self.table} "
+                f"ON CONFLICT ({key}) DO NOTHING"
+            )
+        else:
+            await self.connection.copy_records_to_table(self.table, records=self.batch, columns=self.columns)
+        self.batch.clear()
+
+
+async def import_group(connection, lines: Iterator[str], target_group_id: Optional[int] = None,
+                       replace: bool = False, batch_size: int = 5_000, progress_every: int = 50_000,
+                       progress: Optional[Callable[[Dict], None]] = None) -> Dict[str, int]:
+    """استيراد ملف تصدير إلى جروب (معاملة واحدة، مع إعادة ترقيم المعرفات)"""
+    tracker = _Progress("استيراد", progress_every, progress)
+    sections = _read_sections(lines)
+    _, header = next(sections)
+    group_id = target_group_id if target_group_id is not None else header['group_id']
+    counts: Dict[str, int] = {}
+
+    # مطابقة المراجع الثابتة بالمفتاح الطبيعي: معرف المصدر -> معرف الهدف
+    reference_maps: Dict[str, Dict[int, int]] = {}
+    for name, query in REFERENCE_QUERIES.items():
+        target_ids = {row['key']: row['id'] for row in await connection.fetch(query)}
+        reference_maps[name] = {int(source_id): target_ids[key] for source_id, key in header['refs'][name].items()
+                                if key in target_ids}
+    clan_ids: Dict[int, int] = {}
+
+    def remap(table: str, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if 'group_id' in row or table == 'groups':
+            row['group_id' if table != 'groups' else 'id'] = group_id
+        for column, reference in REFERENCE_COLUMNS.items():
+            if row.get(column) is not None:
+                mapped = reference_maps[reference].get(row[column])
+                if mapped is None:
+                    if column == 'level_id':
+                        row[column] = None  # يُعاد حسابه بعد الاستيراد
+                    else:
+                        return None  # شارة أو عنصر غير موجود في الهدف
+                else:
+                    row[column] = mapped
+        if row.get('clan_id') is not None:
+            row['clan_id'] = clan_ids.get(row['clan_id'])
+            if row['clan_id'] is None and table == 'clan_activities':
+                return None
+        return row
+
+    async with connection.transaction():
+        existing = await connection.fetchval("SELECT COUNT(*) FROM user_groups WHERE group_id = $1", group_id)
+        if existing and not replace:
+            raise ValueError(f"الجروب {group_id} يحتوي على {existing} عضو، استخدم --replace للاستبدال")
+        if replace:
+            # الحذف بالترتيب العكسي (الكلانات تحذف أنشطتها بالتتابع)
+            for table in ('message_logs', 'season_standings', 'seasons', 'user_quest_history', 'daily_quests',
+                          'user_inventory', 'user_badges', 'user_groups', 'clans', 'group_settings'):
+                await connection.execute(f"DELETE FROM {table} WHERE group_id = $1", group_id)
+
+        loader: Optional[_TableLoader] = None
+        for kind, value in sections:
+            if kind == 'table':
+                if loader:
+                    await loader.flush()
+                    counts[loader.table] = loader.rows
+                    tracker.report(loader.table, loader.rows, done=True)
+                table = value['table']
+                types = await _column_types(connection, table)
+                loader = _TableLoader(connection, table, value['columns'], types,
+                                      lambda row, table=table: remap(table, row), batch_size)
+                if table == 'clans':
+                    loader = _ClanLoader(loader, clan_ids)
+            elif kind == 'row':
+                await loader.add(value)
+                tracker.report(loader.table, loader.rows)
+            elif kind == 'end':
+                if loader:
+                    await loader.flush()
+                    counts[loader.table] = loader.rows
+                    tracker.report(loader.table, loader.rows, done=True)
+                expected = value['counts']
+                if any(counts.get(table, 0) > rows for table, rows in expected.items()):
+                    raise ValueError("عدد الصفوف المستوردة أكبر من المصدّرة!")
+                break
+        else:
+            raise ValueError("ملف التصدير غير مكتمل (لا يوجد سطر ختامي)")
+
+        # مستويات لم تُطابق: إعادة حسابها من XP
+        await connection.execute("""
+            UPDATE user_groups ug
+            SET level_id = (SELECT l.id FROM levels l WHERE l.required_xp <= ug.xp
+                            ORDER BY l.required_xp DESC LIMIT 1)
+            WHERE ug.group_id = $1 AND ug.level_id IS NULL
+        """, group_id)
+
+    return counts
+
+
+class _ClanLoader:
+    """الكلانات قليلة: إدراج صفاً صفاً لمعرفة المعرفات الجديدة لربط الأعضاء والأنشطة"""
+
+    def __init__(self, loader: _TableLoader, clan_ids: Dict[int, int]):
+        self.loader = loader
+        self.clan_ids = clan_ids
+        self.table = loader.table
+        self.rows = 0
+
+    async def add(self, raw: Any):
+        row = dict(zip(self.loader.source_columns, raw)) if isinstance(raw, list) else raw
+        old_id = row['id']
+        row = self.loader.remap(row)
+        columns = self.loader.columns
+        values = [coerce_value(row.get(column), data_type) for column, data_type in zip(columns, self.loader.types)]
+        placeholders = ', '.join(f"${i + 1}" for i in range(len(columns)))
+        self.clan_ids[old_id] = await self.loader.connection.fetchval(
+            f"INSERT INTO clans ({', '.join(columns)}) VALUES ({placeholders}) RETURNING id", *values
+        )
+        self.rows += 1
+
+    async def flush(self):
+        pass
+
+
+async def _connect():
+    import asyncpg
+    config = load_config_from_env()
+    return await asyncpg.connect(host=config['host'], port=config['port'], database=config['database'],
+                                 user=config['user'], password=config['password'])
+
+
+async def _main(args) -> int:
+    connection = await _connect()
+    try:
+        if args.command == 'export':
+            with open_export(args.output, 'w', args.format) as out:
+                counts = await export_group(connection, args.group, out, args.format, args.include_logs)
+        else:
+            with open_export(args.input, 'r') as stream:
+                counts = await import_group(connection, iter(stream), args.target_group, args.replace,
+                                            args.batch_size)
+    finally:
+        await connection.close()
+    logger.info("✅ %s", ', '.join(f"{table}={rows}" for table, rows in counts.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+    parser = argparse.ArgumentParser(description="تصدير واستيراد بيانات جروب")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export')
+    export.add_argument('--group', type=int, required=True)
+    export.add_argument('--output', required=True)
+    export.add_argument('--format', choices=FORMATS, default='ndjson')
+    export.add_argument('--include-logs', action='store_true', help="تضمين message_logs")
+    restore = commands.add_parser('import')
+    restore.add_argument('--input', required=True)
+    restore.add_argument('--target-group', type=int, help="استيراد إلى جروب آخر")
+    restore.add_argument('--replace', action='store_true', help="حذف بيانات الجروب الحالية أولاً")
+    restore.add_argument('--batch-size', type=int, default=5_000)
+    sys.exit(asyncio.run(_main(parser.parse_args())))
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HLL - عدّ تقريبي للأعضاء النشطين بـ HyperLogLog بدل COUNT(DISTINCT user_id) على message_logs
+
+مسار المنح يضيف العضو إلى مخطط (sketch) الجروب والمخطط العام (group_id = 0) لليوم الحالي في الذاكرة،
+والمخططات التي تغيرت فقط تُكتب دورياً في activity_sketches كبيانات ثنائية صغيرة (صف لكل جروب ويوم).
+الأسبوع والشهر يُحسبان بدمج مخططات الأيام (أكبر قيمة لكل خانة)، والدمج لا يتأثر بالتكرار فيمكن
+دمج المحفوظ مع ما في الذاكرة في أي وقت.
+
+الدقة 12 (4096 خانة = 4 كيلوبايت كحد أقصى) تعطي خطأ معيارياً ~1.6%، والمخطط الذي فيه أعضاء قليلون
+يُحفظ بصيغة متفرقة (3 بايت لكل خانة مستخدمة). قياس الدقة والذاكرة: python -m benchmarks.bench_hll
+"""
+
+import asyncio
+import logging
+import math
+import struct
+from datetime import date, timedelta
+from typing import Optional, List, Dict, Iterable, Tuple
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRECISION = 12
+
+# صف المخطط العام لكل الجروبات (لا يوجد جروب بالمعرف 0)
+GLOBAL_GROUP_ID = 0
+
+_DENSE, _SPARSE = 1, 2
+_MASK64 = (1 << 64) - 1
+
+# نوافذ أمر /activity وواجهة الإحصائيات (بالأيام)
+WINDOWS = {'today': 1, 'week': 7, 'month': 30}
+
+
+def _hash64(value: int) -> int:
+    """splitmix64: توزيع منتظم لمعرفات متتالية بدون hashlib في مسار الرسائل"""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+def _sigma(x: float) -> float:
+    if x == 1.0:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0.0 or x == 1.0:
+        return 0.0
+    y, z = 1.0, 1.0 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+class HyperLogLog:
+    """مخطط HyperLogLog بـ 2^precision خانة (بايت لكل خانة)"""
+
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: Optional[bytearray] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"الدقة يجب أن تكون بين 4 و 16: {precision}")
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(1 << precision)
+
+    def add(self, value: int) -> bool:
+        """إضافة معرف، و True إن تغير المخطط (العضو المتكرر غالباً لا يغيره)"""
+        hashed = _hash64(value)
+        bits = 64 - self.precision
+        index = hashed >> bits
+        rank = bits - (hashed & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """دمج مخطط آخر في هذا المخطط (اتحاد المجموعتين)"""
+        if other.precision != self.precision:
+            raise ValueError(f"لا يمكن دمج دقتين مختلفتين: {self.precision} و {other.precision}")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        """مقدِّر Ertl (2017): بدون انحياز في المدى المتوسط وبدون جداول تصحيح تجريبية"""
+        size = len(self.registers)
+        bits = 64 - self.precision
+        histogram = [0] * (bits + 2)
+        for rank in self.registers:
+            histogram[rank] += 1
+        z = size * _tau(1 - histogram[bits + 1] / size)
+        for rank in range(bits, 0, -1):
+            z = 0.5 * (z + histogram[rank])
+        z += size * _sigma(histogram[0] / size)
+        return int(round(size * size / (2 * math.log(2)) / z))
+
+    def to_bytes(self) -> bytes:
+        """[الصيغة، الدقة] ثم الخانات كاملة، أو (رقم الخانة، القيمة) للخانات المستخدمة فقط إن كان أصغر"""
+        used = [(index, rank) for index, rank in enumerate(self.registers) if rank]
+        if len(used) * 3 < len(self.registers):
+            return bytes((_SPARSE, self.precision)) + b''.join(struct.pack('>HB', *pair) for pair in used)
+        return bytes((_DENSE, self.precision)) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'HyperLogLog':
+        data = bytes(data)
+        encoding, precision = data[0], data[1]
+        if encoding == _DENSE:
+            return cls(precision, bytearray(data[2:]))
+        if encoding != _SPARSE:
+            raise ValueError(f"صيغة مخطط غير معروفة: {encoding}")
+        sketch = cls(precision)
+        for index, rank in struct.iter_unpack('>HB', data[2:]):
+            sketch.registers[index] = rank
+        return sketch
+
+
+def _merge_rows(rows: Iterable[Dict], precision: int) -> Dict[Tuple[int, date], HyperLogLog]:
+    sketches = {}
+    for row in rows:
+        try:
+            sketch = HyperLogLog.from_bytes(row['sketch'])
+        except (ValueError, IndexError, struct.error) as e:
+            logger.warning("تجاهل مخطط تالف (%s, %s): %s", row['group_id'], row['sketch_date'], e)
+            continue
+        if sketch.precision != precision:
+            continue
+        sketch_date = row['sketch_date']
+        if not isinstance(sketch_date, date):
+            sketch_date = date.fromisoformat(str(sketch_date)[:10])
+        sketches[(row['group_id'], sketch_date)] = sketch
+    return sketches
+
+
+def count_windows(daily: Dict[date, HyperLogLog], today: date, precision: int = DEFAULT_PRECISION) -> Dict[str, int]:
+    """عدد الأعضاء المختلفين في كل نافذة من WINDOWS بدمج مخططات الأيام"""
+    merged = HyperLogLog(precision)
+    result, covered = {}, 0
+    for name, days in sorted(WINDOWS.items(), key=lambda item: item[1]):
+        for offset in range(covered, days):
+            sketch = daily.get(today - timedelta(days=offset))
+            if sketch is not None:
+                merged.merge(sketch)
+        covered = days
+        result[name] = merged.count()
+    return result
+
+
+async def _stored_daily(db, group_id: int, today: date, precision: int) -> Dict[date, HyperLogLog]:
+    rows = await db.get_activity_sketches([group_id], today - timedelta(days=max(WINDOWS.values()) - 1), today)
+    return {day: sketch for (_, day), sketch in _merge_rows(rows, precision).items()}
+
+
+async def active_user_windows(db, group_id: int, today: Optional[date] = None,
+                              precision: int = DEFAULT_PRECISION) -> Dict[str, int]:
+    """النوافذ من المخططات المحفوظة فقط (واجهة الإحصائيات لا تملك ذاكرة البوت)"""
+    today = today or date.today()
+    return count_windows(await _stored_daily(db, group_id, today, precision), today, precision)
+
+
+class ActiveUserSketches:
+    """مخططات اليوم لكل جروب في الذاكرة مع كتابة ما تغير منها في activity_sketches"""
+
+    def __init__(self, db, precision: int = DEFAULT_PRECISION, keep_days: int = 2):
+        self.db = db
+        self.precision = precision
+        self.keep_days = keep_days
+        self.flushes = 0
+        self._days: Dict[date, Dict[int, HyperLogLog]] = {}
+        # (جروب، يوم) تغير منذ آخر كتابة
+        self._dirty: set = set()
+        # (جروب، يوم) دُمج المحفوظ منه في الذاكرة (بعد إعادة التشغيل تبدأ الذاكرة فارغة)
+        self._merged: set = set()
+        self._lock = asyncio.Lock()
+
+    def record(self, group_id: int, user_id: int, day: Optional[date] = None):
+        """إضافة العضو لمخطط الجروب والمخطط العام (بدون أي استعلام)"""
+        day = day or date.today()
+        sketches = self._days.get(day)
+        if sketches is None:
+            sketches = self._days[day] = {}
+        for key in (group_id, GLOBAL_GROUP_ID):
+            sketch = sketches.get(key)
+            if sketch is None:
+                sketch = sketches[key] = HyperLogLog(self.precision)
+            if sketch.add(user_id):
+                self._dirty.add((key, day))
+
+    async def _merge_stored(self, keys: List[Tuple[int, date]]):
+        by_day: Dict[date, List[int]] = {}
+        for group_id, day in keys:
+            by_day.setdefault(day, []).append(group_id)
+        for day, group_ids in by_day.items():
+            stored = _merge_rows(await self.db.get_activity_sketches(group_ids, day, day), self.precision)
+            for (group_id, _), sketch in stored.items():
+                self._days[day][group_id].merge(sketch)
+            self._merged.update((group_id, day) for group_id in group_ids)
+
+    async def flush(self) -> int:
+        """كتابة المخططات التي تغيرت (بعد دمج المحفوظ منها أول مرة)"""
+        async with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            if dirty:
+                try:
+                    await self._merge_stored([key for key in dirty if key not in self._merged])
+                    await self.db.save_activity_sketches([
+                        {'group_id': group_id, 'sketch_date': day, 'sketch': self._days[day][group_id].to_bytes()}
+                        for group_id, day in sorted(dirty)
+                    ])
+                except Exception:
+                    self._dirty |= dirty
+                    raise
+                self.flushes += 1
+            self._prune()
+            global_today = self._days.get(date.today(), {}).get(GLOBAL_GROUP_ID)
+            REGISTRY.set_gauge('active_users.today', global_today.count() if global_today else 0)
+            return len(dirty)
+
+    def _prune(self):
+        cutoff = date.today() - timedelta(days=self.keep_days - 1)
+        pending_days = {day for _, day in self._dirty}
+        for day in [day for day in self._days if day < cutoff and day not in pending_days]:
+            del self._days[day]
+            self._merged = {key for key in self._merged if key[1] != day}
+
+    async def windows(self, group_id: int, today: Optional[date] = None) -> Dict[str, int]:
+        """الأعضاء النشطون اليوم وآخر 7 و 30 يوماً (المحفوظ مدموجاً مع ما لم يُكتب بعد)"""
+        today = today or date.today()
+        daily = await _stored_daily(self.db, group_id, today, self.precision)
+        for day, sketches in self._days.items():
+            sketch = sketches.get(group_id)
+            if sketch is not None:
+                daily[day] = daily[day].merge(sketch) if day in daily else sketch
+        return count_windows(daily, today, self.precision)
+
+    async def job_callback(self, context):
+        """كتابة دورية عبر JobQueue"""
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("خطأ في كتابة مخططات الأعضاء النشطين: %s", e)
+
+    async def stop(self):
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {'days': len(self._days), 'sketches': sum(len(s) for s in self._days.values()),
+                'dirty': len(self._dirty), 'flushes': self.flushes}
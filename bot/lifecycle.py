@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lifecycle - ترتيب تشغيل وإيقاف الخدمات وحفظ الذاكرة الدافئة بين إعادات التشغيل
+
+الخدمات تبدأ بترتيب تسجيلها وتتوقف بالترتيب العكسي (ما يكتب يتوقف ويفرغ طوابيره قبل إغلاق
+قاعدة البيانات). الذاكرة الدافئة (فترات الانتظار، المستويات، المستخدمون المسجلون، المتصدرون...)
+تُحفظ في ملف JSON محلي عند الإيقاف وبشكل دوري، وتُستعاد عند التشغيل فلا تبدأ كل النسخ بذاكرة
+فارغة تضغط على قاعدة البيانات دفعة واحدة.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, date
+from typing import Optional, List, Dict, Any, Callable, Awaitable, Tuple
+
+logger = logging.getLogger(__name__)
+
+STATE_VERSION = 1
+
+Hook = Callable[[], Awaitable[Any]]
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"قيمة غير قابلة للحفظ: {type(value).__name__}")
+
+
+class Lifecycle:
+    """خدمات مرتبة (start/stop) وأقسام حالة تُحفظ وتُستعاد (snapshot/restore)"""
+
+    def __init__(self, state_path: Optional[str] = None, max_age: float = 6 * 3600, stop_timeout: float = 10.0):
+        self.state_path = state_path
+        self.max_age = max_age
+        self.stop_timeout = stop_timeout
+        self._services: List[Tuple[str, Optional[Hook], Optional[Hook]]] = []
+        self._started: List[Tuple[str, Optional[Hook]]] = []
+        self._states: Dict[str, Any] = {}
+
+    def add_service(self, name: str, start: Optional[Hook] = None, stop: Optional[Hook] = None):
+        """تسجيل خدمة (الترتيب = ترتيب التشغيل، والإيقاف بعكسه)"""
+        self._services.append((name, start, stop))
+
+    def add_state(self, name: str, obj):
+        """تسجيل ذاكرة تملك snapshot() -> dict و restore(dict)"""
+        self._states[name] = obj
+
+    async def start(self):
+        for name, start, stop in self._services:
+            try:
+                if start:
+                    await start()
+            except Exception:
+                logger.error("فشل تشغيل %s، إيقاف ما بدأ قبله", name)
+                await self.stop()
+                raise
+            self._started.append((name, stop))
+
+    async def stop(self):
+        """إيقاف الخدمات بالترتيب العكسي (خطأ أو بطء خدمة لا يمنع إيقاف الباقي)"""
+        while self._started:
+            name, stop = self._started.pop()
+            if not stop:
+                continue
+            try:
+                await asyncio.wait_for(stop(), self.stop_timeout)
+            except asyncio.TimeoutError:
+                logger.error("انتهت مهلة إيقاف %s (%s ثانية)", name, self.stop_timeout)
+            except Exception as e:
+                logger.error("خطأ في إيقاف %s: %s", name, e)
+
+    # حفظ الحالة
+
+    def _collect(self) -> Dict[str, Any]:
+        sections = {}
+        for name, obj in self._states.items():
+            try:
+                sections[name] = obj.snapshot()
+            except Exception as e:
+                logger.error("خطأ في حفظ حالة %s: %s", name, e)
+        return {'version': STATE_VERSION, 'saved_at': time.time(), 'sections': sections}
+
+    def _write(self, payload: str):
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        os.replace(tmp_path, self.state_path)
+
+    async def checkpoint(self) -> bool:
+        """كتابة كل الأقسام في الملف (كتابة ذرية عبر ملف مؤقت)"""
+        if not self.state_path or not self._states:
+            return False
+        started = time.perf_counter()
+        payload = json.dumps(self._collect(), ensure_ascii=False, default=_json_default)
+        await asyncio.to_thread(self._write, payload)
+        logger.info("💾 تم حفظ الذاكرة الدافئة (%d بايت في %.0fms)", len(payload),
+                    (time.perf_counter() - started) * 1000)
+        return True
+
+    async def restore(self) -> bool:
+        """استعادة الأقسام من الملف إن وُجد ولم يكن أقدم من max_age"""
+        if not self.state_path or not os.path.exists(self.state_path):
+            return False
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("تعذر قراءة ملف الحالة، البدء بذاكرة فارغة: %s", e)
+            return False
+        age = time.time() - state.get('saved_at', 0)
+        if state.get('version') != STATE_VERSION or age > self.max_age:
+            logger.info("تجاهل ملف حالة قديم (عمره %.0f ثانية)", age)
+            return False
+        for name, section in state.get('sections', {}).items():
+            obj = self._states.get(name)
+            if obj is None or not section:
+                continue
+            try:
+                obj.restore(section)
+            except Exception as e:
+                logger.error("خطأ في استعادة حالة %s: %s", name, e)
+        logger.info("♻️ تمت استعادة الذاكرة الدافئة (عمرها %.0f ثانية)", age)
+        return True
+
+    async def job_callback(self, context):
+        """حفظ دوري عبر JobQueue (حتى لا يضيع كل شيء عند توقف مفاجئ)"""
+        try:
+            await self.checkpoint()
+        except Exception as e:
+            logger.error("خطأ في الحفظ الدوري للحالة: %s", e)
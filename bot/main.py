@@ -10,7 +10,8 @@ import asyncio
 import logging
 import os
 import random
-from datetime import datetime, timedelta, date
+import time
+from datetime import datetime, timedelta, date, time as dtime
 from typing import Optional, Dict, List, Tuple
 from dotenv import load_dotenv
 
@@ -20,11 +21,29 @@ from telegram.ext import (
     CallbackQueryHandler, ContextTypes, filters
 )
 
-from supabase_database import SupabaseManager
+from storage import create_storage, open_storage, close_storage
+from notifier import Notifier, PRIORITY_HIGH, PRIORITY_NORMAL
+from admin_tools import ReplyTracker, parse_admin_targets, is_integer
+from dedup import RecentUpdates
+from caches import CooldownTracker, SeenEntities, LevelCache, LeaderboardCache
+from lifecycle import Lifecycle
+from resilience import Resilience, ResiliencePolicy, CircuitOpenError
+from antispam import SpamScorer
+from xp_rules import XpRuleBook, detect_message_type
+from group_settings import GroupSettingsStore, SETTING_LIMITS
+from events import build_event_bus
+from stats_api import DailyStatsRefresher
+from activity import GroupActivity, render_heatmap
+from hll import ActiveUserSketches
+from profile_cards import ProfileCardCache
+from quest_sweeper import QuestSweeper
+from quest_rollover import QuestRollover, quests_for_level
+from seasons import SeasonManager
+from metrics import MetricsServer, instrument_database, instrument_handlers
 from models import User, UserGroup, Level, ShopItem, Badge, DailyQuest, Clan
 from utils import (
     format_number, calculate_xp_gain, calculate_coin_gain,
-    check_level_up, get_progress_bar, format_time_remaining
+    check_level_up, format_time_remaining
 )
 
 # تحميل متغيرات البيئة
@@ -38,20 +57,112 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 class TelegramBot:
-    def __init__(self, token: str):
+    def __init__(self, token: str, db=None):
         """تهيئة البوت"""
         self.token = token
-        self.db = SupabaseManager()
-        self.application = Application.builder().token(token).build()
+        # مهلات وإعادة محاولة وقاطع دائرة، والكتابات أثناء فتحه تُؤجل في DB_JOURNAL
+        self.resilience = Resilience(ResiliencePolicy.from_env(), os.getenv('DB_JOURNAL', '.db_journal.ndjson') or None)
+        self.db = instrument_database(self.resilience.protect(db if db is not None else create_storage()))
+        self.application = (
+            Application.builder()
+            .token(token)
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+            .build()
+        )
+        self.notifier = Notifier(self.application.bot)
+        self.reply_tracker = ReplyTracker()
+        # آخر update_id معالج (إعادة إرسال webhook أو الاستطلاع لا تمنح XP مرتين)
+        self.recent_updates = RecentUpdates()
+        self.spam_scorer = SpamScorer()
+        self.xp_rules = XpRuleBook()
+        # إعدادات كل جروب (فترة الانتظار وحدود XP والعملات) من جدول group_settings
+        self.group_settings = GroupSettingsStore(self.db)
+        self.quest_sweeper = QuestSweeper(self.db)
+        # مهام الغد لكل الأعضاء النشطين تُنشأ قبل منتصف الليل بدفعات موزعة على QUEST_ROLLOVER_WINDOW ثانية
+        self.quest_rollover = QuestRollover(self.db, window=float(os.getenv('QUEST_ROLLOVER_WINDOW', '1800')))
+        self.daily_stats = DailyStatsRefresher(self.db)
+        # مواسم XP (group_settings.season_days): بدء المستحقة وأرشفة ترتيب المنتهية خارج مسار الرسائل
+        self.seasons = SeasonManager(self.db, self.group_settings)
+        # عدادات النشاط حسب ساعة الأسبوع لأمر /activity (تُكتب في group_activity دورياً)
+        self.activity = GroupActivity(self.db)
+        # الأعضاء النشطون (اليوم، 7 و 30 يوماً) بمخططات HyperLogLog بدل COUNT(DISTINCT) على message_logs
+        self.active_users = ActiveUserSketches(self.db)
+        # بطاقات /profile و /xp و /level و /progress، يبطلها مسار المنح
+        self.profile_cards = ProfileCardCache()
+        # أحداث المنح للمستهلكين الخارجيين (ملف، outbox، SSE) حسب متغيرات البيئة
+        self.events = build_event_bus(self.db)
+        # ذاكرة دافئة تُحفظ في STATE_FILE عند الإيقاف وتُستعاد عند التشغيل
+        self.cooldowns = CooldownTracker()
+        self.seen = SeenEntities()
+        self.levels = LevelCache(self.db)
+        self.leaderboards = LeaderboardCache()
+        metrics_port = os.getenv('METRICS_PORT')
+        self.metrics_server = MetricsServer(port=int(metrics_port) if metrics_port else None)
+        self.lifecycle = self.build_lifecycle()
+        instrument_handlers(self)
         self.setup_handlers()
+        self.setup_jobs()
+        
+    def build_lifecycle(self) -> Lifecycle:
+        """ترتيب الخدمات: التشغيل من الأعلى والإيقاف من الأسفل"""
+        lifecycle = Lifecycle(state_path=os.getenv('STATE_FILE', '.bot_state.json') or None)
+        for name, cache in (('recent_updates', self.recent_updates), ('cooldowns', self.cooldowns),
+                            ('seen', self.seen), ('levels', self.levels), ('leaderboards', self.leaderboards)):
+            lifecycle.add_state(name, cache)
+        # قاعدة البيانات تُغلق أخيراً بعد تفريغ كل ما يكتب فيها (كاتب SQLite ينهي طابوره)
+        lifecycle.add_service('storage', lambda: open_storage(self.db), lambda: close_storage(self.db))
+        lifecycle.add_service('resilience', self.resilience.start, self.resilience.stop)
+        # الحفظ بعد إيقاف كل الخدمات التي قد تعدل الذاكرة
+        lifecycle.add_service('state', lifecycle.restore, lifecycle.checkpoint)
+        lifecycle.add_service('group_settings', self.group_settings.start, self.group_settings.stop)
+        lifecycle.add_service('levels', self.levels.table)
+        lifecycle.add_service('activity', stop=self.activity.stop)
+        lifecycle.add_service('active_users', stop=self.active_users.stop)
+        lifecycle.add_service('events', self.events.start, self.events.stop)
+        lifecycle.add_service('notifier', self.notifier.start, self.notifier.stop)
+        lifecycle.add_service('metrics', self.metrics_server.start, self.metrics_server.stop)
+        return lifecycle
+    
+    async def post_init(self, application: Application):
+        """تشغيل الخدمات الخلفية بعد تهيئة التطبيق"""
+        await self.lifecycle.start()
+    
+    async def post_shutdown(self, application: Application):
+        """إيقاف الخدمات الخلفية وحفظ الذاكرة الدافئة"""
+        await self.lifecycle.stop()
+    
+    def setup_jobs(self):
+        """إعداد المهام المجدولة"""
+        job_queue = self.application.job_queue
+        if job_queue is None:
+            logger.warning("JobQueue غير متاح، لن يتم تشغيل المهام المجدولة")
+            return
+        
+        # تنظيف المهام اليومية القديمة بعد منتصف الليل
+        job_queue.run_daily(self.quest_sweeper.job_callback, time=dtime(hour=0, minute=5), name="quest_sweeper")
+        
+        # إنشاء مهام اليوم التالي قبل منتصف الليل (النافذة الافتراضية تنتهي 23:30)
+        job_queue.run_daily(self.quest_rollover.job_callback, time=dtime(hour=23), name="quest_rollover")
+        
+        # إعادة تحميل قواعد XP عند تعديل الملف
+        job_queue.run_repeating(self.xp_rules.job_callback, interval=30, first=30, name="xp_rules_reload")
         
-        # إعدادات البوت
-        self.XP_COOLDOWN = 60  # ثانية
-        self.MAX_XP_PER_MESSAGE = 15
-        self.MIN_XP_PER_MESSAGE = 5
-        self.MAX_COINS_PER_MESSAGE = 10
-        self.MIN_COINS_PER_MESSAGE = 1
+        # تجميع نشاط الجروبات اليومي لواجهة الإحصائيات (بدل GROUP BY على message_logs عند كل طلب)
+        job_queue.run_repeating(self.daily_stats.job_callback, interval=600, first=60, name="daily_stats")
         
+        # كتابة فروق عدادات النشاط في group_activity
+        job_queue.run_repeating(self.activity.job_callback, interval=60, first=60, name="group_activity")
+        
+        # كتابة مخططات الأعضاء النشطين التي تغيرت في activity_sketches
+        job_queue.run_repeating(self.active_users.job_callback, interval=120, first=120, name="active_users")
+        
+        # أرشفة المواسم المنتهية وبدء المستحقة
+        job_queue.run_repeating(self.seasons.job_callback, interval=3600, first=300, name="seasons")
+        
+        # حفظ دوري للذاكرة الدافئة (التوقف المفاجئ لا يمر بـ post_shutdown)
+        job_queue.run_repeating(self.lifecycle.job_callback, interval=300, first=300, name="state_checkpoint")
+    
     def setup_handlers(self):
         """إعداد معالجات الأوامر"""
         # الأوامر الأساسية
@@ -64,6 +175,8 @@ class TelegramBot:
         self.application.add_handler(CommandHandler("progress", self.progress_command))
         self.application.add_handler(CommandHandler("profile", self.profile_command))
         self.application.add_handler(CommandHandler("leaderboard", self.leaderboard_command))
+        self.application.add_handler(CommandHandler("activity", self.activity_command))
+        self.application.add_handler(CommandHandler("season", self.season_command))
         
         # أوامر المتجر والمهام
         self.application.add_handler(CommandHandler("shop", self.shop_command))
@@ -81,10 +194,15 @@ class TelegramBot:
         self.application.add_handler(CommandHandler("addxp", self.add_xp_command))
         self.application.add_handler(CommandHandler("addcoins", self.add_coins_command))
         self.application.add_handler(CommandHandler("resetuser", self.reset_user_command))
+        self.application.add_handler(CommandHandler("settings", self.settings_command))
+        self.application.add_handler(CommandHandler("set", self.set_setting_command))
+        self.application.add_handler(CommandHandler("newseason", self.new_season_command))
         
-        # معالج الرسائل
+        # معالج الرسائل (النصوص والوسائط، ونوع الرسالة يحدد مضاعف XP)
         self.application.add_handler(MessageHandler(
-            filters.TEXT & ~filters.COMMAND, self.handle_message
+            (filters.TEXT & ~filters.COMMAND) | filters.PHOTO | filters.VIDEO | filters.VIDEO_NOTE
+            | filters.ANIMATION | filters.Document.ALL | filters.Sticker.ALL | filters.VOICE | filters.AUDIO,
+            self.handle_message
         ))
         
         # معالج الأزرار
@@ -102,6 +220,7 @@ class TelegramBot:
 🎪 /progress - عرض التقدم للمستوى التالي
 👤 /profile - ملفك الشخصي الكامل
 🏆 /leaderboard - قائمة المتصدرين
+🗓️ /activity - أوقات نشاط الجروب
 
 🛍️ /shop - المتجر
 🎒 /inventory - مخزونك
@@ -134,6 +253,8 @@ class TelegramBot:
 • /progress - التقدم نحو المستوى التالي
 • /profile - الملف الشخصي الكامل
 • /leaderboard - قائمة أفضل 10 أعضاء
+• /activity - خريطة نشاط الجروب حسب اليوم والساعة
+• /season [رقم] - متصدرو الموسم الحالي أو ترتيب موسم سابق
 
 🛍️ المتجر والمهام:
 • /shop - تصفح المتجر
@@ -148,9 +269,13 @@ class TelegramBot:
 • /leaveclan - مغادرة الكلان
 
 ⚙️ أوامر الإدارة (للمشرفين فقط):
-• /addxp @user <رقم> - إضافة XP
-• /addcoins @user <رقم> - إضافة عملات
-• /resetuser @user - إعادة تعيين المستخدم
+• /addxp <رقم> @user1 @user2 ... - إضافة XP
+• /addcoins <رقم> @user1 @user2 ... - إضافة عملات
+• /resetuser @user1 @user2 ... - إعادة تعيين المستخدمين
+• /settings - إعدادات الجروب الحالية
+• /set <الإعداد> <القيمة> - تعديل إعداد (مثل /set xp_cooldown 30)
+• /newseason - إنهاء الموسم الحالي وبدء موسم جديد
+• بالرد على رسالة: تطبيق الأمر على صاحبها وكل من رد عليها
 
 💡 نصائح:
 - تفاعل بانتظام لكسب XP والعملات
@@ -161,136 +286,41 @@ class TelegramBot:
     
     async def xp_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """عرض نقاط الخبرة"""
-        if update.effective_chat.type == 'private':
-            await update.message.reply_text("❌ هذا الأمر متاح في الجروبات فقط!")
-            return
-            
-        user_group = await self.get_user_group(update.effective_user.id, update.effective_chat.id)
-        if not user_group:
-            await update.message.reply_text("❌ لم يتم العثور على بياناتك!")
-            return
-        
-        level = await self.db.get_level_by_id(user_group.level_id)
-        next_level = await self.db.get_level_by_number(level.level_number + 1)
-        
-        xp_text = f"📊 إحصائيات {update.effective_user.first_name}:\n\n"
-        xp_text += f"⚡ XP: {format_number(user_group.xp)}\n"
-        xp_text += f"🏆 المستوى: {level.level_number}\n"
-        xp_text += f"{level.level_emoji} الرتبة: {level.level_name}\n"
-        
-        if next_level:
-            needed_xp = next_level.required_xp - user_group.xp
-            xp_text += f"📈 للمستوى التالي: {format_number(needed_xp)} XP\n"
-        
-        xp_text += f"💰 العملات: {format_number(user_group.coins)}\n"
-        xp_text += f"📝 الرسائل: {format_number(user_group.total_messages)}"
-        
-        await update.message.reply_text(xp_text)
+        await self.reply_profile_card(update, 'xp')
     
     async def level_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """عرض المستوى الحالي"""
-        if update.effective_chat.type == 'private':
-            await update.message.reply_text("❌ هذا الأمر متاح في الجروبات فقط!")
-            return
-            
-        user_group = await self.get_user_group(update.effective_user.id, update.effective_chat.id)
-        if not user_group:
-            await update.message.reply_text("❌ لم يتم العثور على بياناتك!")
-            return
-        
-        level = await self.db.get_level_by_id(user_group.level_id)
-        
-        level_text = f"🏆 مستوى {update.effective_user.first_name}:\n\n"
-        level_text += f"{level.level_emoji} {level.level_name}\n"
-        level_text += f"🔢 المستوى: {level.level_number} من 55\n"
-        level_text += f"🏷️ الفئة: {level.category}\n"
-        level_text += f"⭐ الدرجة: {level.tier}\n"
-        level_text += f"⚡ XP المطلوب: {format_number(level.required_xp)}\n"
-        level_text += f"⚡ XP الحالي: {format_number(user_group.xp)}"
-        
-        await update.message.reply_text(level_text)
+        await self.reply_profile_card(update, 'level')
     
     async def progress_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """عرض التقدم للمستوى التالي"""
+        await self.reply_profile_card(update, 'progress')
+    
+    async def reply_profile_card(self, update: Update, kind: str, reply_markup=None):
+        """الرد ببطاقة من الذاكرة (أو من get_profile_bundle عند أول طلب بعد آخر منح)"""
         if update.effective_chat.type == 'private':
             await update.message.reply_text("❌ هذا الأمر متاح في الجروبات فقط!")
             return
-            
-        user_group = await self.get_user_group(update.effective_user.id, update.effective_chat.id)
-        if not user_group:
-            await update.message.reply_text("❌ لم يتم العثور على بياناتك!")
-            return
         
-        current_level = await self.db.get_level_by_id(user_group.level_id)
-        next_level = await self.db.get_level_by_number(current_level.level_number + 1)
-        
-        if not next_level:
-            await update.message.reply_text("🎉 تهانينا! لقد وصلت للمستوى الأقصى!")
+        text = await self.profile_cards.render(
+            update.effective_user.id, update.effective_chat.id, kind,
+            update.effective_user.first_name, self.db.get_profile_bundle
+        )
+        if text is None:
+            await update.message.reply_text("❌ لم يتم العثور على بياناتك!")
             return
         
-        current_xp = user_group.xp - current_level.required_xp
-        needed_xp = next_level.required_xp - current_level.required_xp
-        progress_percent = (current_xp / needed_xp) * 100
-        
-        progress_bar = get_progress_bar(progress_percent)
-        remaining_xp = next_level.required_xp - user_group.xp
-        
-        progress_text = f"📈 تقدم {update.effective_user.first_name}:\n\n"
-        progress_text += f"🔸 المستوى الحالي: {current_level.level_emoji} {current_level.level_name}\n"
-        progress_text += f"🔹 المستوى التالي: {next_level.level_emoji} {next_level.level_name}\n\n"
-        progress_text += f"{progress_bar}\n"
-        progress_text += f"📊 التقدم: {progress_percent:.1f}%\n"
-        progress_text += f"⚡ XP المطلوب: {format_number(remaining_xp)}\n"
-        progress_text += f"📅 الرسائل المتبقية: ~{remaining_xp // 10}"
-        
-        await update.message.reply_text(progress_text)
+        await update.message.reply_text(text, reply_markup=reply_markup)
     
     async def profile_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """عرض الملف الشخصي الكامل"""
-        if update.effective_chat.type == 'private':
-            await update.message.reply_text("❌ هذا الأمر متاح في الجروبات فقط!")
-            return
-        
-        user_group = await self.get_user_group(update.effective_user.id, update.effective_chat.id)
-        if not user_group:
-            await update.message.reply_text("❌ لم يتم العثور على بياناتك!")
-            return
-        
-        level = await self.db.get_level_by_id(user_group.level_id)
-        badges_count = await self.db.get_user_badges_count(
-            update.effective_user.id, update.effective_chat.id
-        )
-        
-        # معلومات الكلان
-        clan_info = ""
-        if user_group.clan_id:
-            clan = await self.db.get_clan_by_id(user_group.clan_id)
-            if clan:
-                clan_info = f"🏰 الكلان: {clan.name}\n"
-        
-        # تاريخ الانضمام
-        join_date = user_group.joined_at.strftime("%Y-%m-%d") if user_group.joined_at else "غير معروف"
-        
-        profile_text = f"👤 الملف الشخصي: {update.effective_user.first_name}\n"
-        profile_text += f"{'='*30}\n\n"
-        profile_text += f"{level.level_emoji} {level.level_name}\n"
-        profile_text += f"🏆 المستوى: {level.level_number}/55\n"
-        profile_text += f"⚡ XP: {format_number(user_group.xp)}\n"
-        profile_text += f"💰 العملات: {format_number(user_group.coins)}\n"
-        profile_text += f"📝 الرسائل: {format_number(user_group.total_messages)}\n"
-        profile_text += f"🏅 الشارات: {badges_count}\n"
-        profile_text += clan_info
-        profile_text += f"📅 انضم في: {join_date}"
-        
         # إضافة أزرار للتفاعل
         keyboard = [
             [InlineKeyboardButton("📊 التفاصيل", callback_data="profile_details")],
             [InlineKeyboardButton("🏅 الشارات", callback_data="view_badges")],
             [InlineKeyboardButton("🛍️ المتجر", callback_data="open_shop")]
         ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await update.message.reply_text(profile_text, reply_markup=reply_markup)
+        await self.reply_profile_card(update, 'profile', InlineKeyboardMarkup(keyboard))
     
     async def shop_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """عرض المتجر"""
@@ -371,9 +401,10 @@ class TelegramBot:
             await update.message.reply_text("❌ هذا الأمر متاح في الجروبات فقط!")
             return
         
-        user_group = await self.get_user_group(update.effective_user.id, update.effective_chat.id)
+        # العضوية والكلان وقائده في رحلة واحدة
+        bundle = await self.db.get_profile_bundle(update.effective_user.id, update.effective_chat.id)
         
-        if not user_group or not user_group.clan_id:
+        if not bundle or not bundle.user_group.clan_id:
             await update.message.reply_text(
                 "🏰 لست عضواً في أي كلان!\n"
                 "استخدم /createclan <اسم> لإنشاء كلان جديد\n"
@@ -381,13 +412,13 @@ class TelegramBot:
             )
             return
         
-        clan = await self.db.get_clan_by_id(user_group.clan_id)
+        clan = bundle.clan
         if not clan:
             await update.message.reply_text("❌ خطأ في العثور على الكلان!")
             return
         
         # معلومات قائد الكلان
-        leader = await self.db.get_user_by_id(clan.leader_user_id)
+        leader = bundle.clan_leader
         leader_name = leader.first_name if leader else "غير معروف"
         
         clan_text = f"🏰 كلان: {clan.name}\n"
@@ -415,57 +446,127 @@ class TelegramBot:
         """معالج الرسائل الأساسي"""
         if update.effective_chat.type == 'private':
             return  # تجاهل الرسائل الخاصة
+        if not self.recent_updates.add(update.update_id):
+            return  # تحديث مكرر: فحص في الذاكرة بدون أي كتابة
+        
+        # خريطة النشاط تعد كل رسالة (قبل فترة الانتظار وتقييم السبام)
+        self.activity.record(update.effective_chat.id)
+        
+        # تتبع الردود لاستخدامها في الأوامر الإدارية الجماعية
+        if update.message.reply_to_message:
+            self.reply_tracker.record(
+                update.effective_chat.id,
+                update.message.reply_to_message.message_id,
+                update.effective_user.id
+            )
+        
+        # تقييم الرسالة قبل أي كتابة (يُحدّث العدادات حتى أثناء فترة الانتظار)
+        verdict = self.spam_scorer.score(
+            update.effective_chat.id,
+            update.effective_user.id,
+            update.message.text or update.message.caption
+        )
         
         # التأكد من وجود المستخدم
         await self.ensure_user_exists(update.effective_user, update.effective_chat.id)
         
-        # التحقق من cooldown
-        user_group = await self.get_user_group(update.effective_user.id, update.effective_chat.id)
-        if user_group and user_group.last_xp_gain:
-            time_diff = datetime.now() - user_group.last_xp_gain
-            if time_diff.total_seconds() < self.XP_COOLDOWN:
-                return  # المستخدم ما زال في فترة الانتظار
-        
-        # حساب XP والعملات
-        xp_gained = calculate_xp_gain(self.MIN_XP_PER_MESSAGE, self.MAX_XP_PER_MESSAGE)
-        coins_gained = calculate_coin_gain(self.MIN_COINS_PER_MESSAGE, self.MAX_COINS_PER_MESSAGE)
+        # إعدادات الجروب من الذاكرة (بدون استعلام)
+        settings = self.group_settings.get(update.effective_chat.id)
+        
+        # التحقق من cooldown (من الذاكرة، وقراءة user_groups فقط لعضو لم يُمنح في هذه العملية)
+        last_award = self.cooldowns.last_award(update.effective_user.id, update.effective_chat.id)
+        if last_award is None:
+            user_group = await self.get_user_group(update.effective_user.id, update.effective_chat.id)
+            if user_group and user_group.last_xp_gain:
+                last_award = user_group.last_xp_gain.timestamp()
+                self.cooldowns.record(update.effective_user.id, update.effective_chat.id, last_award)
+        if last_award is not None and time.time() - last_award < settings.xp_cooldown:
+            return  # المستخدم ما زال في فترة الانتظار
+        
+        # حساب XP حسب قواعد الجروب (نوع الرسالة، الطول، الموضوع، الساعة) ثم تقييم السبام
+        multiplier = self.xp_rules.multiplier(update.effective_chat.id, update.message, datetime.now().hour)
+        xp_gained = verdict.scale(calculate_xp_gain(settings.min_xp, settings.max_xp, multiplier))
+        coins_gained = verdict.scale(calculate_coin_gain(settings.min_coins, settings.max_coins))
+        if verdict.reasons:
+            logger.debug("رسالة مشبوهة من %s في %s: %s (score=%.2f)", update.effective_user.id,
+                         update.effective_chat.id, ', '.join(verdict.reasons), verdict.score)
+        if xp_gained <= 0 and coins_gained <= 0:
+            return  # لا شيء يُمنح: لا تحديث ولا تسجيل في message_logs
         
         # تطبيق المضاعفات (إذا كانت موجودة)
         # TODO: تطبيق تأثيرات العناصر المشتراة
         
-        # تحديث البيانات
-        await self.db.update_user_stats(
+        # تسجيل الرسالة أولاً: القيد الفريد (group_id, message_id) يمنع المنح المكرر بعد إعادة التشغيل
+        message_type = detect_message_type(update.message)
+        logged = await self.db.log_message(
             update.effective_user.id,
             update.effective_chat.id,
+            update.message.message_id,
             xp_gained,
-            coins_gained
+            coins_gained,
+            message_type
         )
+        if not logged:
+            return  # الرسالة مُنحت من قبل
         
-        # تسجيل الرسالة
-        await self.db.log_message(
+        # تحديث البيانات
+        await self.db.update_user_stats(
             update.effective_user.id,
             update.effective_chat.id,
-            update.message.message_id,
             xp_gained,
             coins_gained,
-            'text'
+            season_id=settings.season_id
+        )
+        self.cooldowns.record(update.effective_user.id, update.effective_chat.id)
+        self.active_users.record(update.effective_chat.id, update.effective_user.id)
+        self.profile_cards.invalidate(update.effective_user.id, update.effective_chat.id)
+        self.events.publish(
+            'xp_awarded', update.effective_chat.id, update.effective_user.id,
+            xp=xp_gained, coins=coins_gained, message_type=message_type, spam_score=round(verdict.score, 3)
         )
         
-        # التحقق من ترقية المستوى
-        new_user_group = await self.get_user_group(update.effective_user.id, update.effective_chat.id)
-        level_up_result = await check_level_up(self.db, new_user_group)
-        
+        # التحقق من ترقية المستوى والشارات الجديدة
+        try:
+            new_user_group = await self.get_user_group(update.effective_user.id, update.effective_chat.id)
+            level_up_result = await check_level_up(self.db, new_user_group, await self.levels.table())
+            new_badges = await self.check_new_badges(update.effective_user.id, update.effective_chat.id)
+        except CircuitOpenError:
+            # القاعدة متوقفة والمنح في السجل المؤجل: المستوى والشارات تُفحص مع أول رسالة بعد عودتها
+            level_up_result, new_badges = None, []
+        
+        # الإشعارات تُرسل عبر المجدول حتى لا تنتظر عملية منح XP
         if level_up_result:
             new_level = level_up_result
-            await update.message.reply_text(
+            self.events.publish(
+                'level_up', update.effective_chat.id, update.effective_user.id,
+                level_id=new_level.id, level_number=new_level.level_number
+            )
+            self.notifier.notify(
+                update.effective_chat.id,
                 f"🎉 تهانينا {update.effective_user.first_name}!\n"
                 f"ارتقيت إلى المستوى {new_level.level_number}!\n"
                 f"{new_level.level_emoji} {new_level.level_name}\n"
-                f"⚡ XP المطلوب للمستوى التالي: {format_number(new_level.required_xp)}"
+                f"⚡ XP المطلوب للمستوى التالي: {format_number(new_level.required_xp)}",
+                priority=PRIORITY_HIGH,
+                reply_to=update.message.message_id,
+                kind='level_up'
             )
         
-        # التحقق من الشارات الجديدة
-        await self.check_new_badges(update.effective_user.id, update.effective_chat.id)
+        if level_up_result or new_badges:
+            # المستوى أو عدد الشارات تغير بعد الإبطال الأول
+            self.profile_cards.invalidate(update.effective_user.id, update.effective_chat.id)
+        for badge in new_badges:
+            self.events.publish(
+                'badge_earned', update.effective_chat.id, update.effective_user.id,
+                badge_id=badge.id, name=badge.name
+            )
+            self.notifier.notify(
+                update.effective_chat.id,
+                f"🏅 {update.effective_user.first_name} حصل على شارة {badge.emoji} {badge.name}!",
+                priority=PRIORITY_NORMAL,
+                reply_to=update.message.message_id,
+                kind='badge'
+            )
         
         # تحديث المهام اليومية
         await self.update_daily_quests(update.effective_user.id, update.effective_chat.id, 'messages', 1)
@@ -489,15 +590,29 @@ class TelegramBot:
         # يمكن إضافة المزيد من المعالجات هنا
     
     async def ensure_user_exists(self, user, group_id: int):
-        """التأكد من وجود المستخدم في قاعدة البيانات"""
-        # إضافة المستخدم إذا لم يكن موجوداً
-        await self.db.add_user_if_not_exists(user)
+        """التأكد من وجود المستخدم في قاعدة البيانات (ما كُتب بنجاح من قبل لا يُكتب مرة أخرى)"""
+        # إضافة المستخدم إذا لم يكن موجوداً (أو تغير اسمه)؛ الكتابة المؤجلة أو الفاشلة تُعاد مع الرسالة التالية
+        if not self.seen.user_known(user):
+            if await self.db.add_user_if_not_exists(user):
+                self.seen.mark_user(user)
         
         # إضافة الجروب إذا لم يكن موجوداً
-        await self.db.add_group_if_not_exists(group_id, "Unknown Group")
+        if not self.seen.group_known(group_id):
+            if await self.db.add_group_if_not_exists(group_id, "Unknown Group"):
+                self.seen.mark_group(group_id)
         
         # ربط المستخدم بالجروب
-        await self.db.add_user_to_group_if_not_exists(user.id, group_id)
+        if not self.seen.member_known(user.id, group_id):
+            added = False
+            try:
+                added = await self.db.add_user_to_group_if_not_exists(user.id, group_id)
+            finally:
+                if added:
+                    self.seen.mark_member(user.id, group_id)
+                else:
+                    # قد يكون المستخدم أو الجروب حُذف بعد تسجيله (استيراد --replace)، فيُكتبان من جديد
+                    self.seen.forget_user(user.id)
+                    self.seen.forget_group(group_id)
     
     async def get_user_group(self, user_id: int, group_id: int) -> Optional[UserGroup]:
         """الحصول على بيانات المستخدم في الجروب"""
@@ -512,28 +627,25 @@ class TelegramBot:
         if existing_quests:
             return  # المهام موجودة بالفعل
         
-        # إنشاء مهام عشوائية
-        quest_templates = [
-            {"type": "messages", "target": 50, "xp": 100, "coins": 50},
-            {"type": "xp_gain", "target": 100, "xp": 150, "coins": 75},
-            {"type": "coins_gain", "target": 50, "xp": 75, "coins": 100},
-        ]
+        # نفس مهام QuestRollover حسب مستوى العضو (للأعضاء الجدد أو غير النشطين وقت الإنشاء الليلي)
+        user_group = await self.get_user_group(user_id, group_id)
+        level = await self.levels.by_id(user_group.level_id) if user_group else None
         
-        for template in quest_templates:
+        for quest in quests_for_level(level.level_number if level else 1):
             await self.db.create_daily_quest(
-                user_id, group_id, template["type"], 
-                template["target"], template["xp"], template["coins"], today
+                user_id, group_id, quest["quest_type"],
+                quest["target_value"], quest["reward_xp"], quest["reward_coins"], today
             )
     
     async def update_daily_quests(self, user_id: int, group_id: int, quest_type: str, progress: int):
         """تحديث تقدم المهام اليومية"""
         await self.db.update_daily_quest_progress(user_id, group_id, quest_type, progress, date.today())
     
-    async def check_new_badges(self, user_id: int, group_id: int):
+    async def check_new_badges(self, user_id: int, group_id: int) -> List[Badge]:
         """التحقق من الشارات الجديدة"""
         user_group = await self.get_user_group(user_id, group_id)
         if not user_group:
-            return
+            return []
         
         # الحصول على جميع الشارات المتاحة
         all_badges = await self.db.get_all_badges()
@@ -543,6 +655,7 @@ class TelegramBot:
         user_badge_ids = [badge.id for badge in user_badges]
         
         # التحقق من كل شارة
+        new_badges = []
         for badge in all_badges:
             if badge.id in user_badge_ids:
                 continue  # المستخدم يملك هذه الشارة بالفعل
@@ -550,7 +663,9 @@ class TelegramBot:
             # التحقق من الشروط
             if await self.check_badge_requirement(badge, user_group):
                 await self.db.award_badge(user_id, group_id, badge.id)
-                # إشعار المستخدم (يمكن إضافة هذا لاحقاً)
+                new_badges.append(badge)
+        
+        return new_badges
     
     async def check_badge_requirement(self, badge: Badge, user_group: UserGroup) -> bool:
         """التحقق من شروط الشارة"""
@@ -561,7 +676,7 @@ class TelegramBot:
         elif badge.requirement_type == "coins":
             return user_group.coins >= badge.requirement_value
         elif badge.requirement_type == "level":
-            level = await self.db.get_level_by_id(user_group.level_id)
+            level = await self.levels.by_id(user_group.level_id)
             return level.level_number >= badge.requirement_value
         
         return False
@@ -599,30 +714,165 @@ class TelegramBot:
     # أوامر الإدارة
     async def add_xp_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """إضافة XP (للمشرفين فقط)"""
+        await self.bulk_admin_command(update, context, 'xp')
+    
+    async def add_coins_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """إضافة عملات (للمشرفين فقط)"""
+        await self.bulk_admin_command(update, context, 'coins')
+    
+    async def reset_user_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """إعادة تعيين مستخدم (للمشرفين فقط)"""
+        await self.bulk_admin_command(update, context, 'reset')
+    
+    async def bulk_admin_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE, mode: str):
+        """تنفيذ أمر إداري على مستخدم واحد أو مجموعة مستخدمين دفعة واحدة"""
+        if update.effective_chat.type == 'private':
+            await update.message.reply_text("❌ هذا الأمر متاح في الجروبات فقط!")
+            return
+        
         if not await self.is_admin(update.effective_user.id, update.effective_chat.id):
             await update.message.reply_text("❌ هذا الأمر للمشرفين فقط!")
             return
         
-        # TODO: تطبيق إضافة XP
-        await update.message.reply_text("🛠️ أمر إضافة XP قيد التطوير...")
+        args = list(context.args or [])
+        amount = 0
+        if mode != 'reset':
+            if not args or not is_integer(args[0]):
+                await update.message.reply_text(
+                    "❌ الاستخدام: /addxp <رقم> @user1 @user2 ... [السبب]\n"
+                    "أو بالرد على رسالة لمنح صاحبها وكل من رد عليها"
+                )
+                return
+            amount = int(args.pop(0))
+        
+        targets = parse_admin_targets(update.message, args, self.reply_tracker)
+        try:
+            resolved = await self.db.get_user_ids_by_usernames(targets.usernames)
+        except Exception as e:
+            logger.error("خطأ في جلب المستخدمين بالأسماء في الجروب %s: %s", update.effective_chat.id, e)
+            await update.message.reply_text("❌ حدث خطأ في قاعدة البيانات، لم يتم تعديل أي مستخدم")
+            return
+        user_ids = sorted(targets.user_ids | set(resolved.values()))
+        missing = [name for name in targets.usernames if name.lower() not in resolved]
+        
+        if not user_ids:
+            await update.message.reply_text("❌ لم يتم تحديد أي مستخدم!")
+            return
+        
+        group_id = update.effective_chat.id
+        admin_id = update.effective_user.id
+        await self.ensure_user_exists(update.effective_user, group_id)
+        
+        deltas = [amount] * len(user_ids)
+        zeros = [0] * len(user_ids)
+        try:
+            # كل واجهة تنفذ الدفعة في معاملة واحدة: عند الخطأ لم يتغير أي مستخدم
+            if mode == 'reset':
+                updated = await self.db.bulk_reset_users(admin_id, group_id, user_ids, targets.reason)
+            elif mode == 'xp':
+                updated = await self.db.bulk_adjust_users(
+                    admin_id, group_id, user_ids, deltas, zeros,
+                    'add_xp' if amount >= 0 else 'remove_xp', targets.reason
+                )
+            else:
+                updated = await self.db.bulk_adjust_users(
+                    admin_id, group_id, user_ids, zeros, deltas,
+                    'add_coins' if amount >= 0 else 'remove_coins', targets.reason
+                )
+        except Exception as e:
+            logger.error("خطأ في أمر المشرف (%s) في الجروب %s: %s", mode, group_id, e)
+            await update.message.reply_text("❌ حدث خطأ في قاعدة البيانات، لم يتم تعديل أي مستخدم")
+            return
+        
+        if mode == 'reset':
+            result_text = f"♻️ تمت إعادة تعيين {len(updated)} مستخدم"
+        else:
+            unit = "XP" if mode == 'xp' else "💰"
+            result_text = f"✅ تمت إضافة {format_number(amount)} {unit} لـ {len(updated)} مستخدم"
+            for row in updated:
+                self.events.publish(
+                    'xp_awarded', group_id, row['user_id'],
+                    xp=amount if mode == 'xp' else 0, coins=amount if mode == 'coins' else 0,
+                    source='admin', admin_user_id=admin_id
+                )
+        
+        for row in updated:
+            self.profile_cards.invalidate(row['user_id'], group_id)
+        
+        skipped = len(user_ids) - len(updated)
+        if skipped:
+            result_text += f"\n⚠️ {skipped} مستخدم غير مسجل في الجروب"
+        if missing:
+            result_text += f"\n⚠️ لم يتم العثور على: {', '.join('@' + name for name in missing)}"
+        
+        await update.message.reply_text(result_text)
+    
+    async def settings_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """عرض إعدادات الجروب"""
+        if update.effective_chat.type == 'private':
+            await update.message.reply_text("❌ هذا الأمر متاح في الجروبات فقط!")
+            return
+        
+        settings = self.group_settings.get(update.effective_chat.id)
+        await update.message.reply_text(
+            "⚙️ إعدادات الجروب:\n\n"
+            f"⏱️ xp_cooldown: {settings.xp_cooldown} ثانية\n"
+            f"⚡ min_xp / max_xp: {settings.min_xp} - {settings.max_xp}\n"
+            f"🪙 min_coins / max_coins: {settings.min_coins} - {settings.max_coins}\n"
+            f"🏁 season_days: {settings.season_days or 'بدون مواسم تلقائية'} (الموسم الحالي {settings.season_id})\n\n"
+            "للتعديل (للمشرفين): /set <الإعداد> <القيمة>"
+        )
     
-    async def add_coins_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """إضافة عملات (للمشرفين فقط)"""
+    async def set_setting_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """تعديل إعداد للجروب (للمشرفين فقط)"""
+        if update.effective_chat.type == 'private':
+            await update.message.reply_text("❌ هذا الأمر متاح في الجروبات فقط!")
+            return
+        
         if not await self.is_admin(update.effective_user.id, update.effective_chat.id):
             await update.message.reply_text("❌ هذا الأمر للمشرفين فقط!")
             return
         
-        # TODO: تطبيق إضافة عملات
-        await update.message.reply_text("🛠️ أمر إضافة العملات قيد التطوير...")
+        args = context.args or []
+        if len(args) != 2 or args[0] not in SETTING_LIMITS or not is_integer(args[1]):
+            await update.message.reply_text(
+                "❌ الاستخدام: /set <الإعداد> <القيمة>\n"
+                f"الإعدادات: {', '.join(SETTING_LIMITS)}"
+            )
+            return
+        
+        try:
+            await self.group_settings.update(
+                update.effective_chat.id, updated_by=update.effective_user.id, **{args[0]: int(args[1])}
+            )
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {e}")
+            return
+        except RuntimeError:
+            await update.message.reply_text("❌ حدث خطأ أثناء حفظ الإعداد")
+            return
+        
+        await update.message.reply_text(f"✅ تم تعديل {args[0]} إلى {args[1]}")
     
-    async def reset_user_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """إعادة تعيين مستخدم (للمشرفين فقط)"""
+    async def new_season_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """إنهاء الموسم الحالي وبدء موسم جديد (للمشرفين فقط)"""
+        if update.effective_chat.type == 'private':
+            await update.message.reply_text("❌ هذا الأمر متاح في الجروبات فقط!")
+            return
+        
         if not await self.is_admin(update.effective_user.id, update.effective_chat.id):
             await update.message.reply_text("❌ هذا الأمر للمشرفين فقط!")
             return
         
-        # TODO: تطبيق إعادة التعيين
-        await update.message.reply_text("🛠️ أمر إعادة التعيين قيد التطوير...")
+        current = self.group_settings.get(update.effective_chat.id).season_id
+        started = await self.seasons.start_new_season(update.effective_chat.id, current, update.effective_user.id)
+        if started is None:
+            await update.message.reply_text("⏳ الموسم السابق ما زال قيد الأرشفة، حاول بعد قليل")
+            return
+        
+        await update.message.reply_text(
+            f"🏁 بدأ الموسم {started.season_id}! الترتيب النهائي للموسم {current} يُحفظ خلال دقائق: /season {current}"
+        )
     
     async def is_admin(self, user_id: int, group_id: int) -> bool:
         """التحقق من صلاحيات المشرف"""
@@ -650,8 +900,82 @@ class TelegramBot:
     
     async def leaderboard_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """عرض قائمة المتصدرين"""
-        # TODO: تطبيق قائمة المتصدرين
-        await update.message.reply_text("🛠️ قائمة المتصدرين قيد التطوير...")
+        if update.effective_chat.type == 'private':
+            await update.message.reply_text("❌ هذا الأمر متاح في الجروبات فقط!")
+            return
+        
+        top_members = await self.leaderboards.get(update.effective_chat.id, 10, self.db.get_group_leaderboard)
+        if not top_members:
+            await update.message.reply_text("📭 لا يوجد أعضاء في قائمة المتصدرين بعد!")
+            return
+        
+        levels = await self.levels.all()
+        medals = {1: "🥇", 2: "🥈", 3: "🥉"}
+        
+        leaderboard_text = "🏆 قائمة المتصدرين:\n\n"
+        for rank, member in enumerate(top_members, 1):
+            level = levels.get(member['level_id'])
+            name = member['first_name'] or member['username'] or str(member['user_id'])
+            leaderboard_text += f"{medals.get(rank, f'{rank}.')} {name}"
+            if level:
+                leaderboard_text += f" - {level.level_emoji} {level.level_number}"
+            leaderboard_text += f" ({format_number(member['xp'])} XP)\n"
+        
+        await update.message.reply_text(leaderboard_text)
+    
+    async def season_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """متصدرو الموسم الحالي، أو الترتيب المؤرشف لموسم سابق (/season رقم)"""
+        if update.effective_chat.type == 'private':
+            await update.message.reply_text("❌ هذا الأمر متاح في الجروبات فقط!")
+            return
+        
+        group_id = update.effective_chat.id
+        settings = self.group_settings.get(group_id)
+        args = context.args or []
+        if args and (not is_integer(args[0]) or not 1 <= int(args[0]) <= settings.season_id):
+            await update.message.reply_text(f"❌ الاستخدام: /season [رقم الموسم من 1 إلى {settings.season_id}]")
+            return
+        
+        medals = {1: "🥇", 2: "🥈", 3: "🥉"}
+        season_id = int(args[0]) if args else settings.season_id
+        if season_id < settings.season_id:
+            members = await self.db.get_season_standings(group_id, season_id, 10)
+            if not members:
+                await update.message.reply_text(f"📭 لا يوجد ترتيب محفوظ للموسم {season_id} (ربما لم يُؤرشف بعد)")
+                return
+            text = f"🏆 الترتيب النهائي للموسم {season_id}:\n\n"
+        else:
+            members = await self.db.get_season_leaderboard(group_id, season_id, 10)
+            text = f"🏁 متصدرو الموسم {season_id}:\n\n"
+            if not members:
+                text += "📭 لم يكسب أحد XP في هذا الموسم بعد!\n"
+        
+        for rank, member in enumerate(members, 1):
+            name = member['first_name'] or member['username'] or str(member['user_id'])
+            text += f"{medals.get(rank, f'{rank}.')} {name} ({format_number(member['xp'])} XP)\n"
+        
+        if season_id == settings.season_id and settings.season_days:
+            season = await self.db.get_season(group_id, season_id)
+            started_at = (season.started_at if season else None) or settings.updated_at
+            if started_at:
+                days_left = settings.season_days - (datetime.now() - started_at).days
+                text += f"\n⏳ ينتهي الموسم خلال {max(days_left, 0)} يوم"
+        
+        await update.message.reply_text(text)
+    
+    async def activity_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """خريطة نشاط الجروب حسب ساعة الأسبوع (من عدادات الذاكرة)"""
+        if update.effective_chat.type == 'private':
+            await update.message.reply_text("❌ هذا الأمر متاح في الجروبات فقط!")
+            return
+        
+        counters = await self.activity.counters(update.effective_chat.id)
+        active = await self.active_users.windows(update.effective_chat.id)
+        await update.message.reply_text(
+            f"{render_heatmap(counters)}\n\n"
+            f"👥 الأعضاء النشطون (تقريباً): اليوم {format_number(active['today'])} • "
+            f"7 أيام {format_number(active['week'])} • 30 يوماً {format_number(active['month'])}"
+        )
     
     async def inventory_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """عرض المخزون"""
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Metrics - قياس زمن المعالجات واستعلامات قاعدة البيانات
+"""
+
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Optional, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# حدود الفئات بالثواني (ثابتة ومحجوزة مسبقاً)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# العملية الجارية والتتبع الحالي للتحديث
+_current_op: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('metrics_current_op', default=None)
+_current_trace: contextvars.ContextVar[Optional['Trace']] = contextvars.ContextVar('metrics_current_trace', default=None)
+
+
+class Histogram:
+    """مدرج تكراري بفئات ثابتة"""
+
+    __slots__ = ('bounds', 'counts', 'total', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """تقدير النسبة المئوية من الفئات"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else float('inf')
+        return float('inf')
+
+
+class OperationStats:
+    __slots__ = ('histogram', 'calls', 'errors')
+
+    def __init__(self):
+        self.histogram = Histogram()
+        self.calls = 0
+        self.errors = 0
+
+
+class Trace:
+    """تسلسل استدعاءات قاعدة البيانات لتحديث واحد"""
+
+    __slots__ = ('update_id', 'handler', 'started', 'spans')
+
+    def __init__(self, update_id: Optional[int], handler: str):
+        self.update_id = update_id
+        self.handler = handler
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float, bool]] = []
+
+    def to_dict(self, duration: float) -> Dict:
+        return {
+            'update_id': self.update_id,
+            'handler': self.handler,
+            'duration_ms': round(duration * 1000, 3),
+            'spans': [
+                {'op': op, 'duration_ms': round(seconds * 1000, 3), 'ok': ok}
+                for op, seconds, ok in self.spans
+            ]
+        }
+
+
+class MetricsRegistry:
+    """سجل القياسات لكل عملية"""
+
+    def __init__(self, max_traces: int = 200, slow_trace_seconds: float = 1.0):
+        self.operations: Dict[str, OperationStats] = {}
+        self.gauges: Dict[str, float] = {}
+        self.recent_traces: deque = deque(maxlen=max_traces)
+        self.slow_trace_seconds = slow_trace_seconds
+        self.started_at = time.time()
+
+    def _stats(self, name: str) -> OperationStats:
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = OperationStats()
+        return stats
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        stats = self._stats(name)
+        stats.calls += 1
+        stats.histogram.observe(seconds)
+        if error:
+            stats.errors += 1
+
+    def count_error(self, name: str):
+        self._stats(name).errors += 1
+
+    def set_gauge(self, name: str, value: float):
+        self.gauges[name] = value
+
+    def finish_trace(self, trace: Trace, seconds: float):
+        data = trace.to_dict(seconds)
+        self.recent_traces.append(data)
+        if seconds >= self.slow_trace_seconds:
+            chain = " → ".join(f"{span['op']} {span['duration_ms']:.1f}ms" for span in data['spans'])
+            logger.warning("تحديث بطيء %s (%s) %.1fms: %s", trace.update_id, trace.handler, seconds * 1000, chain)
+
+    def render_prometheus(self) -> str:
+        """تصدير القياسات بصيغة Prometheus النصية"""
+        lines = [
+            "# HELP bot_operation_seconds Latency of bot handlers and database calls",
+            "# TYPE bot_operation_seconds histogram"
+        ]
+        for name, stats in sorted(self.operations.items()):
+            hist = stats.histogram
+            cumulative = 0
+            for bound, bucket_count in zip(hist.bounds, hist.counts):
+                cumulative += bucket_count
+                lines.append(f'bot_operation_seconds_bucket{{op="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'bot_operation_seconds_bucket{{op="{name}",le="+Inf"}} {hist.count}')
+            lines.append(f'bot_operation_seconds_sum{{op="{name}"}} {hist.total:.6f}')
+            lines.append(f'bot_operation_seconds_count{{op="{name}"}} {hist.count}')
+
+        lines.append("# HELP bot_operation_errors_total Errors per operation")
+        lines.append("# TYPE bot_operation_errors_total counter")
+        for name, stats in sorted(self.operations.items()):
+            lines.append(f'bot_operation_errors_total{{op="{name}"}} {stats.errors}')
+
+        if self.gauges:
+            lines.append("# HELP bot_gauge Current value of internal state (circuit breaker, queues)")
+            lines.append("# TYPE bot_gauge gauge")
+            for name, value in sorted(self.gauges.items()):
+                lines.append(f'bot_gauge{{name="{name}"}} {value}')
+
+        lines.append("# TYPE bot_uptime_seconds gauge")
+        lines.append(f"bot_uptime_seconds {time.time() - self.started_at:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, limit: int = 10) -> str:
+        """ملخص نصي لأكثر العمليات استهلاكاً للوقت"""
+        ranked = sorted(self.operations.items(), key=lambda item: item[1].histogram.total, reverse=True)
+        rows = []
+        for name, stats in ranked[:limit]:
+            hist = stats.histogram
+            rows.append(
+                f"{name}: calls={stats.calls} errors={stats.errors} "
+                f"p50<={hist.quantile(0.5) * 1000:.1f}ms p99<={hist.quantile(0.99) * 1000:.1f}ms "
+                f"total={hist.total:.2f}s"
+            )
+        return "\n".join(rows)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def mark_error():
+    """تسجيل خطأ للعملية الجارية (للأخطاء التي تُعالج داخل الدالة)"""
+    name = _current_op.get()
+    if name:
+        REGISTRY.count_error(name)
+
+
+def _wrap_operation(name: str, func, registry: MetricsRegistry):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        token = _current_op.set(name)
+        started = time.perf_counter()
+        ok = True
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            ok = False
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_op.reset(token)
+            registry.observe(name, elapsed, not ok)
+            trace = _current_trace.get()
+            if trace is not None:
+                trace.spans.append((name, elapsed, ok))
+    return wrapper
+
+
+def _wrap_handler(name: str, func, registry: MetricsRegistry):
+    @functools.wraps(func)
+    async def wrapper(update, context, *args, **kwargs):
+        trace = Trace(getattr(update, 'update_id', None), name)
+        token = _current_trace.set(trace)
+        started = time.perf_counter()
+        ok = True
+        try:
+            return await func(update, context, *args, **kwargs)
+        except Exception:
+            ok = False
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_trace.reset(token)
+            registry.observe(name, elapsed, not ok)
+            registry.finish_trace(trace, elapsed)
+    return wrapper
+
+
+def _public_coroutines(obj, exclude=()):
+    for name, member in inspect.getmembers(type(obj), inspect.iscoroutinefunction):
+        if not name.startswith('_') and name not in exclude:
+            yield name
+
+
+def instrument_database(db, prefix: str = 'db', registry: MetricsRegistry = REGISTRY):
+    """تغليف كل دوال مدير قاعدة البيانات بالقياس"""
+    for name in _public_coroutines(db, exclude=('connect', 'disconnect')):
+        setattr(db, name, _wrap_operation(f"{prefix}.{name}", getattr(db, name), registry))
+    return db
+
+
+def instrument_handlers(bot, registry: MetricsRegistry = REGISTRY):
+    """تغليف معالجات البوت بالقياس والتتبع (قبل تسجيلها في Application)"""
+    for name in _public_coroutines(bot):
+        if name.endswith('_command') or name in ('handle_message', 'handle_callback'):
+            setattr(bot, name, _wrap_handler(f"handler.{name}", getattr(bot, name), registry))
+    return bot
+
+
+class MetricsServer:
+    """خادم HTTP صغير لعرض القياسات (/metrics و /traces) مع ملخص دوري في السجل"""
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = '0.0.0.0', port: Optional[int] = None,
+                 summary_interval: float = 300.0):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.summary_interval = summary_interval
+        self._runner = None
+        self._summary_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.summary_interval:
+            self._summary_task = asyncio.create_task(self._log_summary())
+        if self.port:
+            await self._start_http()
+
+    async def _start_http(self):
+        from aiohttp import web
+
+        async def metrics_view(request):
+            return web.Response(text=self.registry.render_prometheus(),
+                                content_type='text/plain', charset='utf-8')
+
+        async def traces_view(request):
+            return web.json_response(list(self.registry.recent_traces))
+
+        app = web.Application()
+        app.router.add_get('/metrics', metrics_view)
+        app.router.add_get('/traces', traces_view)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info("📊 خادم القياسات يعمل على المنفذ %s", self.port)
+
+    async def _log_summary(self):
+        while True:
+            await asyncio.sleep(self.summary_interval)
+            summary = self.registry.summary()
+            if summary:
+                logger.info("📊 ملخص الأداء:\n%s", summary)
+
+    async def stop(self):
+        if self._summary_task:
+            self._summary_task.cancel()
+            self._summary_task = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -5,10 +5,28 @@
 Models - نماذج البيانات
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import datetime, date
 from typing import Optional, Dict, Any
 
+_DATETIME_TYPES = (datetime, Optional[datetime])
+_DATE_TYPES = (date, Optional[date])
+
+def _normalize(cls, data: Dict[str, Any]) -> Dict[str, Any]:
+    """تحويل التواريخ النصية (كما تعيدها Supabase) إلى كائنات datetime/date"""
+    for f in fields(cls):
+        value = data.get(f.name)
+        if not isinstance(value, str):
+            continue
+        if f.type in _DATETIME_TYPES:
+            parsed = datetime.fromisoformat(value)
+            if parsed.tzinfo:
+                parsed = parsed.astimezone().replace(tzinfo=None)
+            data[f.name] = parsed
+        elif f.type in _DATE_TYPES:
+            data[f.name] = date.fromisoformat(value[:10])
+    return data
+
 @dataclass
 class User:
     id: int
@@ -22,7 +40,7 @@ class User:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'User':
-        return cls(**data)
+        return cls(**_normalize(cls, data))
 
 @dataclass
 class UserGroup:
@@ -37,12 +55,17 @@ class UserGroup:
     last_xp_gain: Optional[datetime] = None
     clan_id: Optional[int] = None
     is_active: bool = True
+    # XP الموسم الحالي، وقيمة الموسم السابق حتى يُؤرشف (season_id يتقدم عند أول منح في الموسم الجديد)
+    season_id: int = 1
+    season_xp: int = 0
+    prev_season_id: Optional[int] = None
+    prev_season_xp: int = 0
     joined_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'UserGroup':
-        return cls(**data)
+        return cls(**_normalize(cls, data))
 
 @dataclass
 class Level:
@@ -57,7 +80,7 @@ class Level:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Level':
-        return cls(**data)
+        return cls(**_normalize(cls, data))
 
 @dataclass
 class ShopItem:
@@ -74,7 +97,7 @@ class ShopItem:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'ShopItem':
-        return cls(**data)
+        return cls(**_normalize(cls, data))
 
 @dataclass
 class Badge:
@@ -91,7 +114,7 @@ class Badge:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Badge':
-        return cls(**data)
+        return cls(**_normalize(cls, data))
 
 @dataclass
 class DailyQuest:
@@ -110,7 +133,7 @@ class DailyQuest:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'DailyQuest':
-        return cls(**data)
+        return cls(**_normalize(cls, data))
 
 @dataclass
 class Clan:
@@ -127,7 +150,7 @@ class Clan:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'Clan':
-        return cls(**data)
+        return cls(**_normalize(cls, data))
 
 @dataclass
 class UserBadge:
@@ -139,7 +162,7 @@ class UserBadge:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'UserBadge':
-        return cls(**data)
+        return cls(**_normalize(cls, data))
 
 @dataclass
 class MessageLog:
@@ -154,4 +177,66 @@ class MessageLog:
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'MessageLog':
-        return cls(**data)
+        return cls(**_normalize(cls, data))
+
+# الإعدادات التي يمكن للمشرفين تعديلها لكل جروب
+GROUP_SETTING_FIELDS = ('xp_cooldown', 'min_xp', 'max_xp', 'min_coins', 'max_coins', 'season_days')
+
+@dataclass(frozen=True)
+class GroupSettings:
+    group_id: int
+    xp_cooldown: int = 60
+    min_xp: int = 5
+    max_xp: int = 15
+    min_coins: int = 1
+    max_coins: int = 10
+    # طول الموسم بالأيام (0 = بدون مواسم تلقائية)
+    season_days: int = 0
+    # الموسم الحالي، لا يُعدل إلا عبر start_season (وليس /set)
+    season_id: int = 1
+    updated_by: Optional[int] = None
+    updated_at: Optional[datetime] = None
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'GroupSettings':
+        return cls(**_normalize(cls, data))
+
+@dataclass
+class Season:
+    """موسم جروب: يبدأ بزيادة group_settings.season_id ويُؤرشف ترتيبه النهائي في season_standings"""
+    group_id: int
+    season_id: int
+    started_at: Optional[datetime] = None
+    ended_at: Optional[datetime] = None
+    archived_at: Optional[datetime] = None
+    started_by: Optional[int] = None
+    members: int = 0
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Season':
+        return cls(**_normalize(cls, data))
+
+@dataclass
+class ProfileBundle:
+    """العضوية مع المستخدم ومستواه والمستوى التالي وعدد شاراته وكلانه وقائده (استعلام واحد)"""
+    user_group: UserGroup
+    level: Level
+    user: Optional[User] = None
+    next_level: Optional[Level] = None
+    badge_count: int = 0
+    clan: Optional[Clan] = None
+    clan_leader: Optional[User] = None
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'ProfileBundle':
+        def nested(model, key):
+            return model.from_dict(dict(data[key])) if data.get(key) else None
+        return cls(
+            user_group=UserGroup.from_dict(dict(data['user_group'])),
+            level=Level.from_dict(dict(data['level'])),
+            user=nested(User, 'user'),
+            next_level=nested(Level, 'next_level'),
+            badge_count=data.get('badge_count') or 0,
+            clan=nested(Clan, 'clan'),
+            clan_leader=nested(User, 'clan_leader')
+        )
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Notifier - جدولة الرسائل الصادرة مع تحديد المعدل ودمج الإشعارات
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List
+
+from telegram.error import RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# أولويات الإرسال (الأصغر يُرسل أولاً)
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# الحد الأقصى لطول رسالة تيليجرام
+MAX_MESSAGE_LENGTH = 4096
+
+
+class TokenBucket:
+    """دلو رموز لتحديد معدل الإرسال"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """الوقت اللازم حتى يتوفر رمز واحد"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def is_full(self, now: float) -> bool:
+        """الدلو ممتلئ: حذفه وإنشاء غيره لاحقاً لا يغير المعدل"""
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+    def consume(self, now: float):
+        """استهلاك رمز واحد"""
+        self._refill(now)
+        self.tokens -= 1
+
+    def block_for(self, seconds: float, now: float):
+        """إيقاف الدلو لمدة محددة (عند رد 429 من تيليجرام)"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+@dataclass
+class Notification:
+    text: str
+    priority: int = PRIORITY_NORMAL
+    reply_to: Optional[int] = None
+    kind: str = 'generic'
+
+
+@dataclass
+class _ChatQueue:
+    bucket: TokenBucket
+    pending: List[Notification] = field(default_factory=list)
+    scheduled: bool = False
+
+
+class Notifier:
+    """مجدول الإرسال: دلو لكل محادثة + دلو عام + طابور أولويات"""
+
+    def __init__(self, bot, global_rate: float = 25.0, chat_rate: float = 20 / 60,
+                 chat_burst: float = 3.0, coalesce_window: float = 1.5,
+                 max_pending_per_chat: int = 50, idle_sweep_interval: float = 60.0):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.coalesce_window = coalesce_window
+        self.max_pending_per_chat = max_pending_per_chat
+        self.idle_sweep_interval = idle_sweep_interval
+
+        self._chats: Dict[int, _ChatQueue] = {}
+        self._swept_at = time.monotonic()
+        # (وقت الجاهزية, الأولوية, التسلسل, المحادثة)
+        self._delayed: list = []
+        # (الأولوية, التسلسل, المحادثة)
+        self._ready: list = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running = False
+
+    async def start(self):
+        """تشغيل عامل الإرسال في الخلفية"""
+        if self._task:
+            return
+        self._running = True
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self, flush_timeout: float = 5.0):
+        """إيقاف العامل بعد محاولة إرسال ما تبقى"""
+        if not self._task:
+            return
+        # إرسال المتبقي فوراً دون انتظار نافذة الدمج
+        self._promote(float('inf'))
+        deadline = time.monotonic() + flush_timeout
+        while self.pending_count() and time.monotonic() < deadline:
+            self._wakeup.set()
+            await asyncio.sleep(0.05)
+        self._running = False
+        self._wakeup.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def pending_count(self) -> int:
+        """عدد الإشعارات المنتظرة"""
+        return sum(len(chat.pending) for chat in self._chats.values())
+
+    def notify(self, chat_id: int, text: str, priority: int = PRIORITY_NORMAL,
+               reply_to: Optional[int] = None, kind: str = 'generic'):
+        """إضافة إشعار للطابور دون انتظار الإرسال"""
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = _ChatQueue(TokenBucket(self.chat_rate, self.chat_burst))
+            self._chats[chat_id] = chat
+
+        chat.pending.append(Notification(text, priority, reply_to, kind))
+        if len(chat.pending) > self.max_pending_per_chat:
+            # حذف أقدم إشعار منخفض الأولوية
+            dropped = max(range(len(chat.pending)), key=lambda i: (chat.pending[i].priority, -i))
+            chat.pending.pop(dropped)
+
+        if not chat.scheduled:
+            chat.scheduled = True
+            ready_at = time.monotonic() + self.coalesce_window
+            heapq.heappush(self._delayed, (ready_at, priority, next(self._seq), chat_id))
+            self._wakeup.set()
+
+    def _promote(self, now: float):
+        """نقل المحادثات التي انتهت نافذتها إلى طابور الجاهزية"""
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, seq, chat_id = heapq.heappop(self._delayed)
+            chat = self._chats.get(chat_id)
+            if not chat or not chat.pending:
+                continue
+            priority = min(n.priority for n in chat.pending)
+            heapq.heappush(self._ready, (priority, seq, chat_id))
+
+    def _sweep_idle(self, now: float):
+        """حذف محادثات بدون إشعارات منتظرة وامتلأ دلوها (وإلا تبقى في الذاكرة طوال عمر البوت)"""
+        if now - self._swept_at < self.idle_sweep_interval:
+            return
+        self._swept_at = now
+        idle = [chat_id for chat_id, chat in self._chats.items()
+                if not chat.scheduled and not chat.pending and chat.bucket.is_full(now)]
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+    def _take_batch(self, chat: _ChatQueue) -> List[Notification]:
+        """أخذ دفعة من الإشعارات تتسع في رسالة واحدة"""
+        chat.pending.sort(key=lambda n: n.priority)
+        batch, size = [], 0
+        while chat.pending:
+            length = len(chat.pending[0].text) + 2
+            if batch and size + length > MAX_MESSAGE_LENGTH:
+                break
+            batch.append(chat.pending.pop(0))
+            size += length
+        return batch
+
+    async def _send(self, chat_id: int, batch: List[Notification]):
+        text = "\n\n".join(n.text for n in batch)[:MAX_MESSAGE_LENGTH]
+        reply_to = batch[0].reply_to if len(batch) == 1 else None
+        await self.bot.send_message(
+            chat_id=chat_id,
+            text=text,
+            reply_to_message_id=reply_to,
+            allow_sending_without_reply=True
+        )
+
+    async def _worker(self):
+        """حلقة الإرسال"""
+        while self._running:
+            now = time.monotonic()
+            self._promote(now)
+            self._sweep_idle(now)
+
+            if not self._ready:
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            global_wait = self.global_bucket.wait_time(now)
+            if global_wait > 0:
+                await asyncio.sleep(global_wait)
+                continue
+
+            priority, seq, chat_id = heapq.heappop(self._ready)
+            chat = self._chats[chat_id]
+            chat_wait = chat.bucket.wait_time(now)
+            if chat_wait > 0:
+                heapq.heappush(self._delayed, (now + chat_wait, priority, seq, chat_id))
+                continue
+
+            batch = self._take_batch(chat)
+            chat.bucket.consume(now)
+            self.global_bucket.consume(now)
+            try:
+                await self._send(chat_id, batch)
+            except RetryAfter as e:
+                retry_after = float(e.retry_after)
+                logger.warning("تجاوز حد الإرسال في %s، إعادة المحاولة بعد %.1f ثانية", chat_id, retry_after)
+                chat.pending[:0] = batch
+                chat.bucket.block_for(retry_after, time.monotonic())
+            except TelegramError as e:
+                logger.error("فشل إرسال الإشعار إلى %s: %s", chat_id, e)
+            except Exception:
+                logger.exception("خطأ غير متوقع في إرسال الإشعار إلى %s", chat_id)
+
+            if chat.pending:
+                wait = max(chat.bucket.wait_time(time.monotonic()), 0.0)
+                heapq.heappush(self._delayed, (time.monotonic() + wait, priority, next(self._seq), chat_id))
+            else:
+                chat.scheduled = False
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Profile Cards - بطاقات /profile و /xp و /level و /progress المنسقة في الذاكرة
+
+الأوامر تشترك في جلب واحد (get_profile_bundle) والنصوص تُنسق مرة واحدة لكل بطاقة.
+مسار المنح يبطل بطاقة العضو بعد كل كتابة، ولكل مفتاح رقم إصدار: الجلب الذي بدأ قبل
+الإبطال لا يُخزن نتيجته، فلا تظهر بطاقة أقدم من آخر منح في نفس العملية.
+"""
+
+import itertools
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple, Callable, Awaitable
+
+from models import ProfileBundle
+from utils import format_number, get_progress_bar
+
+def render_profile(bundle: ProfileBundle, first_name: str) -> str:
+    user_group, level = bundle.user_group, bundle.level
+    join_date = user_group.joined_at.strftime("%Y-%m-%d") if user_group.joined_at else "غير معروف"
+    text = f"👤 الملف الشخصي: {first_name}\n"
+    text += f"{'='*30}\n\n"
+    text += f"{level.level_emoji} {level.level_name}\n"
+    text += f"🏆 المستوى: {level.level_number}/55\n"
+    text += f"⚡ XP: {format_number(user_group.xp)}\n"
+    text += f"💰 العملات: {format_number(user_group.coins)}\n"
+    text += f"📝 الرسائل: {format_number(user_group.total_messages)}\n"
+    text += f"🏅 الشارات: {bundle.badge_count}\n"
+    if bundle.clan:
+        text += f"🏰 الكلان: {bundle.clan.name}\n"
+    text += f"📅 انضم في: {join_date}"
+    return text
+
+
+def render_xp(bundle: ProfileBundle, first_name: str) -> str:
+    user_group, level = bundle.user_group, bundle.level
+    text = f"📊 إحصائيات {first_name}:\n\n"
+    text += f"⚡ XP: {format_number(user_group.xp)}\n"
+    text += f"🏆 المستوى: {level.level_number}\n"
+    text += f"{level.level_emoji} الرتبة: {level.level_name}\n"
+    if bundle.next_level:
+        needed_xp = bundle.next_level.required_xp - user_group.xp
+        text += f"📈 للمستوى التالي: {format_number(needed_xp)} XP\n"
+    text += f"💰 العملات: {format_number(user_group.coins)}\n"
+    text += f"📝 الرسائل: {format_number(user_group.total_messages)}"
+    return text
+
+
+def render_level(bundle: ProfileBundle, first_name: str) -> str:
+    level = bundle.level
+    text = f"🏆 مستوى {first_name}:\n\n"
+    text += f"{level.level_emoji} {level.level_name}\n"
+    text += f"🔢 المستوى: {level.level_number} من 55\n"
+    text += f"🏷️ الفئة: {level.category}\n"
+    text += f"⭐ الدرجة: {level.tier}\n"
+    text += f"⚡ XP المطلوب: {format_number(level.required_xp)}\n"
+    text += f"⚡ XP الحالي: {format_number(bundle.user_group.xp)}"
+    return text
+
+
+def render_progress(bundle: ProfileBundle, first_name: str) -> str:
+    current_level, next_level = bundle.level, bundle.next_level
+    if not next_level:
+        return "🎉 تهانينا! لقد وصلت للمستوى الأقصى!"
+    xp = bundle.user_group.xp
+    current_xp = xp - current_level.required_xp
+    needed_xp = next_level.required_xp - current_level.required_xp
+    progress_percent = (current_xp / needed_xp) * 100
+    remaining_xp = next_level.required_xp - xp
+    text = f"📈 تقدم {first_name}:\n\n"
+    text += f"🔸 المستوى الحالي: {current_level.level_emoji} {current_level.level_name}\n"
+    text += f"🔹 المستوى التالي: {next_level.level_emoji} {next_level.level_name}\n\n"
+    text += f"{get_progress_bar(progress_percent)}\n"
+    text += f"📊 التقدم: {progress_percent:.1f}%\n"
+    text += f"⚡ XP المطلوب: {format_number(remaining_xp)}\n"
+    text += f"📅 الرسائل المتبقية: ~{remaining_xp // 10}"
+    return text
+
+
+RENDERERS: Dict[str, Callable[[ProfileBundle, str], str]] = {
+    'profile': render_profile,
+    'xp': render_xp,
+    'level': render_level,
+    'progress': render_progress,
+}
+
+
+class _Card:
+    __slots__ = ('version', 'bundle', 'texts', 'stored_at')
+
+    def __init__(self, version: int):
+        self.version = version
+        self.bundle: Optional[ProfileBundle] = None
+        self.texts: Dict[Tuple[str, str], str] = {}
+        self.stored_at = 0.0
+
+
+class ProfileCardCache:
+    """بطاقة لكل (مستخدم، جروب) مع رقم إصدار يُرفع عند كل إبطال (LRU بحد أقصى)
+
+    ttl حد احتياطي للتغييرات التي لا تمر بهذه العملية (نسخ أخرى من البوت أو تعديل مباشر).
+    """
+
+    def __init__(self, max_entries: int = 50_000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._cards: "OrderedDict[Tuple[int, int], _Card]" = OrderedDict()
+        self._clock = itertools.count(1)
+
+    def _entry(self, key: Tuple[int, int]) -> _Card:
+        card = self._cards.get(key)
+        if card is None:
+            card = self._cards[key] = _Card(next(self._clock))
+            if len(self._cards) > self.max_entries:
+                self._cards.popitem(last=False)
+        else:
+            self._cards.move_to_end(key)
+        return card
+
+    def invalidate(self, user_id: int, group_id: int):
+        """إبطال البطاقة بعد أي كتابة تغير بيانات العضو (بدون I/O)"""
+        key = (user_id, group_id)
+        if key in self._cards:
+            self._cards[key] = _Card(next(self._clock))
+
+    async def render(self, user_id: int, group_id: int, kind: str, first_name: str,
+                     fetch: Callable[[int, int], Awaitable[Optional[ProfileBundle]]]) -> Optional[str]:
+        """نص البطاقة (None إن لم يكن العضو مسجلاً)"""
+        key = (user_id, group_id)
+        card = self._entry(key)
+        if card.bundle is None or time.monotonic() - card.stored_at >= self.ttl:
+            self.misses += 1
+            version = card.version
+            bundle = await fetch(user_id, group_id)
+            if bundle is None:
+                return None
+            current = self._cards.get(key)
+            if current is not None and current.version == version:
+                # لم يحدث إبطال أثناء الجلب: تخزين النتيجة
+                current.bundle, current.texts, current.stored_at = bundle, {}, time.monotonic()
+                card = current
+            else:
+                # أُبطلت أثناء الجلب: نعرض النتيجة بدون تخزين (البطاقة التالية تُجلب من جديد)
+                return RENDERERS[kind](bundle, first_name)
+        else:
+            self.hits += 1
+
+        text_key = (kind, first_name)
+        text = card.texts.get(text_key)
+        if text is None:
+            text = card.texts[text_key] = RENDERERS[kind](card.bundle, first_name)
+        return text
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._cards), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Quest Rollover - إنشاء مهام اليوم التالي مسبقاً لكل الأعضاء النشطين بدل إنشائها عند أول طلب
+
+المهام لكل مستوى تُحسب مرة واحدة من utils.calculate_daily_quest_difficulty وتُمرر كمصفوفات،
+وكل دفعة من الجروبات تُنشأ مهامها باستعلام INSERT ... SELECT واحد يربط user_groups بمستوى كل عضو
+(ON CONFLICT DO NOTHING فإعادة التشغيل آمنة). الدفعات تتوزع على window ثانية قبل منتصف الليل
+حتى لا تتزاحم الكتابات.
+
+يعمل داخل JobQueue الخاص بالبوت كل ليلة، أو يدوياً:
+    python quest_rollover.py [--backend supabase|postgres|sqlite] [--date 2026-01-01] [--window 0]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any, List, Iterable
+
+from dotenv import load_dotenv
+
+from models import Level
+from storage import available_backends, create_storage, open_storage, close_storage
+from utils import calculate_daily_quest_difficulty
+
+logger = logging.getLogger(__name__)
+
+# مكافأة كل نوع عند المستوى 0 (XP، عملات)، وتزيد بنفس نسبة صعوبة الهدف
+QUEST_REWARDS = {
+    'messages': (100, 50),
+    'xp_gain': (150, 75),
+    'coins_gain': (75, 100),
+}
+
+
+def quests_for_level(level_number: int) -> List[Dict[str, Any]]:
+    """المهام اليومية لعضو في المستوى level_number"""
+    base = calculate_daily_quest_difficulty(0)
+    targets = calculate_daily_quest_difficulty(level_number)
+    quests = []
+    for quest_type, (reward_xp, reward_coins) in QUEST_REWARDS.items():
+        scale = targets[quest_type] / base[quest_type]
+        quests.append({
+            'quest_type': quest_type,
+            'target_value': targets[quest_type],
+            'reward_xp': int(reward_xp * scale),
+            'reward_coins': int(reward_coins * scale),
+        })
+    return quests
+
+
+def quest_definitions(levels: Iterable[Level]) -> List[Dict[str, Any]]:
+    """صف لكل (مستوى، نوع مهمة) يربطه الاستعلام بـ level_id لكل عضو"""
+    return [
+        {'level_id': level.id, **quest}
+        for level in levels
+        for quest in quests_for_level(level.level_number)
+    ]
+
+
+class QuestRollover:
+    """إنشاء مهام quest_date لأعضاء آخر active_days يوماً على دفعات من الجروبات"""
+
+    def __init__(self, db, active_days: int = 7, window: float = 1800.0, chunk_size: int = 500):
+        self.db = db
+        self.active_days = active_days
+        # الثواني التي تتوزع عليها الدفعات (0 = بدون انتظار)
+        self.window = window
+        self.chunk_size = chunk_size
+        self.running = False
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    async def _group_chunks(self) -> List[List[int]]:
+        chunks, after_id = [], None
+        while True:
+            group_ids = await self.db.fetch_group_ids_chunk(after_id, self.chunk_size)
+            if group_ids:
+                chunks.append(group_ids)
+            if len(group_ids) < self.chunk_size:
+                return chunks
+            after_id = group_ids[-1]
+
+    async def run_once(self, quest_date: Optional[date] = None) -> Dict[str, Any]:
+        """إنشاء مهام اليوم التالي (أو quest_date) لكل الجروبات"""
+        if self.running:
+            logger.warning("إنشاء المهام قيد التشغيل بالفعل")
+            return self.last_run or {}
+
+        self.running = True
+        quest_date = quest_date or date.today() + timedelta(days=1)
+        active_since = datetime.combine(quest_date, datetime.min.time()) - timedelta(days=self.active_days)
+        stats = {
+            'started_at': datetime.now().isoformat(),
+            'quest_date': quest_date.isoformat(),
+            'chunks': 0,
+            'groups': 0,
+            'created': 0,
+            'max_chunk_seconds': 0.0,
+            'duration_seconds': 0.0,
+            'error': None
+        }
+        started = time.monotonic()
+
+        try:
+            quests = quest_definitions(await self.db.get_all_levels())
+            chunks = await self._group_chunks()
+            pause = self.window / len(chunks) if chunks else 0.0
+            for index, group_ids in enumerate(chunks):
+                chunk_started = time.monotonic()
+                stats['created'] += await self.db.generate_daily_quests(group_ids, quest_date, active_since, quests)
+                elapsed = time.monotonic() - chunk_started
+                stats['max_chunk_seconds'] = max(stats['max_chunk_seconds'], elapsed)
+                stats['chunks'] += 1
+                stats['groups'] += len(group_ids)
+                if index < len(chunks) - 1:
+                    await asyncio.sleep(max(pause - elapsed, 0.0))
+        except Exception as e:
+            stats['error'] = str(e)
+            logger.exception("خطأ في إنشاء المهام اليومية")
+        finally:
+            stats['duration_seconds'] = time.monotonic() - started
+            self.last_run = stats
+            self.running = False
+
+        logger.info(
+            "📋 مهام %s: %s مهمة جديدة في %s جروب (%s دفعة) خلال %.2f ث (أطول دفعة %.3f ث)",
+            stats['quest_date'], stats['created'], stats['groups'], stats['chunks'],
+            stats['duration_seconds'], stats['max_chunk_seconds']
+        )
+        return stats
+
+    async def job_callback(self, context):
+        """استدعاء من JobQueue الخاص بالبوت"""
+        await self.run_once()
+
+
+async def _main(args):
+    db = create_storage(args.backend)
+    await open_storage(db)
+
+    rollover = QuestRollover(db, args.active_days, args.window, args.chunk_size)
+    try:
+        await rollover.run_once(date.fromisoformat(args.date) if args.date else None)
+    finally:
+        await close_storage(db)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+    parser = argparse.ArgumentParser(description="إنشاء المهام اليومية مسبقاً للأعضاء النشطين")
+    parser.add_argument('--backend', choices=available_backends(), default=None,
+                        help="واجهة التخزين (افتراضياً STORAGE_BACKEND)")
+    parser.add_argument('--date', default=None, help="تاريخ المهام (افتراضياً الغد)")
+    parser.add_argument('--active-days', type=int, default=7)
+    parser.add_argument('--window', type=float, default=0.0, help="ثوانٍ تتوزع عليها الدفعات")
+    parser.add_argument('--chunk-size', type=int, default=500, help="عدد الجروبات في كل استعلام")
+    asyncio.run(_main(parser.parse_args()))
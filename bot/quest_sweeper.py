@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Quest Sweeper - تنظيف المهام اليومية القديمة وتجميعها في سجل المستخدم
+
+يعمل داخل JobQueue الخاص بالبوت عند بداية كل يوم، أو يدوياً:
+    python quest_sweeper.py [--backend supabase|postgres|sqlite] [--retention-days 2] [--archive]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Any
+
+from dotenv import load_dotenv
+
+from storage import available_backends, create_storage, open_storage, close_storage
+
+logger = logging.getLogger(__name__)
+
+
+class QuestSweeper:
+    """حذف/أرشفة المهام المنتهية على دفعات محدودة بعد تجميعها"""
+
+    def __init__(self, db, retention_days: int = 2, batch_size: int = 5_000,
+                 pause_seconds: float = 0.05, archive: bool = False):
+        self.db = db
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.archive = archive
+        self.running = False
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    async def run_once(self, today: Optional[date] = None) -> Dict[str, Any]:
+        """تنفيذ دورة تنظيف كاملة"""
+        if self.running:
+            logger.warning("تنظيف المهام قيد التشغيل بالفعل")
+            return self.last_run or {}
+
+        self.running = True
+        cutoff = (today or date.today()) - timedelta(days=self.retention_days)
+        stats = {
+            'started_at': datetime.now().isoformat(),
+            'cutoff': cutoff.isoformat(),
+            'batches': 0,
+            'deleted': 0,
+            'completed': 0,
+            'max_batch_seconds': 0.0,
+            'duration_seconds': 0.0,
+            'error': None
+        }
+        started = time.monotonic()
+
+        try:
+            while True:
+                batch_started = time.monotonic()
+                result = await self.db.sweep_daily_quests(cutoff, self.batch_size, self.archive)
+                stats['max_batch_seconds'] = max(stats['max_batch_seconds'], time.monotonic() - batch_started)
+                stats['batches'] += 1
+                stats['deleted'] += result['deleted']
+                stats['completed'] += result['completed']
+
+                if result['deleted'] < self.batch_size:
+                    break
+                # استراحة قصيرة حتى لا يحتكر التنظيف الجداول الساخنة
+                await asyncio.sleep(self.pause_seconds)
+        except Exception as e:
+            stats['error'] = str(e)
+            logger.exception("خطأ في تنظيف المهام اليومية")
+        finally:
+            stats['duration_seconds'] = time.monotonic() - started
+            self.last_run = stats
+            self.running = False
+
+        logger.info(
+            "🧹 تنظيف المهام: %s صف محذوف (%s مكتمل) في %s دفعة خلال %.2f ث (أطول دفعة %.3f ث)",
+            stats['deleted'], stats['completed'], stats['batches'],
+            stats['duration_seconds'], stats['max_batch_seconds']
+        )
+        return stats
+
+    async def job_callback(self, context):
+        """استدعاء من JobQueue الخاص بالبوت"""
+        await self.run_once()
+
+
+async def _main(args):
+    db = create_storage(args.backend)
+    await open_storage(db)
+
+    sweeper = QuestSweeper(db, args.retention_days, args.batch_size, archive=args.archive)
+    try:
+        await sweeper.run_once()
+    finally:
+        await close_storage(db)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+    parser = argparse.ArgumentParser(description="تنظيف المهام اليومية القديمة")
+    parser.add_argument('--backend', choices=available_backends(), default=None,
+                        help="واجهة التخزين (افتراضياً STORAGE_BACKEND)")
+    parser.add_argument('--retention-days', type=int, default=2)
+    parser.add_argument('--batch-size', type=int, default=5_000)
+    parser.add_argument('--archive', action='store_true', help="نسخ الصفوف إلى daily_quests_archive قبل حذفها")
+    asyncio.run(_main(parser.parse_args()))
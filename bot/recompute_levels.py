@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Recompute Levels - إعادة حساب مستويات جميع المستخدمين بعد تعديل منحنى XP
+
+الاستخدام:
+    python recompute_levels.py [--backend supabase|postgres|sqlite] [--chunk-size 10000] [--restart]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from bisect import bisect_right
+from typing import Optional, List, Dict, Callable
+
+from dotenv import load_dotenv
+
+from models import Level
+from storage import available_backends, create_storage, open_storage, close_storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = '.recompute_levels.json'
+
+
+class LevelTable:
+    """جدول عتبات المستويات للبحث الثنائي السريع"""
+
+    def __init__(self, levels: List[Level]):
+        ordered = sorted(levels, key=lambda level: level.required_xp)
+        if not ordered:
+            raise ValueError("جدول المستويات فارغ!")
+        self.levels = ordered
+        self.thresholds = [level.required_xp for level in ordered]
+        self.level_ids = [level.id for level in ordered]
+        self.by_id = {level.id: level for level in ordered}
+
+    def fingerprint(self) -> str:
+        """بصمة العتبات لاكتشاف تغير المنحنى بين التشغيلات"""
+        raw = ",".join(f"{i}:{xp}" for i, xp in zip(self.level_ids, self.thresholds))
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def level_for_xp(self, xp: int) -> Level:
+        """المستوى المناسب لكمية XP"""
+        index = bisect_right(self.thresholds, xp) - 1
+        return self.levels[max(index, 0)]
+
+    def map_level_ids(self, xps: List[int]) -> List[int]:
+        """تحويل قائمة XP إلى معرفات المستويات (مثل searchsorted)"""
+        thresholds = self.thresholds
+        level_ids = self.level_ids
+        return [level_ids[max(bisect_right(thresholds, xp) - 1, 0)] for xp in xps]
+
+
+def _load_checkpoint(path: str, fingerprint: str) -> Dict:
+    if path and os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('fingerprint') == fingerprint and not state.get('finished'):
+            return state
+    return {'fingerprint': fingerprint, 'last_id': 0, 'scanned': 0, 'changed': 0, 'finished': False}
+
+
+def _save_checkpoint(path: str, state: Dict):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+async def recompute_levels(db, chunk_size: int = 10_000, checkpoint_path: Optional[str] = DEFAULT_CHECKPOINT,
+                           restart: bool = False, progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """إعادة حساب level_id لكل صفوف user_groups على دفعات قابلة للاستئناف"""
+    table = LevelTable(await db.get_all_levels())
+    state = _load_checkpoint(None if restart else checkpoint_path, table.fingerprint())
+    total = await db.count_user_groups()
+    started = time.monotonic()
+
+    if state['last_id']:
+        logger.info("استئناف إعادة الحساب من id=%s", state['last_id'])
+
+    # جلب الدفعة التالية بالتوازي مع كتابة الدفعة الحالية
+    next_chunk = asyncio.create_task(db.fetch_user_groups_chunk(state['last_id'], chunk_size))
+    # خطأ في القراءة أو الكتابة يوقف التشغيل بدون تقديم last_id أو تعيين finished (الاستئناف يعيد الدفعة)
+    try:
+        while True:
+            rows = await next_chunk
+            if not rows:
+                break
+            next_chunk = asyncio.create_task(db.fetch_user_groups_chunk(rows[-1]['id'], chunk_size))
+
+            new_level_ids = table.map_level_ids([row['xp'] or 0 for row in rows])
+            changed_ids, changed_levels = [], []
+            for row, level_id in zip(rows, new_level_ids):
+                if row['level_id'] != level_id:
+                    changed_ids.append(row['id'])
+                    changed_levels.append(level_id)
+
+            if changed_ids:
+                await db.bulk_update_level_ids(changed_ids, changed_levels)
+
+            state['last_id'] = rows[-1]['id']
+            state['scanned'] += len(rows)
+            state['changed'] += len(changed_ids)
+            _save_checkpoint(checkpoint_path, state)
+
+            elapsed = time.monotonic() - started
+            report = {
+                'scanned': state['scanned'],
+                'changed': state['changed'],
+                'total': total,
+                'rows_per_sec': state['scanned'] / elapsed if elapsed else 0.0,
+                'last_id': state['last_id']
+            }
+            if progress:
+                progress(report)
+            else:
+                logger.info(
+                    "إعادة الحساب: %s/%s صف، %s تغيير، %.0f صف/ث",
+                    report['scanned'], total or '?', report['changed'], report['rows_per_sec']
+                )
+    except BaseException:
+        next_chunk.cancel()
+        logger.error("توقفت إعادة الحساب عند id=%s، أعد التشغيل للاستئناف", state['last_id'])
+        raise
+
+    state['finished'] = True
+    _save_checkpoint(checkpoint_path, state)
+    logger.info("✅ انتهت إعادة حساب المستويات: %s صف، %s تغيير", state['scanned'], state['changed'])
+    return state
+
+
+async def _main(args):
+    db = create_storage(args.backend)
+    await open_storage(db)
+
+    try:
+        await recompute_levels(db, args.chunk_size, args.checkpoint, args.restart)
+    finally:
+        await close_storage(db)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+    parser = argparse.ArgumentParser(description="إعادة حساب مستويات المستخدمين")
+    parser.add_argument('--backend', choices=available_backends(), default=None,
+                        help="واجهة التخزين (افتراضياً STORAGE_BACKEND)")
+    parser.add_argument('--chunk-size', type=int, default=10_000)
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    parser.add_argument('--restart', action='store_true', help="تجاهل نقطة الاستئناف والبدء من الصفر")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Resilience - مهلة لكل عملية، إعادة محاولة القراءات، وقاطع دائرة لقاعدة البيانات
+
+كل دوال واجهة التخزين تُغلف (مثل instrument_database):
+- مهلة لكل عملية (القراءة أقصر من الكتابة، والعمليات الدورية الكبيرة أطول)
+- القراءات (get_/fetch_/count_) تُعاد عند الأخطاء العابرة بتأخير أسي عشوائي (full jitter)
+- بعد failure_threshold أخطاء عابرة متتالية يُفتح القاطع: العمليات تفشل فوراً (CircuitOpenError)
+  بدل انتظار المهلة مع كل رسالة، وبعد reset_timeout تمر محاولة واحدة لاختبار القاعدة
+- كتابات مسار الرسائل أثناء فتح القاطع تُحفظ في سجل NDJSON محلي وتُعاد بالترتيب عند الإغلاق
+
+SupabaseManager يلتقط أخطاءه بنفسه، فيبلغ عنها بـ mark_failure() ليحتسبها القاطع.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, date
+from typing import Optional, Dict, Any, List, Tuple
+
+from metrics import REGISTRY, _public_coroutines
+
+logger = logging.getLogger(__name__)
+
+READ_PREFIXES = ('get_', 'fetch_', 'count_')
+
+# كتابات مسار الرسائل التي يمكن تأجيلها (معاملاتها قابلة للحفظ ولا ينتظر المستخدم نتيجتها)
+JOURNALED_WRITES = {
+    'add_group_if_not_exists', 'add_user_to_group_if_not_exists', 'update_user_stats', 'update_user_level',
+    'log_message', 'award_badge', 'create_daily_quest', 'update_daily_quest_progress', 'append_outbox_events',
+    'add_group_activity',
+}
+
+# ما تعيده الكتابة المؤجلة للمستدعي (log_message: الرسالة سُجلت ويُكمل المنح)
+JOURNALED_RESULTS = {'log_message': True}
+
+# كتابات المنح التابعة لآخر log_message مؤجل لنفس (user_id, group_id): تُحذف عند الإعادة إن كانت
+# الرسالة قد سُجلت في هذه الأثناء (تحديث أُعيد تسليمه بعد عودة القاعدة)، فلا يُمنح مرتين
+AWARD_WRITES = {'update_user_stats', 'update_user_level', 'award_badge', 'update_daily_quest_progress'}
+
+# رموز PostgreSQL/PostgREST لأخطاء الاتصال والضغط (غيرها خطأ في الطلب نفسه)
+TRANSIENT_CODES = {'57014', '53300', '57P01', '57P03', '08000', '08003', '08006', 'PGRST000', 'PGRST001', 'PGRST002'}
+
+# asyncio.timeout (3.11+) لا ينشئ مهمة لكل استدعاء مثل wait_for
+_timeout = getattr(asyncio, 'timeout', None)
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+_STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+_call_failed: contextvars.ContextVar[Optional[List[bool]]] = contextvars.ContextVar('resilience_call_failed',
+                                                                                      default=None)
+
+
+class CircuitOpenError(Exception):
+    """القاطع مفتوح: قاعدة البيانات غير متاحة حالياً"""
+
+
+def is_transient(error: BaseException) -> bool:
+    """خطأ اتصال أو مهلة أو ضغط على الخادم (إعادة المحاولة قد تنجح)"""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, OSError)):
+        return True
+    if str(getattr(error, 'code', '')) in TRANSIENT_CODES or getattr(error, 'sqlstate', None) in TRANSIENT_CODES:
+        return True
+    module, name = type(error).__module__ or '', type(error).__name__
+    if module.startswith(('httpx', 'httpcore')):
+        return True
+    if module.startswith('asyncpg'):
+        return any(word in name for word in ('Connection', 'Interface', 'TooMany', 'CannotConnect'))
+    return module == 'sqlite3' and name == 'OperationalError'
+
+
+def mark_failure(error: BaseException):
+    """إبلاغ القاطع بخطأ عُولج داخل الدالة (الدالة تعيد None أو [] بدل رفعه)"""
+    failed = _call_failed.get()
+    if failed is not None and is_transient(error):
+        failed[0] = True
+
+
+@dataclass
+class ResiliencePolicy:
+    read_timeout: float = 2.0
+    write_timeout: float = 5.0
+    timeouts: Dict[str, float] = field(default_factory=lambda: {
+        'sweep_daily_quests': 300.0, 'refresh_group_daily_stats': 120.0, 'bulk_update_level_ids': 60.0,
+        'fetch_user_groups_chunk': 30.0, 'count_user_groups': 30.0, 'generate_daily_quests': 60.0,
+    })
+    retries: int = 2
+    backoff_base: float = 0.05
+    backoff_max: float = 1.0
+    failure_threshold: int = 5
+    reset_timeout: float = 10.0
+
+    @classmethod
+    def from_env(cls) -> 'ResiliencePolicy':
+        return cls(
+            read_timeout=float(os.getenv('DB_READ_TIMEOUT', '2')),
+            write_timeout=float(os.getenv('DB_WRITE_TIMEOUT', '5')),
+            failure_threshold=int(os.getenv('DB_BREAKER_THRESHOLD', '5')),
+            reset_timeout=float(os.getenv('DB_BREAKER_RESET', '10')),
+        )
+
+    def timeout_for(self, name: str) -> float:
+        return self.timeouts.get(name) or (self.read_timeout if name.startswith(READ_PREFIXES) else self.write_timeout)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """مغلق → مفتوح بعد أخطاء متتالية → نصف مفتوح بعد المهلة (محاولة واحدة) → مغلق أو مفتوح"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0, name: str = 'db'):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.name = name
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.on_close = None
+        self._publish()
+
+    def _publish(self):
+        REGISTRY.set_gauge(f"{self.name}.circuit_state", _STATE_GAUGE[self.state])
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            logger.warning("قاطع %s: %s → %s", self.name, self.state, state)
+            self.state = state
+            self._publish()
+
+    def allow(self) -> bool:
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def release_probe(self):
+        """انتهت محاولة الاختبار بدون دليل على صحة القاعدة أو تعطلها: تمر المحاولة التالية"""
+        self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+            if self.on_close:
+                self.on_close()
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {'$datetime': value.isoformat()}
+    if isinstance(value, date):
+        return {'$date': value.isoformat()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(type(value).__name__)
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if isinstance(value, dict):
+        if '$datetime' in value:
+            return datetime.fromisoformat(value['$datetime'])
+        if '$date' in value:
+            return date.fromisoformat(value['$date'])
+        return {key: _decode(item) for key, item in value.items()}
+    return value
+
+
+class WriteJournal:
+    """كتابات مؤجلة بالترتيب: في الذاكرة ونسخة NDJSON على القرص (تبقى بعد إعادة التشغيل)"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 100_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries: deque = deque()
+        self.dropped = 0
+        self._file = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _publish(self):
+        REGISTRY.set_gauge('db.journal_pending', len(self.entries))
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    self.entries.append(json.loads(line))
+        self._publish()
+        if self.entries:
+            logger.warning("📒 %d كتابة مؤجلة من التشغيل السابق", len(self.entries))
+
+    def append(self, operation: str, args: tuple, kwargs: dict, award: Optional[str] = None) -> bool:
+        """False إن امتلأ السجل أو لم تكن المعاملات قابلة للحفظ (award: مفتاح الرسالة التي يتبعها المنح)"""
+        if len(self.entries) >= self.max_entries:
+            self.dropped += 1
+            REGISTRY.count_error('db.journal_dropped')
+            return False
+        try:
+            entry = {'op': operation, 'args': _encode(args), 'kwargs': _encode(kwargs), 'at': time.time()}
+        except TypeError:
+            return False
+        if award:
+            entry['award'] = award
+        self.entries.append(entry)
+        if self.path:
+            if self._file is None:
+                self._file = open(self.path, 'a', encoding='utf-8')
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._file.flush()
+        self._publish()
+        return True
+
+    def rewrite(self):
+        """مزامنة الملف مع ما بقي في الذاكرة بعد الإعادة (كتابة ذرية)"""
+        self._publish()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if not self.path:
+            return
+        if not self.entries:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def discard_award(self, award: str) -> int:
+        """حذف كتابات المنح التابعة لرسالة سُجلت من قبل"""
+        before = len(self.entries)
+        self.entries = deque(entry for entry in self.entries if entry.get('award') != award)
+        return before - len(self.entries)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class Resilience:
+    """تغليف واجهة التخزين بالمهلات وإعادة المحاولة والقاطع وسجل الكتابات المؤجلة"""
+
+    def __init__(self, policy: Optional[ResiliencePolicy] = None, journal_path: Optional[str] = None):
+        self.policy = policy or ResiliencePolicy()
+        self.breaker = CircuitBreaker(self.policy.failure_threshold, self.policy.reset_timeout)
+        self.breaker.on_close = self._schedule_replay
+        self.journal = WriteJournal(journal_path)
+        self._raw: Dict[str, Any] = {}
+        self._replay_task: Optional[asyncio.Task] = None
+        self._replay_lock = asyncio.Lock()
+        # آخر log_message مؤجل لكل (user_id, group_id)
+        self._journaled_logs: Dict[Tuple[Any, Any], str] = {}
+
+    def _award_key(self, name: str, args: tuple) -> Optional[str]:
+        if len(args) < 2:
+            return None
+        if name == 'log_message':
+            key = ':'.join(str(arg) for arg in args[:3])
+            self._journaled_logs[(args[0], args[1])] = key
+            return key
+        if name in AWARD_WRITES:
+            return self._journaled_logs.get((args[0], args[1]))
+        return None
+
+    async def _attempt(self, name: str, func, args, kwargs) -> Tuple[bool, Any]:
+        """محاولة واحدة: (نجحت؟، النتيجة أو الخطأ)"""
+        failed = [False]
+        token = _call_failed.set(failed)
+        try:
+            if _timeout is not None:
+                async with _timeout(self.policy.timeout_for(name)):
+                    result = await func(*args, **kwargs)
+            else:
+                result = await asyncio.wait_for(func(*args, **kwargs), self.policy.timeout_for(name))
+        except Exception as e:
+            if not is_transient(e):
+                # خطأ في الطلب نفسه وليس في القاعدة: لا يُحتسب على القاطع ولا يغلقه
+                self.breaker.release_probe()
+                raise
+            return False, e
+        finally:
+            _call_failed.reset(token)
+        return not failed[0], result
+
+    def _wrap(self, name: str, func):
+        is_read = name.startswith(READ_PREFIXES)
+        attempts = 1 + self.policy.retries if is_read else 1
+
+        async def wrapper(*args, **kwargs):
+            if not self.breaker.allow():
+                REGISTRY.count_error("db.circuit_open")
+                if name in JOURNALED_WRITES and self.journal.append(name, args, kwargs,
+                                                                    self._award_key(name, args)):
+                    return JOURNALED_RESULTS.get(name)
+                raise CircuitOpenError(f"قاعدة البيانات غير متاحة ({name})")
+            if name == 'log_message' and len(args) >= 2:
+                # المنح التالي يتبع هذه الرسالة المسجلة مباشرة، لا رسالة مؤجلة سابقة
+                self._journaled_logs.pop((args[0], args[1]), None)
+            outcome = None
+            for attempt in range(attempts):
+                ok, outcome = await self._attempt(name, func, args, kwargs)
+                if ok:
+                    self.breaker.record_success()
+                    return outcome
+                self.breaker.record_failure()
+                if attempt + 1 < attempts and self.breaker.allow():
+                    REGISTRY.count_error("db.retry")
+                    await asyncio.sleep(self.policy.backoff(attempt))
+                    continue
+                break
+            if isinstance(outcome, BaseException):
+                raise outcome
+            # SupabaseManager عالج الخطأ وأعاد قيمته الافتراضية (None أو [])
+            return outcome
+
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def protect(self, db):
+        """تغليف كل دوال الواجهة العامة (قبل instrument_database)"""
+        for name in _public_coroutines(db, exclude=('connect', 'disconnect', 'listen')):
+            self._raw[name] = getattr(db, name)
+            setattr(db, name, self._wrap(name, self._raw[name]))
+        return db
+
+    def _schedule_replay(self):
+        if self.journal.entries and (self._replay_task is None or self._replay_task.done()):
+            try:
+                self._replay_task = asyncio.get_running_loop().create_task(self.replay())
+            except RuntimeError:
+                pass
+
+    async def replay(self) -> int:
+        """إعادة الكتابات المؤجلة بالترتيب حتى أول فشل"""
+        done = skipped = 0
+        async with self._replay_lock:
+            while self.journal.entries:
+                entry = self.journal.entries[0]
+                func = self._raw[entry['op']]
+                result = None
+                try:
+                    ok, result = await self._attempt(entry['op'], func, _decode(entry['args']),
+                                                     _decode(entry['kwargs']))
+                except Exception as e:
+                    # لن تنجح أبداً (خطأ في الطلب): تُحذف حتى لا توقف ما بعدها
+                    logger.error("حذف كتابة مؤجلة فاشلة %s: %s", entry['op'], e)
+                    ok = True
+                if not ok:
+                    self.breaker.record_failure()
+                    break
+                self.journal.entries.popleft()
+                done += 1
+                if entry['op'] == 'log_message' and result is False and entry.get('award'):
+                    # الرسالة سُجلت ومُنحت من قبل (تحديث أُعيد تسليمه): منحها المؤجل لا يُعاد
+                    skipped += self.journal.discard_award(entry['award'])
+            await asyncio.to_thread(self.journal.rewrite)
+        if done:
+            logger.info("📒 تمت إعادة %d كتابة مؤجلة (تخطي %d منح مكرر، متبقٍ %d)", done, skipped, len(self.journal))
+        return done
+
+    async def start(self):
+        """تحميل ما بقي من التشغيل السابق وإعادته"""
+        self.journal.load()
+        if self.journal.entries:
+            await self.replay()
+
+    async def stop(self):
+        if self._replay_task:
+            self._replay_task.cancel()
+            self._replay_task = None
+        self.journal.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'state': self.breaker.state, 'failures': self.breaker.failures,
+                'journal_pending': len(self.journal), 'journal_dropped': self.journal.dropped}
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Seasons - مواسم XP لكل جروب: ترتيب يبدأ من الصفر كل season_days يوماً بدون المساس بـ XP والمستويات
+
+بدء الموسم لا يلمس user_groups: يزيد group_settings.season_id فقط (وينشر التغيير عبر NOTIFY أو الاستطلاع)،
+ومسار المنح يمرر الموسم الحالي إلى update_user_stats فيبدأ كل عضو الموسم الجديد عند أول رسالة فيه،
+مع الاحتفاظ بـ XP الموسم السابق في prev_season_xp. بعد archive_delay ثانية (حتى تصل النسخة الجديدة من
+الإعدادات لكل العمليات) يُنسخ الترتيب النهائي إلى season_standings باستعلام INSERT ... SELECT واحد.
+
+يعمل داخل JobQueue الخاص بالبوت كل ساعة، أو يدوياً:
+    python seasons.py run
+    python seasons.py start GROUP_ID
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, Dict
+
+from dotenv import load_dotenv
+
+from models import GroupSettings
+from storage import available_backends, create_storage, open_storage, close_storage
+
+logger = logging.getLogger(__name__)
+
+
+class SeasonManager:
+    """بدء المواسم المستحقة وأرشفة المنتهية منها"""
+
+    def __init__(self, db, group_settings=None, archive_delay: float = 600.0):
+        self.db = db
+        # GroupSettingsStore للبوت (None في سطر الأوامر)
+        self.group_settings = group_settings
+        self.archive_delay = archive_delay
+        self.last_run: Optional[Dict[str, int]] = None
+
+    async def start_new_season(self, group_id: int, current_season: int,
+                               started_by: Optional[int] = None) -> Optional[GroupSettings]:
+        """بدء الموسم التالي لـ current_season (None إن بدأ من قبل أو الموسم السابق لم يُؤرشف بعد)"""
+        settings = await self.db.start_season(group_id, current_season + 1, started_by)
+        if settings is not None:
+            logger.info("🏁 بدء الموسم %s في الجروب %s", settings.season_id, group_id)
+            if self.group_settings is not None:
+                await self.group_settings.refresh_group(group_id)
+        return settings
+
+    async def archive_due(self, now: Optional[datetime] = None) -> int:
+        """أرشفة المواسم المنتهية منذ archive_delay ثانية على الأقل"""
+        now = now or datetime.now()
+        archived = 0
+        for season in await self.db.get_unarchived_seasons(now - timedelta(seconds=self.archive_delay)):
+            members = await self.db.archive_season(season.group_id, season.season_id)
+            logger.info("🏆 أرشفة الموسم %s في الجروب %s (%s عضو)", season.season_id, season.group_id, members)
+            archived += 1
+        return archived
+
+    async def roll_due(self, now: Optional[datetime] = None) -> int:
+        """بدء موسم جديد للجروبات التي انتهت مدة موسمها"""
+        started = 0
+        for row in await self.db.get_due_seasons(now or datetime.now()):
+            if await self.start_new_season(row['group_id'], row['season_id']) is not None:
+                started += 1
+        return started
+
+    async def run(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """الأرشفة أولاً: الموسم لا يبدأ والسابق له ما زال بدون أرشفة"""
+        self.last_run = {'archived': await self.archive_due(now), 'started': await self.roll_due(now)}
+        return self.last_run
+
+    async def job_callback(self, context):
+        """استدعاء من JobQueue الخاص بالبوت"""
+        try:
+            await self.run()
+        except Exception as e:
+            logger.error("خطأ في تحديث المواسم: %s", e)
+
+
+async def _main(args):
+    db = create_storage(args.backend)
+    await open_storage(db)
+    try:
+        manager = SeasonManager(db, archive_delay=args.archive_delay)
+        if args.command == 'start':
+            settings = await db.get_group_settings(args.group_id)
+            started = await manager.start_new_season(args.group_id, settings.season_id if settings else 1)
+            print(f"الموسم {started.season_id}" if started else "لم يبدأ موسم جديد (الموسم السابق لم يُؤرشف بعد؟)")
+        else:
+            print(await manager.run())
+    finally:
+        await close_storage(db)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+
+    parser = argparse.ArgumentParser(description="مواسم XP للجروبات")
+    parser.add_argument('--backend', choices=available_backends(), default=None,
+                        help="واجهة التخزين (افتراضياً STORAGE_BACKEND)")
+    parser.add_argument('--archive-delay', type=float, default=600.0,
+                        help="ثوانٍ بين انتهاء الموسم وأرشفة ترتيبه")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('run', help="أرشفة المواسم المنتهية وبدء المستحقة")
+    start = commands.add_parser('start', help="بدء موسم جديد لجروب الآن")
+    start.add_argument('group_id', type=int)
+    asyncio.run(_main(parser.parse_args()))
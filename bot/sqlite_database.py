@@ -0,0 +1,1106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite Database Manager - قاعدة بيانات مدمجة (SQLite بوضع WAL) للتشغيل على خادم واحد والاختبارات
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import sqlite3
+from dataclasses import fields
+from datetime import datetime, date
+from typing import Optional, List, Dict, Any, Callable
+
+from models import (
+    User, UserGroup, Level, ShopItem, Badge, DailyQuest, Clan, GroupSettings, GROUP_SETTING_FIELDS, ProfileBundle,
+    Season
+)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', 'database', 'schema.sql')
+
+NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS groups (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    username TEXT,
+    description TEXT,
+    created_at TEXT DEFAULT ({NOW}),
+    updated_at TEXT DEFAULT ({NOW}),
+    is_active INTEGER DEFAULT 1
+);
+
+CREATE TABLE IF NOT EXISTS group_settings (
+    group_id INTEGER PRIMARY KEY,
+    xp_cooldown INTEGER NOT NULL DEFAULT 60,
+    min_xp INTEGER NOT NULL DEFAULT 5,
+    max_xp INTEGER NOT NULL DEFAULT 15,
+    min_coins INTEGER NOT NULL DEFAULT 1,
+    max_coins INTEGER NOT NULL DEFAULT 10,
+    season_days INTEGER NOT NULL DEFAULT 0,
+    season_id INTEGER NOT NULL DEFAULT 1,
+    updated_by INTEGER,
+    updated_at TEXT DEFAULT ({NOW})
+);
+CREATE INDEX IF NOT EXISTS idx_group_settings_updated_at ON group_settings (updated_at);
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    language_code TEXT DEFAULT 'ar',
+    is_bot INTEGER DEFAULT 0,
+    created_at TEXT DEFAULT ({NOW}),
+    updated_at TEXT DEFAULT ({NOW})
+);
+CREATE INDEX IF NOT EXISTS idx_users_username ON users (lower(username));
+
+CREATE TABLE IF NOT EXISTS levels (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    level_number INTEGER NOT NULL UNIQUE,
+    level_name TEXT NOT NULL,
+    level_emoji TEXT NOT NULL,
+    required_xp INTEGER NOT NULL,
+    category TEXT NOT NULL,
+    tier INTEGER NOT NULL CHECK (tier BETWEEN 1 AND 5),
+    created_at TEXT DEFAULT ({NOW})
+);
+CREATE INDEX IF NOT EXISTS idx_required_xp ON levels (required_xp);
+
+CREATE TABLE IF NOT EXISTS user_groups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    xp INTEGER DEFAULT 0,
+    level_id INTEGER DEFAULT 1 REFERENCES levels(id),
+    coins INTEGER DEFAULT 0,
+    total_messages INTEGER DEFAULT 0,
+    last_message_at TEXT NULL,
+    last_xp_gain TEXT NULL,
+    clan_id INTEGER NULL,
+    is_active INTEGER DEFAULT 1,
+    season_id INTEGER NOT NULL DEFAULT 1,
+    season_xp INTEGER DEFAULT 0,
+    prev_season_id INTEGER NULL,
+    prev_season_xp INTEGER DEFAULT 0,
+    joined_at TEXT DEFAULT ({NOW}),
+    updated_at TEXT DEFAULT ({NOW}),
+    UNIQUE (user_id, group_id)
+);
+CREATE INDEX IF NOT EXISTS idx_group_xp ON user_groups (group_id, xp DESC, user_id DESC);
+CREATE INDEX IF NOT EXISTS idx_group_season_xp ON user_groups (group_id, season_id, season_xp DESC, user_id DESC);
+CREATE INDEX IF NOT EXISTS idx_clan ON user_groups (clan_id);
+
+CREATE TABLE IF NOT EXISTS shop_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    price INTEGER NOT NULL,
+    item_type TEXT NOT NULL,
+    effect_type TEXT NOT NULL,
+    effect_value REAL NOT NULL,
+    duration_hours REAL DEFAULT 0,
+    is_active INTEGER DEFAULT 1,
+    created_at TEXT DEFAULT ({NOW})
+);
+
+CREATE TABLE IF NOT EXISTS user_inventory (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    item_id INTEGER NOT NULL REFERENCES shop_items(id),
+    quantity INTEGER DEFAULT 1,
+    purchased_at TEXT DEFAULT ({NOW}),
+    expires_at TEXT NULL,
+    is_active INTEGER DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_user_group_item ON user_inventory (user_id, group_id, item_id);
+
+CREATE TABLE IF NOT EXISTS badges (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    emoji TEXT NOT NULL,
+    category TEXT NOT NULL,
+    requirement_type TEXT NOT NULL,
+    requirement_value INTEGER NOT NULL,
+    rarity TEXT DEFAULT 'common',
+    is_active INTEGER DEFAULT 1,
+    created_at TEXT DEFAULT ({NOW})
+);
+
+CREATE TABLE IF NOT EXISTS user_badges (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    badge_id INTEGER NOT NULL REFERENCES badges(id),
+    earned_at TEXT DEFAULT ({NOW}),
+    UNIQUE (user_id, group_id, badge_id)
+);
+
+CREATE TABLE IF NOT EXISTS daily_quests (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    quest_type TEXT NOT NULL,
+    target_value INTEGER NOT NULL,
+    current_progress INTEGER DEFAULT 0,
+    reward_xp INTEGER NOT NULL,
+    reward_coins INTEGER NOT NULL,
+    is_completed INTEGER DEFAULT 0,
+    quest_date TEXT NOT NULL,
+    completed_at TEXT NULL,
+    created_at TEXT DEFAULT ({NOW}),
+    UNIQUE (user_id, group_id, quest_type, quest_date)
+);
+CREATE INDEX IF NOT EXISTS idx_quest_date ON daily_quests (quest_date);
+
+CREATE TABLE IF NOT EXISTS daily_quests_archive (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    group_id INTEGER NOT NULL,
+    quest_type TEXT NOT NULL,
+    target_value INTEGER NOT NULL,
+    current_progress INTEGER DEFAULT 0,
+    reward_xp INTEGER NOT NULL,
+    reward_coins INTEGER NOT NULL,
+    is_completed INTEGER DEFAULT 0,
+    quest_date TEXT NOT NULL,
+    completed_at TEXT NULL,
+    created_at TEXT NULL,
+    archived_at TEXT DEFAULT ({NOW})
+);
+
+CREATE TABLE IF NOT EXISTS user_quest_history (
+    user_id INTEGER NOT NULL,
+    group_id INTEGER NOT NULL,
+    quests_completed INTEGER DEFAULT 0,
+    quests_expired INTEGER DEFAULT 0,
+    total_reward_xp INTEGER DEFAULT 0,
+    total_reward_coins INTEGER DEFAULT 0,
+    last_quest_date TEXT NULL,
+    updated_at TEXT DEFAULT ({NOW}),
+    PRIMARY KEY (user_id, group_id)
+);
+
+CREATE TABLE IF NOT EXISTS clans (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    description TEXT,
+    leader_user_id INTEGER NOT NULL REFERENCES users(id),
+    group_id INTEGER NOT NULL REFERENCES groups(id) ON DELETE CASCADE,
+    total_xp INTEGER DEFAULT 0,
+    member_count INTEGER DEFAULT 1,
+    max_members INTEGER DEFAULT 20,
+    created_at TEXT DEFAULT ({NOW}),
+    updated_at TEXT DEFAULT ({NOW}),
+    UNIQUE (name, group_id)
+);
+
+CREATE TABLE IF NOT EXISTS message_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    group_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    xp_gained INTEGER DEFAULT 0,
+    coins_gained INTEGER DEFAULT 0,
+    message_type TEXT DEFAULT 'text',
+    created_at TEXT DEFAULT ({NOW})
+);
+CREATE INDEX IF NOT EXISTS idx_group_date ON message_logs (group_id, created_at);
+-- التحديث المكرر لا يُسجل مرتين (log_message: ON CONFLICT DO NOTHING)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_group_message ON message_logs (group_id, message_id);
+
+CREATE TABLE IF NOT EXISTS group_daily_stats (
+    group_id INTEGER NOT NULL,
+    stat_date TEXT NOT NULL,
+    messages INTEGER DEFAULT 0,
+    active_users INTEGER DEFAULT 0,
+    xp_gained INTEGER DEFAULT 0,
+    coins_gained INTEGER DEFAULT 0,
+    updated_at TEXT DEFAULT ({NOW}),
+    PRIMARY KEY (group_id, stat_date)
+);
+
+CREATE TABLE IF NOT EXISTS group_activity (
+    group_id INTEGER NOT NULL,
+    hour_of_week INTEGER NOT NULL,
+    messages INTEGER DEFAULT 0,
+    updated_at TEXT DEFAULT ({NOW}),
+    PRIMARY KEY (group_id, hour_of_week)
+);
+
+CREATE TABLE IF NOT EXISTS activity_sketches (
+    group_id INTEGER NOT NULL,
+    sketch_date TEXT NOT NULL,
+    sketch BLOB NOT NULL,
+    updated_at TEXT DEFAULT ({NOW}),
+    PRIMARY KEY (group_id, sketch_date)
+);
+
+CREATE TABLE IF NOT EXISTS seasons (
+    group_id INTEGER NOT NULL,
+    season_id INTEGER NOT NULL,
+    started_at TEXT NULL,
+    ended_at TEXT NULL,
+    archived_at TEXT NULL,
+    started_by INTEGER NULL,
+    members INTEGER DEFAULT 0,
+    PRIMARY KEY (group_id, season_id)
+);
+
+CREATE TABLE IF NOT EXISTS season_standings (
+    group_id INTEGER NOT NULL,
+    season_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    xp INTEGER NOT NULL,
+    season_rank INTEGER NOT NULL,
+    PRIMARY KEY (group_id, season_id, user_id)
+);
+CREATE INDEX IF NOT EXISTS idx_season_rank ON season_standings (group_id, season_id, season_rank);
+
+CREATE TABLE IF NOT EXISTS event_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_type TEXT NOT NULL,
+    group_id INTEGER,
+    user_id INTEGER,
+    payload TEXT NOT NULL,
+    created_at TEXT DEFAULT ({NOW})
+);
+
+CREATE TABLE IF NOT EXISTS admin_actions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    admin_user_id INTEGER NOT NULL,
+    target_user_id INTEGER NOT NULL,
+    group_id INTEGER NOT NULL,
+    action_type TEXT NOT NULL,
+    amount INTEGER DEFAULT 0,
+    reason TEXT,
+    created_at TEXT DEFAULT ({NOW})
+);
+"""
+
+_SEED_STATEMENT = re.compile(r"INSERT INTO (levels|shop_items|badges) .*?;", re.DOTALL)
+
+
+def _seed_statements(schema_path: str = SCHEMA_PATH) -> List[str]:
+    """استخراج بيانات المستويات والمتجر والشارات من schema.sql"""
+    with open(schema_path, 'r', encoding='utf-8') as f:
+        sql = f.read()
+    return [statement.replace("INSERT INTO", "INSERT OR IGNORE INTO", 1)
+            for statement in (m.group(0) for m in _SEED_STATEMENT.finditer(sql))]
+
+
+def _dedupe_message_logs(conn: sqlite3.Connection):
+    """حذف السجلات المكررة من قواعد أقدم من الفهرس الفريد (أقدم صف لكل رسالة يبقى)"""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_logs'").fetchone() is None:
+        return
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_group_message'").fetchone():
+        return
+    removed = conn.execute("""
+        DELETE FROM message_logs WHERE id NOT IN (
+            SELECT MIN(id) FROM message_logs GROUP BY group_id, message_id
+        )
+    """).rowcount
+    if removed:
+        logger.warning("تم حذف %s سجل رسالة مكرر قبل إنشاء الفهرس الفريد", removed)
+
+
+# أعمدة أضيفت بعد إنشاء الجداول (CREATE TABLE IF NOT EXISTS لا يضيفها لقاعدة قائمة)
+ADDED_COLUMNS = [
+    ('group_settings', 'season_days', 'INTEGER NOT NULL DEFAULT 0'),
+    ('group_settings', 'season_id', 'INTEGER NOT NULL DEFAULT 1'),
+    ('user_groups', 'season_id', 'INTEGER NOT NULL DEFAULT 1'),
+    ('user_groups', 'season_xp', 'INTEGER DEFAULT 0'),
+    ('user_groups', 'prev_season_id', 'INTEGER NULL'),
+    ('user_groups', 'prev_season_xp', 'INTEGER DEFAULT 0'),
+]
+
+
+def _add_missing_columns(conn: sqlite3.Connection):
+    """إضافة أعمدة ADDED_COLUMNS لقواعد أقدم (قبل الفهارس التي تعتمد عليها)"""
+    existing: Dict[str, set] = {}
+    for table, column, definition in ADDED_COLUMNS:
+        if table not in existing:
+            existing[table] = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if existing[table] and column not in existing[table]:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            existing[table].add(column)
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def _json_object(alias: str, model) -> str:
+    """json_object(...) بأعمدة نموذج كامل لجلب صف مرتبط ضمن استعلام واحد"""
+    return "json_object(" + ", ".join(f"'{f.name}', {alias}.{f.name}" for f in fields(model)) + ")"
+
+
+class SQLiteManager:
+    """قاعدة SQLite مدمجة: القراءة مباشرة، والكتابة عبر مهمة كاتب واحدة تجمع الالتزامات"""
+
+    def __init__(self, path: str = 'bot.db', max_batch: int = 256):
+        self.path = path
+        self.max_batch = max_batch
+        self.conn: Optional[sqlite3.Connection] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    async def connect(self):
+        """فتح قاعدة البيانات وإنشاء الجداول"""
+        if self.conn is not None:
+            return
+        self.conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        if self.path != ':memory:':
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=OFF")
+        _dedupe_message_logs(self.conn)
+        _add_missing_columns(self.conn)
+        self.conn.executescript(SQLITE_SCHEMA)
+        if not self.conn.execute("SELECT 1 FROM levels LIMIT 1").fetchone():
+            for statement in _seed_statements():
+                self.conn.execute(statement)
+
+        self._queue = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+        logger.info("✅ تم فتح قاعدة SQLite: %s", self.path)
+
+    async def disconnect(self):
+        """إغلاق قاعدة البيانات بعد تنفيذ الكتابات المعلقة"""
+        if self._writer:
+            await self._queue.join()
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    async def _ensure_connected(self):
+        if self.conn is None:
+            await self.connect()
+
+    async def _write_loop(self):
+        """مهمة الكاتب الوحيدة: تنفيذ الكتابات المتراكمة في معاملة واحدة"""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            outcomes = []
+            try:
+                self.conn.execute("BEGIN")
+                for operation, future in batch:
+                    self.conn.execute("SAVEPOINT write_op")
+                    try:
+                        result = operation(self.conn)
+                        self.conn.execute("RELEASE write_op")
+                        outcomes.append((future, result, None))
+                    except Exception as e:
+                        self.conn.execute("ROLLBACK TO write_op")
+                        self.conn.execute("RELEASE write_op")
+                        outcomes.append((future, None, e))
+                self.conn.execute("COMMIT")
+            except Exception as e:
+                # فشل المعاملة نفسها (SQLITE_BUSY، امتلاء القرص...): لا شيء من الدفعة التُزم به
+                logger.error("فشل الالتزام بدفعة من %d كتابة: %s", len(batch), e)
+                if self.conn.in_transaction:
+                    try:
+                        self.conn.execute("ROLLBACK")
+                    except sqlite3.Error:
+                        pass
+                outcomes = [(future, None, e) for _, future in batch]
+
+            for future, result, error in outcomes:
+                if not future.done():
+                    if error:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(result)
+                self._queue.task_done()
+
+    async def _write(self, operation: Callable[[sqlite3.Connection], Any]) -> Any:
+        """إضافة عملية كتابة للطابور وانتظار الالتزام بها"""
+        await self._ensure_connected()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((operation, future))
+        return await future
+
+    async def execute_query(self, query: str, *args) -> int:
+        """تنفيذ استعلام كتابة"""
+        return await self._write(lambda conn: conn.execute(query, args).rowcount)
+
+    async def fetch_one(self, query: str, *args) -> Optional[Dict[str, Any]]:
+        """جلب صف واحد"""
+        await self._ensure_connected()
+        row = self.conn.execute(query, args).fetchone()
+        return dict(row) if row else None
+
+    async def fetch_all(self, query: str, *args) -> List[Dict[str, Any]]:
+        """جلب جميع الصفوف"""
+        await self._ensure_connected()
+        return [dict(row) for row in self.conn.execute(query, args).fetchall()]
+
+    # المستخدمين
+    async def add_user_if_not_exists(self, user) -> bool:
+        """إضافة مستخدم جديد إذا لم يكن موجوداً"""
+        query = """
+        INSERT INTO users (id, username, first_name, last_name, language_code, is_bot)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (id) DO UPDATE SET
+            username = excluded.username,
+            first_name = excluded.first_name,
+            last_name = excluded.last_name,
+            updated_at = ?
+        """
+        await self.execute_query(query, user.id, user.username, user.first_name,
+                                 user.last_name, user.language_code, user.is_bot, _now())
+        return True
+
+    async def get_user_by_id(self, user_id: int) -> Optional[User]:
+        """الحصول على مستخدم بالمعرف"""
+        row = await self.fetch_one("SELECT * FROM users WHERE id = ?", user_id)
+        return User.from_dict(row) if row else None
+
+    async def get_user_ids_by_usernames(self, usernames: List[str]) -> Dict[str, int]:
+        """الحصول على معرفات المستخدمين بأسماء المستخدمين"""
+        if not usernames:
+            return {}
+        placeholders = ", ".join("?" for _ in usernames)
+        rows = await self.fetch_all(
+            f"SELECT id, username FROM users WHERE lower(username) IN ({placeholders})",
+            *[name.lower() for name in usernames]
+        )
+        return {row['username'].lower(): row['id'] for row in rows}
+
+    # الجروبات
+    async def add_group_if_not_exists(self, group_id: int, name: str) -> bool:
+        """إضافة جروب جديد إذا لم يكن موجوداً"""
+        query = """
+        INSERT INTO groups (id, name) VALUES (?, ?)
+        ON CONFLICT (id) DO UPDATE SET name = excluded.name, updated_at = ?
+        """
+        await self.execute_query(query, group_id, name, _now())
+        return True
+
+    # إعدادات الجروبات
+    async def get_group_settings(self, group_id: int) -> Optional[GroupSettings]:
+        """إعدادات جروب واحد (None = القيم الافتراضية)"""
+        row = await self.fetch_one("SELECT * FROM group_settings WHERE group_id = ?", group_id)
+        return GroupSettings.from_dict(row) if row else None
+
+    async def get_group_settings_since(self, since: Optional[datetime] = None) -> List[GroupSettings]:
+        """الإعدادات المعدلة منذ وقت معين (أو كلها)"""
+        if since is None:
+            rows = await self.fetch_all("SELECT * FROM group_settings")
+        else:
+            rows = await self.fetch_all("SELECT * FROM group_settings WHERE updated_at >= ?", since.isoformat())
+        return [GroupSettings.from_dict(row) for row in rows]
+
+    async def save_group_settings(self, settings: GroupSettings) -> Optional[GroupSettings]:
+        """حفظ إعدادات جروب (إدراج أو تحديث، وتفعيل season_days يسجل بداية الموسم الحالي)"""
+        columns = ", ".join(GROUP_SETTING_FIELDS)
+        placeholders = ", ".join("?" for _ in range(len(GROUP_SETTING_FIELDS) + 3))
+        updates = ", ".join(f"{name} = excluded.{name}" for name in (*GROUP_SETTING_FIELDS, 'updated_by', 'updated_at'))
+        query = f"""
+        INSERT INTO group_settings (group_id, {columns}, updated_by, updated_at)
+        VALUES ({placeholders})
+        ON CONFLICT (group_id) DO UPDATE SET {updates}
+        """
+        values = [getattr(settings, name) for name in GROUP_SETTING_FIELDS]
+
+        def operation(conn: sqlite3.Connection) -> Dict:
+            previous = conn.execute("SELECT updated_at FROM group_settings WHERE group_id = ? AND season_days > 0",
+                                    (settings.group_id,)).fetchone()
+            now = _now()
+            conn.execute(query, (settings.group_id, *values, settings.updated_by, now))
+            saved = dict(conn.execute("SELECT * FROM group_settings WHERE group_id = ?", (settings.group_id,)).fetchone())
+            if saved['season_days'] > 0:
+                conn.execute("""
+                    INSERT INTO seasons (group_id, season_id, started_at) VALUES (?, ?, ?)
+                    ON CONFLICT (group_id, season_id) DO NOTHING
+                """, (settings.group_id, saved['season_id'], previous[0] if previous else now))
+            return saved
+        return GroupSettings.from_dict(await self._write(operation))
+
+    # ربط المستخدمين بالجروبات
+    async def add_user_to_group_if_not_exists(self, user_id: int, group_id: int) -> bool:
+        """ربط المستخدم بالجروب إذا لم يكن مربوطاً"""
+        query = "INSERT INTO user_groups (user_id, group_id) VALUES (?, ?) ON CONFLICT (user_id, group_id) DO NOTHING"
+        await self.execute_query(query, user_id, group_id)
+        return True
+
+    async def get_user_group(self, user_id: int, group_id: int) -> Optional[UserGroup]:
+        """الحصول على بيانات المستخدم في الجروب"""
+        row = await self.fetch_one("SELECT * FROM user_groups WHERE user_id = ? AND group_id = ?", user_id, group_id)
+        return UserGroup.from_dict(row) if row else None
+
+    async def get_profile_bundle(self, user_id: int, group_id: int) -> Optional[ProfileBundle]:
+        """المستخدم والعضوية والمستوى والتالي وعدد الشارات والكلان مع قائده في استعلام واحد"""
+        row = await self.fetch_one(f"""
+            SELECT {_json_object('ug', UserGroup)} AS user_group,
+                   {_json_object('l', Level)} AS level,
+                   CASE WHEN u.id IS NULL THEN NULL ELSE {_json_object('u', User)} END AS user,
+                   CASE WHEN nl.id IS NULL THEN NULL ELSE {_json_object('nl', Level)} END AS next_level,
+                   (SELECT COUNT(*) FROM user_badges ub
+                    WHERE ub.user_id = ug.user_id AND ub.group_id = ug.group_id) AS badge_count,
+                   CASE WHEN c.id IS NULL THEN NULL ELSE {_json_object('c', Clan)} END AS clan,
+                   CASE WHEN cl.id IS NULL THEN NULL ELSE {_json_object('cl', User)} END AS clan_leader
+            FROM user_groups ug
+            JOIN levels l ON l.id = ug.level_id
+            LEFT JOIN users u ON u.id = ug.user_id
+            LEFT JOIN levels nl ON nl.level_number = l.level_number + 1
+            LEFT JOIN clans c ON c.id = ug.clan_id
+            LEFT JOIN users cl ON cl.id = c.leader_user_id
+            WHERE ug.user_id = ? AND ug.group_id = ?
+        """, user_id, group_id)
+        if not row:
+            return None
+        for key in ('user_group', 'level', 'user', 'next_level', 'clan', 'clan_leader'):
+            row[key] = json.loads(row[key]) if row[key] else None
+        return ProfileBundle.from_dict(row)
+
+    async def update_user_stats(self, user_id: int, group_id: int, xp_gained: int, coins_gained: int,
+                                season_id: int = 1):
+        """تحديث إحصائيات المستخدم (أول منح في موسم جديد ينقل XP الموسم السابق إلى prev_season_xp)"""
+        now = _now()
+        query = """
+        UPDATE user_groups
+        SET xp = xp + ?1, coins = coins + ?2, total_messages = total_messages + 1,
+            season_xp = CASE WHEN season_id >= ?3 THEN season_xp + ?1 ELSE ?1 END,
+            prev_season_id = CASE WHEN season_id < ?3 THEN season_id ELSE prev_season_id END,
+            prev_season_xp = CASE WHEN season_id < ?3 THEN season_xp ELSE prev_season_xp END,
+            season_id = max(season_id, ?3),
+            last_message_at = ?4, last_xp_gain = ?4, updated_at = ?4
+        WHERE user_id = ?5 AND group_id = ?6
+        """
+        await self.execute_query(query, xp_gained, coins_gained, season_id, now, user_id, group_id)
+
+    async def update_user_level(self, user_id: int, group_id: int, new_level_id: int):
+        """تحديث مستوى المستخدم"""
+        query = "UPDATE user_groups SET level_id = ?, updated_at = ? WHERE user_id = ? AND group_id = ?"
+        await self.execute_query(query, new_level_id, _now(), user_id, group_id)
+
+    # الإجراءات الإدارية
+    async def bulk_adjust_users(self, admin_user_id: int, group_id: int, user_ids: List[int],
+                                xp_deltas: List[int], coin_deltas: List[int],
+                                action_type: str, reason: Optional[str] = None) -> List[Dict]:
+        """تعديل XP والعملات لعدة مستخدمين في معاملة واحدة مع تسجيل الإجراءات"""
+        def operation(conn: sqlite3.Connection) -> List[Dict]:
+            now = _now()
+            conn.executemany("""
+                UPDATE user_groups
+                SET xp = max(xp + ?1, 0),
+                    coins = max(coins + ?2, 0),
+                    season_xp = CASE
+                        WHEN season_id = COALESCE((SELECT season_id FROM group_settings WHERE group_id = ?4), 1)
+                        THEN max(season_xp + ?1, 0)
+                        ELSE season_xp
+                    END,
+                    level_id = COALESCE((SELECT id FROM levels WHERE required_xp <= max(user_groups.xp + ?1, 0)
+                                         ORDER BY required_xp DESC LIMIT 1), level_id),
+                    updated_at = ?3
+                WHERE group_id = ?4 AND user_id = ?5
+            """, [(xp, coins, now, group_id, user_id)
+                  for user_id, xp, coins in zip(user_ids, xp_deltas, coin_deltas)])
+            return self._finish_admin_batch(conn, admin_user_id, group_id, user_ids, xp_deltas,
+                                            coin_deltas, action_type, reason)
+        return await self._write(operation)
+
+    async def bulk_reset_users(self, admin_user_id: int, group_id: int, user_ids: List[int],
+                               reason: Optional[str] = None) -> List[Dict]:
+        """إعادة تعيين عدة مستخدمين في معاملة واحدة مع تسجيل الإجراءات"""
+        def operation(conn: sqlite3.Connection) -> List[Dict]:
+            now = _now()
+            conn.executemany("""
+                UPDATE user_groups
+                SET xp = 0, coins = 0, season_xp = 0, prev_season_xp = 0,
+                    level_id = (SELECT id FROM levels ORDER BY required_xp ASC LIMIT 1),
+                    updated_at = ?
+                WHERE group_id = ? AND user_id = ?
+            """, [(now, group_id, user_id) for user_id in user_ids])
+            zeros = [0] * len(user_ids)
+            return self._finish_admin_batch(conn, admin_user_id, group_id, user_ids, zeros,
+                                            zeros, 'reset_user', reason)
+        return await self._write(operation)
+
+    @staticmethod
+    def _finish_admin_batch(conn, admin_user_id, group_id, user_ids, xp_deltas, coin_deltas,
+                            action_type, reason) -> List[Dict]:
+        placeholders = ", ".join("?" for _ in user_ids)
+        rows = [dict(row) for row in conn.execute(
+            f"SELECT user_id, xp, coins, level_id FROM user_groups WHERE group_id = ? AND user_id IN ({placeholders})",
+            (group_id, *user_ids)
+        )]
+        found = {row['user_id'] for row in rows}
+        conn.executemany(
+            "INSERT INTO admin_actions (admin_user_id, target_user_id, group_id, action_type, amount, reason) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(admin_user_id, user_id, group_id, action_type, abs(xp or coins), reason)
+             for user_id, xp, coins in zip(user_ids, xp_deltas, coin_deltas) if user_id in found]
+        )
+        return rows
+
+    # المستويات
+    async def get_level_by_id(self, level_id: int) -> Optional[Level]:
+        """الحصول على مستوى بالمعرف"""
+        row = await self.fetch_one("SELECT * FROM levels WHERE id = ?", level_id)
+        return Level.from_dict(row) if row else None
+
+    async def get_level_by_number(self, level_number: int) -> Optional[Level]:
+        """الحصول على مستوى بالرقم"""
+        row = await self.fetch_one("SELECT * FROM levels WHERE level_number = ?", level_number)
+        return Level.from_dict(row) if row else None
+
+    async def get_level_by_xp(self, xp: int) -> Optional[Level]:
+        """الحصول على المستوى المناسب لكمية XP"""
+        row = await self.fetch_one(
+            "SELECT * FROM levels WHERE required_xp <= ? ORDER BY required_xp DESC LIMIT 1", xp
+        )
+        return Level.from_dict(row) if row else None
+
+    async def get_all_levels(self) -> List[Level]:
+        """الحصول على جميع المستويات مرتبة حسب XP المطلوب"""
+        rows = await self.fetch_all("SELECT * FROM levels ORDER BY required_xp ASC")
+        return [Level.from_dict(row) for row in rows]
+
+    async def count_user_groups(self) -> int:
+        """عدد صفوف user_groups"""
+        row = await self.fetch_one("SELECT COUNT(*) AS total FROM user_groups")
+        return row['total'] if row else 0
+
+    async def fetch_user_groups_chunk(self, after_id: int, limit: int) -> List[Dict]:
+        """جلب دفعة من user_groups بترقيم المفتاح (id, xp, level_id)"""
+        return await self.fetch_all(
+            "SELECT id, xp, level_id FROM user_groups WHERE id > ? ORDER BY id LIMIT ?", after_id, limit
+        )
+
+    async def bulk_update_level_ids(self, ids: List[int], level_ids: List[int]):
+        """تحديث مستويات عدة صفوف في معاملة واحدة"""
+        now = _now()
+        await self._write(lambda conn: conn.executemany(
+            "UPDATE user_groups SET level_id = ?, updated_at = ? WHERE id = ? AND level_id IS NOT ?",
+            [(level_id, now, row_id, level_id) for row_id, level_id in zip(ids, level_ids)]
+        ).rowcount)
+
+    async def get_group_leaderboard(self, group_id: int, limit: int = 10) -> List[Dict]:
+        """أعلى الأعضاء XP في الجروب"""
+        return await self.fetch_all("""
+            SELECT ug.user_id, ug.xp, ug.level_id, u.username, u.first_name
+            FROM user_groups ug
+            JOIN users u ON u.id = ug.user_id
+            WHERE ug.group_id = ? AND ug.is_active = 1
+            ORDER BY ug.xp DESC
+            LIMIT ?
+        """, group_id, limit)
+
+    async def get_leaderboard_page(self, group_id: int, limit: int, after_xp: Optional[int] = None,
+                                   after_user_id: Optional[int] = None) -> List[Dict]:
+        """صفحة من المتصدرين بعد (xp, user_id) معين (ترقيم بالمفتاح بدون OFFSET)"""
+        after = "AND (ug.xp, ug.user_id) < (?, ?)" if after_xp is not None else ""
+        args = (after_xp, after_user_id) if after_xp is not None else ()
+        return await self.fetch_all(f"""
+            SELECT ug.user_id, ug.xp, ug.level_id, ug.updated_at, u.username, u.first_name
+            FROM user_groups ug
+            JOIN users u ON u.id = ug.user_id
+            WHERE ug.group_id = ? AND ug.is_active = 1 {after}
+            ORDER BY ug.xp DESC, ug.user_id DESC
+            LIMIT ?
+        """, group_id, *args, limit)
+
+    # الإحصائيات اليومية
+    async def refresh_group_daily_stats(self, since: date) -> int:
+        """إعادة تجميع message_logs منذ تاريخ معين في group_daily_stats (الصفوف المتغيرة فقط)"""
+        return await self.execute_query(f"""
+            INSERT INTO group_daily_stats (group_id, stat_date, messages, active_users, xp_gained, coins_gained)
+            SELECT group_id, substr(created_at, 1, 10), COUNT(*), COUNT(DISTINCT user_id),
+                   COALESCE(SUM(xp_gained), 0), COALESCE(SUM(coins_gained), 0)
+            FROM message_logs
+            WHERE created_at >= ?
+            GROUP BY group_id, substr(created_at, 1, 10)
+            ON CONFLICT (group_id, stat_date) DO UPDATE SET
+                messages = excluded.messages,
+                active_users = excluded.active_users,
+                xp_gained = excluded.xp_gained,
+                coins_gained = excluded.coins_gained,
+                updated_at = {NOW}
+            WHERE (messages, active_users, xp_gained, coins_gained)
+                IS NOT (excluded.messages, excluded.active_users, excluded.xp_gained, excluded.coins_gained)
+        """, since.isoformat())
+
+    async def get_group_daily_stats(self, group_id: int, since: date) -> List[Dict]:
+        """نشاط الجروب اليومي المجمع مرتباً بالتاريخ"""
+        return await self.fetch_all("""
+            SELECT stat_date, messages, active_users, xp_gained, coins_gained, updated_at
+            FROM group_daily_stats
+            WHERE group_id = ? AND stat_date >= ?
+            ORDER BY stat_date
+        """, group_id, since.isoformat())
+
+    # نشاط الجروب حسب ساعة الأسبوع
+    async def add_group_activity(self, rows: List[Dict]):
+        """إضافة فروق العدادات إلى group_activity في معاملة الكاتب"""
+        values = [(row['group_id'], row['hour_of_week'], row['messages']) for row in rows]
+        await self._write(lambda conn: conn.executemany(f"""
+            INSERT INTO group_activity (group_id, hour_of_week, messages) VALUES (?, ?, ?)
+            ON CONFLICT (group_id, hour_of_week) DO UPDATE SET
+                messages = messages + excluded.messages,
+                updated_at = {NOW}
+        """, values))
+
+    async def get_group_activity(self, group_id: int) -> List[Dict]:
+        """عدادات الجروب المكتوبة (صف لكل ساعة أسبوع فيها نشاط)"""
+        return await self.fetch_all(
+            "SELECT hour_of_week, messages FROM group_activity WHERE group_id = ? ORDER BY hour_of_week", group_id
+        )
+
+    # مخططات الأعضاء النشطين (HyperLogLog)
+    async def save_activity_sketches(self, rows: List[Dict]):
+        """حفظ مخططات (جروب، يوم) في معاملة الكاتب"""
+        values = [(row['group_id'], row['sketch_date'].isoformat(), row['sketch']) for row in rows]
+        await self._write(lambda conn: conn.executemany(f"""
+            INSERT INTO activity_sketches (group_id, sketch_date, sketch) VALUES (?, ?, ?)
+            ON CONFLICT (group_id, sketch_date) DO UPDATE SET
+                sketch = excluded.sketch,
+                updated_at = {NOW}
+        """, values))
+
+    async def get_activity_sketches(self, group_ids: List[int], since: date, until: date) -> List[Dict]:
+        """مخططات الجروبات في نطاق أيام"""
+        if not group_ids:
+            return []
+        placeholders = ", ".join("?" for _ in group_ids)
+        return await self.fetch_all(f"""
+            SELECT group_id, sketch_date, sketch FROM activity_sketches
+            WHERE group_id IN ({placeholders}) AND sketch_date BETWEEN ? AND ?
+        """, *group_ids, since.isoformat(), until.isoformat())
+
+    # المواسم
+    async def start_season(self, group_id: int, season_id: int, started_by: Optional[int] = None) -> Optional[GroupSettings]:
+        """بدء الموسم season_id إن كان الحالي season_id - 1 ولا يوجد موسم منتهٍ لم يُؤرشف (None = لم يبدأ)"""
+        def operation(conn: sqlite3.Connection) -> Optional[Dict]:
+            if conn.execute("SELECT 1 FROM seasons WHERE group_id = ? AND ended_at IS NOT NULL AND archived_at IS NULL",
+                            (group_id,)).fetchone():
+                return None
+            current = conn.execute("SELECT season_id FROM group_settings WHERE group_id = ?", (group_id,)).fetchone()
+            if (current[0] if current else 1) != season_id - 1:
+                return None
+            now = _now()
+            conn.execute("""
+                INSERT INTO group_settings (group_id, season_id, updated_by, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (group_id) DO UPDATE SET
+                    season_id = excluded.season_id, updated_by = excluded.updated_by, updated_at = excluded.updated_at
+            """, (group_id, season_id, started_by, now))
+            conn.execute("""
+                INSERT INTO seasons (group_id, season_id, ended_at) VALUES (?, ?, ?)
+                ON CONFLICT (group_id, season_id) DO UPDATE SET ended_at = excluded.ended_at
+            """, (group_id, season_id - 1, now))
+            conn.execute("""
+                INSERT INTO seasons (group_id, season_id, started_at, started_by) VALUES (?, ?, ?, ?)
+                ON CONFLICT (group_id, season_id) DO NOTHING
+            """, (group_id, season_id, now, started_by))
+            return dict(conn.execute("SELECT * FROM group_settings WHERE group_id = ?", (group_id,)).fetchone())
+        row = await self._write(operation)
+        return GroupSettings.from_dict(row) if row else None
+
+    async def archive_season(self, group_id: int, season_id: int) -> int:
+        """نسخ الترتيب النهائي لموسم منتهٍ من user_groups إلى season_standings في معاملة الكاتب"""
+        def operation(conn: sqlite3.Connection) -> int:
+            final = """
+                SELECT user_id, CASE WHEN season_id = ?2 THEN season_xp ELSE prev_season_xp END AS xp
+                FROM user_groups
+                WHERE group_id = ?1 AND is_active = 1 AND (season_id = ?2 OR prev_season_id = ?2)
+            """
+            conn.execute(f"""
+                INSERT INTO season_standings (group_id, season_id, user_id, xp, season_rank)
+                SELECT ?1, ?2, user_id, xp, ROW_NUMBER() OVER (ORDER BY xp DESC, user_id DESC)
+                FROM ({final}) WHERE xp > 0
+                ON CONFLICT (group_id, season_id, user_id) DO NOTHING
+            """, (group_id, season_id))
+            members = conn.execute(f"SELECT COUNT(*) FROM ({final}) WHERE xp > 0", (group_id, season_id)).fetchone()[0]
+            conn.execute("""
+                INSERT INTO seasons (group_id, season_id, archived_at, members) VALUES (?, ?, ?, ?)
+                ON CONFLICT (group_id, season_id) DO UPDATE SET
+                    archived_at = excluded.archived_at, members = excluded.members
+            """, (group_id, season_id, _now(), members))
+            return members
+        return await self._write(operation)
+
+    async def get_season(self, group_id: int, season_id: int) -> Optional[Season]:
+        """بيانات موسم واحد (None للموسم الأول قبل تفعيل season_days)"""
+        row = await self.fetch_one("SELECT * FROM seasons WHERE group_id = ? AND season_id = ?", group_id, season_id)
+        return Season.from_dict(row) if row else None
+
+    async def get_due_seasons(self, now: datetime) -> List[Dict]:
+        """الجروبات التي انتهت مدة موسمها الحالي (من بدايته في seasons، أو آخر تعديل إن فُعل قبل تسجيلها)"""
+        return await self.fetch_all("""
+            SELECT gs.group_id, gs.season_id
+            FROM group_settings gs
+            LEFT JOIN seasons s ON s.group_id = gs.group_id AND s.season_id = gs.season_id
+            WHERE gs.season_days > 0
+              AND julianday(?) - julianday(COALESCE(s.started_at, gs.updated_at)) >= gs.season_days
+        """, now.isoformat())
+
+    async def get_unarchived_seasons(self, ended_before: datetime) -> List[Season]:
+        """المواسم المنتهية قبل وقت معين ولم يُؤرشف ترتيبها بعد"""
+        rows = await self.fetch_all("""
+            SELECT * FROM seasons
+            WHERE archived_at IS NULL AND ended_at IS NOT NULL AND ended_at <= ?
+            ORDER BY ended_at
+        """, ended_before.isoformat())
+        return [Season.from_dict(row) for row in rows]
+
+    async def get_season_leaderboard(self, group_id: int, season_id: int, limit: int = 10) -> List[Dict]:
+        """أعلى الأعضاء XP في الموسم الجاري"""
+        return await self.fetch_all("""
+            SELECT ug.user_id, ug.season_xp AS xp, ug.level_id, u.username, u.first_name
+            FROM user_groups ug
+            JOIN users u ON u.id = ug.user_id
+            WHERE ug.group_id = ? AND ug.season_id = ? AND ug.is_active = 1 AND ug.season_xp > 0
+            ORDER BY ug.season_xp DESC, ug.user_id DESC
+            LIMIT ?
+        """, group_id, season_id, limit)
+
+    async def get_season_standings(self, group_id: int, season_id: int, limit: int = 10) -> List[Dict]:
+        """الترتيب النهائي المؤرشف لموسم منتهٍ"""
+        return await self.fetch_all("""
+            SELECT ss.user_id, ss.xp, ss.season_rank, u.username, u.first_name
+            FROM season_standings ss
+            LEFT JOIN users u ON u.id = ss.user_id
+            WHERE ss.group_id = ? AND ss.season_id = ?
+            ORDER BY ss.season_rank
+            LIMIT ?
+        """, group_id, season_id, limit)
+
+    # المتجر
+    async def get_shop_items(self, limit: int = 50) -> List[ShopItem]:
+        """الحصول على عناصر المتجر"""
+        rows = await self.fetch_all("SELECT * FROM shop_items WHERE is_active = 1 ORDER BY price ASC LIMIT ?", limit)
+        return [ShopItem.from_dict(row) for row in rows]
+
+    async def get_shop_item_by_id(self, item_id: int) -> Optional[ShopItem]:
+        """الحصول على عنصر من المتجر"""
+        row = await self.fetch_one("SELECT * FROM shop_items WHERE id = ? AND is_active = 1", item_id)
+        return ShopItem.from_dict(row) if row else None
+
+    # الشارات
+    async def get_all_badges(self) -> List[Badge]:
+        """الحصول على جميع الشارات"""
+        rows = await self.fetch_all("SELECT * FROM badges WHERE is_active = 1")
+        return [Badge.from_dict(row) for row in rows]
+
+    async def get_user_badges(self, user_id: int, group_id: int) -> List[Badge]:
+        """الحصول على شارات المستخدم"""
+        rows = await self.fetch_all("""
+            SELECT b.* FROM badges b
+            JOIN user_badges ub ON b.id = ub.badge_id
+            WHERE ub.user_id = ? AND ub.group_id = ?
+            ORDER BY ub.earned_at DESC
+        """, user_id, group_id)
+        return [Badge.from_dict(row) for row in rows]
+
+    async def get_user_badges_count(self, user_id: int, group_id: int) -> int:
+        """الحصول على عدد شارات المستخدم"""
+        row = await self.fetch_one(
+            "SELECT COUNT(*) AS total FROM user_badges WHERE user_id = ? AND group_id = ?", user_id, group_id
+        )
+        return row['total'] if row else 0
+
+    async def award_badge(self, user_id: int, group_id: int, badge_id: int):
+        """منح شارة للمستخدم"""
+        await self.execute_query(
+            "INSERT INTO user_badges (user_id, group_id, badge_id) VALUES (?, ?, ?) "
+            "ON CONFLICT (user_id, group_id, badge_id) DO NOTHING",
+            user_id, group_id, badge_id
+        )
+
+    # المهام اليومية
+    async def get_daily_quests(self, user_id: int, group_id: int, quest_date: date) -> List[DailyQuest]:
+        """الحصول على المهام اليومية"""
+        rows = await self.fetch_all(
+            "SELECT * FROM daily_quests WHERE user_id = ? AND group_id = ? AND quest_date = ? ORDER BY id",
+            user_id, group_id, quest_date.isoformat()
+        )
+        return [DailyQuest.from_dict(row) for row in rows]
+
+    async def create_daily_quest(self, user_id: int, group_id: int, quest_type: str,
+                                 target_value: int, reward_xp: int, reward_coins: int, quest_date: date):
+        """إنشاء مهمة يومية جديدة"""
+        await self.execute_query("""
+            INSERT INTO daily_quests (user_id, group_id, quest_type, target_value, reward_xp, reward_coins, quest_date)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, group_id, quest_type, quest_date) DO NOTHING
+        """, user_id, group_id, quest_type, target_value, reward_xp, reward_coins, quest_date.isoformat())
+
+    async def update_daily_quest_progress(self, user_id: int, group_id: int, quest_type: str,
+                                          progress: int, quest_date: date):
+        """تحديث تقدم المهمة اليومية"""
+        await self.execute_query("""
+            UPDATE daily_quests
+            SET current_progress = current_progress + ?1,
+                is_completed = CASE WHEN current_progress + ?1 >= target_value THEN 1 ELSE 0 END,
+                completed_at = CASE WHEN current_progress + ?1 >= target_value THEN ?2 ELSE completed_at END
+            WHERE user_id = ?3 AND group_id = ?4 AND quest_type = ?5 AND quest_date = ?6
+        """, progress, _now(), user_id, group_id, quest_type, quest_date.isoformat())
+
+    async def sweep_daily_quests(self, cutoff: date, batch_size: int, archive: bool = False) -> Dict[str, int]:
+        """نقل دفعة من المهام القديمة إلى السجل المجمع وحذفها"""
+        def operation(conn: sqlite3.Connection) -> Dict[str, int]:
+            conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS sweep_batch AS SELECT * FROM daily_quests WHERE 0
+            """)
+            conn.execute("DELETE FROM sweep_batch")
+            conn.execute("""
+                INSERT INTO sweep_batch
+                SELECT * FROM daily_quests WHERE quest_date < ? ORDER BY id LIMIT ?
+            """, (cutoff.isoformat(), batch_size))
+            if archive:
+                conn.execute("""
+                    INSERT OR IGNORE INTO daily_quests_archive (id, user_id, group_id, quest_type, target_value,
+                        current_progress, reward_xp, reward_coins, is_completed, quest_date, completed_at, created_at)
+                    SELECT id, user_id, group_id, quest_type, target_value, current_progress,
+                           reward_xp, reward_coins, is_completed, quest_date, completed_at, created_at
+                    FROM sweep_batch
+                """)
+            conn.execute("""
+                INSERT INTO user_quest_history (user_id, group_id, quests_completed, quests_expired,
+                                                total_reward_xp, total_reward_coins, last_quest_date)
+                SELECT user_id, group_id,
+                       SUM(is_completed), SUM(1 - is_completed),
+                       SUM(CASE WHEN is_completed THEN reward_xp ELSE 0 END),
+                       SUM(CASE WHEN is_completed THEN reward_coins ELSE 0 END),
+                       MAX(quest_date)
+                FROM sweep_batch WHERE 1
+                GROUP BY user_id, group_id
+                ON CONFLICT (user_id, group_id) DO UPDATE SET
+                    quests_completed = quests_completed + excluded.quests_completed,
+                    quests_expired = quests_expired + excluded.quests_expired,
+                    total_reward_xp = total_reward_xp + excluded.total_reward_xp,
+                    total_reward_coins = total_reward_coins + excluded.total_reward_coins,
+                    last_quest_date = max(COALESCE(last_quest_date, ''), excluded.last_quest_date),
+                    updated_at = excluded.updated_at
+            """)
+            conn.execute("DELETE FROM daily_quests WHERE id IN (SELECT id FROM sweep_batch)")
+            row = conn.execute(
+                "SELECT COUNT(*) AS deleted, COALESCE(SUM(is_completed), 0) AS completed FROM sweep_batch"
+            ).fetchone()
+            return {'deleted': row['deleted'], 'completed': row['completed']}
+        return await self._write(operation)
+
+    async def fetch_group_ids_chunk(self, after_id: Optional[int], limit: int) -> List[int]:
+        """جلب دفعة من معرفات الجروبات النشطة بترقيم المفتاح (المعرفات سالبة، فالبداية None)"""
+        rows = await self.fetch_all(
+            "SELECT id FROM groups WHERE is_active AND (?1 IS NULL OR id > ?1) ORDER BY id LIMIT ?2",
+            after_id, limit
+        )
+        return [row['id'] for row in rows]
+
+    async def generate_daily_quests(self, group_ids: List[int], quest_date: date, active_since: datetime,
+                                    quests: List[Dict]) -> int:
+        """إنشاء مهام quest_date لأعضاء الجروبات النشطين حسب مستوى كل عضو في معاملة واحدة"""
+        if not group_ids or not quests:
+            return 0
+        placeholders = ", ".join("?" for _ in group_ids)
+
+        def operation(conn: sqlite3.Connection) -> int:
+            conn.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS quest_definitions (
+                    level_id INTEGER, quest_type TEXT, target_value INTEGER, reward_xp INTEGER, reward_coins INTEGER
+                )
+            """)
+            conn.execute("DELETE FROM quest_definitions")
+            conn.executemany(
+                "INSERT INTO quest_definitions VALUES (?, ?, ?, ?, ?)",
+                [(quest['level_id'], quest['quest_type'], quest['target_value'],
+                  quest['reward_xp'], quest['reward_coins']) for quest in quests]
+            )
+            return conn.execute(f"""
+                INSERT INTO daily_quests (user_id, group_id, quest_type, target_value, reward_xp, reward_coins, quest_date)
+                SELECT ug.user_id, ug.group_id, q.quest_type, q.target_value, q.reward_xp, q.reward_coins, ?
+                FROM user_groups ug
+                JOIN quest_definitions q ON q.level_id = ug.level_id
+                WHERE ug.group_id IN ({placeholders}) AND ug.is_active AND ug.last_message_at >= ?
+                ON CONFLICT (user_id, group_id, quest_type, quest_date) DO NOTHING
+            """, (quest_date.isoformat(), *group_ids, active_since.isoformat())).rowcount
+        return await self._write(operation)
+
+    # الكلانات
+    async def get_clan_by_id(self, clan_id: int) -> Optional[Clan]:
+        """الحصول على كلان بالمعرف"""
+        row = await self.fetch_one("SELECT * FROM clans WHERE id = ?", clan_id)
+        return Clan.from_dict(row) if row else None
+
+    async def get_clan_by_name(self, name: str, group_id: int) -> Optional[Clan]:
+        """الحصول على كلان بالاسم"""
+        row = await self.fetch_one("SELECT * FROM clans WHERE name = ? AND group_id = ?", name, group_id)
+        return Clan.from_dict(row) if row else None
+
+    # تسجيل الرسائل
+    async def log_message(self, user_id: int, group_id: int, message_id: int,
+                          xp_gained: int, coins_gained: int, message_type: str = 'text') -> bool:
+        """تسجيل رسالة (False إن كانت مسجلة من قبل: تحديث مكرر)"""
+        inserted = await self.execute_query("""
+            INSERT INTO message_logs (user_id, group_id, message_id, xp_gained, coins_gained, message_type)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (group_id, message_id) DO NOTHING
+        """, user_id, group_id, message_id, xp_gained, coins_gained, message_type)
+        return inserted > 0
+
+    # صندوق الأحداث (outbox)
+    async def append_outbox_events(self, events: List[Dict]):
+        """إدراج دفعة أحداث في معاملة الكاتب"""
+        rows = [(event['event_type'], event['group_id'], event['user_id'],
+                 json.dumps(event['payload'], ensure_ascii=False, default=str), event['created_at'].isoformat())
+                for event in events]
+        await self._write(lambda conn: conn.executemany(
+            "INSERT INTO event_outbox (event_type, group_id, user_id, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+            rows
+        ))
+
+    async def claim_outbox_events(self, limit: int) -> List[Dict]:
+        """سحب أقدم الأحداث وحذفها"""
+        def operation(conn: sqlite3.Connection) -> List[Dict]:
+            rows = [dict(row) for row in conn.execute(
+                "SELECT * FROM event_outbox ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()]
+            if rows:
+                conn.execute("DELETE FROM event_outbox WHERE id <= ?", (rows[-1]['id'],))
+            return rows
+
+        events = await self._write(operation)
+        for event in events:
+            event['payload'] = json.loads(event['payload'])
+        return events
+
+    # المخزون
+    async def add_to_inventory(self, user_id: int, group_id: int, item_id: int,
+                               quantity: int = 1, expires_at: datetime = None):
+        """إضافة عنصر للمخزون"""
+        await self.execute_query("""
+            INSERT INTO user_inventory (user_id, group_id, item_id, quantity, expires_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, user_id, group_id, item_id, quantity, expires_at.isoformat() if expires_at else None)
+
+    async def get_user_inventory(self, user_id: int, group_id: int) -> List[Dict]:
+        """الحصول على مخزون المستخدم"""
+        return await self.fetch_all("""
+            SELECT ui.*, si.name, si.description, si.item_type, si.effect_type, si.effect_value
+            FROM user_inventory ui
+            JOIN shop_items si ON ui.item_id = si.id
+            WHERE ui.user_id = ? AND ui.group_id = ? AND ui.is_active = 1
+            AND (ui.expires_at IS NULL OR ui.expires_at > ?)
+            ORDER BY ui.purchased_at DESC
+        """, user_id, group_id, _now())
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stats API - واجهة JSON للقراءة فقط للوحة التحكم (المتصدرون، ملف العضو، النشاط اليومي)
+
+الردود تُبنى من بيانات مجمعة مسبقاً (user_groups و group_daily_stats) وتُخزن في ذاكرة العملية
+لمدة TTL، وبعدها تُقدم النسخة القديمة فوراً مع تحديثها في الخلفية (stale-while-revalidate).
+كل رد يحمل ETag و Last-Modified، والطلب الشرطي المطابق يحصل على 304 بدون جسم.
+
+الاستخدام (تحديث الإحصائيات اليومية يدوياً):
+    python stats_api.py refresh [--backend postgres] [--days 2]
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, date, timedelta
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, List, Dict, Any, Tuple, Callable, Awaitable
+
+from dotenv import load_dotenv
+
+from metrics import REGISTRY
+from hll import active_user_windows
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 100
+MAX_ACTIVITY_DAYS = 90
+
+
+@dataclass
+class CachedResponse:
+    """رد جاهز للإرسال مع بيانات التحقق الشرطي"""
+    body: bytes
+    etag: str
+    last_modified: float
+    stored_at: float
+
+
+class ResponseCache:
+    """ذاكرة ردود بمدة صلاحية ومدة إضافية تُقدم فيها النسخة القديمة مع تحديثها في الخلفية
+
+    تحميل كل مفتاح يجري مرة واحدة فقط مهما تزامنت الطلبات عليه.
+    """
+
+    def __init__(self, ttl: float = 30.0, stale: float = 300.0, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Any, CachedResponse]" = OrderedDict()
+        self._inflight: Dict[Any, asyncio.Future] = {}
+        self._refreshing: set = set()
+
+    def _store(self, key, response: CachedResponse):
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def _load(self, key, loader: Callable[[], Awaitable[CachedResponse]]) -> CachedResponse:
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            response = await loader()
+            self._store(key, response)
+            future.set_result(response)
+            return response
+        except Exception as e:
+            future.set_exception(e)
+            # المنتظرون يستلمون الخطأ، ولا نريد تحذير "exception never retrieved" إن لم يوجد أحد
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _refresh_in_background(self, key, loader):
+        if key in self._inflight or key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                await self._load(key, loader)
+            except Exception as e:
+                logger.warning("تعذر تحديث رد الإحصائيات في الخلفية: %s", e)
+
+        task = asyncio.create_task(refresh())
+        self._refreshing.add(key)
+        task.add_done_callback(lambda _: self._refreshing.discard(key))
+
+    async def get(self, key, loader: Callable[[], Awaitable[CachedResponse]]) -> Tuple[CachedResponse, str]:
+        """الرد وحالته: hit أو stale أو miss"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.stored_at
+            if age < self.ttl:
+                self.hits += 1
+                return entry, 'hit'
+            if age < self.ttl + self.stale:
+                self.stale_hits += 1
+                self._refresh_in_background(key, loader)
+                return entry, 'stale'
+        self.misses += 1
+        return await self._load(key, loader), 'miss'
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'entries': len(self._entries), 'hits': self.hits, 'stale_hits': self.stale_hits, 'misses': self.misses}
+
+
+def encode_cursor(xp: int, user_id: int, rank: int) -> str:
+    raw = f"{xp}:{user_id}:{rank}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int, int]:
+    """(xp, user_id, rank) لآخر عنصر في الصفحة السابقة (ValueError عند مؤشر غير صالح)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        xp, user_id, rank = (int(part) for part in raw.split(':'))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("مؤشر الصفحة غير صالح") from e
+    return xp, user_id, rank
+
+
+def _timestamp(value) -> Optional[float]:
+    """وقت من قاعدة البيانات (datetime أو نص ISO) كـ Unix timestamp"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value.timestamp()
+
+
+def _int_param(query: Dict[str, str], name: str, default: Optional[int] = None,
+               low: Optional[int] = None, high: Optional[int] = None) -> int:
+    raw = query.get(name)
+    if raw is None or raw == '':
+        if default is None:
+            raise ValueError(f"المعامل {name} مطلوب")
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise ValueError(f"المعامل {name} يجب أن يكون رقماً")
+    if low is not None:
+        value = max(value, low)
+    if high is not None:
+        value = min(value, high)
+    return value
+
+
+class StatsService:
+    """بناء ردود الإحصائيات من قاعدة البيانات مع التخزين المؤقت والتحقق الشرطي"""
+
+    def __init__(self, db, ttl: float = 30.0, stale: float = 300.0, max_entries: int = 10_000):
+        self.db = db
+        self.cache = ResponseCache(ttl, stale, max_entries)
+        self.routes: Dict[str, Callable[[Dict[str, str]], Awaitable[Tuple[Dict[str, Any], Optional[float]]]]] = {
+            'leaderboard': self.leaderboard,
+            'profile': self.profile,
+            'activity': self.activity,
+        }
+
+    async def leaderboard(self, query: Dict[str, str]) -> Tuple[Dict[str, Any], Optional[float]]:
+        """/leaderboard?group_id=&limit=&cursor= (ترقيم بالمفتاح، المؤشر يحمل آخر xp و user_id والترتيب)"""
+        group_id = _int_param(query, 'group_id')
+        limit = _int_param(query, 'limit', 20, 1, MAX_PAGE_SIZE)
+        after_xp = after_user_id = None
+        rank = 0
+        if query.get('cursor'):
+            after_xp, after_user_id, rank = decode_cursor(query['cursor'])
+
+        # عنصر إضافي لمعرفة وجود صفحة تالية بدون استعلام COUNT
+        rows = await self.db.get_leaderboard_page(group_id, limit + 1, after_xp, after_user_id)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        items = []
+        for rank, row in enumerate(rows, start=rank + 1):
+            items.append({
+                'rank': rank, 'user_id': row['user_id'], 'username': row.get('username'),
+                'first_name': row.get('first_name'), 'xp': row['xp'], 'level_id': row['level_id'],
+            })
+        next_cursor = encode_cursor(rows[-1]['xp'], rows[-1]['user_id'], rank) if has_more else None
+        last_modified = max((_timestamp(row.get('updated_at')) or 0 for row in rows), default=None)
+        return {'group_id': group_id, 'items': items, 'next_cursor': next_cursor}, last_modified or None
+
+    async def profile(self, query: Dict[str, str]) -> Tuple[Dict[str, Any], Optional[float]]:
+        """/profile?group_id=&user_id="""
+        group_id = _int_param(query, 'group_id')
+        user_id = _int_param(query, 'user_id')
+        bundle = await self.db.get_profile_bundle(user_id, group_id)
+        if not bundle:
+            raise LookupError("العضو غير موجود في هذا الجروب")
+        user_group, user, level = bundle.user_group, bundle.user, bundle.level
+        payload = {
+            'group_id': group_id, 'user_id': user_id,
+            'username': user.username if user else None,
+            'first_name': user.first_name if user else None,
+            'xp': user_group.xp, 'coins': user_group.coins, 'total_messages': user_group.total_messages,
+            'level': {'id': level.id, 'number': level.level_number, 'name': level.level_name,
+                      'emoji': level.level_emoji} if level else None,
+            'clan_id': user_group.clan_id,
+            'clan_name': bundle.clan.name if bundle.clan else None,
+            'badge_count': bundle.badge_count,
+            'last_message_at': user_group.last_message_at,
+        }
+        return payload, _timestamp(user_group.updated_at)
+
+    async def activity(self, query: Dict[str, str]) -> Tuple[Dict[str, Any], Optional[float]]:
+        """/activity?group_id=&days= (الأيام بدون نشاط تظهر بأصفار)"""
+        group_id = _int_param(query, 'group_id')
+        days = _int_param(query, 'days', 30, 1, MAX_ACTIVITY_DAYS)
+        since = date.today() - timedelta(days=days - 1)
+        rows = await self.db.get_group_daily_stats(group_id, since)
+        by_date = {str(row['stat_date'])[:10]: row for row in rows}
+        series = []
+        for offset in range(days):
+            day = (since + timedelta(days=offset)).isoformat()
+            row = by_date.get(day, {})
+            series.append({
+                'date': day, 'messages': row.get('messages', 0), 'active_users': row.get('active_users', 0),
+                'xp_gained': row.get('xp_gained', 0), 'coins_gained': row.get('coins_gained', 0),
+            })
+        last_modified = max((_timestamp(row.get('updated_at')) or 0 for row in rows), default=None)
+        # أعضاء مختلفون في النافذة كلها (دمج مخططات HyperLogLog، مجموع الأيام يكرر العضو)
+        active_users = await active_user_windows(self.db, group_id)
+        return {'group_id': group_id, 'days': series, 'active_users': active_users}, last_modified or None
+
+    async def _build(self, route: str, query: Dict[str, str]) -> CachedResponse:
+        started = time.perf_counter()
+        try:
+            payload, last_modified = await self.routes[route](query)
+        except Exception:
+            REGISTRY.observe(f"stats.{route}", time.perf_counter() - started, error=True)
+            raise
+        REGISTRY.observe(f"stats.{route}", time.perf_counter() - started)
+        body = json.dumps(payload, ensure_ascii=False, default=str, separators=(',', ':')).encode()
+        etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        return CachedResponse(body, etag, last_modified or time.time(), time.monotonic())
+
+    def _not_modified(self, response: CachedResponse, headers: Dict[str, str]) -> bool:
+        if_none_match = headers.get('if-none-match')
+        if if_none_match is not None:
+            return response.etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+        if_modified_since = headers.get('if-modified-since')
+        if if_modified_since:
+            try:
+                return int(response.last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _headers(self, response: CachedResponse, cache_state: str) -> Dict[str, str]:
+        return {
+            'Content-Type': 'application/json; charset=utf-8',
+            'ETag': response.etag,
+            'Last-Modified': formatdate(response.last_modified, usegmt=True),
+            # شبكة Vercel تخزن الرد أيضاً بنفس المدد
+            'Cache-Control': f"public, max-age={int(self.cache.ttl)}, "
+                             f"stale-while-revalidate={int(self.cache.stale)}",
+            'X-Cache': cache_state,
+        }
+
+    async def handle(self, path: str, query: Dict[str, str],
+                     headers: Optional[Dict[str, str]] = None) -> Tuple[int, Dict[str, str], bytes]:
+        """(رمز الحالة، الترويسات، الجسم) لطلب GET على /api/stats/<route>"""
+        headers = {name.lower(): value for name, value in (headers or {}).items()}
+        route = path.rstrip('/').rsplit('/', 1)[-1]
+        if route not in self.routes:
+            return 404, {'Content-Type': 'application/json'}, b'{"error":"not found"}'
+
+        # المفتاح يشمل المعاملات المعروفة فقط حتى لا تُنشأ نسخ لمعاملات عشوائية
+        params = {name: query[name] for name in ('group_id', 'user_id', 'limit', 'cursor', 'days') if query.get(name)}
+        key = (route, tuple(sorted(params.items())))
+        try:
+            response, cache_state = await self.cache.get(key, lambda: self._build(route, params))
+        except ValueError as e:
+            return 400, {'Content-Type': 'application/json'}, json.dumps({'error': str(e)}, ensure_ascii=False).encode()
+        except LookupError as e:
+            return 404, {'Content-Type': 'application/json'}, json.dumps({'error': str(e)}, ensure_ascii=False).encode()
+
+        response_headers = self._headers(response, cache_state)
+        if self._not_modified(response, headers):
+            return 304, response_headers, b''
+        return 200, response_headers, response.body
+
+
+class DailyStatsRefresher:
+    """تحديث group_daily_stats دورياً من message_logs (آخر يومين فقط)"""
+
+    def __init__(self, db, days: int = 2):
+        self.db = db
+        self.days = days
+
+    async def run(self) -> int:
+        started = time.perf_counter()
+        changed = await self.db.refresh_group_daily_stats(date.today() - timedelta(days=self.days - 1))
+        logger.info("📊 تحديث الإحصائيات اليومية: %s صف خلال %.2fs", changed, time.perf_counter() - started)
+        return changed
+
+    async def job_callback(self, context):
+        """استدعاء دوري من JobQueue الخاص بالبوت"""
+        try:
+            await self.run()
+        except Exception as e:
+            logger.error("خطأ في تحديث الإحصائيات اليومية: %s", e)
+
+
+async def _refresh(args):
+    from storage import create_storage, open_storage, close_storage
+
+    db = create_storage(args.backend)
+    await open_storage(db)
+    try:
+        await DailyStatsRefresher(db, args.days).run()
+    finally:
+        await close_storage(db)
+
+
+def main(argv: Optional[List[str]] = None):
+    from storage import available_backends
+
+    parser = argparse.ArgumentParser(description="إحصائيات لوحة التحكم")
+    commands = parser.add_subparsers(dest='command', required=True)
+    refresh = commands.add_parser('refresh', help="إعادة تجميع group_daily_stats من message_logs")
+    refresh.add_argument('--backend', choices=available_backends(), default=None)
+    refresh.add_argument('--days', type=int, default=2, help="عدد الأيام الأخيرة التي يعاد تجميعها")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    asyncio.run(_refresh(args))
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    main()
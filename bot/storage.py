@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Storage - الواجهة الموحدة لمدراء قاعدة البيانات وسجل الواجهات الخلفية
+"""
+
+import os
+from datetime import datetime, date
+from typing import Optional, List, Dict, Callable, Protocol, runtime_checkable
+
+from models import (
+    User, UserGroup, Level, ShopItem, Badge, DailyQuest, Clan, GroupSettings, ProfileBundle, Season
+)
+
+
+@runtime_checkable
+class StorageBackend(Protocol):
+    """العمليات التي يجب أن توفرها كل واجهة تخزين"""
+
+    # المستخدمين
+    async def add_user_if_not_exists(self, user) -> bool: ...
+    async def get_user_by_id(self, user_id: int) -> Optional[User]: ...
+    async def get_user_ids_by_usernames(self, usernames: List[str]) -> Dict[str, int]: ...
+
+    # الجروبات
+    async def add_group_if_not_exists(self, group_id: int, name: str) -> bool: ...
+    async def add_user_to_group_if_not_exists(self, user_id: int, group_id: int) -> bool: ...
+    async def get_user_group(self, user_id: int, group_id: int) -> Optional[UserGroup]: ...
+    async def get_profile_bundle(self, user_id: int, group_id: int) -> Optional[ProfileBundle]: ...
+    async def update_user_stats(self, user_id: int, group_id: int, xp_gained: int, coins_gained: int,
+                                season_id: int = 1): ...
+    async def update_user_level(self, user_id: int, group_id: int, new_level_id: int): ...
+
+    # إعدادات الجروبات
+    async def get_group_settings(self, group_id: int) -> Optional[GroupSettings]: ...
+    async def get_group_settings_since(self, since: Optional[datetime] = None) -> List[GroupSettings]: ...
+    async def save_group_settings(self, settings: GroupSettings) -> Optional[GroupSettings]: ...
+
+    # الإجراءات الإدارية
+    async def bulk_adjust_users(self, admin_user_id: int, group_id: int, user_ids: List[int],
+                                xp_deltas: List[int], coin_deltas: List[int],
+                                action_type: str, reason: Optional[str] = None) -> List[Dict]: ...
+    async def bulk_reset_users(self, admin_user_id: int, group_id: int, user_ids: List[int],
+                               reason: Optional[str] = None) -> List[Dict]: ...
+
+    # المستويات
+    async def get_level_by_id(self, level_id: int) -> Optional[Level]: ...
+    async def get_level_by_number(self, level_number: int) -> Optional[Level]: ...
+    async def get_level_by_xp(self, xp: int) -> Optional[Level]: ...
+    async def get_all_levels(self) -> List[Level]: ...
+    async def count_user_groups(self) -> int: ...
+    async def fetch_user_groups_chunk(self, after_id: int, limit: int) -> List[Dict]: ...
+    async def bulk_update_level_ids(self, ids: List[int], level_ids: List[int]): ...
+    async def get_group_leaderboard(self, group_id: int, limit: int = 10) -> List[Dict]: ...
+    async def get_leaderboard_page(self, group_id: int, limit: int, after_xp: Optional[int] = None,
+                                   after_user_id: Optional[int] = None) -> List[Dict]: ...
+
+    # الإحصائيات اليومية
+    async def refresh_group_daily_stats(self, since: date) -> int: ...
+    async def get_group_daily_stats(self, group_id: int, since: date) -> List[Dict]: ...
+
+    # نشاط الجروب حسب ساعة الأسبوع
+    async def add_group_activity(self, rows: List[Dict]): ...
+    async def get_group_activity(self, group_id: int) -> List[Dict]: ...
+
+    # مخططات الأعضاء النشطين (HyperLogLog)
+    async def save_activity_sketches(self, rows: List[Dict]): ...
+    async def get_activity_sketches(self, group_ids: List[int], since: date, until: date) -> List[Dict]: ...
+
+    # المواسم
+    async def start_season(self, group_id: int, season_id: int, started_by: Optional[int] = None) -> Optional[GroupSettings]: ...
+    async def archive_season(self, group_id: int, season_id: int) -> int: ...
+    async def get_season(self, group_id: int, season_id: int) -> Optional[Season]: ...
+    async def get_due_seasons(self, now: datetime) -> List[Dict]: ...
+    async def get_unarchived_seasons(self, ended_before: datetime) -> List[Season]: ...
+    async def get_season_leaderboard(self, group_id: int, season_id: int, limit: int = 10) -> List[Dict]: ...
+    async def get_season_standings(self, group_id: int, season_id: int, limit: int = 10) -> List[Dict]: ...
+
+    # المتجر
+    async def get_shop_items(self, limit: int = 50) -> List[ShopItem]: ...
+    async def get_shop_item_by_id(self, item_id: int) -> Optional[ShopItem]: ...
+
+    # الشارات
+    async def get_all_badges(self) -> List[Badge]: ...
+    async def get_user_badges(self, user_id: int, group_id: int) -> List[Badge]: ...
+    async def get_user_badges_count(self, user_id: int, group_id: int) -> int: ...
+    async def award_badge(self, user_id: int, group_id: int, badge_id: int): ...
+
+    # المهام اليومية
+    async def get_daily_quests(self, user_id: int, group_id: int, quest_date: date) -> List[DailyQuest]: ...
+    async def create_daily_quest(self, user_id: int, group_id: int, quest_type: str,
+                                 target_value: int, reward_xp: int, reward_coins: int, quest_date: date): ...
+    async def update_daily_quest_progress(self, user_id: int, group_id: int, quest_type: str,
+                                          progress: int, quest_date: date): ...
+    async def sweep_daily_quests(self, cutoff: date, batch_size: int, archive: bool = False) -> Dict[str, int]: ...
+    async def fetch_group_ids_chunk(self, after_id: Optional[int], limit: int) -> List[int]: ...
+    async def generate_daily_quests(self, group_ids: List[int], quest_date: date, active_since: datetime,
+                                    quests: List[Dict]) -> int: ...
+
+    # الكلانات
+    async def get_clan_by_id(self, clan_id: int) -> Optional[Clan]: ...
+    async def get_clan_by_name(self, name: str, group_id: int) -> Optional[Clan]: ...
+
+    # تسجيل الرسائل
+    async def log_message(self, user_id: int, group_id: int, message_id: int,
+                          xp_gained: int, coins_gained: int, message_type: str = 'text') -> bool: ...
+
+    # صندوق الأحداث (outbox)
+    async def append_outbox_events(self, events: List[Dict]): ...
+    async def claim_outbox_events(self, limit: int) -> List[Dict]: ...
+
+    # المخزون
+    async def add_to_inventory(self, user_id: int, group_id: int, item_id: int,
+                               quantity: int = 1, expires_at: datetime = None): ...
+    async def get_user_inventory(self, user_id: int, group_id: int) -> List[Dict]: ...
+
+
+_BACKENDS: Dict[str, Callable[[], StorageBackend]] = {}
+
+
+def register_backend(name: str):
+    """تسجيل دالة إنشاء واجهة تخزين باسم"""
+    def decorator(factory: Callable[[], StorageBackend]):
+        _BACKENDS[name] = factory
+        return factory
+    return decorator
+
+
+def available_backends() -> List[str]:
+    """أسماء الواجهات المسجلة"""
+    return sorted(_BACKENDS)
+
+
+def create_storage(name: Optional[str] = None) -> StorageBackend:
+    """إنشاء واجهة التخزين المحددة (أو من STORAGE_BACKEND)"""
+    name = name or os.getenv('STORAGE_BACKEND', 'supabase')
+    factory = _BACKENDS.get(name)
+    if factory is None:
+        raise ValueError(f"واجهة تخزين غير معروفة: {name} (المتاح: {', '.join(available_backends())})")
+    return factory()
+
+
+async def open_storage(db: StorageBackend):
+    """فتح الاتصالات إن كانت الواجهة تحتاج ذلك"""
+    connect = getattr(db, 'connect', None)
+    if connect:
+        await connect()
+
+
+async def close_storage(db: StorageBackend):
+    """إغلاق الاتصالات إن كانت الواجهة تدعم ذلك"""
+    disconnect = getattr(db, 'disconnect', None)
+    if disconnect:
+        await disconnect()
+
+
+# الواجهات المدمجة (الاستيراد عند الطلب حتى لا تُطلب مكتبات غير مستخدمة)
+@register_backend('supabase')
+def _supabase_backend() -> StorageBackend:
+    from supabase_database import SupabaseManager
+    return SupabaseManager()
+
+
+@register_backend('postgres')
+def _postgres_backend() -> StorageBackend:
+    from database import DatabaseManager, load_config_from_env, load_replica_dsns_from_env
+    return DatabaseManager(load_config_from_env(), load_replica_dsns_from_env(),
+                           max_replica_lag=float(os.getenv('DB_MAX_REPLICA_LAG', '5')))
+
+
+@register_backend('sqlite')
+def _sqlite_backend() -> StorageBackend:
+    from sqlite_database import SQLiteManager
+    return SQLiteManager(os.getenv('SQLITE_PATH', 'bot.db'))
+
+
+@register_backend('memory')
+def _memory_backend() -> StorageBackend:
+    from sqlite_database import SQLiteManager
+    return SQLiteManager(':memory:')
@@ -5,11 +5,26 @@
 Supabase Database Manager - إدارة قاعدة البيانات باستخدام Supabase
 """
 
+import logging
 import os
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 from typing import Optional, List, Dict, Any
 from datetime import datetime, date
-from models import User, UserGroup, Level, ShopItem, Badge, DailyQuest, Clan
+from models import (
+    User, UserGroup, Level, ShopItem, Badge, DailyQuest, Clan, GroupSettings, GROUP_SETTING_FIELDS, ProfileBundle,
+    Season
+)
+from metrics import mark_error
+from resilience import mark_failure
+
+logger = logging.getLogger(__name__)
+
+def _log_error(message: str, error: Exception):
+    """تسجيل الخطأ واحتسابه على العملية الجارية (وعلى قاطع الدائرة إن كان خطأ اتصال)"""
+    logger.error("%s: %s", message, error)
+    mark_error()
+    mark_failure(error)
 
 class SupabaseManager:
     def __init__(self):
@@ -20,11 +35,14 @@ class SupabaseManager:
         if not supabase_url or not supabase_key:
             raise ValueError("متغيرات Supabase غير موجودة!")
         
-        self.supabase: Client = create_client(supabase_url, supabase_key)
+        # العميل متزامن: مهلة HTTP هي الحد الفعلي لزمن كل طلب
+        timeout = float(os.getenv('SUPABASE_TIMEOUT', '5'))
+        self.supabase: Client = create_client(supabase_url, supabase_key,
+                                              options=ClientOptions(postgrest_client_timeout=timeout))
     
     # المستخدمين
-    async def add_user_if_not_exists(self, user):
-        """إضافة مستخدم جديد إذا لم يكن موجوداً"""
+    async def add_user_if_not_exists(self, user) -> bool:
+        """إضافة مستخدم جديد إذا لم يكن موجوداً (False = فشلت الكتابة)"""
         try:
             # البحث عن المستخدم أولاً
             existing = self.supabase.table('users').select('*').eq('id', user.id).execute()
@@ -46,8 +64,10 @@ class SupabaseManager:
                     'first_name': user.first_name,
                     'last_name': user.last_name
                 }).eq('id', user.id).execute()
+            return True
         except Exception as e:
-            print(f"خطأ في إضافة المستخدم: {e}")
+            _log_error("خطأ في إضافة المستخدم", e)
+            return False
     
     async def get_user_by_id(self, user_id: int) -> Optional[User]:
         """الحصول على مستخدم بالمعرف"""
@@ -57,12 +77,12 @@ class SupabaseManager:
                 return User.from_dict(result.data[0])
             return None
         except Exception as e:
-            print(f"خطأ في جلب المستخدم: {e}")
+            _log_error("خطأ في جلب المستخدم", e)
             return None
     
     # الجروبات
-    async def add_group_if_not_exists(self, group_id: int, name: str):
-        """إضافة جروب جديد إذا لم يكن موجوداً"""
+    async def add_group_if_not_exists(self, group_id: int, name: str) -> bool:
+        """إضافة جروب جديد إذا لم يكن موجوداً (False = فشلت الكتابة)"""
         try:
             existing = self.supabase.table('groups').select('*').eq('id', group_id).execute()
             
@@ -75,12 +95,58 @@ class SupabaseManager:
                 self.supabase.table('groups').update({
                     'name': name
                 }).eq('id', group_id).execute()
+            return True
         except Exception as e:
-            print(f"خطأ في إضافة الجروب: {e}")
+            _log_error("خطأ في إضافة الجروب", e)
+            return False
+    
+    # إعدادات الجروبات (لا يوجد LISTEN عبر REST، فالتحديث بالاستطلاع على updated_at)
+    async def get_group_settings(self, group_id: int) -> Optional[GroupSettings]:
+        """إعدادات جروب واحد (None = القيم الافتراضية)"""
+        try:
+            result = self.supabase.table('group_settings').select('*').eq('group_id', group_id).execute()
+            if result.data:
+                return GroupSettings.from_dict(result.data[0])
+            return None
+        except Exception as e:
+            _log_error("خطأ في جلب إعدادات الجروب", e)
+            return None
+    
+    async def get_group_settings_since(self, since: Optional[datetime] = None) -> List[GroupSettings]:
+        """الإعدادات المعدلة منذ وقت معين (أو كلها)"""
+        try:
+            query = self.supabase.table('group_settings').select('*')
+            if since is not None:
+                query = query.gte('updated_at', since.isoformat())
+            result = query.execute()
+            return [GroupSettings.from_dict(row) for row in result.data]
+        except Exception as e:
+            _log_error("خطأ في جلب إعدادات الجروبات", e)
+            return []
+    
+    async def save_group_settings(self, settings: GroupSettings) -> Optional[GroupSettings]:
+        """حفظ إعدادات جروب (إدراج أو تحديث، وتفعيل season_days يسجل بداية الموسم الحالي)"""
+        try:
+            previous = self.supabase.table('group_settings').select('updated_at').eq(
+                'group_id', settings.group_id).gt('season_days', 0).execute()
+            record = {name: getattr(settings, name) for name in GROUP_SETTING_FIELDS}
+            record.update(group_id=settings.group_id, updated_by=settings.updated_by)
+            result = self.supabase.table('group_settings').upsert(record, on_conflict='group_id').execute()
+            saved = GroupSettings.from_dict(result.data[0]) if result.data else None
+            if saved and saved.season_days > 0:
+                self.supabase.table('seasons').upsert({
+                    'group_id': saved.group_id,
+                    'season_id': saved.season_id,
+                    'started_at': previous.data[0]['updated_at'] if previous.data else datetime.now().isoformat()
+                }, on_conflict='group_id,season_id', ignore_duplicates=True).execute()
+            return saved
+        except Exception as e:
+            _log_error("خطأ في حفظ إعدادات الجروب", e)
+            return None
     
     # ربط المستخدمين بالجروبات
-    async def add_user_to_group_if_not_exists(self, user_id: int, group_id: int):
-        """ربط المستخدم بالجروب إذا لم يكن مربوطاً"""
+    async def add_user_to_group_if_not_exists(self, user_id: int, group_id: int) -> bool:
+        """ربط المستخدم بالجروب إذا لم يكن مربوطاً (False = فشلت الكتابة)"""
         try:
             existing = self.supabase.table('user_groups').select('*').eq('user_id', user_id).eq('group_id', group_id).execute()
             
@@ -89,8 +155,10 @@ class SupabaseManager:
                     'user_id': user_id,
                     'group_id': group_id
                 }).execute()
+            return True
         except Exception as e:
-            print(f"خطأ في ربط المستخدم بالجروب: {e}")
+            _log_error("خطأ في ربط المستخدم بالجروب", e)
+            return False
     
     async def get_user_group(self, user_id: int, group_id: int) -> Optional[UserGroup]:
         """الحصول على بيانات المستخدم في الجروب"""
@@ -100,30 +168,48 @@ class SupabaseManager:
                 return UserGroup.from_dict(result.data[0])
             return None
         except Exception as e:
-            print(f"خطأ في جلب بيانات المستخدم: {e}")
+            _log_error("خطأ في جلب بيانات المستخدم", e)
             return None
     
-    async def update_user_stats(self, user_id: int, group_id: int, xp_gained: int, coins_gained: int):
-        """تحديث إحصائيات المستخدم"""
+    async def get_profile_bundle(self, user_id: int, group_id: int) -> Optional[ProfileBundle]:
+        """المستخدم والعضوية والمستوى والتالي وعدد الشارات والكلان مع قائده عبر RPC واحد"""
+        try:
+            result = self.supabase.rpc('get_profile_bundle', {'p_user_id': user_id, 'p_group_id': group_id}).execute()
+            return ProfileBundle.from_dict(result.data) if result.data else None
+        except Exception as e:
+            _log_error("خطأ في جلب الملف الشخصي", e)
+            return None
+    
+    async def update_user_stats(self, user_id: int, group_id: int, xp_gained: int, coins_gained: int,
+                                season_id: int = 1):
+        """تحديث إحصائيات المستخدم (أول منح في موسم جديد ينقل XP الموسم السابق إلى prev_season_xp)"""
         try:
             # جلب البيانات الحالية
-            current = self.supabase.table('user_groups').select('xp, coins, total_messages').eq('user_id', user_id).eq('group_id', group_id).execute()
+            current = self.supabase.table('user_groups').select(
+                'xp, coins, total_messages, season_id, season_xp, prev_season_id, prev_season_xp'
+            ).eq('user_id', user_id).eq('group_id', group_id).execute()
             
             if current.data:
                 old_data = current.data[0]
                 new_xp = old_data['xp'] + xp_gained
                 new_coins = old_data['coins'] + coins_gained
                 new_messages = old_data['total_messages'] + 1
+                if old_data['season_id'] >= season_id:
+                    season = {'season_xp': old_data['season_xp'] + xp_gained}
+                else:
+                    season = {'season_id': season_id, 'season_xp': xp_gained,
+                              'prev_season_id': old_data['season_id'], 'prev_season_xp': old_data['season_xp']}
                 
                 self.supabase.table('user_groups').update({
                     'xp': new_xp,
                     'coins': new_coins,
                     'total_messages': new_messages,
+                    **season,
                     'last_message_at': datetime.now().isoformat(),
                     'last_xp_gain': datetime.now().isoformat()
                 }).eq('user_id', user_id).eq('group_id', group_id).execute()
         except Exception as e:
-            print(f"خطأ في تحديث الإحصائيات: {e}")
+            _log_error("خطأ في تحديث الإحصائيات", e)
     
     async def update_user_level(self, user_id: int, group_id: int, new_level_id: int):
         """تحديث مستوى المستخدم"""
@@ -132,7 +218,7 @@ class SupabaseManager:
                 'level_id': new_level_id
             }).eq('user_id', user_id).eq('group_id', group_id).execute()
         except Exception as e:
-            print(f"خطأ في تحديث المستوى: {e}")
+            _log_error("خطأ في تحديث المستوى", e)
     
     # المستويات
     async def get_level_by_id(self, level_id: int) -> Optional[Level]:
@@ -143,7 +229,7 @@ class SupabaseManager:
                 return Level.from_dict(result.data[0])
             return None
         except Exception as e:
-            print(f"خطأ في جلب المستوى: {e}")
+            _log_error("خطأ في جلب المستوى", e)
             return None
     
     async def get_level_by_number(self, level_number: int) -> Optional[Level]:
@@ -154,7 +240,7 @@ class SupabaseManager:
                 return Level.from_dict(result.data[0])
             return None
         except Exception as e:
-            print(f"خطأ في جلب المستوى: {e}")
+            _log_error("خطأ في جلب المستوى", e)
             return None
     
     async def get_level_by_xp(self, xp: int) -> Optional[Level]:
@@ -165,9 +251,247 @@ class SupabaseManager:
                 return Level.from_dict(result.data[0])
             return None
         except Exception as e:
-            print(f"خطأ في جلب المستوى بـ XP: {e}")
+            _log_error("خطأ في جلب المستوى بـ XP", e)
+            return None
+    
+    async def get_all_levels(self) -> List[Level]:
+        """الحصول على جميع المستويات مرتبة حسب XP المطلوب"""
+        try:
+            result = self.supabase.table('levels').select('*').order('required_xp').execute()
+            return [Level.from_dict(level) for level in result.data]
+        except Exception as e:
+            _log_error("خطأ في جلب المستويات", e)
+            return []
+    
+    async def count_user_groups(self) -> int:
+        """عدد تقريبي لصفوف user_groups"""
+        try:
+            result = self.supabase.table('user_groups').select('id', count='estimated').limit(1).execute()
+            return result.count or 0
+        except Exception as e:
+            _log_error("خطأ في عد الصفوف", e)
+            return 0
+    
+    async def fetch_user_groups_chunk(self, after_id: int, limit: int) -> List[Dict]:
+        """جلب دفعة من user_groups بترقيم المفتاح (id, xp, level_id)"""
+        try:
+            result = self.supabase.table('user_groups').select('id, xp, level_id').gt('id', after_id).order('id').limit(limit).execute()
+            return [dict(item) for item in result.data]
+        except Exception as e:
+            _log_error("خطأ في جلب دفعة المستخدمين", e)
+            raise
+    
+    async def bulk_update_level_ids(self, ids: List[int], level_ids: List[int]):
+        """تحديث مستويات عدة صفوف عبر RPC واحد"""
+        try:
+            self.supabase.rpc('bulk_set_levels', {
+                'p_ids': ids,
+                'p_level_ids': level_ids
+            }).execute()
+        except Exception as e:
+            _log_error("خطأ في تحديث المستويات الجماعي", e)
+            raise
+    
+    async def get_group_leaderboard(self, group_id: int, limit: int = 10) -> List[Dict]:
+        """أعلى الأعضاء XP في الجروب"""
+        try:
+            result = self.supabase.table('user_groups').select(
+                'user_id, xp, level_id, users(username, first_name)'
+            ).eq('group_id', group_id).eq('is_active', True).order('xp', desc=True).limit(limit).execute()
+            return [
+                {
+                    'user_id': row['user_id'], 'xp': row['xp'], 'level_id': row['level_id'],
+                    'username': (row.get('users') or {}).get('username'),
+                    'first_name': (row.get('users') or {}).get('first_name'),
+                }
+                for row in result.data
+            ]
+        except Exception as e:
+            _log_error("خطأ في جلب قائمة المتصدرين", e)
+            return []
+    
+    async def get_leaderboard_page(self, group_id: int, limit: int, after_xp: Optional[int] = None,
+                                   after_user_id: Optional[int] = None) -> List[Dict]:
+        """صفحة من المتصدرين بعد (xp, user_id) معين (ترقيم بالمفتاح بدون OFFSET)"""
+        try:
+            query = self.supabase.table('user_groups').select(
+                'user_id, xp, level_id, updated_at, users(username, first_name)'
+            ).eq('group_id', group_id).eq('is_active', True)
+            if after_xp is not None:
+                query = query.or_(f"xp.lt.{after_xp},and(xp.eq.{after_xp},user_id.lt.{after_user_id})")
+            result = query.order('xp', desc=True).order('user_id', desc=True).limit(limit).execute()
+            return [
+                {
+                    'user_id': row['user_id'], 'xp': row['xp'], 'level_id': row['level_id'],
+                    'updated_at': row.get('updated_at'),
+                    'username': (row.get('users') or {}).get('username'),
+                    'first_name': (row.get('users') or {}).get('first_name'),
+                }
+                for row in result.data
+            ]
+        except Exception as e:
+            _log_error("خطأ في جلب صفحة المتصدرين", e)
+            return []
+    
+    # الإحصائيات اليومية
+    async def refresh_group_daily_stats(self, since: date) -> int:
+        """إعادة تجميع message_logs منذ تاريخ معين عبر RPC"""
+        try:
+            result = self.supabase.rpc('refresh_group_daily_stats', {'p_since': since.isoformat()}).execute()
+            return result.data or 0
+        except Exception as e:
+            _log_error("خطأ في تحديث الإحصائيات اليومية", e)
+            return 0
+    
+    async def get_group_daily_stats(self, group_id: int, since: date) -> List[Dict]:
+        """نشاط الجروب اليومي المجمع مرتباً بالتاريخ"""
+        try:
+            result = self.supabase.table('group_daily_stats').select(
+                'stat_date, messages, active_users, xp_gained, coins_gained, updated_at'
+            ).eq('group_id', group_id).gte('stat_date', since.isoformat()).order('stat_date').execute()
+            return result.data
+        except Exception as e:
+            _log_error("خطأ في جلب الإحصائيات اليومية", e)
+            return []
+    
+    # نشاط الجروب حسب ساعة الأسبوع
+    async def add_group_activity(self, rows: List[Dict]):
+        """إضافة فروق العدادات عبر RPC (upsert في PostgREST يستبدل القيمة ولا يجمعها)"""
+        if not rows:
+            return
+        try:
+            self.supabase.rpc('add_group_activity', {'p_rows': rows}).execute()
+        except Exception as e:
+            _log_error("خطأ في كتابة نشاط الجروبات", e)
+            raise
+    
+    async def get_group_activity(self, group_id: int) -> List[Dict]:
+        """عدادات الجروب المكتوبة (صف لكل ساعة أسبوع فيها نشاط)"""
+        try:
+            result = self.supabase.table('group_activity').select(
+                'hour_of_week, messages'
+            ).eq('group_id', group_id).order('hour_of_week').execute()
+            return result.data
+        except Exception as e:
+            _log_error("خطأ في جلب نشاط الجروب", e)
+            return []
+    
+    # مخططات الأعضاء النشطين (HyperLogLog)
+    async def save_activity_sketches(self, rows: List[Dict]):
+        """حفظ مخططات (جروب، يوم) في طلب واحد (bytea يُرسل كنص سداسي \\x...)"""
+        if not rows:
+            return
+        try:
+            self.supabase.table('activity_sketches').upsert([
+                {'group_id': row['group_id'], 'sketch_date': row['sketch_date'].isoformat(),
+                 'sketch': '\\x' + row['sketch'].hex()}
+                for row in rows
+            ], on_conflict='group_id,sketch_date').execute()
+        except Exception as e:
+            _log_error("خطأ في حفظ مخططات الأعضاء النشطين", e)
+            raise
+    
+    async def get_activity_sketches(self, group_ids: List[int], since: date, until: date) -> List[Dict]:
+        """مخططات الجروبات في نطاق أيام"""
+        if not group_ids:
+            return []
+        try:
+            result = self.supabase.table('activity_sketches').select('group_id, sketch_date, sketch').in_(
+                'group_id', group_ids
+            ).gte('sketch_date', since.isoformat()).lte('sketch_date', until.isoformat()).execute()
+            return [{**row, 'sketch': bytes.fromhex(row['sketch'][2:])} for row in result.data]
+        except Exception as e:
+            _log_error("خطأ في جلب مخططات الأعضاء النشطين", e)
+            return []
+    
+    # المواسم (البدء والأرشفة عبر RPC: عدة جداول في معاملة واحدة)
+    async def start_season(self, group_id: int, season_id: int, started_by: Optional[int] = None) -> Optional[GroupSettings]:
+        """بدء الموسم season_id إن كان الحالي season_id - 1 ولا يوجد موسم منتهٍ لم يُؤرشف (None = لم يبدأ)"""
+        try:
+            result = self.supabase.rpc('start_season', {
+                'p_group_id': group_id, 'p_season_id': season_id, 'p_started_by': started_by
+            }).execute()
+            return GroupSettings.from_dict(result.data[0]) if result.data else None
+        except Exception as e:
+            _log_error("خطأ في بدء الموسم", e)
+            raise
+    
+    async def archive_season(self, group_id: int, season_id: int) -> int:
+        """نسخ الترتيب النهائي لموسم منتهٍ إلى season_standings عبر RPC"""
+        try:
+            result = self.supabase.rpc('archive_season', {'p_group_id': group_id, 'p_season_id': season_id}).execute()
+            return result.data or 0
+        except Exception as e:
+            _log_error("خطأ في أرشفة الموسم", e)
+            raise
+    
+    async def get_season(self, group_id: int, season_id: int) -> Optional[Season]:
+        """بيانات موسم واحد (None للموسم الأول قبل تفعيل season_days)"""
+        try:
+            result = self.supabase.table('seasons').select('*').eq('group_id', group_id).eq('season_id', season_id).execute()
+            return Season.from_dict(result.data[0]) if result.data else None
+        except Exception as e:
+            _log_error("خطأ في جلب الموسم", e)
             return None
     
+    async def get_due_seasons(self, now: datetime) -> List[Dict]:
+        """الجروبات التي انتهت مدة موسمها الحالي عبر RPC"""
+        try:
+            result = self.supabase.rpc('get_due_seasons', {'p_now': now.isoformat()}).execute()
+            return result.data or []
+        except Exception as e:
+            _log_error("خطأ في جلب المواسم المنتهية", e)
+            return []
+    
+    async def get_unarchived_seasons(self, ended_before: datetime) -> List[Season]:
+        """المواسم المنتهية قبل وقت معين ولم يُؤرشف ترتيبها بعد"""
+        try:
+            result = self.supabase.table('seasons').select('*').is_('archived_at', 'null').lte(
+                'ended_at', ended_before.isoformat()
+            ).order('ended_at').execute()
+            return [Season.from_dict(row) for row in result.data]
+        except Exception as e:
+            _log_error("خطأ في جلب المواسم غير المؤرشفة", e)
+            return []
+    
+    async def get_season_leaderboard(self, group_id: int, season_id: int, limit: int = 10) -> List[Dict]:
+        """أعلى الأعضاء XP في الموسم الجاري"""
+        try:
+            result = self.supabase.table('user_groups').select(
+                'user_id, season_xp, level_id, users(username, first_name)'
+            ).eq('group_id', group_id).eq('season_id', season_id).eq('is_active', True).gt('season_xp', 0).order(
+                'season_xp', desc=True
+            ).order('user_id', desc=True).limit(limit).execute()
+            return [
+                {
+                    'user_id': row['user_id'], 'xp': row['season_xp'], 'level_id': row['level_id'],
+                    'username': (row.get('users') or {}).get('username'),
+                    'first_name': (row.get('users') or {}).get('first_name'),
+                }
+                for row in result.data
+            ]
+        except Exception as e:
+            _log_error("خطأ في جلب متصدري الموسم", e)
+            return []
+    
+    async def get_season_standings(self, group_id: int, season_id: int, limit: int = 10) -> List[Dict]:
+        """الترتيب النهائي المؤرشف لموسم منتهٍ"""
+        try:
+            result = self.supabase.table('season_standings').select(
+                'user_id, xp, season_rank, users(username, first_name)'
+            ).eq('group_id', group_id).eq('season_id', season_id).order('season_rank').limit(limit).execute()
+            return [
+                {
+                    'user_id': row['user_id'], 'xp': row['xp'], 'season_rank': row['season_rank'],
+                    'username': (row.get('users') or {}).get('username'),
+                    'first_name': (row.get('users') or {}).get('first_name'),
+                }
+                for row in result.data
+            ]
+        except Exception as e:
+            _log_error("خطأ في جلب ترتيب الموسم", e)
+            return []
+    
     # المتجر
     async def get_shop_items(self, limit: int = 50) -> List[ShopItem]:
         """الحصول على عناصر المتجر"""
@@ -175,7 +499,7 @@ class SupabaseManager:
             result = self.supabase.table('shop_items').select('*').eq('is_active', True).order('price').limit(limit).execute()
             return [ShopItem.from_dict(item) for item in result.data]
         except Exception as e:
-            print(f"خطأ في جلب عناصر المتجر: {e}")
+            _log_error("خطأ في جلب عناصر المتجر", e)
             return []
     
     async def get_shop_item_by_id(self, item_id: int) -> Optional[ShopItem]:
@@ -186,7 +510,7 @@ class SupabaseManager:
                 return ShopItem.from_dict(result.data[0])
             return None
         except Exception as e:
-            print(f"خطأ في جلب عنصر المتجر: {e}")
+            _log_error("خطأ في جلب عنصر المتجر", e)
             return None
     
     # الشارات
@@ -196,7 +520,7 @@ class SupabaseManager:
             result = self.supabase.table('badges').select('*').eq('is_active', True).execute()
             return [Badge.from_dict(badge) for badge in result.data]
         except Exception as e:
-            print(f"خطأ في جلب الشارات: {e}")
+            _log_error("خطأ في جلب الشارات", e)
             return []
     
     async def get_user_badges(self, user_id: int, group_id: int) -> List[Badge]:
@@ -205,7 +529,7 @@ class SupabaseManager:
             result = self.supabase.table('user_badges').select('badges(*)').eq('user_id', user_id).eq('group_id', group_id).execute()
             return [Badge.from_dict(item['badges']) for item in result.data if item['badges']]
         except Exception as e:
-            print(f"خطأ في جلب شارات المستخدم: {e}")
+            _log_error("خطأ في جلب شارات المستخدم", e)
             return []
     
     async def get_user_badges_count(self, user_id: int, group_id: int) -> int:
@@ -214,7 +538,7 @@ class SupabaseManager:
             result = self.supabase.table('user_badges').select('id', count='exact').eq('user_id', user_id).eq('group_id', group_id).execute()
             return result.count or 0
         except Exception as e:
-            print(f"خطأ في عد الشارات: {e}")
+            _log_error("خطأ في عد الشارات", e)
             return 0
     
     async def award_badge(self, user_id: int, group_id: int, badge_id: int):
@@ -226,7 +550,7 @@ class SupabaseManager:
                 'badge_id': badge_id
             }).execute()
         except Exception as e:
-            print(f"خطأ في منح الشارة: {e}")
+            _log_error("خطأ في منح الشارة", e)
     
     # المهام اليومية
     async def get_daily_quests(self, user_id: int, group_id: int, quest_date: date) -> List[DailyQuest]:
@@ -235,7 +559,7 @@ class SupabaseManager:
             result = self.supabase.table('daily_quests').select('*').eq('user_id', user_id).eq('group_id', group_id).eq('quest_date', quest_date.isoformat()).execute()
             return [DailyQuest.from_dict(quest) for quest in result.data]
         except Exception as e:
-            print(f"خطأ في جلب المهام اليومية: {e}")
+            _log_error("خطأ في جلب المهام اليومية", e)
             return []
     
     async def create_daily_quest(self, user_id: int, group_id: int, quest_type: str, 
@@ -252,7 +576,7 @@ class SupabaseManager:
                 'quest_date': quest_date.isoformat()
             }).execute()
         except Exception as e:
-            print(f"خطأ في إنشاء المهمة اليومية: {e}")
+            _log_error("خطأ في إنشاء المهمة اليومية", e)
     
     async def update_daily_quest_progress(self, user_id: int, group_id: int, quest_type: str, 
                                         progress: int, quest_date: date):
@@ -277,7 +601,52 @@ class SupabaseManager:
                 
                 self.supabase.table('daily_quests').update(update_data).eq('user_id', user_id).eq('group_id', group_id).eq('quest_type', quest_type).eq('quest_date', quest_date.isoformat()).execute()
         except Exception as e:
-            print(f"خطأ في تحديث تقدم المهمة: {e}")
+            _log_error("خطأ في تحديث تقدم المهمة", e)
+    
+    async def sweep_daily_quests(self, cutoff: date, batch_size: int, archive: bool = False) -> Dict[str, int]:
+        """نقل دفعة من المهام القديمة إلى السجل المجمع وحذفها عبر RPC"""
+        try:
+            result = self.supabase.rpc('sweep_daily_quests', {
+                'p_cutoff': cutoff.isoformat(),
+                'p_batch_size': batch_size,
+                'p_archive': archive
+            }).execute()
+            row = result.data[0] if result.data else {}
+            return {'deleted': row.get('deleted', 0), 'completed': row.get('completed', 0)}
+        except Exception as e:
+            _log_error("خطأ في تنظيف المهام اليومية", e)
+            raise
+    
+    async def fetch_group_ids_chunk(self, after_id: Optional[int], limit: int) -> List[int]:
+        """جلب دفعة من معرفات الجروبات النشطة بترقيم المفتاح (المعرفات سالبة، فالبداية None)"""
+        try:
+            query = self.supabase.table('groups').select('id').eq('is_active', True)
+            if after_id is not None:
+                query = query.gt('id', after_id)
+            result = query.order('id').limit(limit).execute()
+            return [item['id'] for item in result.data]
+        except Exception as e:
+            _log_error("خطأ في جلب دفعة الجروبات", e)
+            raise
+    
+    async def generate_daily_quests(self, group_ids: List[int], quest_date: date, active_since: datetime,
+                                    quests: List[Dict]) -> int:
+        """إنشاء مهام quest_date لأعضاء الجروبات النشطين عبر RPC واحد"""
+        try:
+            result = self.supabase.rpc('generate_daily_quests', {
+                'p_group_ids': group_ids,
+                'p_quest_date': quest_date.isoformat(),
+                'p_active_since': active_since.isoformat(),
+                'p_level_ids': [quest['level_id'] for quest in quests],
+                'p_quest_types': [quest['quest_type'] for quest in quests],
+                'p_targets': [quest['target_value'] for quest in quests],
+                'p_reward_xp': [quest['reward_xp'] for quest in quests],
+                'p_reward_coins': [quest['reward_coins'] for quest in quests]
+            }).execute()
+            return result.data or 0
+        except Exception as e:
+            _log_error("خطأ في إنشاء المهام اليومية", e)
+            raise
     
     # الكلانات
     async def get_clan_by_id(self, clan_id: int) -> Optional[Clan]:
@@ -288,7 +657,7 @@ class SupabaseManager:
                 return Clan.from_dict(result.data[0])
             return None
         except Exception as e:
-            print(f"خطأ في جلب الكلان: {e}")
+            _log_error("خطأ في جلب الكلان", e)
             return None
     
     async def get_clan_by_name(self, name: str, group_id: int) -> Optional[Clan]:
@@ -299,24 +668,50 @@ class SupabaseManager:
                 return Clan.from_dict(result.data[0])
             return None
         except Exception as e:
-            print(f"خطأ في جلب الكلان بالاسم: {e}")
+            _log_error("خطأ في جلب الكلان بالاسم", e)
             return None
     
     # تسجيل الرسائل
     async def log_message(self, user_id: int, group_id: int, message_id: int, 
-                         xp_gained: int, coins_gained: int, message_type: str = 'text'):
-        """تسجيل رسالة"""
+                         xp_gained: int, coins_gained: int, message_type: str = 'text') -> bool:
+        """تسجيل رسالة (False إن كانت مسجلة من قبل: تحديث مكرر)"""
         try:
-            self.supabase.table('message_logs').insert({
+            # ignore-duplicates يعيد الصفوف المدرجة فقط
+            result = self.supabase.table('message_logs').upsert({
                 'user_id': user_id,
                 'group_id': group_id,
                 'message_id': message_id,
                 'xp_gained': xp_gained,
                 'coins_gained': coins_gained,
                 'message_type': message_type
-            }).execute()
+            }, on_conflict='group_id,message_id', ignore_duplicates=True).execute()
+            return bool(result.data)
+        except Exception as e:
+            _log_error("خطأ في تسجيل الرسالة", e)
+            # خطأ التسجيل لا يمنع المنح
+            return True
+    
+    # صندوق الأحداث (outbox)
+    async def append_outbox_events(self, events: List[Dict]):
+        """إدراج دفعة أحداث في طلب واحد"""
+        if not events:
+            return
+        try:
+            self.supabase.table('event_outbox').insert([
+                {**event, 'created_at': event['created_at'].isoformat()} for event in events
+            ]).execute()
         except Exception as e:
-            print(f"خطأ في تسجيل الرسالة: {e}")
+            _log_error("خطأ في إدراج الأحداث", e)
+            raise
+    
+    async def claim_outbox_events(self, limit: int) -> List[Dict]:
+        """سحب أقدم الأحداث وحذفها عبر RPC"""
+        try:
+            result = self.supabase.rpc('claim_outbox_events', {'p_limit': limit}).execute()
+            return sorted(result.data or [], key=lambda event: event['id'])
+        except Exception as e:
+            _log_error("خطأ في سحب الأحداث", e)
+            return []
     
     # المخزون
     async def add_to_inventory(self, user_id: int, group_id: int, item_id: int, 
@@ -335,7 +730,7 @@ class SupabaseManager:
             
             self.supabase.table('user_inventory').insert(insert_data).execute()
         except Exception as e:
-            print(f"خطأ في إضافة العنصر للمخزون: {e}")
+            _log_error("خطأ في إضافة العنصر للمخزون", e)
     
     async def get_user_inventory(self, user_id: int, group_id: int) -> List[Dict]:
         """الحصول على مخزون المستخدم"""
@@ -343,5 +738,54 @@ class SupabaseManager:
             result = self.supabase.table('user_inventory').select('*, shop_items(name, description, item_type, effect_type, effect_value)').eq('user_id', user_id).eq('group_id', group_id).eq('is_active', True).execute()
             return [dict(item) for item in result.data]
         except Exception as e:
-            print(f"خطأ في جلب المخزون: {e}")
+            _log_error("خطأ في جلب المخزون", e)
             return []
+    
+    # الإجراءات الإدارية
+    async def get_user_ids_by_usernames(self, usernames: List[str]) -> Dict[str, int]:
+        """الحصول على معرفات المستخدمين بأسماء المستخدمين"""
+        if not usernames:
+            return {}
+        try:
+            # مطابقة بدون حساسية لحالة الأحرف مثل lower(username) في PostgreSQL و SQLite
+            result = self.supabase.rpc('get_user_ids_by_usernames', {
+                'p_usernames': [name.lower() for name in usernames]
+            }).execute()
+            return {item['username'].lower(): item['id'] for item in result.data if item['username']}
+        except Exception as e:
+            _log_error("خطأ في جلب المستخدمين بالأسماء", e)
+            raise
+    
+    async def bulk_adjust_users(self, admin_user_id: int, group_id: int, user_ids: List[int],
+                                xp_deltas: List[int], coin_deltas: List[int],
+                                action_type: str, reason: Optional[str] = None) -> List[Dict]:
+        """تعديل XP والعملات لعدة مستخدمين عبر RPC واحد مع تسجيل الإجراءات"""
+        try:
+            result = self.supabase.rpc('bulk_adjust_users', {
+                'p_admin_user_id': admin_user_id,
+                'p_group_id': group_id,
+                'p_user_ids': user_ids,
+                'p_xp_deltas': xp_deltas,
+                'p_coin_deltas': coin_deltas,
+                'p_action_type': action_type,
+                'p_reason': reason
+            }).execute()
+            return [dict(item) for item in result.data or []]
+        except Exception as e:
+            _log_error("خطأ في التعديل الجماعي للمستخدمين", e)
+            raise
+    
+    async def bulk_reset_users(self, admin_user_id: int, group_id: int, user_ids: List[int],
+                               reason: Optional[str] = None) -> List[Dict]:
+        """إعادة تعيين عدة مستخدمين عبر RPC واحد مع تسجيل الإجراءات"""
+        try:
+            result = self.supabase.rpc('bulk_reset_users', {
+                'p_admin_user_id': admin_user_id,
+                'p_group_id': group_id,
+                'p_user_ids': user_ids,
+                'p_reason': reason
+            }).execute()
+            return [dict(item) for item in result.data or []]
+        except Exception as e:
+            _log_error("خطأ في إعادة التعيين الجماعي", e)
+            raise
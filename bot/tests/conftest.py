@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""وحدات البوت تُستورد بأسمائها المباشرة (كما عند التشغيل من مجلد bot)"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""أوامر المشرف: خطأ قاعدة البيانات يُبلغ به بدل رد نجاح بصفر مستخدم"""
+
+import asyncio
+from types import SimpleNamespace
+
+from main import TelegramBot
+
+
+class FailingDb:
+    def __init__(self, failing: str):
+        self.failing = failing
+
+    async def get_user_ids_by_usernames(self, usernames):
+        if self.failing == 'lookup':
+            raise RuntimeError("PGRST000")
+        return {name.lower(): 7 for name in usernames}
+
+    async def bulk_adjust_users(self, *args):
+        raise RuntimeError("PGRST000")
+
+    bulk_reset_users = bulk_adjust_users
+
+
+def _run_command(db, mode: str, args):
+    replies = []
+
+    async def reply_text(text):
+        replies.append(text)
+
+    async def is_admin(user_id, group_id):
+        return True
+
+    async def ensure_user_exists(user, group_id):
+        pass
+
+    message = SimpleNamespace(reply_text=reply_text, parse_entities=lambda types: {}, reply_to_message=None)
+    update = SimpleNamespace(message=message, effective_chat=SimpleNamespace(id=-100, type='supergroup'),
+                             effective_user=SimpleNamespace(id=1))
+    bot = SimpleNamespace(db=db, is_admin=is_admin, ensure_user_exists=ensure_user_exists, reply_tracker=None)
+    asyncio.run(TelegramBot.bulk_admin_command(bot, update, SimpleNamespace(args=args), mode))
+    return replies
+
+
+def test_failed_adjust_reports_error():
+    replies = _run_command(FailingDb('adjust'), 'xp', ['50', '@ali'])
+    assert len(replies) == 1 and replies[0].startswith("❌")
+
+
+def test_failed_reset_reports_error():
+    replies = _run_command(FailingDb('adjust'), 'reset', ['7'])
+    assert len(replies) == 1 and replies[0].startswith("❌")
+
+
+def test_failed_lookup_not_reported_as_missing_users():
+    replies = _run_command(FailingDb('lookup'), 'coins', ['5', '@ali'])
+    assert len(replies) == 1 and replies[0].startswith("❌") and "@ali" not in replies[0]
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""SpamScorer: عقوبة المعدل بالعداد المنزلق، الرسائل شبه المكررة، الموجات، وحدود الذاكرة"""
+
+from antispam import SlidingCounter, SpamScorer, normalize_text
+
+SPAM = "اربح جوائز مجانية الآن ادخل على الرابط واحصل على الهدية قبل انتهاء العرض اليوم"
+
+
+def test_sliding_counter_weights_previous_window():
+    counter = SlidingCounter(60.0, now=0.0)
+    for second in range(10):
+        counter.add(float(second))
+    assert counter.value(59.0) == 10
+    # نصف النافذة التالية: نصف عدد السابقة
+    assert counter.value(90.0) == 5
+    assert counter.add(100.0) == 1 + 10 * (1 - 40 / 60)
+    # بعد نافذتين بلا رسائل لا يبقى شيء
+    assert counter.value(300.0) == 0
+
+
+def test_rate_penalty_above_soft_limit():
+    scorer = SpamScorer(user_soft_limit=8)
+    verdicts = [scorer.score(-1, 1, None, now=float(i)) for i in range(10)]
+    assert all(v.score == 1.0 for v in verdicts[:8])
+    assert verdicts[9].score == 8 / 10 and verdicts[9].reasons == ['rate']
+    # عضو آخر في نفس الجروب لا يتأثر
+    assert scorer.score(-1, 2, None, now=10.0).score == 1.0
+    assert scorer.score(-1, 1, None, now=200.0).score == 1.0
+
+
+def test_near_duplicates_from_other_users_penalized():
+    scorer = SpamScorer()
+    assert not scorer.score(-1, 1, SPAM, now=0.0).reasons
+    edited = scorer.score(-1, 2, SPAM.replace("جوائز", "جوايز"), now=1.0)
+    assert edited.reasons == ['duplicate'] and edited.score == scorer.duplicate_penalty
+    # التشكيل والرموز والأرقام وتكرار الحروف لا تغير البصمة
+    assert normalize_text("مرحبااااا بكم!!! 123") == normalize_text("مَرحباا بكم")
+    assert scorer.score(-1, 3, "  " + SPAM + " 🎁🎁 2024!!!", now=2.0).reasons == ['duplicate']
+    assert not scorer.score(-1, 4, "كيف حالكم يا شباب، هل شاهدتم مباراة الأمس؟ كانت رائعة جداً", now=3.0).reasons
+    # نص قصير أو في جروب آخر لا يُقارن
+    assert not scorer.score(-1, 5, "تمام", now=4.0).reasons
+    assert not scorer.score(-1, 6, "تمام", now=5.0).reasons
+    assert not scorer.score(-2, 1, SPAM, now=6.0).reasons
+
+
+def test_burst_against_group_baseline():
+    scorer = SpamScorer(burst_window=10.0, burst_factor=4.0, burst_floor=30)
+    # رسالة كل 10 ثوانٍ لمدة ساعة: متوسط الجروب ~1 في النافذة
+    now = 0.0
+    for i in range(360):
+        now = i * 10.0
+        assert 'burst' not in scorer.score(-1, i, None, now=now).reasons
+    # 40 رسالة من أعضاء مختلفين خلال ثانيتين
+    spike = [scorer.score(-1, 1000 + i, None, now=now + 1 + i * 0.05) for i in range(40)]
+    flagged = [i for i, verdict in enumerate(spike) if 'burst' in verdict.reasons]
+    assert flagged and flagged[0] >= 25 and flagged == list(range(flagged[0], 40))
+    assert spike[-1].score == scorer.burst_penalty
+
+
+def test_memory_bounded_by_lru():
+    scorer = SpamScorer(max_users=3, max_groups=2)
+    for user_id in range(5):
+        scorer.score(-1, user_id, None, now=0.0)
+    scorer.score(-1, 2, None, now=1.0)
+    scorer.score(-1, 9, None, now=1.0)
+    assert set(scorer._users) == {(-1, 2), (-1, 4), (-1, 9)}
+    for group_id in (-1, -2, -3):
+        scorer.score(group_id, 1, None, now=2.0)
+    assert scorer.stats() == {'tracked_users': 3, 'tracked_groups': 2}
+    assert set(scorer._groups) == {-2, -3}
+
+
+def test_disabled_scorer_keeps_no_state():
+    scorer = SpamScorer(enabled=False)
+    assert scorer.score(-1, 1, SPAM).score == 1.0
+    assert scorer.stats() == {'tracked_users': 0, 'tracked_groups': 0}
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""جدول المستويات المستعاد من ملف الحالة لا يحجب تعديلات required_xp بعد إعادة التشغيل"""
+
+import asyncio
+
+import pytest
+
+from caches import LevelCache
+from models import Level
+
+
+def _levels(second_threshold: int):
+    return [
+        Level(id=1, level_number=1, level_name='مبتدئ', level_emoji='🌱', required_xp=0, category='a', tier=1),
+        Level(id=2, level_number=2, level_name='متقدم', level_emoji='🌿', required_xp=second_threshold,
+              category='a', tier=1),
+    ]
+
+
+class LevelsDb:
+    def __init__(self, levels):
+        self.levels = levels
+        self.calls = 0
+        self.error = None
+
+    async def get_all_levels(self):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.levels
+
+
+def _saved_snapshot():
+    cache = LevelCache(LevelsDb(_levels(100)))
+    asyncio.run(cache.table())
+    return cache.snapshot()
+
+
+def test_restored_table_reloads_from_db_on_first_use():
+    db = LevelsDb(_levels(500))
+    cache = LevelCache(db)
+    cache.restore(_saved_snapshot())
+    table = asyncio.run(cache.table())
+    assert db.calls == 1
+    assert table.level_for_xp(200).id == 1
+
+
+def test_restored_table_used_when_db_unavailable():
+    db = LevelsDb(_levels(500))
+    db.error = ConnectionError("down")
+    cache = LevelCache(db)
+    cache.restore(_saved_snapshot())
+    assert asyncio.run(cache.table()).level_for_xp(200).id == 2
+
+
+def test_empty_cache_raises_when_db_unavailable():
+    db = LevelsDb([])
+    db.error = ConnectionError("down")
+    with pytest.raises(ConnectionError):
+        asyncio.run(LevelCache(db).table())
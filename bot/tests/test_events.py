@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""إيقاف مستهلكي الأحداث بدون فقد الدفعة الجارية، ومعرفات الأحداث، وطلبات SSE غير الصالحة"""
+
+import asyncio
+
+from events import EventBus, EventSink, SSESink
+
+
+class SlowSink(EventSink):
+    name = 'slow'
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.received = []
+        self.stopped = False
+
+    async def write(self, events):
+        await asyncio.sleep(self.delay)
+        self.received.extend(event.id for event in events)
+
+    async def stop(self):
+        self.stopped = True
+
+
+def test_stop_waits_for_in_flight_batch_and_drains_queue():
+    async def scenario():
+        sink = SlowSink(0.05)
+        bus = EventBus()
+        bus.add_sink(sink, batch_size=2)
+        await bus.start()
+        events = [bus.publish('xp_awarded', -1, 1, xp=5) for _ in range(5)]
+        await asyncio.sleep(0.01)  # الدفعة الأولى قيد الكتابة
+        await bus.stop()
+        return sink, bus.workers[0], [event.id for event in events]
+
+    sink, worker, ids = asyncio.run(scenario())
+    assert sink.received == ids
+    assert worker.written == 5 and worker.dropped == 0
+    assert sink.stopped
+
+
+def test_stop_timeout_counts_unwritten_events_as_dropped():
+    async def scenario():
+        sink = SlowSink(1.0)
+        bus = EventBus()
+        bus.add_sink(sink, batch_size=2)
+        await bus.start()
+        for _ in range(5):
+            bus.publish('xp_awarded', -1, 1)
+        await asyncio.sleep(0.01)
+        await bus.workers[0].stop(drain_timeout=0.05)
+        return bus.workers[0]
+
+    worker = asyncio.run(scenario())
+    assert worker.written == 0 and worker.dropped == 5
+
+
+def test_event_ids_keep_increasing_across_restarts():
+    def last_id():
+        bus = EventBus()
+        bus.add_sink(SlowSink(0))
+        return bus.publish('level_up', -1, 1).id
+
+    first = last_id()
+    assert last_id() > first
+
+
+def test_sse_rejects_malformed_ids():
+    from aiohttp import web
+    from aiohttp.test_utils import TestClient, TestServer
+
+    async def scenario():
+        sink = SSESink()
+        app = web.Application()
+        app.router.add_get('/events', sink._handle)
+        async with TestClient(TestServer(app)) as client:
+            bad_group = await client.get('/events?group_id=abc')
+            bad_last_id = await client.get('/events', headers={'Last-Event-ID': 'x1'})
+            return bad_group.status, bad_last_id.status
+
+    assert asyncio.run(scenario()) == (400, 400)
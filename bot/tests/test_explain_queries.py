@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+بوابة الفهارس: الفهرس متزامن مع DatabaseManager، ولا استعلام ساخن يلجأ إلى Seq Scan
+
+فحص الخطط يحتاج PostgreSQL للاختبار (يُطبق schema_postgres.sql في schema مؤقتة explain_check):
+    TEST_DATABASE_URL=postgresql://postgres@localhost/bot_test python -m pytest tests
+"""
+
+import asyncio
+import os
+
+import pytest
+
+import explain_queries
+from explain_queries import CATALOG_PATH, record_queries, render_catalog, seq_scans
+
+SCHEMA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'database', 'schema_postgres.sql')
+TEST_DSN = os.getenv('TEST_DATABASE_URL')
+
+
+def test_catalog_in_sync():
+    with open(CATALOG_PATH, 'r', encoding='utf-8') as f:
+        assert f.read() == render_catalog(asyncio.run(record_queries())), \
+            "شغّل: python explain_queries.py catalog"
+
+
+def test_seq_scans_ignores_small_tables():
+    plan = {'Node Type': 'Nested Loop', 'Plans': [
+        {'Node Type': 'Seq Scan', 'Relation Name': 'levels'},
+        {'Node Type': 'Seq Scan', 'Relation Name': 'user_groups'},
+        {'Node Type': 'Index Scan', 'Relation Name': 'users', 'Index Name': 'users_pkey'},
+    ]}
+    assert seq_scans(plan) == ['user_groups']
+
+
+async def _explain_with_schema():
+    """المخطط في schema منفصلة تُنشأ من جديد في كل تشغيل (schema_postgres.sql يضيف بيانات أولية)"""
+    import asyncpg
+
+    settings = {'search_path': 'explain_check'}
+    connection = await asyncpg.connect(TEST_DSN)
+    try:
+        await connection.execute("DROP SCHEMA IF EXISTS explain_check CASCADE; CREATE SCHEMA explain_check")
+        await connection.execute("SET search_path = explain_check")
+        with open(SCHEMA_PATH, 'r', encoding='utf-8') as f:
+            await connection.execute(f.read())
+        return await explain_queries.explain_all({'dsn': TEST_DSN, 'server_settings': settings})
+    finally:
+        await connection.execute("DROP SCHEMA IF EXISTS explain_check CASCADE")
+        await connection.close()
+
+
+@pytest.mark.skipif(not TEST_DSN, reason="TEST_DATABASE_URL غير معرف")
+def test_hot_queries_use_indexes():
+    shapes = asyncio.run(_explain_with_schema())
+    errors = {shape['name']: shape['error'] for shape in shapes if 'error' in shape}
+    assert not errors
+    scans = {shape['name']: shape['seq_scans'] for shape in shapes if shape['hot'] and shape['seq_scans']}
+    assert not scans, f"استعلامات ساخنة بدون فهرس: {scans}"
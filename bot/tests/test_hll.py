@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""HyperLogLog: الصيغتان المتفرقة والكاملة، الدمج، دقة العد، ودمج المحفوظ بعد إعادة التشغيل"""
+
+import asyncio
+from datetime import date
+
+from hll import ActiveUserSketches, GLOBAL_GROUP_ID, HyperLogLog, _DENSE, _SPARSE
+
+
+class SketchStore:
+    """activity_sketches في الذاكرة: صف لكل (جروب، يوم)"""
+
+    def __init__(self):
+        self.rows = {}
+
+    async def get_activity_sketches(self, group_ids, start, end):
+        return [{'group_id': g, 'sketch_date': d, 'sketch': s}
+                for (g, d), s in self.rows.items() if g in group_ids and start <= d <= end]
+
+    async def save_activity_sketches(self, rows):
+        for row in rows:
+            self.rows[(row['group_id'], row['sketch_date'])] = row['sketch']
+
+
+def _sketch(values, precision=12):
+    sketch = HyperLogLog(precision)
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+
+def test_sparse_round_trip():
+    sketch = _sketch(range(100))
+    data = sketch.to_bytes()
+    assert data[0] == _SPARSE
+    # 3 بايت لكل خانة مستخدمة بدل 4096
+    assert len(data) < 400
+    restored = HyperLogLog.from_bytes(data)
+    assert restored.precision == 12 and restored.registers == sketch.registers
+
+
+def test_dense_round_trip():
+    sketch = _sketch(range(20000))
+    data = sketch.to_bytes()
+    assert data[0] == _DENSE and len(data) == 2 + 4096
+    restored = HyperLogLog.from_bytes(data)
+    assert restored.registers == sketch.registers
+    assert restored.count() == sketch.count()
+
+
+def test_empty_sketch_counts_zero():
+    sketch = HyperLogLog()
+    assert sketch.count() == 0
+    assert HyperLogLog.from_bytes(sketch.to_bytes()).count() == 0
+
+
+def test_estimate_error_on_known_set():
+    for n in (1000, 10000, 50000):
+        estimate = _sketch(range(1, n + 1)).count()
+        # الخطأ المعياري ~1.6%، وثلاثة أضعافه هامش آمن
+        assert abs(estimate - n) / n < 0.05
+
+
+def test_merge_is_union():
+    a = _sketch(range(0, 6000))
+    b = _sketch(range(4000, 10000))
+    union = _sketch(range(0, 10000))
+    merged = HyperLogLog.from_bytes(a.to_bytes()).merge(b)
+    assert merged.registers == union.registers
+    # الدمج لا يتأثر بالتكرار
+    assert merged.merge(b).merge(a).registers == union.registers
+
+
+def test_merge_rejects_different_precision():
+    try:
+        HyperLogLog(12).merge(HyperLogLog(10))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("يجب رفض دمج دقتين مختلفتين")
+
+
+def test_repeated_member_does_not_dirty_sketch():
+    sketch = HyperLogLog()
+    assert sketch.add(42) is True
+    assert sketch.add(42) is False
+
+
+def test_flush_merges_stored_after_restart():
+    today = date.today()
+    store = SketchStore()
+
+    async def run():
+        before = ActiveUserSketches(store)
+        for user_id in range(1, 501):
+            before.record(-100, user_id, today)
+        assert await before.flush() == 2
+        assert await before.flush() == 0
+
+        # بعد إعادة التشغيل الذاكرة فارغة: أعضاء جدد مع بعض القدامى
+        after = ActiveUserSketches(store)
+        for user_id in range(400, 1001):
+            after.record(-100, user_id, today)
+        assert await after.flush() == 2
+        return await after.windows(-100, today)
+
+    windows = asyncio.run(run())
+    expected = _sketch(range(1, 1001))
+    stored = HyperLogLog.from_bytes(store.rows[(-100, today)])
+    assert stored.registers == expected.registers
+    assert HyperLogLog.from_bytes(store.rows[(GLOBAL_GROUP_ID, today)]).registers == expected.registers
+    assert windows['today'] == windows['week'] == windows['month'] == expected.count()
+
+
+def test_flush_failure_keeps_dirty():
+    today = date.today()
+
+    class FailingStore(SketchStore):
+        fail = True
+
+        async def save_activity_sketches(self, rows):
+            if self.fail:
+                raise RuntimeError("db down")
+            await super().save_activity_sketches(rows)
+
+    store = FailingStore()
+
+    async def run():
+        sketches = ActiveUserSketches(store)
+        sketches.record(-100, 1, today)
+        try:
+            await sketches.flush()
+        except RuntimeError:
+            pass
+        assert sketches.stats()['dirty'] == 2
+        store.fail = False
+        return await sketches.flush()
+
+    assert asyncio.run(run()) == 2
+    assert HyperLogLog.from_bytes(store.rows[(-100, today)]).count() == 1
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""مجدول الإشعارات: الدمج، الأولويات، التراجع عند 429، وحذف المحادثات الخاملة"""
+
+import asyncio
+import time
+
+from telegram.error import RetryAfter
+
+from notifier import Notifier, PRIORITY_HIGH, PRIORITY_LOW
+
+
+class FakeBot:
+    def __init__(self, retry_after: int = 0):
+        self.sent = []
+        self.retry_after = retry_after
+
+    async def send_message(self, chat_id, text, reply_to_message_id=None, allow_sending_without_reply=True):
+        if self.retry_after:
+            retry_after, self.retry_after = self.retry_after, 0
+            raise RetryAfter(retry_after)
+        self.sent.append((chat_id, text, time.monotonic()))
+
+
+def _run(bot, scenario, **options):
+    async def wrapper():
+        notifier = Notifier(bot, **{'coalesce_window': 0.05, **options})
+        await notifier.start()
+        try:
+            await scenario(notifier)
+        finally:
+            await notifier.stop(flush_timeout=3.0)
+        return notifier
+    return asyncio.run(wrapper())
+
+
+def test_notifications_in_window_coalesced():
+    bot = FakeBot()
+
+    async def scenario(notifier):
+        notifier.notify(-1, "أ")
+        notifier.notify(-1, "ب")
+        await asyncio.sleep(0.2)
+
+    _run(bot, scenario)
+    assert [(chat_id, text) for chat_id, text, _ in bot.sent] == [(-1, "أ\n\nب")]
+
+
+def test_high_priority_first_across_and_within_chats():
+    bot = FakeBot()
+
+    async def scenario(notifier):
+        notifier.notify(-1, "عادي", priority=PRIORITY_LOW)
+        notifier.notify(-2, "مهم", priority=PRIORITY_HIGH)
+        notifier.notify(-1, "ترقية", priority=PRIORITY_HIGH)
+        await asyncio.sleep(0.2)
+
+    _run(bot, scenario)
+    # المحادثة -1 جاهزة أولاً لكن أولويتها تُحسب من أهم إشعاراتها، والتسلسل يحسم التعادل
+    assert [(chat_id, text) for chat_id, text, _ in bot.sent] == [(-1, "ترقية\n\nعادي"), (-2, "مهم")]
+
+
+def test_retry_after_requeues_batch_and_waits():
+    bot = FakeBot(retry_after=1)
+
+    async def scenario(notifier):
+        notifier.notify(-1, "أ")
+        started = time.monotonic()
+        while not bot.sent and time.monotonic() - started < 3:
+            await asyncio.sleep(0.05)
+        bot.started = started
+
+    _run(bot, scenario, chat_rate=100.0)
+    assert [text for _, text, _ in bot.sent] == ["أ"]
+    assert bot.sent[0][2] - bot.started >= 1.0
+
+
+def test_idle_chats_removed_once_bucket_refills():
+    bot = FakeBot()
+
+    async def scenario(notifier):
+        for chat_id in (-1, -2, -3):
+            notifier.notify(chat_id, "أ")
+        await asyncio.sleep(0.1)
+        # دلاء المحادثات لم تمتلئ بعد الإرسال: حذفها يسمح بتجاوز المعدل
+        notifier.notify(-9, "ب")
+        await asyncio.sleep(0.1)
+        assert sorted(notifier._chats) == [-9, -3, -2, -1]
+        await asyncio.sleep(0.4)
+        notifier.notify(-10, "ج")
+        await asyncio.sleep(0.1)
+
+    notifier = _run(bot, scenario, chat_rate=5.0, chat_burst=3.0, idle_sweep_interval=0.0)
+    assert len(bot.sent) == 5
+    assert list(notifier._chats) == [-10]
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""توجيه القراءات إلى نسخ القراءة: التناوب، القراءة بعد الكتابة، التأخر، والنسخ المعطلة (بدون PostgreSQL)"""
+
+import asyncio
+import os
+
+import pytest
+
+from database import DatabaseManager
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def _answer(self, query, *args):
+        if self.pool.error:
+            raise self.pool.error
+        self.pool.queries.append(query)
+        return self.pool.answer
+
+    fetch = fetchrow = fetchval = execute = _answer
+
+
+class FakePool:
+    """بديل asyncpg.Pool يسجل الاستعلامات ويرد بقيمة ثابتة أو يرفع خطأ"""
+
+    def __init__(self, answer, error=None):
+        self.answer = answer
+        self.error = error
+        self.queries = []
+
+    def acquire(self):
+        pool = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                return FakeConnection(pool)
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Acquire()
+
+
+def _manager(replicas=2, max_replica_lag=5.0):
+    manager = DatabaseManager({}, [f"postgresql://bot@replica{i}/db" for i in range(replicas)],
+                              max_replica_lag=max_replica_lag)
+    manager.pool = FakePool('primary')
+    for index, replica in enumerate(manager.replicas):
+        replica.pool = FakePool(f'replica{index}')
+        replica.healthy = True
+    return manager
+
+
+def _run(coroutine):
+    # سياق جديد لكل حالة: وقت آخر كتابة (contextvar) لا ينتقل بين الحالات
+    return asyncio.run(coroutine)
+
+
+def test_round_robin_between_healthy_replicas():
+    manager = _manager()
+
+    async def reads():
+        return [await manager._read_one("SELECT 1") for _ in range(4)]
+
+    assert _run(reads()) == ['replica0', 'replica1', 'replica0', 'replica1']
+    assert manager.pool.queries == []
+
+
+def test_no_replicas_reads_primary():
+    manager = _manager(replicas=0)
+    assert manager._pick_replica() is None
+    assert _run(manager._read_all("SELECT 1")) == 'primary'
+
+
+def test_read_after_write_pinned_to_primary():
+    manager = _manager()
+
+    async def write_then_read():
+        await manager.execute_query("UPDATE users SET username = 'x'")
+        return await manager._read_one("SELECT username FROM users")
+
+    assert _run(write_then_read()) == 'primary'
+    # سياق آخر (تحديث آخر) لم يكتب شيئاً فيقرأ من النسخة
+    assert _run(manager._read_one("SELECT 1")) == 'replica0'
+
+
+def test_write_pin_expires_after_max_lag():
+    manager = _manager(max_replica_lag=0.0)
+
+    async def write_then_read():
+        await manager.execute_query("UPDATE users SET username = 'x'")
+        return await manager._read_one("SELECT 1")
+
+    assert _run(write_then_read()) == 'replica0'
+
+
+def test_lagging_replica_skipped():
+    manager = _manager()
+    manager.replicas[0].lag = 30.0
+    assert _run(manager._read_one("SELECT 1")) == 'replica1'
+    manager.replicas[1].lag = 30.0
+    assert manager._pick_replica() is None
+    assert _run(manager._read_one("SELECT 1")) == 'primary'
+
+
+def test_unhealthy_replica_skipped():
+    manager = _manager()
+    manager.replicas[1].healthy = False
+    assert [_run(manager._read_one("SELECT 1")) for _ in range(3)] == ['replica0'] * 3
+    manager.replicas[0].healthy = False
+    assert _run(manager._read_one("SELECT 1")) == 'primary'
+
+
+def test_failed_replica_read_falls_back_and_marks_unhealthy():
+    manager = _manager(replicas=1)
+    manager.replicas[0].pool.error = ConnectionResetError("connection lost")
+    assert _run(manager._read_one("SELECT 1")) == 'primary'
+    assert manager.replicas[0].healthy is False
+    assert manager._pick_replica() is None
+
+
+def test_health_check_measures_lag_and_recovers():
+    manager = _manager(replicas=1)
+    replica = manager.replicas[0]
+    replica.healthy = False
+    replica.pool.answer = 1.5
+    _run(manager._check_replica(replica))
+    assert replica.healthy and replica.lag == 1.5
+
+    replica.pool.error = OSError("down")
+    _run(manager._check_replica(replica))
+    assert replica.healthy is False
+
+
+@pytest.mark.skipif(not os.getenv('TEST_DATABASE_URL'), reason="TEST_DATABASE_URL غير معرف")
+def test_lag_query_on_real_server():
+    manager = DatabaseManager({}, [os.environ['TEST_DATABASE_URL']])
+    replica = manager.replicas[0]
+
+    async def check():
+        try:
+            await manager._check_replica(replica)
+        finally:
+            await replica.pool.close()
+
+    _run(check())
+    # قاعدة رئيسية (ليست في وضع الاستعادة) تُعد نسخة بلا تأخر
+    assert replica.healthy and replica.lag == 0.0
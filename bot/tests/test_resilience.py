@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""القاطع لا يُغلق بخطأ في الطلب، وإعادة السجل المؤجل لا تمنح رسالة سُجلت في هذه الأثناء مرتين"""
+
+import asyncio
+
+import pytest
+
+from resilience import Resilience, ResiliencePolicy, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+
+
+class AwardDb:
+    """مسار المنح فقط: log_message يرفض الرسالة المكررة مثل القيد الفريد (group_id, message_id)"""
+
+    def __init__(self):
+        self.down = False
+        self.logged = set()
+        self.xp = {}
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("connection refused")
+
+    async def log_message(self, user_id, group_id, message_id, xp_gained, coins_gained, message_type='text'):
+        self._check()
+        if (group_id, message_id) in self.logged:
+            return False
+        self.logged.add((group_id, message_id))
+        return True
+
+    async def update_user_stats(self, user_id, group_id, xp_gained, coins_gained, season_id=1):
+        self._check()
+        self.xp[(user_id, group_id)] = self.xp.get((user_id, group_id), 0) + xp_gained
+
+    async def get_user_group(self, user_id, group_id):
+        self._check()
+        return self.xp.get((user_id, group_id))
+
+    async def get_broken(self):
+        raise ValueError("column does not exist")
+
+
+def _protected(threshold=1):
+    resilience = Resilience(ResiliencePolicy(failure_threshold=threshold, reset_timeout=0.0, retries=0))
+    db = resilience.protect(AwardDb())
+    return resilience, db
+
+
+async def _award(db, message_id, xp=10):
+    """مثل handle_message: التسجيل ثم المنح"""
+    if await db.log_message(1, -1, message_id, xp, 0):
+        await db.update_user_stats(1, -1, xp, 0)
+
+
+def test_request_error_does_not_close_half_open_breaker():
+    async def scenario():
+        resilience, db = _protected()
+        db.down = True
+        with pytest.raises(ConnectionError):
+            await db.get_user_group(1, -1)
+        assert resilience.breaker.state == OPEN
+        with pytest.raises(ValueError):
+            await db.get_broken()  # محاولة الاختبار في حالة نصف مفتوح
+        assert resilience.breaker.state == HALF_OPEN
+        # المحاولة التالية ما زالت مسموحة وتحسم الحالة
+        db.down = False
+        await db.get_user_group(1, -1)
+        return resilience.breaker.state
+
+    assert asyncio.run(scenario()) == CLOSED
+
+
+def test_replay_skips_award_of_message_logged_meanwhile():
+    async def scenario():
+        resilience, db = _protected()
+        raw = resilience._raw
+        db.down = True
+        with pytest.raises(ConnectionError):
+            await db.get_user_group(1, -1)
+        resilience.breaker.opened_at = float('inf')  # يبقى مفتوحاً حتى الإعادة
+        await _award(db, 100)  # مؤجلة: log_message + update_user_stats
+        await _award(db, 101)
+        assert len(resilience.journal) == 4
+
+        # القاعدة عادت والتحديث 100 أُعيد تسليمه ومُنح مباشرة قبل الإعادة
+        db.down = False
+        if await raw['log_message'](1, -1, 100, 10, 0):
+            await raw['update_user_stats'](1, -1, 10, 0)
+
+        await resilience.replay()
+        return raw['log_message'].__self__, resilience
+
+    db, resilience = asyncio.run(scenario())
+    assert db.xp[(1, -1)] == 20  # 100 مرة واحدة + 101
+    assert len(resilience.journal) == 0
+
+
+def test_live_log_unlinks_earlier_journaled_message():
+    async def scenario():
+        resilience, db = _protected()
+        raw_db = resilience._raw['log_message'].__self__
+        raw_db.down = True
+        with pytest.raises(ConnectionError):
+            await db.get_user_group(1, -1)
+        resilience.breaker.opened_at = float('inf')
+        await _award(db, 100)
+        with pytest.raises(CircuitOpenError):
+            await db.get_user_group(1, -1)
+        # عودة القاعدة: رسالة جديدة تُسجل مباشرة، ومنحها لا يُربط بالرسالة 100 المؤجلة
+        raw_db.down = False
+        resilience.breaker.opened_at = 0.0
+        await _award(db, 102, xp=5)
+        await resilience.replay()
+        return raw_db, resilience
+
+    raw_db, resilience = asyncio.run(scenario())
+    assert raw_db.xp[(1, -1)] == 15
+    assert len(resilience.journal) == 0
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""بداية الموسم الأول تُسجل عند تفعيل season_days، وتعديلات المشرف تشمل XP الموسم"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+from types import SimpleNamespace
+
+from models import GroupSettings
+from sqlite_database import SQLiteManager
+
+GROUP_ID = -100
+
+
+def _run(scenario):
+    async def wrapper():
+        db = SQLiteManager(':memory:')
+        await db.connect()
+        try:
+            return await scenario(db)
+        finally:
+            await db.disconnect()
+    return asyncio.run(wrapper())
+
+
+async def _member(db, user_id: int, season_xp: int):
+    user = SimpleNamespace(id=user_id, username=None, first_name='u', last_name=None, language_code=None, is_bot=False)
+    await db.add_user_if_not_exists(user)
+    await db.add_group_if_not_exists(GROUP_ID, 'g')
+    await db.add_user_to_group_if_not_exists(user_id, GROUP_ID)
+    await db.update_user_stats(user_id, GROUP_ID, season_xp, 0, season_id=1)
+
+
+async def _season_xp(db):
+    return {row['user_id']: row['xp'] for row in await db.get_season_leaderboard(GROUP_ID, 1)}
+
+
+async def _due(db, after: timedelta):
+    return [row['group_id'] for row in await db.get_due_seasons(datetime.now() + after)]
+
+
+def test_other_settings_do_not_push_back_first_season():
+    async def scenario(db):
+        await db.save_group_settings(GroupSettings(group_id=GROUP_ID, season_days=7, updated_by=1))
+        six_days_ago = (datetime.now() - timedelta(days=6)).isoformat()
+        await db.execute_query("UPDATE seasons SET started_at = ? WHERE group_id = ?", six_days_ago, GROUP_ID)
+        await db.save_group_settings(GroupSettings(group_id=GROUP_ID, season_days=7, xp_cooldown=30, updated_by=1))
+        return await _due(db, timedelta(days=1, hours=1)), await db.get_season(GROUP_ID, 1)
+
+    due, season = _run(scenario)
+    assert due == [GROUP_ID]
+    assert season.started_at < datetime.now() - timedelta(days=5)
+
+
+def test_settings_enabled_before_upgrade_keep_their_start():
+    async def scenario(db):
+        ten_days_ago = (datetime.now() - timedelta(days=10)).isoformat()
+        await db.execute_query(
+            "INSERT INTO group_settings (group_id, season_days, updated_at) VALUES (?, 7, ?)", GROUP_ID, ten_days_ago
+        )
+        await db.save_group_settings(GroupSettings(group_id=GROUP_ID, season_days=7, xp_cooldown=30, updated_by=1))
+        return await _due(db, timedelta(0))
+
+    assert _run(scenario) == [GROUP_ID]
+
+
+def test_disabled_seasons_not_started():
+    async def scenario(db):
+        await db.save_group_settings(GroupSettings(group_id=GROUP_ID, xp_cooldown=30, updated_by=1))
+        return await db.get_season(GROUP_ID, 1), await _due(db, timedelta(days=365))
+
+    assert _run(scenario) == (None, [])
+
+
+def test_admin_adjust_changes_season_xp():
+    async def scenario(db):
+        await _member(db, 1, 50)
+        await _member(db, 2, 50)
+        await db.bulk_adjust_users(9, GROUP_ID, [1, 2], [-30, -80], [0, 0], 'remove_xp')
+        return await _season_xp(db)
+
+    assert _run(scenario) == {1: 20}
+
+
+def test_admin_reset_removes_member_from_season():
+    async def scenario(db):
+        await _member(db, 1, 50)
+        await _member(db, 2, 40)
+        await db.bulk_reset_users(9, GROUP_ID, [1])
+        return await _season_xp(db), await db.get_user_group(1, GROUP_ID)
+
+    standings, reset = _run(scenario)
+    assert standings == {2: 40}
+    assert (reset.season_xp, reset.prev_season_xp) == (0, 0)
+
+
+def test_adjust_leaves_previous_season_xp_of_idle_member():
+    async def scenario(db):
+        await _member(db, 1, 50)
+        await db.start_season(GROUP_ID, 2)
+        await db.bulk_adjust_users(9, GROUP_ID, [1], [100], [0], 'add_xp')
+        return await db.get_user_group(1, GROUP_ID)
+
+    member = _run(scenario)
+    assert (member.xp, member.season_id, member.season_xp) == (150, 1, 50)
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""التسجيل في SeenEntities بعد كتابة مؤكدة فقط، والعضويات لا تُستعاد من ملف الحالة"""
+
+import asyncio
+from types import SimpleNamespace
+
+from caches import SeenEntities
+from main import TelegramBot
+
+USER = SimpleNamespace(id=1, username='ali', first_name='Ali', last_name=None, language_code='ar', is_bot=False)
+
+
+class RegistrationDb:
+    """add_* مثل Supabase: تعيد False بدل رفع الخطأ"""
+
+    def __init__(self):
+        self.fail_membership = False
+        self.calls = []
+
+    async def add_user_if_not_exists(self, user):
+        self.calls.append('user')
+        return True
+
+    async def add_group_if_not_exists(self, group_id, name):
+        self.calls.append('group')
+        return True
+
+    async def add_user_to_group_if_not_exists(self, user_id, group_id):
+        self.calls.append('member')
+        return not self.fail_membership
+
+
+def _ensure(bot, times=1):
+    for _ in range(times):
+        asyncio.run(TelegramBot.ensure_user_exists(bot, USER, -100))
+
+
+def test_registration_written_once():
+    bot = SimpleNamespace(db=RegistrationDb(), seen=SeenEntities())
+    _ensure(bot, times=3)
+    assert bot.db.calls == ['user', 'group', 'member']
+
+
+def test_failed_membership_is_retried_with_user_and_group():
+    bot = SimpleNamespace(db=RegistrationDb(), seen=SeenEntities())
+    bot.db.fail_membership = True
+    _ensure(bot)
+    assert not bot.seen.member_known(1, -100)
+    bot.db.fail_membership = False
+    _ensure(bot, times=2)
+    assert bot.db.calls == ['user', 'group', 'member'] * 2
+
+
+def test_members_not_restored_from_checkpoint():
+    bot = SimpleNamespace(db=RegistrationDb(), seen=SeenEntities())
+    _ensure(bot)
+    restored = SeenEntities()
+    restored.restore(bot.seen.snapshot())
+    assert restored.user_known(USER) and restored.group_known(-100)
+    assert not restored.member_known(1, -100)
+
+    # ملف حالة قديم فيه عضويات
+    old = SeenEntities()
+    old.restore({**bot.seen.snapshot(), 'members': [[1, -100]]})
+    assert not old.member_known(1, -100)
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""SQLiteManager: الكاتب الوحيد وتعافيه، المواسم في update_user_stats، العمليات الجماعية،
+تنظيف المهام وإنشاؤها، وترقية قواعد أقدم عند الاتصال"""
+
+import asyncio
+import sqlite3
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+from quest_rollover import quest_definitions
+from sqlite_database import SQLiteManager
+
+GROUP_ID = -100
+
+
+def _run(scenario, path: str = ':memory:'):
+    async def wrapper():
+        db = SQLiteManager(path)
+        await db.connect()
+        try:
+            return await scenario(db)
+        finally:
+            await db.disconnect()
+    return asyncio.run(wrapper())
+
+
+async def _member(db, user_id: int, group_id: int = GROUP_ID):
+    await db.add_user_if_not_exists(SimpleNamespace(id=user_id, username=f'user{user_id}', first_name='u',
+                                                    last_name=None, language_code=None, is_bot=False))
+    await db.add_group_if_not_exists(group_id, 'g')
+    await db.add_user_to_group_if_not_exists(user_id, group_id)
+
+
+class FailingCommit:
+    """اتصال يفشل COMMIT فيه مرة واحدة (SQLITE_FULL، خطأ قرص...)"""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self.commits = 0
+        self.fail_next = False
+
+    def execute(self, sql, *args):
+        if sql == "COMMIT":
+            self.commits += 1
+            if self.fail_next:
+                self.fail_next = False
+                raise sqlite3.OperationalError("database or disk is full")
+        return self._conn.execute(sql, *args)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _insert_group(group_id):
+    return lambda conn: conn.execute("INSERT INTO groups (id, name) VALUES (?, 'g')", (group_id,)).rowcount
+
+
+def test_concurrent_writes_share_one_transaction():
+    async def scenario(db):
+        db.conn = FailingCommit(db.conn)
+        await asyncio.gather(*(db._write(_insert_group(-i)) for i in range(1, 11)))
+        return db.conn.commits, await db.fetch_one("SELECT COUNT(*) AS n FROM groups")
+
+    commits, count = _run(scenario)
+    assert commits == 1 and count['n'] == 10
+
+
+def test_failed_operation_does_not_abort_batch():
+    async def scenario(db):
+        def broken(conn):
+            conn.execute("INSERT INTO groups (id, name) VALUES (-2, 'g')")
+            raise ValueError("bad write")
+
+        return await asyncio.gather(db._write(_insert_group(-1)), db._write(broken), db._write(_insert_group(-3)),
+                                    return_exceptions=True), await db.fetch_all("SELECT id FROM groups ORDER BY id")
+
+    results, rows = _run(scenario)
+    assert results[0] == 1 and isinstance(results[1], ValueError) and results[2] == 1
+    assert [row['id'] for row in rows] == [-3, -1]
+
+
+def test_writer_survives_failed_commit():
+    async def scenario(db):
+        db.conn = FailingCommit(db.conn)
+        db.conn.fail_next = True
+        failed = await asyncio.gather(db._write(_insert_group(-1)), db._write(_insert_group(-2)),
+                                      return_exceptions=True)
+        assert not db.conn.in_transaction
+        await db._write(_insert_group(-3))
+        return failed, await db.fetch_all("SELECT id FROM groups")
+
+    failed, rows = _run(scenario)
+    assert all(isinstance(error, sqlite3.OperationalError) for error in failed)
+    assert [row['id'] for row in rows] == [-3]
+
+
+def test_update_user_stats_rolls_season_on_first_award():
+    async def scenario(db):
+        await _member(db, 1)
+        await db.update_user_stats(1, GROUP_ID, 50, 5, season_id=1)
+        await db.update_user_stats(1, GROUP_ID, 10, 1, season_id=2)
+        first_award = await db.get_user_group(1, GROUP_ID)
+        await db.update_user_stats(1, GROUP_ID, 7, 1, season_id=2)
+        return first_award, await db.get_user_group(1, GROUP_ID)
+
+    first_award, member = _run(scenario)
+    assert (first_award.season_id, first_award.season_xp) == (2, 10)
+    assert (first_award.prev_season_id, first_award.prev_season_xp) == (1, 50)
+    assert (member.xp, member.coins, member.total_messages) == (67, 7, 3)
+    assert (member.season_xp, member.prev_season_xp) == (17, 50)
+
+
+def test_bulk_adjust_recomputes_levels_and_audits():
+    async def scenario(db):
+        await _member(db, 9)
+        await _member(db, 1)
+        await _member(db, 2)
+        levels = await db.get_all_levels()
+        updated = await db.bulk_adjust_users(9, GROUP_ID, [1, 2, 404], [levels[2].required_xp, -10], [0, 3],
+                                             'add_xp', 'event')
+        audit = await db.fetch_all("SELECT target_user_id, amount FROM admin_actions ORDER BY target_user_id")
+        return levels, updated, audit
+
+    levels, updated, audit = _run(scenario)
+    by_user = {row['user_id']: row for row in updated}
+    assert set(by_user) == {1, 2}
+    assert by_user[1]['level_id'] == levels[2].id and by_user[1]['xp'] == levels[2].required_xp
+    assert (by_user[2]['xp'], by_user[2]['coins']) == (0, 3)
+    assert [(row['target_user_id'], row['amount']) for row in audit] == [(1, levels[2].required_xp), (2, 10)]
+
+
+def test_bulk_reset_returns_first_level():
+    async def scenario(db):
+        await _member(db, 9)
+        await _member(db, 1)
+        await db.update_user_stats(1, GROUP_ID, 5000, 500)
+        updated = await db.bulk_reset_users(9, GROUP_ID, [1], 'cheating')
+        return (await db.get_all_levels())[0], updated
+
+    first_level, updated = _run(scenario)
+    assert updated == [{'user_id': 1, 'xp': 0, 'coins': 0, 'level_id': first_level.id}]
+
+
+def test_sweep_moves_old_quests_to_history_in_batches():
+    async def scenario(db):
+        await _member(db, 1)
+        today = date.today()
+        for days_ago in (3, 2, 0):
+            await db.create_daily_quest(1, GROUP_ID, 'messages', 10, 100, 50, today - timedelta(days=days_ago))
+        await db.execute_query("UPDATE daily_quests SET is_completed = 1 WHERE quest_date = ?",
+                               (today - timedelta(days=3)).isoformat())
+        first = await db.sweep_daily_quests(today, batch_size=1, archive=True)
+        second = await db.sweep_daily_quests(today, batch_size=1, archive=True)
+        done = await db.sweep_daily_quests(today, batch_size=1, archive=True)
+        history = await db.fetch_one("SELECT * FROM user_quest_history WHERE user_id = 1")
+        archived = await db.fetch_one("SELECT COUNT(*) AS n FROM daily_quests_archive")
+        remaining = await db.get_daily_quests(1, GROUP_ID, today)
+        return (first, second, done), history, archived['n'], remaining
+
+    batches, history, archived, remaining = _run(scenario)
+    assert batches == ({'deleted': 1, 'completed': 1}, {'deleted': 1, 'completed': 0}, {'deleted': 0, 'completed': 0})
+    assert (history['quests_completed'], history['quests_expired'], history['total_reward_xp']) == (1, 1, 100)
+    assert archived == 2 and len(remaining) == 1
+
+
+def test_generate_daily_quests_for_active_members_once():
+    async def scenario(db):
+        levels = await db.get_all_levels()
+        for user_id in (1, 2, 3):
+            await _member(db, user_id)
+        await db.update_user_stats(1, GROUP_ID, 10, 1)
+        await db.update_user_stats(2, GROUP_ID, 10, 1)
+        await db.update_user_level(2, GROUP_ID, levels[3].id)
+        # العضو 3 لم يرسل شيئاً منذ active_since
+        tomorrow = date.today() + timedelta(days=1)
+        since = datetime.now() - timedelta(days=7)
+        created = await db.generate_daily_quests([GROUP_ID], tomorrow, since, quest_definitions(levels))
+        again = await db.generate_daily_quests([GROUP_ID], tomorrow, since, quest_definitions(levels))
+        return (created, again, await db.get_daily_quests(1, GROUP_ID, tomorrow),
+                await db.get_daily_quests(2, GROUP_ID, tomorrow), await db.get_daily_quests(3, GROUP_ID, tomorrow))
+
+    created, again, low, high, inactive = _run(scenario)
+    assert (created, again) == (len(low) + len(high), 0)
+    assert {q.quest_type for q in low} == {'messages', 'xp_gain', 'coins_gain'} and not inactive
+    targets = {q.quest_type: q.target_value for q in low}
+    assert all(q.target_value >= targets[q.quest_type] for q in high)
+
+
+OLD_SCHEMA = """
+CREATE TABLE group_settings (
+    group_id INTEGER PRIMARY KEY,
+    xp_cooldown INTEGER NOT NULL DEFAULT 60,
+    min_xp INTEGER NOT NULL DEFAULT 5,
+    max_xp INTEGER NOT NULL DEFAULT 15,
+    min_coins INTEGER NOT NULL DEFAULT 1,
+    max_coins INTEGER NOT NULL DEFAULT 10,
+    updated_by INTEGER,
+    updated_at TEXT
+);
+CREATE TABLE user_groups (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    group_id INTEGER NOT NULL,
+    xp INTEGER DEFAULT 0,
+    level_id INTEGER DEFAULT 1,
+    coins INTEGER DEFAULT 0,
+    total_messages INTEGER DEFAULT 0,
+    last_message_at TEXT NULL,
+    last_xp_gain TEXT NULL,
+    clan_id INTEGER NULL,
+    is_active INTEGER DEFAULT 1,
+    joined_at TEXT,
+    updated_at TEXT,
+    UNIQUE (user_id, group_id)
+);
+CREATE TABLE message_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    group_id INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    xp_gained INTEGER DEFAULT 0,
+    coins_gained INTEGER DEFAULT 0,
+    message_type TEXT DEFAULT 'text',
+    created_at TEXT
+);
+INSERT INTO user_groups (user_id, group_id, xp) VALUES (1, -100, 120);
+INSERT INTO group_settings (group_id, xp_cooldown) VALUES (-100, 30);
+INSERT INTO message_logs (user_id, group_id, message_id, xp_gained) VALUES (1, -100, 5, 10), (1, -100, 5, 10);
+"""
+
+
+def test_connect_upgrades_old_database(tmp_path):
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.executescript(OLD_SCHEMA)
+    conn.close()
+
+    async def scenario(db):
+        member = await db.get_user_group(1, GROUP_ID)
+        settings = await db.get_group_settings(GROUP_ID)
+        logs = await db.fetch_one("SELECT COUNT(*) AS n FROM message_logs")
+        duplicate = await db.log_message(1, GROUP_ID, 5, 10, 1)
+        await db.update_user_stats(1, GROUP_ID, 10, 1, season_id=2)
+        return member, settings, logs['n'], duplicate, await db.get_user_group(1, GROUP_ID)
+
+    member, settings, logs, duplicate, rolled = _run(scenario, path)
+    assert (member.xp, member.season_id, member.season_xp) == (120, 1, 0)
+    assert (settings.xp_cooldown, settings.season_days, settings.season_id) == (30, 0, 1)
+    assert logs == 1 and duplicate is False
+    assert (rolled.season_id, rolled.season_xp, rolled.prev_season_id) == (2, 10, 1)
@@ -19,9 +19,9 @@ def format_number(num: int) -> str:
     else:
         return str(num)
 
-def calculate_xp_gain(min_xp: int, max_xp: int) -> int:
-    """حساب XP عشوائي"""
-    return random.randint(min_xp, max_xp)
+def calculate_xp_gain(min_xp: int, max_xp: int, multiplier: float = 1.0) -> int:
+    """حساب XP عشوائي مضروب في مضاعف قواعد XP"""
+    return round(random.randint(min_xp, max_xp) * multiplier)
 
 def calculate_coin_gain(min_coins: int, max_coins: int) -> int:
     """حساب العملات عشوائية"""
@@ -45,24 +45,26 @@ def format_time_remaining(seconds: int) -> str:
         minutes = (seconds % 3600) // 60
         return f"{hours}س {minutes}د"
 
-async def check_level_up(db: DatabaseManager, user_group: UserGroup) -> Optional[Level]:
-    """التحقق من ترقية المستوى"""
-    current_level = await db.get_level_by_id(user_group.level_id)
+async def check_level_up(db: DatabaseManager, user_group: UserGroup, levels=None) -> Optional[Level]:
+    """التحقق من ترقية المستوى (levels: جدول LevelTable في الذاكرة بدل استعلامي المستويات)"""
+    if levels is not None:
+        current_level = levels.by_id.get(user_group.level_id)
+    else:
+        current_level = await db.get_level_by_id(user_group.level_id)
     if not current_level:
         return None
     
-    # التحقق من وجود مستوى أعلى
-    next_level = await db.get_level_by_number(current_level.level_number + 1)
-    if not next_level:
-        return None  # وصل للمستوى الأقصى
-    
-    # التحقق من توفر XP للترقية
-    if user_group.xp >= next_level.required_xp:
-        # ترقية المستوى
-        await db.update_user_level(user_group.user_id, user_group.group_id, next_level.id)
-        return next_level
+    # المستوى المناسب لـ XP الحالي (قد يتخطى أكثر من مستوى دفعة واحدة)
+    if levels is not None:
+        target_level = levels.level_for_xp(user_group.xp)
+    else:
+        target_level = await db.get_level_by_xp(user_group.xp)
+    if not target_level or target_level.level_number <= current_level.level_number:
+        return None
     
-    return None
+    # ترقية المستوى
+    await db.update_user_level(user_group.user_id, user_group.group_id, target_level.id)
+    return target_level
 
 def get_rarity_color(rarity: str) -> str:
     """الحصول على لون الندرة"""
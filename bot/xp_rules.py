@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+XP Rules - جدول قواعد XP لكل جروب (نوع الرسالة، الطول، الموضوع، الساعة)
+
+القواعد تُقرأ من ملف JSON (XP_RULES_PATH، افتراضياً xp_rules.json) وتُترجم عند التحميل
+إلى مصفوفة مسطحة من المضاعفات، فتقييم رسالة = بضع عمليات فهرسة.
+يُعاد تحميل الملف تلقائياً عند تغيره دون إعادة تشغيل البوت.
+"""
+
+import json
+import logging
+import os
+from array import array
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), 'xp_rules.json')
+
+# بنفس ترتيب message_logs.message_type
+MESSAGE_TYPES = ('text', 'photo', 'video', 'document', 'sticker', 'voice', 'other')
+_TYPE_INDEX = {name: index for index, name in enumerate(MESSAGE_TYPES)}
+
+# أنواع تيليجرام الأخرى تُحسب كأقرب نوع في الجدول
+_MESSAGE_ATTRIBUTES = (
+    ('photo', 'photo'), ('video', 'video'), ('video_note', 'video'), ('animation', 'video'),
+    ('document', 'document'), ('sticker', 'sticker'), ('voice', 'voice'), ('audio', 'voice'),
+)
+
+
+def detect_message_type(message) -> str:
+    """نوع الرسالة كما يُسجل في message_logs"""
+    for attribute, message_type in _MESSAGE_ATTRIBUTES:
+        if getattr(message, attribute, None):
+            return message_type
+    return 'text' if getattr(message, 'text', None) else 'other'
+
+
+def message_length(message) -> int:
+    return len(getattr(message, 'text', None) or getattr(message, 'caption', None) or '')
+
+
+class CompiledRules:
+    """قواعد مترجمة: مضاعف لكل (نوع، فئة طول، موضوع، ساعة) في مصفوفة واحدة"""
+
+    __slots__ = ('table', 'length_bucket', 'channel_index', 'lengths', 'channels')
+
+    def __init__(self, table: array, length_bucket: bytes, channel_index: Dict[int, int], lengths: int, channels: int):
+        self.table = table
+        self.length_bucket = length_bucket
+        self.channel_index = channel_index
+        self.lengths = lengths
+        self.channels = channels
+
+    def multiplier(self, message_type: str, length: int, thread_id: Optional[int], hour: int) -> float:
+        bucket = self.length_bucket[min(length, len(self.length_bucket) - 1)]
+        channel = self.channel_index.get(thread_id, 0)
+        index = ((_TYPE_INDEX.get(message_type, 6) * self.lengths + bucket) * self.channels + channel) * 24 + hour
+        return self.table[index]
+
+
+def _parse_hours(spec: Dict[str, float]) -> List[float]:
+    """{"0-6": 0.5, "20": 1.2} → 24 مضاعفاً (النطاق شامل للطرفين)"""
+    hours = [1.0] * 24
+    for key, value in spec.items():
+        start, _, end = str(key).partition('-')
+        first, last = int(start), int(end or start)
+        if not 0 <= first <= last <= 23:
+            raise ValueError(f"نطاق ساعات غير صالح: {key}")
+        for hour in range(first, last + 1):
+            hours[hour] = float(value)
+    return hours
+
+
+def compile_rules(spec: Dict[str, Any]) -> CompiledRules:
+    """ترجمة قواعد JSON إلى جدول مسطح (ValueError عند قواعد غير صالحة)"""
+    unknown = set(spec.get('message_types', {})) - set(MESSAGE_TYPES)
+    if unknown:
+        raise ValueError(f"أنواع رسائل غير معروفة: {', '.join(sorted(unknown))}")
+    types = [float(spec.get('message_types', {}).get(name, 1.0)) for name in MESSAGE_TYPES]
+
+    # [[أقل طول، مضاعف], ...] مرتبة تصاعدياً، وما قبل أول حد مضاعفه 1
+    buckets = sorted((int(minimum), float(value)) for minimum, value in spec.get('length_buckets', []))
+    if len(buckets) > 254:
+        raise ValueError("عدد فئات الطول كبير جداً")
+    length_multipliers = [1.0] + [value for _, value in buckets]
+    max_length = buckets[-1][0] if buckets else 0
+    length_bucket = bytearray(max_length + 1)
+    for bucket, (minimum, _) in enumerate(buckets, start=1):
+        for length in range(minimum, max_length + 1):
+            length_bucket[length] = bucket
+
+    # الموضوع 0 = الرسائل خارج المواضيع المحددة
+    channels = spec.get('channels', {})
+    channel_index = {int(thread_id): index for index, thread_id in enumerate(channels, start=1)}
+    channel_multipliers = [1.0] + [float(value) for value in channels.values()]
+
+    hours = _parse_hours(spec.get('hours', {}))
+
+    table = array('d', (
+        type_value * length_value * channel_value * hour_value
+        for type_value in types
+        for length_value in length_multipliers
+        for channel_value in channel_multipliers
+        for hour_value in hours
+    ))
+    if any(value < 0 for value in table):
+        raise ValueError("المضاعفات يجب ألا تكون سالبة")
+    return CompiledRules(table, bytes(length_bucket), channel_index, len(length_multipliers), len(channel_multipliers))
+
+
+def _merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            merged[key] = {**base[key], **value}
+        else:
+            merged[key] = value
+    return merged
+
+
+class XpRuleBook:
+    """القواعد الافتراضية وقواعد كل جروب، مع إعادة تحميل الملف عند تغيره"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv('XP_RULES_PATH') or DEFAULT_RULES_PATH
+        self.default = compile_rules({})
+        self.groups: Dict[int, CompiledRules] = {}
+        self.loaded_mtime: Optional[float] = None
+        self.reload_if_changed()
+
+    def load(self, spec: Dict[str, Any]):
+        """ترجمة كل القواعد ثم استبدالها دفعة واحدة (لا حالة نصف محملة)"""
+        default_spec = spec.get('default', {})
+        default = compile_rules(default_spec)
+        groups = {
+            int(group_id): compile_rules(_merge(default_spec, override))
+            for group_id, override in spec.get('groups', {}).items()
+        }
+        self.default, self.groups = default, groups
+
+    def reload_if_changed(self) -> bool:
+        """إعادة التحميل إن تغير الملف، مع إبقاء القواعد الحالية عند الخطأ"""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return False
+        if mtime == self.loaded_mtime:
+            return False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.load(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.error("خطأ في تحميل قواعد XP من %s: %s", self.path, e)
+            return False
+        finally:
+            self.loaded_mtime = mtime
+        logger.info("تم تحميل قواعد XP من %s (%d جروب مخصص)", self.path, len(self.groups))
+        return True
+
+    def for_group(self, group_id: int) -> CompiledRules:
+        return self.groups.get(group_id, self.default)
+
+    def multiplier(self, group_id: int, message, hour: int) -> float:
+        # message_thread_id يُملأ للردود أيضاً، فالموضوع يُعتبر فقط في جروبات المواضيع
+        thread_id = message.message_thread_id if getattr(message, 'is_topic_message', False) else None
+        return self.for_group(group_id).multiplier(
+            detect_message_type(message), message_length(message), thread_id, hour
+        )
+
+    async def job_callback(self, context):
+        """استدعاء دوري من JobQueue الخاص بالبوت"""
+        self.reload_if_changed()
@@ -0,0 +1,307 @@
+-- دوال PostgreSQL (RPC) المستخدمة من SupabaseManager
+-- تُنفذ مرة واحدة على قاعدة Supabase بعد إنشاء الجداول
+
+-- معرفات المستخدمين بأسماء المستخدمين بدون حساسية لحالة الأحرف (idx_users_username_lower)
+CREATE OR REPLACE FUNCTION get_user_ids_by_usernames(p_usernames TEXT[])
+RETURNS TABLE (id BIGINT, username TEXT)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT u.id, u.username FROM users u WHERE lower(u.username) = ANY(p_usernames);
+$$;
+
+-- تعديل XP والعملات لعدة مستخدمين مع إعادة حساب المستوى وتسجيل الإجراءات
+CREATE OR REPLACE FUNCTION bulk_adjust_users(
+    p_admin_user_id BIGINT,
+    p_group_id BIGINT,
+    p_user_ids BIGINT[],
+    p_xp_deltas BIGINT[],
+    p_coin_deltas BIGINT[],
+    p_action_type TEXT,
+    p_reason TEXT DEFAULT NULL
+)
+RETURNS TABLE (user_id BIGINT, xp BIGINT, coins BIGINT, level_id INT)
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE user_groups ug
+        SET xp = GREATEST(ug.xp + t.xp_delta, 0),
+            coins = GREATEST(ug.coins + t.coins_delta, 0),
+            season_xp = CASE
+                WHEN ug.season_id = COALESCE((SELECT gs.season_id FROM group_settings gs WHERE gs.group_id = p_group_id), 1)
+                THEN GREATEST(ug.season_xp + t.xp_delta, 0)
+                ELSE ug.season_xp
+            END,
+            level_id = COALESCE((
+                SELECT l.id FROM levels l
+                WHERE l.required_xp <= GREATEST(ug.xp + t.xp_delta, 0)
+                ORDER BY l.required_xp DESC
+                LIMIT 1
+            ), ug.level_id),
+            updated_at = CURRENT_TIMESTAMP
+        FROM unnest(p_user_ids, p_xp_deltas, p_coin_deltas) AS t(user_id, xp_delta, coins_delta)
+        WHERE ug.group_id = p_group_id AND ug.user_id = t.user_id
+        RETURNING ug.user_id, ug.xp, ug.coins, ug.level_id,
+                  CASE WHEN t.xp_delta <> 0 THEN t.xp_delta ELSE t.coins_delta END AS amount
+    ), audit AS (
+        INSERT INTO admin_actions (admin_user_id, target_user_id, group_id, action_type, amount, reason)
+        SELECT p_admin_user_id, u.user_id, p_group_id, p_action_type, abs(u.amount), p_reason FROM updated u
+    )
+    SELECT u.user_id, u.xp, u.coins, u.level_id FROM updated u;
+$$;
+
+-- إعادة تعيين عدة مستخدمين وتسجيل الإجراءات
+CREATE OR REPLACE FUNCTION bulk_reset_users(
+    p_admin_user_id BIGINT,
+    p_group_id BIGINT,
+    p_user_ids BIGINT[],
+    p_reason TEXT DEFAULT NULL
+)
+RETURNS TABLE (user_id BIGINT, xp BIGINT, coins BIGINT, level_id INT)
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE user_groups ug
+        SET xp = 0,
+            coins = 0,
+            season_xp = 0,
+            prev_season_xp = 0,
+            level_id = (SELECT l.id FROM levels l ORDER BY l.required_xp ASC LIMIT 1),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE ug.group_id = p_group_id AND ug.user_id = ANY(p_user_ids)
+        RETURNING ug.user_id, ug.xp, ug.coins, ug.level_id
+    ), audit AS (
+        INSERT INTO admin_actions (admin_user_id, target_user_id, group_id, action_type, amount, reason)
+        SELECT p_admin_user_id, u.user_id, p_group_id, 'reset_user', 0, p_reason FROM updated u
+    )
+    SELECT u.user_id, u.xp, u.coins, u.level_id FROM updated u;
+$$;
+
+-- تحديث مستويات عدة صفوف دفعة واحدة (أداة إعادة حساب المستويات)
+CREATE OR REPLACE FUNCTION bulk_set_levels(
+    p_ids BIGINT[],
+    p_level_ids INT[]
+)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    UPDATE user_groups ug
+    SET level_id = t.level_id, updated_at = CURRENT_TIMESTAMP
+    FROM unnest(p_ids, p_level_ids) AS t(id, level_id)
+    WHERE ug.id = t.id AND ug.level_id IS DISTINCT FROM t.level_id;
+$$;
+
+-- نقل المهام اليومية القديمة إلى السجل المجمع وحذفها على دفعات محدودة
+CREATE OR REPLACE FUNCTION sweep_daily_quests(
+    p_cutoff DATE,
+    p_batch_size INT,
+    p_archive BOOLEAN DEFAULT FALSE
+)
+RETURNS TABLE (deleted BIGINT, completed BIGINT)
+LANGUAGE sql
+AS $$
+    WITH batch AS (
+        DELETE FROM daily_quests
+        WHERE id IN (
+            SELECT id FROM daily_quests
+            WHERE quest_date < p_cutoff
+            ORDER BY id
+            LIMIT p_batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING *
+    ), archived AS (
+        INSERT INTO daily_quests_archive (id, user_id, group_id, quest_type, target_value, current_progress,
+                                          reward_xp, reward_coins, is_completed, quest_date, completed_at, created_at)
+        SELECT id, user_id, group_id, quest_type, target_value, current_progress,
+               reward_xp, reward_coins, is_completed, quest_date, completed_at, created_at
+        FROM batch WHERE p_archive
+    ), rollup AS (
+        INSERT INTO user_quest_history (user_id, group_id, quests_completed, quests_expired,
+                                        total_reward_xp, total_reward_coins, last_quest_date)
+        SELECT user_id, group_id,
+               COUNT(*) FILTER (WHERE is_completed),
+               COUNT(*) FILTER (WHERE NOT is_completed),
+               COALESCE(SUM(reward_xp) FILTER (WHERE is_completed), 0),
+               COALESCE(SUM(reward_coins) FILTER (WHERE is_completed), 0),
+               MAX(quest_date)
+        FROM batch
+        GROUP BY user_id, group_id
+        ON CONFLICT (user_id, group_id) DO UPDATE SET
+            quests_completed = user_quest_history.quests_completed + EXCLUDED.quests_completed,
+            quests_expired = user_quest_history.quests_expired + EXCLUDED.quests_expired,
+            total_reward_xp = user_quest_history.total_reward_xp + EXCLUDED.total_reward_xp,
+            total_reward_coins = user_quest_history.total_reward_coins + EXCLUDED.total_reward_coins,
+            last_quest_date = GREATEST(user_quest_history.last_quest_date, EXCLUDED.last_quest_date),
+            updated_at = CURRENT_TIMESTAMP
+    )
+    SELECT COUNT(*), COUNT(*) FILTER (WHERE is_completed) FROM batch;
+$$;
+
+-- سحب أقدم أحداث event_outbox وحذفها (SKIP LOCKED يسمح بعدة مستهلكين متوازيين)
+CREATE OR REPLACE FUNCTION claim_outbox_events(p_limit INT)
+RETURNS SETOF event_outbox
+LANGUAGE sql
+AS $$
+    DELETE FROM event_outbox
+    WHERE id IN (SELECT id FROM event_outbox ORDER BY id LIMIT p_limit FOR UPDATE SKIP LOCKED)
+    RETURNING *;
+$$;
+
+-- إعادة تجميع message_logs منذ تاريخ معين في group_daily_stats (الصفوف المتغيرة فقط)
+CREATE OR REPLACE FUNCTION refresh_group_daily_stats(p_since DATE)
+RETURNS BIGINT
+LANGUAGE sql
+AS $$
+    WITH upserted AS (
+        INSERT INTO group_daily_stats (group_id, stat_date, messages, active_users, xp_gained, coins_gained)
+        SELECT group_id, created_at::date, COUNT(*), COUNT(DISTINCT user_id),
+               COALESCE(SUM(xp_gained), 0), COALESCE(SUM(coins_gained), 0)
+        FROM message_logs
+        WHERE created_at >= p_since
+        GROUP BY group_id, created_at::date
+        ON CONFLICT (group_id, stat_date) DO UPDATE SET
+            messages = EXCLUDED.messages,
+            active_users = EXCLUDED.active_users,
+            xp_gained = EXCLUDED.xp_gained,
+            coins_gained = EXCLUDED.coins_gained,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE (group_daily_stats.messages, group_daily_stats.active_users,
+               group_daily_stats.xp_gained, group_daily_stats.coins_gained)
+            IS DISTINCT FROM (EXCLUDED.messages, EXCLUDED.active_users, EXCLUDED.xp_gained, EXCLUDED.coins_gained)
+        RETURNING 1
+    )
+    SELECT COUNT(*) FROM upserted;
+$$;
+
+-- إضافة فروق عدادات النشاط لكل (جروب، ساعة أسبوع) (upsert في PostgREST يستبدل ولا يجمع)
+CREATE OR REPLACE FUNCTION add_group_activity(p_rows JSONB)
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    INSERT INTO group_activity (group_id, hour_of_week, messages)
+    SELECT (r->>'group_id')::BIGINT, (r->>'hour_of_week')::SMALLINT, (r->>'messages')::BIGINT
+    FROM jsonb_array_elements(p_rows) AS r
+    ON CONFLICT (group_id, hour_of_week) DO UPDATE SET
+        messages = group_activity.messages + EXCLUDED.messages,
+        updated_at = CURRENT_TIMESTAMP;
+$$;
+
+-- المستخدم والعضوية والمستوى والتالي وعدد الشارات والكلان مع قائده في طلب واحد (أوامر الملف والكلان)
+CREATE OR REPLACE FUNCTION get_profile_bundle(p_user_id BIGINT, p_group_id BIGINT)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT json_build_object(
+        'user_group', to_jsonb(ug),
+        'level', to_jsonb(l),
+        'user', to_jsonb(u),
+        'next_level', to_jsonb(nl),
+        'badge_count', (SELECT COUNT(*) FROM user_badges ub
+                        WHERE ub.user_id = ug.user_id AND ub.group_id = ug.group_id),
+        'clan', to_jsonb(c),
+        'clan_leader', to_jsonb(cl)
+    )
+    FROM user_groups ug
+    JOIN levels l ON l.id = ug.level_id
+    LEFT JOIN users u ON u.id = ug.user_id
+    LEFT JOIN levels nl ON nl.level_number = l.level_number + 1
+    LEFT JOIN clans c ON c.id = ug.clan_id
+    LEFT JOIN users cl ON cl.id = c.leader_user_id
+    WHERE ug.user_id = p_user_id AND ug.group_id = p_group_id;
+$$;
+
+-- بدء الموسم p_season_id إن كان الحالي p_season_id - 1 ولا يوجد موسم منتهٍ لم يُؤرشف (لا صفوف = لم يبدأ)
+CREATE OR REPLACE FUNCTION start_season(p_group_id BIGINT, p_season_id INT, p_started_by BIGINT)
+RETURNS SETOF group_settings
+LANGUAGE sql
+AS $$
+    WITH bumped AS (
+        INSERT INTO group_settings (group_id, season_id, updated_by)
+        SELECT p_group_id, p_season_id, p_started_by
+        WHERE NOT EXISTS (SELECT 1 FROM seasons
+                          WHERE group_id = p_group_id AND ended_at IS NOT NULL AND archived_at IS NULL)
+          AND (p_season_id = 2 OR EXISTS (SELECT 1 FROM group_settings WHERE group_id = p_group_id))
+        ON CONFLICT (group_id) DO UPDATE SET
+            season_id = EXCLUDED.season_id,
+            updated_by = EXCLUDED.updated_by,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE group_settings.season_id = EXCLUDED.season_id - 1
+        RETURNING *
+    ), ended AS (
+        INSERT INTO seasons (group_id, season_id, ended_at)
+        SELECT group_id, season_id - 1, CURRENT_TIMESTAMP FROM bumped
+        ON CONFLICT (group_id, season_id) DO UPDATE SET ended_at = EXCLUDED.ended_at
+    ), started AS (
+        INSERT INTO seasons (group_id, season_id, started_at, started_by)
+        SELECT group_id, season_id, CURRENT_TIMESTAMP, p_started_by FROM bumped
+        ON CONFLICT (group_id, season_id) DO NOTHING
+    )
+    SELECT * FROM bumped;
+$$;
+
+-- نسخ الترتيب النهائي لموسم منتهٍ من user_groups إلى season_standings (يعيد عدد الأعضاء)
+CREATE OR REPLACE FUNCTION archive_season(p_group_id BIGINT, p_season_id INT)
+RETURNS INT
+LANGUAGE sql
+AS $$
+    WITH final AS (
+        SELECT user_id, CASE WHEN season_id = p_season_id THEN season_xp ELSE prev_season_xp END AS xp
+        FROM user_groups
+        WHERE group_id = p_group_id AND is_active = TRUE AND (season_id = p_season_id OR prev_season_id = p_season_id)
+    ), copied AS (
+        INSERT INTO season_standings (group_id, season_id, user_id, xp, season_rank)
+        SELECT p_group_id, p_season_id, user_id, xp, ROW_NUMBER() OVER (ORDER BY xp DESC, user_id DESC)
+        FROM final WHERE xp > 0
+        ON CONFLICT (group_id, season_id, user_id) DO NOTHING
+    ), marked AS (
+        INSERT INTO seasons (group_id, season_id, archived_at, members)
+        SELECT p_group_id, p_season_id, CURRENT_TIMESTAMP, COUNT(*) FROM final WHERE xp > 0
+        ON CONFLICT (group_id, season_id) DO UPDATE SET
+            archived_at = EXCLUDED.archived_at,
+            members = EXCLUDED.members
+        RETURNING members
+    )
+    SELECT members FROM marked;
+$$;
+
+-- الجروبات التي انتهت مدة موسمها الحالي (من بدايته في seasons، أو آخر تعديل إن فُعل قبل تسجيلها)
+CREATE OR REPLACE FUNCTION get_due_seasons(p_now TIMESTAMP)
+RETURNS TABLE (group_id BIGINT, season_id INT)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT gs.group_id, gs.season_id
+    FROM group_settings gs
+    LEFT JOIN seasons s ON s.group_id = gs.group_id AND s.season_id = gs.season_id
+    WHERE gs.season_days > 0
+      AND COALESCE(s.started_at, gs.updated_at) + gs.season_days * INTERVAL '1 day' <= p_now;
+$$;
+
+-- إنشاء مهام يوم كامل لأعضاء دفعة من الجروبات النشطين (صف لكل مستوى ونوع مهمة في المصفوفات)
+CREATE OR REPLACE FUNCTION generate_daily_quests(
+    p_group_ids BIGINT[],
+    p_quest_date DATE,
+    p_active_since TIMESTAMP,
+    p_level_ids INT[],
+    p_quest_types TEXT[],
+    p_targets INT[],
+    p_reward_xp INT[],
+    p_reward_coins INT[]
+)
+RETURNS BIGINT
+LANGUAGE sql
+AS $$
+    WITH created AS (
+        INSERT INTO daily_quests (user_id, group_id, quest_type, target_value, reward_xp, reward_coins, quest_date)
+        SELECT ug.user_id, ug.group_id, q.quest_type, q.target_value, q.reward_xp, q.reward_coins, p_quest_date
+        FROM user_groups ug
+        JOIN unnest(p_level_ids, p_quest_types, p_targets, p_reward_xp, p_reward_coins)
+            AS q(level_id, quest_type, target_value, reward_xp, reward_coins) ON q.level_id = ug.level_id
+        WHERE ug.group_id = ANY(p_group_ids) AND ug.is_active = TRUE AND ug.last_message_at >= p_active_since
+        ON CONFLICT (user_id, group_id, quest_type, quest_date) DO NOTHING
+        RETURNING 1
+    )
+    SELECT COUNT(*) FROM created;
+$$;
@@ -0,0 +1,430 @@
+-- فهرس أشكال الاستعلامات التي يرسلها DatabaseManager
+-- مُولد بواسطة: python bot/explain_queries.py catalog (لا تعدله يدوياً)
+
+-- name: add_user_if_not_exists (hot)
+INSERT INTO users (id, username, first_name, last_name, language_code, is_bot)
+VALUES ($1, $2, $3, $4, $5, $6)
+ON CONFLICT (id) DO UPDATE SET
+username = EXCLUDED.username,
+first_name = EXCLUDED.first_name,
+last_name = EXCLUDED.last_name,
+updated_at = CURRENT_TIMESTAMP;
+
+-- name: get_user_by_id (hot)
+SELECT * FROM users WHERE id = $1;
+
+-- name: get_user_ids_by_usernames (hot)
+SELECT id, username FROM users WHERE lower(username) = ANY($1::text[]);
+
+-- name: add_group_if_not_exists (hot)
+INSERT INTO groups (id, name)
+VALUES ($1, $2)
+ON CONFLICT (id) DO UPDATE SET
+name = EXCLUDED.name,
+updated_at = CURRENT_TIMESTAMP;
+
+-- name: get_group_settings (hot)
+SELECT * FROM group_settings WHERE group_id = $1;
+
+-- name: save_group_settings (hot)
+WITH previous AS (
+SELECT updated_at FROM group_settings WHERE group_id = $1 AND season_days > 0
+), saved AS (
+INSERT INTO group_settings (group_id, xp_cooldown, min_xp, max_xp, min_coins, max_coins, season_days, updated_by)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+ON CONFLICT (group_id) DO UPDATE SET xp_cooldown = EXCLUDED.xp_cooldown, min_xp = EXCLUDED.min_xp, max_xp = EXCLUDED.max_xp, min_coins = EXCLUDED.min_coins, max_coins = EXCLUDED.max_coins, season_days = EXCLUDED.season_days, updated_by = EXCLUDED.updated_by
+RETURNING *
+), started AS (
+INSERT INTO seasons (group_id, season_id, started_at)
+SELECT group_id, season_id, COALESCE((SELECT updated_at FROM previous), CURRENT_TIMESTAMP)
+FROM saved WHERE season_days > 0
+ON CONFLICT (group_id, season_id) DO NOTHING
+)
+SELECT * FROM saved;
+
+-- name: add_user_to_group_if_not_exists (hot)
+INSERT INTO user_groups (user_id, group_id)
+VALUES ($1, $2)
+ON CONFLICT (user_id, group_id) DO NOTHING;
+
+-- name: get_user_group (hot)
+SELECT * FROM user_groups WHERE user_id = $1 AND group_id = $2;
+
+-- name: get_profile_bundle (hot)
+SELECT to_jsonb(ug) AS user_group, to_jsonb(l) AS level, to_jsonb(u) AS "user",
+to_jsonb(nl) AS next_level,
+(SELECT COUNT(*) FROM user_badges ub
+WHERE ub.user_id = ug.user_id AND ub.group_id = ug.group_id) AS badge_count,
+to_jsonb(c) AS clan, to_jsonb(cl) AS clan_leader
+FROM user_groups ug
+JOIN levels l ON l.id = ug.level_id
+LEFT JOIN users u ON u.id = ug.user_id
+LEFT JOIN levels nl ON nl.level_number = l.level_number + 1
+LEFT JOIN clans c ON c.id = ug.clan_id
+LEFT JOIN users cl ON cl.id = c.leader_user_id
+WHERE ug.user_id = $1 AND ug.group_id = $2;
+
+-- name: update_user_stats (hot)
+UPDATE user_groups
+SET xp = xp + $3,
+coins = coins + $4,
+total_messages = total_messages + 1,
+season_xp = CASE WHEN season_id >= $5 THEN season_xp + $3 ELSE $3 END,
+prev_season_id = CASE WHEN season_id < $5 THEN season_id ELSE prev_season_id END,
+prev_season_xp = CASE WHEN season_id < $5 THEN season_xp ELSE prev_season_xp END,
+season_id = GREATEST(season_id, $5),
+last_message_at = CURRENT_TIMESTAMP,
+last_xp_gain = CURRENT_TIMESTAMP,
+updated_at = CURRENT_TIMESTAMP
+WHERE user_id = $1 AND group_id = $2;
+
+-- name: update_user_level (hot)
+UPDATE user_groups
+SET level_id = $3, updated_at = CURRENT_TIMESTAMP
+WHERE user_id = $1 AND group_id = $2;
+
+-- name: get_group_leaderboard (hot)
+SELECT ug.user_id, ug.xp, ug.level_id, u.username, u.first_name
+FROM user_groups ug
+JOIN users u ON u.id = ug.user_id
+WHERE ug.group_id = $1 AND ug.is_active = TRUE
+ORDER BY ug.xp DESC
+LIMIT $2;
+
+-- name: get_leaderboard_page (hot)
+SELECT ug.user_id, ug.xp, ug.level_id, ug.updated_at, u.username, u.first_name
+FROM user_groups ug
+JOIN users u ON u.id = ug.user_id
+WHERE ug.group_id = $1 AND ug.is_active = TRUE
+AND (ug.xp, ug.user_id) < ($3, $4)
+ORDER BY ug.xp DESC, ug.user_id DESC LIMIT $2;
+
+-- name: get_group_daily_stats (hot)
+SELECT stat_date, messages, active_users, xp_gained, coins_gained, updated_at
+FROM group_daily_stats
+WHERE group_id = $1 AND stat_date >= $2
+ORDER BY stat_date;
+
+-- name: get_group_activity (hot)
+SELECT hour_of_week, messages FROM group_activity WHERE group_id = $1 ORDER BY hour_of_week;
+
+-- name: get_activity_sketches (hot)
+SELECT group_id, sketch_date, sketch FROM activity_sketches
+WHERE group_id = ANY($1::bigint[]) AND sketch_date BETWEEN $2 AND $3;
+
+-- name: get_season (hot)
+SELECT * FROM seasons WHERE group_id = $1 AND season_id = $2;
+
+-- name: get_season_leaderboard (hot)
+SELECT ug.user_id, ug.season_xp AS xp, ug.level_id, u.username, u.first_name
+FROM user_groups ug
+JOIN users u ON u.id = ug.user_id
+WHERE ug.group_id = $1 AND ug.season_id = $2 AND ug.is_active = TRUE AND ug.season_xp > 0
+ORDER BY ug.season_xp DESC, ug.user_id DESC
+LIMIT $3;
+
+-- name: get_season_standings (hot)
+SELECT ss.user_id, ss.xp, ss.season_rank, u.username, u.first_name
+FROM season_standings ss
+LEFT JOIN users u ON u.id = ss.user_id
+WHERE ss.group_id = $1 AND ss.season_id = $2
+ORDER BY ss.season_rank
+LIMIT $3;
+
+-- name: start_season (hot)
+WITH bumped AS (
+INSERT INTO group_settings (group_id, season_id, updated_by)
+SELECT $1, $2, $3::bigint
+WHERE NOT EXISTS (SELECT 1 FROM seasons
+WHERE group_id = $1 AND ended_at IS NOT NULL AND archived_at IS NULL)
+AND ($2 = 2 OR EXISTS (SELECT 1 FROM group_settings WHERE group_id = $1))
+ON CONFLICT (group_id) DO UPDATE SET
+season_id = EXCLUDED.season_id,
+updated_by = EXCLUDED.updated_by,
+updated_at = CURRENT_TIMESTAMP
+WHERE group_settings.season_id = EXCLUDED.season_id - 1
+RETURNING *
+), ended AS (
+INSERT INTO seasons (group_id, season_id, ended_at)
+SELECT group_id, season_id - 1, CURRENT_TIMESTAMP FROM bumped
+ON CONFLICT (group_id, season_id) DO UPDATE SET ended_at = EXCLUDED.ended_at
+), started AS (
+INSERT INTO seasons (group_id, season_id, started_at, started_by)
+SELECT group_id, season_id, CURRENT_TIMESTAMP, $3::bigint FROM bumped
+ON CONFLICT (group_id, season_id) DO NOTHING
+)
+SELECT * FROM bumped;
+
+-- name: get_level_by_id (hot)
+SELECT * FROM levels WHERE id = $1;
+
+-- name: get_level_by_number (hot)
+SELECT * FROM levels WHERE level_number = $1;
+
+-- name: get_level_by_xp (hot)
+SELECT * FROM levels
+WHERE required_xp <= $1
+ORDER BY required_xp DESC
+LIMIT 1;
+
+-- name: get_all_levels (hot)
+SELECT * FROM levels ORDER BY required_xp ASC;
+
+-- name: get_shop_items (hot)
+SELECT * FROM shop_items WHERE is_active = TRUE ORDER BY price ASC LIMIT $1;
+
+-- name: get_shop_item_by_id (hot)
+SELECT * FROM shop_items WHERE id = $1 AND is_active = TRUE;
+
+-- name: get_all_badges (hot)
+SELECT * FROM badges WHERE is_active = TRUE;
+
+-- name: get_user_badges (hot)
+SELECT b.* FROM badges b
+JOIN user_badges ub ON b.id = ub.badge_id
+WHERE ub.user_id = $1 AND ub.group_id = $2
+ORDER BY ub.earned_at DESC;
+
+-- name: get_user_badges_count (hot)
+SELECT COUNT(*) FROM user_badges WHERE user_id = $1 AND group_id = $2;
+
+-- name: award_badge (hot)
+INSERT INTO user_badges (user_id, group_id, badge_id)
+VALUES ($1, $2, $3)
+ON CONFLICT (user_id, group_id, badge_id) DO NOTHING;
+
+-- name: get_daily_quests (hot)
+SELECT * FROM daily_quests
+WHERE user_id = $1 AND group_id = $2 AND quest_date = $3
+ORDER BY id;
+
+-- name: create_daily_quest (hot)
+INSERT INTO daily_quests (user_id, group_id, quest_type, target_value, reward_xp, reward_coins, quest_date)
+VALUES ($1, $2, $3, $4, $5, $6, $7);
+
+-- name: update_daily_quest_progress (hot)
+UPDATE daily_quests
+SET current_progress = current_progress + $4,
+is_completed = CASE WHEN current_progress + $4 >= target_value THEN TRUE ELSE FALSE END,
+completed_at = CASE WHEN current_progress + $4 >= target_value THEN CURRENT_TIMESTAMP ELSE completed_at END
+WHERE user_id = $1 AND group_id = $2 AND quest_type = $3 AND quest_date = $5;
+
+-- name: get_clan_by_id (hot)
+SELECT * FROM clans WHERE id = $1;
+
+-- name: get_clan_by_name (hot)
+SELECT * FROM clans WHERE name = $1 AND group_id = $2;
+
+-- name: log_message (hot)
+INSERT INTO message_logs (user_id, group_id, message_id, xp_gained, coins_gained, message_type)
+VALUES ($1, $2, $3, $4, $5, $6)
+ON CONFLICT (group_id, message_id) DO NOTHING
+RETURNING id;
+
+-- name: append_outbox_events (hot)
+INSERT INTO event_outbox (event_type, group_id, user_id, payload, created_at)
+SELECT t, g, u, p::jsonb, c
+FROM unnest($1::text[], $2::bigint[], $3::bigint[], $4::text[], $5::timestamp[]) AS e(t, g, u, p, c);
+
+-- name: add_to_inventory (hot)
+INSERT INTO user_inventory (user_id, group_id, item_id, quantity, expires_at)
+VALUES ($1, $2, $3, $4, $5);
+
+-- name: get_user_inventory (hot)
+SELECT ui.*, si.name, si.description, si.item_type, si.effect_type, si.effect_value
+FROM user_inventory ui
+JOIN shop_items si ON ui.item_id = si.id
+WHERE ui.user_id = $1 AND ui.group_id = $2 AND ui.is_active = TRUE
+AND (ui.expires_at IS NULL OR ui.expires_at > CURRENT_TIMESTAMP)
+ORDER BY ui.purchased_at DESC;
+
+-- name: bulk_adjust_users (hot)
+WITH updated AS (
+UPDATE user_groups ug
+SET xp = GREATEST(ug.xp + t.xp_delta, 0),
+coins = GREATEST(ug.coins + t.coins_delta, 0),
+season_xp = CASE
+WHEN ug.season_id = COALESCE((SELECT gs.season_id FROM group_settings gs WHERE gs.group_id = $2), 1)
+THEN GREATEST(ug.season_xp + t.xp_delta, 0)
+ELSE ug.season_xp
+END,
+level_id = COALESCE((
+SELECT l.id FROM levels l
+WHERE l.required_xp <= GREATEST(ug.xp + t.xp_delta, 0)
+ORDER BY l.required_xp DESC
+LIMIT 1
+), ug.level_id),
+updated_at = CURRENT_TIMESTAMP
+FROM unnest($3::bigint[], $4::bigint[], $5::bigint[]) AS t(user_id, xp_delta, coins_delta)
+WHERE ug.group_id = $2 AND ug.user_id = t.user_id
+RETURNING ug.user_id, ug.xp, ug.coins, ug.level_id,
+CASE WHEN t.xp_delta <> 0 THEN t.xp_delta ELSE t.coins_delta END AS amount
+), audit AS (
+INSERT INTO admin_actions (admin_user_id, target_user_id, group_id, action_type, amount, reason)
+SELECT $1, u.user_id, $2, $6, abs(u.amount), $7 FROM updated u
+)
+SELECT user_id, xp, coins, level_id FROM updated;
+
+-- name: bulk_reset_users (hot)
+WITH updated AS (
+UPDATE user_groups ug
+SET xp = 0,
+coins = 0,
+season_xp = 0,
+prev_season_xp = 0,
+level_id = (SELECT id FROM levels ORDER BY required_xp ASC LIMIT 1),
+updated_at = CURRENT_TIMESTAMP
+WHERE ug.group_id = $2 AND ug.user_id = ANY($3::bigint[])
+RETURNING ug.user_id, ug.xp, ug.coins, ug.level_id
+), audit AS (
+INSERT INTO admin_actions (admin_user_id, target_user_id, group_id, action_type, amount, reason)
+SELECT $1, u.user_id, $2, 'reset_user', 0, $4 FROM updated u
+)
+SELECT user_id, xp, coins, level_id FROM updated;
+
+-- name: get_group_settings_since
+SELECT * FROM group_settings WHERE updated_at >= $1;
+
+-- name: claim_outbox_events
+DELETE FROM event_outbox
+WHERE id IN (SELECT id FROM event_outbox ORDER BY id LIMIT $1 FOR UPDATE SKIP LOCKED)
+RETURNING id, event_type, group_id, user_id, payload, created_at;
+
+-- name: refresh_group_daily_stats
+WITH upserted AS (
+INSERT INTO group_daily_stats (group_id, stat_date, messages, active_users, xp_gained, coins_gained)
+SELECT group_id, created_at::date, COUNT(*), COUNT(DISTINCT user_id),
+COALESCE(SUM(xp_gained), 0), COALESCE(SUM(coins_gained), 0)
+FROM message_logs
+WHERE created_at >= $1
+GROUP BY group_id, created_at::date
+ON CONFLICT (group_id, stat_date) DO UPDATE SET
+messages = EXCLUDED.messages,
+active_users = EXCLUDED.active_users,
+xp_gained = EXCLUDED.xp_gained,
+coins_gained = EXCLUDED.coins_gained,
+updated_at = CURRENT_TIMESTAMP
+WHERE (group_daily_stats.messages, group_daily_stats.active_users,
+group_daily_stats.xp_gained, group_daily_stats.coins_gained)
+IS DISTINCT FROM (EXCLUDED.messages, EXCLUDED.active_users, EXCLUDED.xp_gained, EXCLUDED.coins_gained)
+RETURNING 1
+)
+SELECT COUNT(*) FROM upserted;
+
+-- name: add_group_activity
+INSERT INTO group_activity (group_id, hour_of_week, messages)
+SELECT g, h, m FROM unnest($1::bigint[], $2::smallint[], $3::bigint[]) AS a(g, h, m)
+ON CONFLICT (group_id, hour_of_week) DO UPDATE SET
+messages = group_activity.messages + EXCLUDED.messages,
+updated_at = CURRENT_TIMESTAMP;
+
+-- name: save_activity_sketches
+INSERT INTO activity_sketches (group_id, sketch_date, sketch)
+SELECT g, d, s FROM unnest($1::bigint[], $2::date[], $3::bytea[]) AS a(g, d, s)
+ON CONFLICT (group_id, sketch_date) DO UPDATE SET
+sketch = EXCLUDED.sketch,
+updated_at = CURRENT_TIMESTAMP;
+
+-- name: archive_season
+WITH final AS (
+SELECT user_id, CASE WHEN season_id = $2 THEN season_xp ELSE prev_season_xp END AS xp
+FROM user_groups
+WHERE group_id = $1 AND is_active = TRUE AND (season_id = $2 OR prev_season_id = $2)
+), copied AS (
+INSERT INTO season_standings (group_id, season_id, user_id, xp, season_rank)
+SELECT $1, $2, user_id, xp, ROW_NUMBER() OVER (ORDER BY xp DESC, user_id DESC)
+FROM final WHERE xp > 0
+ON CONFLICT (group_id, season_id, user_id) DO NOTHING
+), marked AS (
+INSERT INTO seasons (group_id, season_id, archived_at, members)
+SELECT $1, $2, CURRENT_TIMESTAMP, COUNT(*) FROM final WHERE xp > 0
+ON CONFLICT (group_id, season_id) DO UPDATE SET
+archived_at = EXCLUDED.archived_at,
+members = EXCLUDED.members
+RETURNING members
+)
+SELECT members FROM marked;
+
+-- name: get_due_seasons
+SELECT gs.group_id, gs.season_id
+FROM group_settings gs
+LEFT JOIN seasons s ON s.group_id = gs.group_id AND s.season_id = gs.season_id
+WHERE gs.season_days > 0
+AND COALESCE(s.started_at, gs.updated_at) + gs.season_days * INTERVAL '1 day' <= $1;
+
+-- name: get_unarchived_seasons
+SELECT * FROM seasons
+WHERE archived_at IS NULL AND ended_at IS NOT NULL AND ended_at <= $1
+ORDER BY ended_at;
+
+-- name: count_user_groups
+SELECT GREATEST(reltuples, 0)::bigint FROM pg_class WHERE relname = 'user_groups';
+
+-- name: fetch_user_groups_chunk
+SELECT id, xp, level_id FROM user_groups
+WHERE id > $1
+ORDER BY id
+LIMIT $2;
+
+-- name: bulk_update_level_ids
+UPDATE user_groups ug
+SET level_id = t.level_id, updated_at = CURRENT_TIMESTAMP
+FROM unnest($1::bigint[], $2::int[]) AS t(id, level_id)
+WHERE ug.id = t.id AND ug.level_id IS DISTINCT FROM t.level_id;
+
+-- name: sweep_daily_quests
+WITH batch AS (
+DELETE FROM daily_quests
+WHERE id IN (
+SELECT id FROM daily_quests
+WHERE quest_date < $1
+ORDER BY id
+LIMIT $2
+FOR UPDATE SKIP LOCKED
+)
+RETURNING *
+), archived AS (
+INSERT INTO daily_quests_archive (id, user_id, group_id, quest_type, target_value, current_progress,
+reward_xp, reward_coins, is_completed, quest_date, completed_at, created_at)
+SELECT id, user_id, group_id, quest_type, target_value, current_progress,
+reward_xp, reward_coins, is_completed, quest_date, completed_at, created_at
+FROM batch WHERE $3
+), rollup AS (
+INSERT INTO user_quest_history (user_id, group_id, quests_completed, quests_expired,
+total_reward_xp, total_reward_coins, last_quest_date)
+SELECT user_id, group_id,
+COUNT(*) FILTER (WHERE is_completed),
+COUNT(*) FILTER (WHERE NOT is_completed),
+COALESCE(SUM(reward_xp) FILTER (WHERE is_completed), 0),
+COALESCE(SUM(reward_coins) FILTER (WHERE is_completed), 0),
+MAX(quest_date)
+FROM batch
+GROUP BY user_id, group_id
+ON CONFLICT (user_id, group_id) DO UPDATE SET
+quests_completed = user_quest_history.quests_completed + EXCLUDED.quests_completed,
+quests_expired = user_quest_history.quests_expired + EXCLUDED.quests_expired,
+total_reward_xp = user_quest_history.total_reward_xp + EXCLUDED.total_reward_xp,
+total_reward_coins = user_quest_history.total_reward_coins + EXCLUDED.total_reward_coins,
+last_quest_date = GREATEST(user_quest_history.last_quest_date, EXCLUDED.last_quest_date),
+updated_at = CURRENT_TIMESTAMP
+)
+SELECT COUNT(*) AS deleted, COUNT(*) FILTER (WHERE is_completed) AS completed FROM batch;
+
+-- name: fetch_group_ids_chunk
+SELECT id FROM groups
+WHERE is_active AND ($1::bigint IS NULL OR id > $1)
+ORDER BY id
+LIMIT $2;
+
+-- name: generate_daily_quests
+WITH created AS (
+INSERT INTO daily_quests (user_id, group_id, quest_type, target_value, reward_xp, reward_coins, quest_date)
+SELECT ug.user_id, ug.group_id, q.quest_type, q.target_value, q.reward_xp, q.reward_coins, $2
+FROM user_groups ug
+JOIN unnest($4::int[], $5::text[], $6::int[], $7::int[], $8::int[])
+AS q(level_id, quest_type, target_value, reward_xp, reward_coins) ON q.level_id = ug.level_id
+WHERE ug.group_id = ANY($1::bigint[]) AND ug.is_active AND ug.last_message_at >= $3
+ON CONFLICT (user_id, group_id, quest_type, quest_date) DO NOTHING
+RETURNING 1
+)
+SELECT COUNT(*) AS created FROM created;
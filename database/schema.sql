@@ -15,6 +15,22 @@ CREATE TABLE groups (
     is_active BOOLEAN DEFAULT TRUE
 );
 
+-- إعدادات كل جروب (الجروبات بدون صف تستخدم القيم الافتراضية)
+CREATE TABLE group_settings (
+    group_id BIGINT PRIMARY KEY,
+    xp_cooldown INT NOT NULL DEFAULT 60,
+    min_xp INT NOT NULL DEFAULT 5,
+    max_xp INT NOT NULL DEFAULT 15,
+    min_coins INT NOT NULL DEFAULT 1,
+    max_coins INT NOT NULL DEFAULT 10,
+    season_days INT NOT NULL DEFAULT 0,
+    season_id INT NOT NULL DEFAULT 1,
+    updated_by BIGINT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    INDEX idx_updated_at (updated_at)
+);
+
 -- جدول المستخدمين الأساسي
 CREATE TABLE users (
     id BIGINT PRIMARY KEY,
@@ -54,6 +70,10 @@ CREATE TABLE user_groups (
     last_xp_gain TIMESTAMP NULL,
     clan_id BIGINT NULL,
     is_active BOOLEAN DEFAULT TRUE,
+    season_id INT NOT NULL DEFAULT 1,
+    season_xp BIGINT DEFAULT 0,
+    prev_season_id INT NULL,
+    prev_season_xp BIGINT DEFAULT 0,
     joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
@@ -142,7 +162,41 @@ CREATE TABLE daily_quests (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
     UNIQUE KEY unique_user_group_quest_date (user_id, group_id, quest_type, quest_date),
-    INDEX idx_user_group_date (user_id, group_id, quest_date)
+    INDEX idx_user_group_date (user_id, group_id, quest_date),
+    INDEX idx_quest_date (quest_date)
+);
+
+-- أرشيف المهام اليومية القديمة (اختياري)
+CREATE TABLE daily_quests_archive (
+    id BIGINT PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    group_id BIGINT NOT NULL,
+    quest_type VARCHAR(100) NOT NULL,
+    target_value BIGINT NOT NULL,
+    current_progress BIGINT DEFAULT 0,
+    reward_xp BIGINT NOT NULL,
+    reward_coins BIGINT NOT NULL,
+    is_completed BOOLEAN DEFAULT FALSE,
+    quest_date DATE NOT NULL,
+    completed_at TIMESTAMP NULL,
+    created_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_archive_user_group (user_id, group_id, quest_date)
+);
+
+-- سجل المهام المجمع لكل مستخدم (يُحدث عند تنظيف المهام القديمة)
+CREATE TABLE user_quest_history (
+    user_id BIGINT NOT NULL,
+    group_id BIGINT NOT NULL,
+    quests_completed BIGINT DEFAULT 0,
+    quests_expired BIGINT DEFAULT 0,
+    total_reward_xp BIGINT DEFAULT 0,
+    total_reward_coins BIGINT DEFAULT 0,
+    last_quest_date DATE NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, group_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
 );
 
 -- جدول الكلانات
@@ -189,10 +243,71 @@ CREATE TABLE message_logs (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
     FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    UNIQUE KEY unique_group_message (group_id, message_id),
     INDEX idx_user_group_date (user_id, group_id, created_at),
     INDEX idx_group_date (group_id, created_at)
 );
 
+-- إحصائيات يومية مجمعة لكل جروب (تُحدث دورياً من message_logs وتقرأها واجهة الإحصائيات)
+CREATE TABLE group_daily_stats (
+    group_id BIGINT NOT NULL,
+    stat_date DATE NOT NULL,
+    messages BIGINT DEFAULT 0,
+    active_users BIGINT DEFAULT 0,
+    xp_gained BIGINT DEFAULT 0,
+    coins_gained BIGINT DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (group_id, stat_date),
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+);
+
+-- عدد الرسائل الممنوحة لكل جروب حسب ساعة الأسبوع (0 = الاثنين 00:00 ... 167 = الأحد 23:00)
+-- يُكتب بإضافة فروق عدادات الذاكرة دورياً (activity.py) ويقرؤه أمر /activity
+CREATE TABLE group_activity (
+    group_id BIGINT NOT NULL,
+    hour_of_week SMALLINT NOT NULL,
+    messages BIGINT DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (group_id, hour_of_week),
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+);
+
+-- مخطط HyperLogLog للأعضاء النشطين لكل جروب ويوم (group_id = 0 لكل الجروبات، انظر hll.py)
+-- الأسبوع والشهر يُحسبان بدمج مخططات الأيام بدل COUNT(DISTINCT user_id) على message_logs
+CREATE TABLE activity_sketches (
+    group_id BIGINT NOT NULL,
+    sketch_date DATE NOT NULL,
+    sketch BLOB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (group_id, sketch_date)
+);
+
+-- مواسم كل جروب (الموسم 1 ضمني حتى يبدأ الثاني)
+CREATE TABLE seasons (
+    group_id BIGINT NOT NULL,
+    season_id INT NOT NULL,
+    started_at TIMESTAMP NULL,
+    ended_at TIMESTAMP NULL,
+    archived_at TIMESTAMP NULL,
+    started_by BIGINT NULL,
+    members INT DEFAULT 0,
+    PRIMARY KEY (group_id, season_id),
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+);
+
+-- الترتيب النهائي لكل موسم منتهٍ (نسخة من user_groups تُؤخذ خارج مسار الرسائل، انظر seasons.py)
+CREATE TABLE season_standings (
+    group_id BIGINT NOT NULL,
+    season_id INT NOT NULL,
+    user_id BIGINT NOT NULL,
+    xp BIGINT NOT NULL,
+    season_rank INT NOT NULL,
+    PRIMARY KEY (group_id, season_id, user_id),
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    INDEX idx_season_rank (group_id, season_id, season_rank)
+);
+
 -- جدول الإجراءات الإدارية
 CREATE TABLE admin_actions (
     id BIGINT PRIMARY KEY AUTO_INCREMENT,
@@ -210,6 +325,16 @@ CREATE TABLE admin_actions (
     INDEX idx_admin_date (admin_user_id, created_at)
 );
 
+-- صندوق الأحداث الصادرة (outbox): يُكتب على دفعات ويسحبه المستهلكون (python events.py drain)
+CREATE TABLE event_outbox (
+    id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    event_type VARCHAR(50) NOT NULL,
+    group_id BIGINT,
+    user_id BIGINT,
+    payload JSON NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- جدول إحصائيات البوت
 CREATE TABLE bot_stats (
     id INT PRIMARY KEY AUTO_INCREMENT,
@@ -0,0 +1,470 @@
+-- مخطط PostgreSQL / Supabase
+-- مُولد من database/schema.sql بواسطة: python bot/migrate.py schema (لا تعدله يدوياً)
+
+CREATE OR REPLACE FUNCTION set_updated_at() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- الاحتفاظ بالقيمة إن عُدلت صراحةً (مثل أداة النسخ)
+    IF NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at THEN
+        NEW.updated_at = CURRENT_TIMESTAMP;
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION notify_group_change() RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM pg_notify(TG_TABLE_NAME, COALESCE(NEW.group_id, OLD.group_id)::text);
+    RETURN NULL;
+END;
+$$;
+
+CREATE TABLE IF NOT EXISTS groups (
+    id BIGINT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    username VARCHAR(255),
+    description TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_active BOOLEAN DEFAULT TRUE
+);
+CREATE OR REPLACE TRIGGER trg_groups_updated_at BEFORE UPDATE ON groups
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE TABLE IF NOT EXISTS group_settings (
+    group_id BIGINT PRIMARY KEY,
+    xp_cooldown INT NOT NULL DEFAULT 60,
+    min_xp INT NOT NULL DEFAULT 5,
+    max_xp INT NOT NULL DEFAULT 15,
+    min_coins INT NOT NULL DEFAULT 1,
+    max_coins INT NOT NULL DEFAULT 10,
+    season_days INT NOT NULL DEFAULT 0,
+    season_id INT NOT NULL DEFAULT 1,
+    updated_by BIGINT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_group_settings_updated_at ON group_settings (updated_at);
+CREATE OR REPLACE TRIGGER trg_group_settings_updated_at BEFORE UPDATE ON group_settings
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+CREATE OR REPLACE TRIGGER trg_group_settings_notify AFTER INSERT OR UPDATE OR DELETE ON group_settings
+    FOR EACH ROW EXECUTE FUNCTION notify_group_change();
+
+CREATE TABLE IF NOT EXISTS users (
+    id BIGINT PRIMARY KEY,
+    username VARCHAR(255),
+    first_name VARCHAR(255),
+    last_name VARCHAR(255),
+    language_code VARCHAR(10) DEFAULT 'ar',
+    is_bot BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE OR REPLACE TRIGGER trg_users_updated_at BEFORE UPDATE ON users
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE TABLE IF NOT EXISTS levels (
+    id INT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    level_number INT NOT NULL UNIQUE,
+    level_name VARCHAR(100) NOT NULL,
+    level_emoji VARCHAR(10) NOT NULL,
+    required_xp BIGINT NOT NULL,
+    category TEXT NOT NULL CHECK (category IN ('Basic', 'Junior', 'Medium', 'Senior', 'Expert', 'Master', 'Grand Master', 'Legend', 'Mythic', 'Supreme', 'Owner')),
+    tier INT NOT NULL CHECK (tier BETWEEN 1 AND 5),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_levels_required_xp ON levels (required_xp);
+
+CREATE TABLE IF NOT EXISTS user_groups (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    group_id BIGINT NOT NULL,
+    xp BIGINT DEFAULT 0,
+    level_id INT DEFAULT 1,
+    coins BIGINT DEFAULT 0,
+    total_messages BIGINT DEFAULT 0,
+    last_message_at TIMESTAMP NULL,
+    last_xp_gain TIMESTAMP NULL,
+    clan_id BIGINT NULL,
+    is_active BOOLEAN DEFAULT TRUE,
+    season_id INT NOT NULL DEFAULT 1,
+    season_xp BIGINT DEFAULT 0,
+    prev_season_id INT NULL,
+    prev_season_xp BIGINT DEFAULT 0,
+    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    FOREIGN KEY (level_id) REFERENCES levels(id),
+    CONSTRAINT unique_user_group UNIQUE (user_id, group_id)
+);
+CREATE INDEX IF NOT EXISTS idx_user_groups_user_xp ON user_groups (user_id, xp);
+CREATE INDEX IF NOT EXISTS idx_user_groups_group_level ON user_groups (group_id, level_id);
+CREATE INDEX IF NOT EXISTS idx_user_groups_clan ON user_groups (clan_id);
+CREATE OR REPLACE TRIGGER trg_user_groups_updated_at BEFORE UPDATE ON user_groups
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE TABLE IF NOT EXISTS shop_items (
+    id INT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    price BIGINT NOT NULL,
+    item_type TEXT NOT NULL CHECK (item_type IN ('booster', 'upgrade', 'badge', 'vip', 'protection')),
+    effect_type VARCHAR(100) NOT NULL,
+    effect_value NUMERIC(10,2) NOT NULL,
+    duration_hours INT DEFAULT 0,
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_shop_items_type_price ON shop_items (item_type, price);
+
+CREATE TABLE IF NOT EXISTS user_inventory (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    group_id BIGINT NOT NULL,
+    item_id INT NOT NULL,
+    quantity INT DEFAULT 1,
+    purchased_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NULL,
+    is_active BOOLEAN DEFAULT TRUE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    FOREIGN KEY (item_id) REFERENCES shop_items(id)
+);
+CREATE INDEX IF NOT EXISTS idx_user_inventory_user_group_item ON user_inventory (user_id, group_id, item_id);
+CREATE INDEX IF NOT EXISTS idx_user_inventory_expires ON user_inventory (expires_at);
+
+CREATE TABLE IF NOT EXISTS badges (
+    id INT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    emoji VARCHAR(10) NOT NULL,
+    category VARCHAR(100) NOT NULL,
+    requirement_type VARCHAR(100) NOT NULL,
+    requirement_value BIGINT NOT NULL,
+    rarity TEXT DEFAULT 'common' CHECK (rarity IN ('common', 'rare', 'epic', 'legendary')),
+    is_active BOOLEAN DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS user_badges (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    group_id BIGINT NOT NULL,
+    badge_id INT NOT NULL,
+    earned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    FOREIGN KEY (badge_id) REFERENCES badges(id),
+    CONSTRAINT unique_user_group_badge UNIQUE (user_id, group_id, badge_id)
+);
+
+CREATE TABLE IF NOT EXISTS daily_quests (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    group_id BIGINT NOT NULL,
+    quest_type VARCHAR(100) NOT NULL,
+    target_value BIGINT NOT NULL,
+    current_progress BIGINT DEFAULT 0,
+    reward_xp BIGINT NOT NULL,
+    reward_coins BIGINT NOT NULL,
+    is_completed BOOLEAN DEFAULT FALSE,
+    quest_date DATE NOT NULL,
+    completed_at TIMESTAMP NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    CONSTRAINT unique_user_group_quest_date UNIQUE (user_id, group_id, quest_type, quest_date)
+);
+CREATE INDEX IF NOT EXISTS idx_daily_quests_user_group_date ON daily_quests (user_id, group_id, quest_date);
+CREATE INDEX IF NOT EXISTS idx_daily_quests_quest_date ON daily_quests (quest_date);
+
+CREATE TABLE IF NOT EXISTS daily_quests_archive (
+    id BIGINT PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    group_id BIGINT NOT NULL,
+    quest_type VARCHAR(100) NOT NULL,
+    target_value BIGINT NOT NULL,
+    current_progress BIGINT DEFAULT 0,
+    reward_xp BIGINT NOT NULL,
+    reward_coins BIGINT NOT NULL,
+    is_completed BOOLEAN DEFAULT FALSE,
+    quest_date DATE NOT NULL,
+    completed_at TIMESTAMP NULL,
+    created_at TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_daily_quests_archive_archive_user_group ON daily_quests_archive (user_id, group_id, quest_date);
+
+CREATE TABLE IF NOT EXISTS user_quest_history (
+    user_id BIGINT NOT NULL,
+    group_id BIGINT NOT NULL,
+    quests_completed BIGINT DEFAULT 0,
+    quests_expired BIGINT DEFAULT 0,
+    total_reward_xp BIGINT DEFAULT 0,
+    total_reward_coins BIGINT DEFAULT 0,
+    last_quest_date DATE NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, group_id),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+);
+CREATE OR REPLACE TRIGGER trg_user_quest_history_updated_at BEFORE UPDATE ON user_quest_history
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE TABLE IF NOT EXISTS clans (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    description TEXT,
+    leader_user_id BIGINT NOT NULL,
+    group_id BIGINT NOT NULL,
+    total_xp BIGINT DEFAULT 0,
+    member_count INT DEFAULT 1,
+    max_members INT DEFAULT 20,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (leader_user_id) REFERENCES users(id),
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    CONSTRAINT unique_clan_name_group UNIQUE (name, group_id)
+);
+CREATE INDEX IF NOT EXISTS idx_clans_group_xp ON clans (group_id, total_xp);
+CREATE OR REPLACE TRIGGER trg_clans_updated_at BEFORE UPDATE ON clans
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE TABLE IF NOT EXISTS clan_activities (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    clan_id BIGINT NOT NULL,
+    user_id BIGINT NOT NULL,
+    activity_type TEXT NOT NULL CHECK (activity_type IN ('join', 'leave', 'promotion', 'xp_gain', 'achievement')),
+    description TEXT,
+    xp_amount BIGINT DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (clan_id) REFERENCES clans(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+CREATE INDEX IF NOT EXISTS idx_clan_activities_clan_date ON clan_activities (clan_id, created_at);
+
+CREATE TABLE IF NOT EXISTS message_logs (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    group_id BIGINT NOT NULL,
+    message_id BIGINT NOT NULL,
+    xp_gained BIGINT DEFAULT 0,
+    coins_gained BIGINT DEFAULT 0,
+    message_type TEXT DEFAULT 'text' CHECK (message_type IN ('text', 'photo', 'video', 'document', 'sticker', 'voice', 'other')),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    CONSTRAINT unique_group_message UNIQUE (group_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_message_logs_user_group_date ON message_logs (user_id, group_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_message_logs_group_date ON message_logs (group_id, created_at);
+
+CREATE TABLE IF NOT EXISTS group_daily_stats (
+    group_id BIGINT NOT NULL,
+    stat_date DATE NOT NULL,
+    messages BIGINT DEFAULT 0,
+    active_users BIGINT DEFAULT 0,
+    xp_gained BIGINT DEFAULT 0,
+    coins_gained BIGINT DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (group_id, stat_date),
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+);
+CREATE OR REPLACE TRIGGER trg_group_daily_stats_updated_at BEFORE UPDATE ON group_daily_stats
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE TABLE IF NOT EXISTS group_activity (
+    group_id BIGINT NOT NULL,
+    hour_of_week SMALLINT NOT NULL,
+    messages BIGINT DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (group_id, hour_of_week),
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+);
+CREATE OR REPLACE TRIGGER trg_group_activity_updated_at BEFORE UPDATE ON group_activity
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE TABLE IF NOT EXISTS activity_sketches (
+    group_id BIGINT NOT NULL,
+    sketch_date DATE NOT NULL,
+    sketch BYTEA NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (group_id, sketch_date)
+);
+CREATE OR REPLACE TRIGGER trg_activity_sketches_updated_at BEFORE UPDATE ON activity_sketches
+    FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE TABLE IF NOT EXISTS seasons (
+    group_id BIGINT NOT NULL,
+    season_id INT NOT NULL,
+    started_at TIMESTAMP NULL,
+    ended_at TIMESTAMP NULL,
+    archived_at TIMESTAMP NULL,
+    started_by BIGINT NULL,
+    members INT DEFAULT 0,
+    PRIMARY KEY (group_id, season_id),
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS season_standings (
+    group_id BIGINT NOT NULL,
+    season_id INT NOT NULL,
+    user_id BIGINT NOT NULL,
+    xp BIGINT NOT NULL,
+    season_rank INT NOT NULL,
+    PRIMARY KEY (group_id, season_id, user_id),
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_season_standings_season_rank ON season_standings (group_id, season_id, season_rank);
+
+CREATE TABLE IF NOT EXISTS admin_actions (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    admin_user_id BIGINT NOT NULL,
+    target_user_id BIGINT NOT NULL,
+    group_id BIGINT NOT NULL,
+    action_type TEXT NOT NULL CHECK (action_type IN ('add_xp', 'remove_xp', 'add_coins', 'remove_coins', 'reset_user', 'ban', 'unban')),
+    amount BIGINT DEFAULT 0,
+    reason TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (admin_user_id) REFERENCES users(id),
+    FOREIGN KEY (target_user_id) REFERENCES users(id),
+    FOREIGN KEY (group_id) REFERENCES groups(id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_admin_actions_group_date ON admin_actions (group_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_admin_actions_admin_date ON admin_actions (admin_user_id, created_at);
+
+CREATE TABLE IF NOT EXISTS event_outbox (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    event_type VARCHAR(50) NOT NULL,
+    group_id BIGINT,
+    user_id BIGINT,
+    payload JSONB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS bot_stats (
+    id INT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+    stat_date DATE NOT NULL UNIQUE,
+    total_users BIGINT DEFAULT 0,
+    total_groups BIGINT DEFAULT 0,
+    total_messages BIGINT DEFAULT 0,
+    total_xp_gained BIGINT DEFAULT 0,
+    total_coins_gained BIGINT DEFAULT 0,
+    active_users BIGINT DEFAULT 0,
+    new_users BIGINT DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- فهارس الاستعلامات الساخنة
+CREATE INDEX IF NOT EXISTS idx_users_username_lower ON users (lower(username));
+CREATE INDEX IF NOT EXISTS idx_user_groups_leaderboard ON user_groups (group_id, xp DESC, user_id DESC) INCLUDE (level_id) WHERE is_active;
+CREATE INDEX IF NOT EXISTS idx_user_groups_season ON user_groups (group_id, season_id, season_xp DESC, user_id DESC) INCLUDE (level_id) WHERE is_active;
+CREATE INDEX IF NOT EXISTS idx_message_logs_created_brin ON message_logs USING brin (created_at);
+CREATE INDEX IF NOT EXISTS idx_user_inventory_active ON user_inventory (user_id, group_id, purchased_at DESC) INCLUDE (item_id, expires_at) WHERE is_active;
+CREATE INDEX IF NOT EXISTS idx_shop_items_active_price ON shop_items (price) WHERE is_active;
+CREATE INDEX IF NOT EXISTS idx_user_badges_earned ON user_badges (user_id, group_id, earned_at DESC);
+
+-- البيانات الأولية
+
+INSERT INTO levels (level_number, level_name, level_emoji, required_xp, category, tier) VALUES
+-- Basic (1-5)
+(1, 'Basic I', '🌱', 0, 'Basic', 1),
+(2, 'Basic II', '🌿', 100, 'Basic', 2),
+(3, 'Basic III', '🍃', 250, 'Basic', 3),
+(4, 'Basic IV', '🌾', 500, 'Basic', 4),
+(5, 'Basic V', '🌳', 1000, 'Basic', 5),
+
+-- Junior (6-10)
+(6, 'Junior I', '🔵', 1750, 'Junior', 1),
+(7, 'Junior II', '🟦', 2750, 'Junior', 2),
+(8, 'Junior III', '💙', 4000, 'Junior', 3),
+(9, 'Junior IV', '🧿', 5500, 'Junior', 4),
+(10, 'Junior V', '🔷', 7500, 'Junior', 5),
+
+-- Medium (11-15)
+(11, 'Medium I', '🟢', 10000, 'Medium', 1),
+(12, 'Medium II', '🟩', 13000, 'Medium', 2),
+(13, 'Medium III', '💚', 16500, 'Medium', 3),
+(14, 'Medium IV', '🍀', 20500, 'Medium', 4),
+(15, 'Medium V', '🔶', 25000, 'Medium', 5),
+
+-- Senior (16-20)
+(16, 'Senior I', '🟠', 30000, 'Senior', 1),
+(17, 'Senior II', '🟧', 35500, 'Senior', 2),
+(18, 'Senior III', '🧡', 41500, 'Senior', 3),
+(19, 'Senior IV', '🔸', 48000, 'Senior', 4),
+(20, 'Senior V', '🔥', 55000, 'Senior', 5),
+
+-- Expert (21-25)
+(21, 'Expert I', '🟣', 63000, 'Expert', 1),
+(22, 'Expert II', '🟪', 72000, 'Expert', 2),
+(23, 'Expert III', '💜', 82000, 'Expert', 3),
+(24, 'Expert IV', '🔮', 93000, 'Expert', 4),
+(25, 'Expert V', '⚡', 105000, 'Expert', 5),
+
+-- Master (26-30)
+(26, 'Master I', '🔴', 118000, 'Master', 1),
+(27, 'Master II', '🟥', 132000, 'Master', 2),
+(28, 'Master III', '❤️', 147000, 'Master', 3),
+(29, 'Master IV', '💎', 163000, 'Master', 4),
+(30, 'Master V', '👑', 180000, 'Master', 5),
+
+-- Grand Master (31-35)
+(31, 'Grand Master I', '🌟', 198000, 'Grand Master', 1),
+(32, 'Grand Master II', '⭐', 217000, 'Grand Master', 2),
+(33, 'Grand Master III', '✨', 237000, 'Grand Master', 3),
+(34, 'Grand Master IV', '💫', 258000, 'Grand Master', 4),
+(35, 'Grand Master V', '🌠', 280000, 'Grand Master', 5),
+
+-- Legend (36-40)
+(36, 'Legend I', '🏆', 303000, 'Legend', 1),
+(37, 'Legend II', '🥇', 327000, 'Legend', 2),
+(38, 'Legend III', '🏅', 352000, 'Legend', 3),
+(39, 'Legend IV', '🎖️', 378000, 'Legend', 4),
+(40, 'Legend V', '🏵️', 405000, 'Legend', 5),
+
+-- Mythic (41-45)
+(41, 'Mythic I', '🌈', 433000, 'Mythic', 1),
+(42, 'Mythic II', '🦄', 462000, 'Mythic', 2),
+(43, 'Mythic III', '🐉', 492000, 'Mythic', 3),
+(44, 'Mythic IV', '🔱', 523000, 'Mythic', 4),
+(45, 'Mythic V', '⚜️', 555000, 'Mythic', 5),
+
+-- Supreme (46-50)
+(46, 'Supreme I', '🌌', 588000, 'Supreme', 1),
+(47, 'Supreme II', '🌠', 622000, 'Supreme', 2),
+(48, 'Supreme III', '✨', 657000, 'Supreme', 3),
+(49, 'Supreme IV', '🌟', 693000, 'Supreme', 4),
+(50, 'Supreme V', '💫', 730000, 'Supreme', 5),
+
+-- Owner (51-55)
+(51, 'Owner I', '👑', 768000, 'Owner', 1),
+(52, 'Owner II', '💎', 807000, 'Owner', 2),
+(53, 'Owner III', '🔥', 847000, 'Owner', 3),
+(54, 'Owner IV', '⚡', 888000, 'Owner', 4),
+(55, 'Owner V', '🎯', 930000, 'Owner', 5);
+
+INSERT INTO shop_items (name, description, price, item_type, effect_type, effect_value, duration_hours) VALUES
+('XP Booster', 'مضاعف XP لمدة ساعة واحدة', 50, 'booster', 'xp_multiplier', 2.0, 1),
+('Coin Booster', 'مضاعف العملات لمدة ساعة واحدة', 75, 'booster', 'coin_multiplier', 2.0, 1),
+('XP Shield', 'حماية من فقدان XP لمدة 24 ساعة', 100, 'protection', 'xp_protection', 1.0, 24),
+('VIP Status', 'حالة VIP لمدة 7 أيام', 500, 'upgrade', 'vip_status', 1.0, 168),
+('Mega Booster', 'مضاعف XP و Coins لمدة 30 دقيقة', 150, 'booster', 'mega_multiplier', 3.0, 0.5),
+('Legend Badge', 'شارة الأسطورة', 1000, 'badge', 'special_badge', 1.0, 0);
+
+INSERT INTO badges (name, description, emoji, category, requirement_type, requirement_value, rarity) VALUES
+('First Steps', 'أول رسالة في الجروب', '👶', 'milestone', 'messages', 1, 'common'),
+('Chatterbox', 'إرسال 100 رسالة', '💬', 'activity', 'messages', 100, 'common'),
+('Veteran', 'إرسال 1000 رسالة', '🏅', 'activity', 'messages', 1000, 'rare'),
+('Coin Collector', 'جمع 1000 عملة', '💰', 'achievement', 'coins', 1000, 'common'),
+('Wealthy', 'جمع 10000 عملة', '💎', 'achievement', 'coins', 10000, 'rare'),
+('Level Up', 'الوصول للمستوى 10', '📈', 'progression', 'level', 10, 'common'),
+('High Roller', 'الوصول للمستوى 25', '🎯', 'progression', 'level', 25, 'epic'),
+('Shopaholic', 'شراء 10 عناصر من المتجر', '🛍️', 'shopping', 'purchases', 10, 'rare'),
+('Clan Leader', 'إنشاء كلان', '👑', 'social', 'clan_created', 1, 'epic'),
+('Team Player', 'الانضمام لكلان', '🤝', 'social', 'clan_joined', 1, 'common');